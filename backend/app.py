@@ -35,11 +35,22 @@ from backend.sse import sse
 
 from backend.config import Config, config as config_map  # noqa: E402
 from backend.database import db, init_db  # noqa: E402
-from backend.migrations.runtime_schema_checks import ensure_schema_columns  # noqa: E402
+from backend.migrations.runtime_schema_checks import (  # noqa: E402
+    ensure_schema_columns,
+    ensure_schema_indexes,
+)
 from backend.extensions import limiter  # noqa: E402
 from backend.middleware.auth import init_auth_middleware  # noqa: E402
 from backend.middleware.audit import init_audit_middleware  # noqa: E402
 from backend.middleware.error_handler import init_error_handlers  # noqa: E402
+from backend.services import calendar_feed_service  # noqa: E402
+from backend.services import workday_calendar_service  # noqa: E402
+from backend.services.attendance_summary_service import register_summary_hooks  # noqa: E402
+from backend.services.audit_pipeline import init_audit_pipeline  # noqa: E402
+from backend.services.notification_counter_service import register_counter_hooks  # noqa: E402
+from backend.utils import principal_cache, settings_cache  # noqa: E402
+from backend.utils.geo_utils import invalidate_office_index  # noqa: E402
+from backend.utils.webhook_utils import clear_webhook_caches  # noqa: E402
 
 # Blueprints -----------------------------------------------------------------
 from backend.routes.admin_attendance_routes import admin_attendance_bp  # noqa: E402
@@ -59,6 +70,7 @@ from backend.routes.pause_routes import pause_bp  # noqa: E402
 from backend.routes.profile_routes import profile_bp  # noqa: E402
 from backend.routes.push_routes import push_bp  # noqa: E402
 from backend.routes.qr_attendance_routes import qr_code_bp  # noqa: E402
+from backend.routes.report_job_routes import report_jobs_bp  # noqa: E402
 from backend.routes.stats_routes import stats_bp  # noqa: E402
 from backend.routes.stripe_routes import stripe_bp  # noqa: E402
 from backend.routes.subscription_plan_routes import (  # noqa: E402
@@ -149,10 +161,27 @@ def _init_jwt(app: Flask) -> JWTManager:
 
 
 def _init_database(app: Flask) -> None:
+    # Avant ``db.init_app`` : ses fonctions de fin de contexte passent ainsi
+    # après la libération de la session
+    init_audit_pipeline(app)
     db.init_app(app)
+    # Les caches sont propres au processus, pas à la base ciblée
+    settings_cache.clear()
+    principal_cache.clear()
+    calendar_feed_service.clear()
+    workday_calendar_service.clear()
+    invalidate_office_index()
+    clear_webhook_caches()
+    register_summary_hooks()
+    register_counter_hooks()
+    settings_cache.register_settings_hooks()
+    principal_cache.register_principal_hooks()
+    calendar_feed_service.register_calendar_hooks()
+    workday_calendar_service.register_workday_calendar_hooks()
     with app.app_context():
         init_db()
         ensure_schema_columns()
+        ensure_schema_indexes()
 
 
 def _init_rate_limiter(app: Flask) -> None:
@@ -203,6 +232,7 @@ def _blueprint_registrations() -> Iterable[BlueprintRegistration]:
         (pause_bp, "/api/pause"),
         (stats_bp, "/api"),
         (export_bp, "/api"),
+        (report_jobs_bp, "/api/reports"),
         (subscription_plan_bp, "/api/subscription"),
         (webhook_bp, "/api/webhooks"),
         (superadmin_bp, "/api/superadmin"),
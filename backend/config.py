@@ -20,6 +20,8 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    # Rôle, entreprise et manager inscrits dans le jeton (suppose Redis, voir principal_cache)
+    JWT_PRINCIPAL_CLAIMS = os.environ.get('JWT_PRINCIPAL_CLAIMS', 'false').lower() in ['true', 'on', '1']
     
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:5173,http://localhost:3000').split(',')
@@ -45,6 +47,23 @@ class Config:
     SMTP_USERNAME = os.environ.get('SMTP_USERNAME') or os.environ.get('MAIL_USERNAME')
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD') or os.environ.get('MAIL_PASSWORD')
     SENDER_EMAIL = os.environ.get('SENDER_EMAIL') or 'noreply@pointflex.com'
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'true').lower() in ['true', 'on', '1']
+    # Authentification SMTP requise (désactivable pour un relais local)
+    SMTP_USE_AUTH = os.environ.get('SMTP_USE_AUTH', 'true').lower() in ['true', 'on', '1']
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT') or 10)
+    # Pool de connexions SMTP réutilisées entre les envois
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE') or 4)
+    SMTP_POOL_MAX_IDLE_SECONDS = int(os.environ.get('SMTP_POOL_MAX_IDLE_SECONDS') or 60)
+    SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_CONNECTION') or 100)
+    # File d'envoi des emails (relayée par ``run_email_outbox.py``)
+    # Envoi dans le processus courant juste après le commit (tests, développement)
+    EMAIL_OUTBOX_SYNC = os.environ.get('EMAIL_OUTBOX_SYNC', 'false').lower() in ['true', 'on', '1']
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE') or 50)
+    EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS') or 2)
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS') or 5)
+    EMAIL_OUTBOX_RETENTION_HOURS = int(os.environ.get('EMAIL_OUTBOX_RETENTION_HOURS') or 168)
+    # Débit maximal par serveur SMTP (0 : illimité)
+    EMAIL_RATE_LIMIT_PER_SECOND = float(os.environ.get('EMAIL_RATE_LIMIT_PER_SECOND') or 10)
     
     # URL frontend pour les liens dans les emails
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
@@ -81,10 +100,91 @@ class Config:
     PASSWORD_HISTORY_COUNT = int(os.environ.get('PASSWORD_HISTORY_COUNT') or 5) # Number of old passwords to remember
     # PASSWORD_EXPIRY_DAYS = int(os.environ.get('PASSWORD_EXPIRY_DAYS') or 90) # Deferred for now
 
+    # Stockage des tokens QR : 'memory' (un seul processus), 'redis' ou 'sql'
+    QR_TOKEN_STORE = os.environ.get('QR_TOKEN_STORE') or 'memory'
+
+    # Synchronisation groupée des pointages hors ligne
+    OFFLINE_SYNC_MAX_EVENTS = int(os.environ.get('OFFLINE_SYNC_MAX_EVENTS') or 500)
+    OFFLINE_SYNC_MAX_AGE_HOURS = int(os.environ.get('OFFLINE_SYNC_MAX_AGE_HOURS') or 24)
+
+    # Durée de vie de l'index spatial des bureaux (secondes)
+    OFFICE_INDEX_TTL = int(os.environ.get('OFFICE_INDEX_TTL') or 60)
+
+    # Cache des principaux (rôle, entreprise, activation) par processus (secondes)
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL') or 30)
+    PRINCIPAL_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_VERSION_CHECK_SECONDS') or 2)
+
+    # Cache des flux du calendrier d'équipe par (périmètre, mois) (secondes)
+    CALENDAR_FEED_CACHE_TTL = int(os.environ.get('CALENDAR_FEED_CACHE_TTL') or 60)
+    CALENDAR_FEED_VERSION_CHECK_SECONDS = float(os.environ.get('CALENDAR_FEED_VERSION_CHECK_SECONDS') or 2)
+
+    # Cache des calendriers de jours ouvrés par (entreprise, année) (secondes)
+    WORKDAY_CALENDAR_CACHE_TTL = int(os.environ.get('WORKDAY_CALENDAR_CACHE_TTL') or 300)
+    WORKDAY_CALENDAR_VERSION_CHECK_SECONDS = float(os.environ.get('WORKDAY_CALENDAR_VERSION_CHECK_SECONDS') or 2)
+
+    # Cache des paramètres système (secondes)
+    SETTINGS_CACHE_TTL = int(os.environ.get('SETTINGS_CACHE_TTL') or 60)
+    SETTINGS_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('SETTINGS_CACHE_VERSION_CHECK_SECONDS') or 2)
+
+    # Jobs de rapports asynchrones (file RQ ``pointflex_reports``)
+    REPORT_JOBS_SYNC = os.environ.get('REPORT_JOBS_SYNC', 'false').lower() in ['true', 'on', '1']
+    REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT') or 600)
+    REPORT_JOB_DEDUP_SECONDS = int(os.environ.get('REPORT_JOB_DEDUP_SECONDS') or 300)
+    REPORT_ARTIFACT_TTL = int(os.environ.get('REPORT_ARTIFACT_TTL') or 86400)
+    REPORT_ARTIFACT_STORAGE = os.environ.get('REPORT_ARTIFACT_STORAGE') or 'local'  # 'local' ou 's3'
+    REPORT_ARTIFACT_DIR = os.environ.get('REPORT_ARTIFACT_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'report_artifacts'
+    )
+    REPORT_ARTIFACT_S3_BUCKET = os.environ.get('REPORT_ARTIFACT_S3_BUCKET')
+    REPORT_ARTIFACT_S3_PREFIX = os.environ.get('REPORT_ARTIFACT_S3_PREFIX') or 'reports/'
+    REPORT_ARTIFACT_S3_ENDPOINT_URL = os.environ.get('REPORT_ARTIFACT_S3_ENDPOINT_URL')
+
     # Webhooks
     WEBHOOK_SIGNATURE_HEADER_NAME = os.environ.get('WEBHOOK_SIGNATURE_HEADER_NAME') or 'X-PointFlex-Signature-256'
     WEBHOOK_TIMEOUT_SECONDS = int(os.environ.get('WEBHOOK_TIMEOUT_SECONDS') or 10)
-    WEBHOOK_MAX_RETRIES = int(os.environ.get('WEBHOOK_MAX_RETRIES') or 3) # For future use with async tasks
+    WEBHOOK_MAX_RETRIES = int(os.environ.get('WEBHOOK_MAX_RETRIES') or 3)
+    # Livraison dans le processus courant, sans Redis (développement)
+    WEBHOOK_DELIVERY_SYNC = os.environ.get('WEBHOOK_DELIVERY_SYNC', 'false').lower() in ['true', 'on', '1']
+    WEBHOOK_SUBSCRIPTION_CACHE_TTL = int(os.environ.get('WEBHOOK_SUBSCRIPTION_CACHE_TTL') or 30)
+    WEBHOOK_BATCH_WINDOW_SECONDS = int(os.environ.get('WEBHOOK_BATCH_WINDOW_SECONDS') or 5)
+    WEBHOOK_BATCH_MAX_EVENTS = int(os.environ.get('WEBHOOK_BATCH_MAX_EVENTS') or 100)
+
+    # Outbox des pointages (relayée par ``run_outbox_relay.py``)
+    # Relais dans le processus courant juste après le commit (tests, développement)
+    OUTBOX_RELAY_SYNC = os.environ.get('OUTBOX_RELAY_SYNC', 'false').lower() in ['true', 'on', '1']
+    OUTBOX_RELAY_BATCH_SIZE = int(os.environ.get('OUTBOX_RELAY_BATCH_SIZE') or 100)
+    OUTBOX_RELAY_POLL_SECONDS = float(os.environ.get('OUTBOX_RELAY_POLL_SECONDS') or 0.5)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 5)
+    OUTBOX_RETENTION_HOURS = int(os.environ.get('OUTBOX_RETENTION_HOURS') or 72)
+
+    # Journal d'audit : file en mémoire vidée par INSERT multi-lignes
+    AUDIT_BUFFER_ENABLED = os.environ.get('AUDIT_BUFFER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    AUDIT_BUFFER_MAX_SIZE = int(os.environ.get('AUDIT_BUFFER_MAX_SIZE') or 10000)
+    AUDIT_FLUSH_INTERVAL_MS = int(os.environ.get('AUDIT_FLUSH_INTERVAL_MS') or 500)
+    AUDIT_FLUSH_BATCH_SIZE = int(os.environ.get('AUDIT_FLUSH_BATCH_SIZE') or 200)
+    AUDIT_FLUSH_MAX_ATTEMPTS = int(os.environ.get('AUDIT_FLUSH_MAX_ATTEMPTS') or 3)
+    # Actions sensibles écrites dans la transaction métier, sans passer par la file
+    AUDIT_SYNC_ACTIONS = (
+        os.environ.get('AUDIT_SYNC_ACTIONS')
+        or 'LOGIN_SUCCESS,LOGIN_FAILED,CHANGE_PASSWORD,GENERATE_API_KEY,'
+           '2FA_ENABLED,2FA_DISABLED,2FA_BACKUP_CODES_REGENERATED,2FA_LOGIN_FAILED,'
+           '2FA_LOGIN_FAILED_BACKUP_ERROR,2FA_LOGIN_BACKUP_CODE_USED,'
+           'DELETE,UPDATE_SYSTEM_SETTING,RESET_SYSTEM_SETTINGS,TOGGLE_MAINTENANCE,'
+           # Relu par ``accrue-leave`` pour ne pas créditer deux fois
+           'ANNUAL_LEAVE_ACCRUAL'
+    ).split(',')
+
+    # Pagination par curseur : au-delà de ce nombre de lignes, le total est estimé
+    # (``?count=exact`` pour un COUNT complet)
+    PAGINATION_COUNT_CAP = int(os.environ.get('PAGINATION_COUNT_CAP') or 1000)
+
+    # Web Push : envois parallèles par lot
+    WEBPUSH_MAX_WORKERS = int(os.environ.get('WEBPUSH_MAX_WORKERS') or 8)
+    WEBPUSH_TIMEOUT_SECONDS = int(os.environ.get('WEBPUSH_TIMEOUT_SECONDS') or 10)
+
+    # Pools de connexions HTTP sortantes des workers (par hôte cible)
+    HTTP_POOL_MAX_HOSTS = int(os.environ.get('HTTP_POOL_MAX_HOSTS') or 256)
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE') or 10)
 
     # 2FA
     TWO_FACTOR_ENCRYPTION_KEY = os.environ.get('TWO_FACTOR_ENCRYPTION_KEY') # Loaded in security_utils directly
@@ -118,6 +218,9 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SAMESITE = 'Lax'
     TWO_FACTOR_REQUIRE_KEY = True
 
+    # Plusieurs workers : les tokens QR doivent être partagés
+    QR_TOKEN_STORE = os.environ.get('QR_TOKEN_STORE') or 'redis'
+
 class TestingConfig(Config):
     """Configuration pour les tests"""
     TESTING = True
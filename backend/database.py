@@ -9,6 +9,18 @@ from flask import current_app
 
 db = SQLAlchemy()
 
+
+def dialect_insert(connection, table):
+    """``INSERT`` avec clause ``ON CONFLICT`` (PostgreSQL et SQLite)"""
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - dialectes non déployés
+        raise NotImplementedError(f"Upsert non supporté pour {connection.dialect.name}")
+    return insert(table)
+
+
 def init_db():
     """Initialise la base de données avec les données de test"""
     try:
@@ -1,13 +1,21 @@
 """
 Middleware d'authentification et autorisation
+
+Chaque requête authentifiée résout une seule fois son principal
+(``backend.utils.principal_cache.Principal`` : rôle, entreprise, actif,
+manager), à partir des claims du jeton ou du cache par processus. Les
+décorateurs de rôle n'interrogent donc pas la base ; ``get_current_user``
+charge l'utilisateur complet au plus une fois par requête, à la demande.
 """
 
-from flask import request, jsonify, g
+from flask import current_app, request, jsonify, g
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from flask_jwt_extended.exceptions import UserLookupError
 from functools import wraps
 from backend.models.user import User
 from backend.models.audit_log import AuditLog
 from backend.database import db
+from backend.utils import principal_cache
 
 def init_auth_middleware(app, jwt):
     """Initialise le middleware d'authentification"""
@@ -19,15 +27,18 @@ def init_auth_middleware(app, jwt):
             return str(user.id)
         return str(user)
     
+    @jwt.additional_claims_loader
+    def add_principal_claims(identity):
+        """Inscrit rôle, entreprise et manager dans le jeton (``JWT_PRINCIPAL_CLAIMS``)"""
+        if app.config.get('JWT_PRINCIPAL_CLAIMS') and isinstance(identity, User):
+            return principal_cache.additional_claims(identity)
+        return {}
+
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
-        """Charge l'utilisateur à partir du token JWT"""
-        identity = jwt_data["sub"]
-        try:
-            user_id = int(identity)
-            return User.query.filter_by(id=user_id, is_active=True).first()
-        except (ValueError, TypeError):
-            return None
+        """Résout le principal du token JWT (None si l'utilisateur est inactif)"""
+        principal = _resolve_principal(jwt_data)
+        return principal if principal is not None and principal.is_active else None
     
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -45,6 +56,34 @@ def init_auth_middleware(app, jwt):
         """Gère l'absence de token"""
         return jsonify(message="Token d'authentification requis"), 401
 
+def _resolve_principal(jwt_data):
+    """Principal du jeton, mémorisé pour la requête (clé : identifiant du jeton)"""
+    memo = getattr(g, '_principal', None)
+    if memo is not None and memo[0] == jwt_data.get('jti'):
+        return memo[1]
+
+    try:
+        user_id = int(jwt_data["sub"])
+    except (KeyError, ValueError, TypeError):
+        return None
+    principal = None
+    if current_app.config.get('JWT_PRINCIPAL_CLAIMS'):
+        principal = principal_cache.principal_from_claims(user_id, jwt_data)
+    if principal is None:
+        principal = principal_cache.get_principal(user_id)
+    g._principal = (jwt_data.get('jti'), principal)
+    return principal
+
+
+def get_current_principal():
+    """Principal de la requête courante (None si non authentifiée)"""
+    try:
+        verify_jwt_in_request()
+    except Exception:
+        return None
+    return _resolve_principal(get_jwt())
+
+
 def require_auth(f):
     """Décorateur pour exiger une authentification"""
     @wraps(f)
@@ -70,17 +109,15 @@ def require_role(required_roles):
         def decorated_function(*args, **kwargs):
             try:
                 verify_jwt_in_request()
-                current_user = get_jwt_identity()
+                principal = _resolve_principal(get_jwt())
                 
-                if not current_user:
-                    return jsonify(message="Utilisateur non trouvé"), 401
-                
-                user = User.query.get(int(current_user))
-                if not user or not user.is_active:
+                if not principal or not principal.is_active:
                     return jsonify(message="Utilisateur inactif"), 401
                 
-                if user.role not in required_roles:
-                    # Log de tentative d'accès non autorisé
+                if principal.role not in required_roles:
+                    # Log de tentative d'accès non autorisé (seul chemin qui
+                    # charge l'utilisateur)
+                    user = get_current_user()
                     AuditLog.log_action(
                         user_email=user.email,
                         user_id=user.id,
@@ -89,19 +126,21 @@ def require_role(required_roles):
                         details={
                             'endpoint': request.endpoint,
                             'required_roles': required_roles,
-                            'user_role': user.role
+                            'user_role': principal.role
                         },
                         ip_address=request.remote_addr,
                         user_agent=request.headers.get('User-Agent')
                     )
-                    db.session.commit()
+                    # Pas de commit dédié : l'entrée rejoint la file d'audit
+                    # en fin de requête.
                     
                     return jsonify(message="Accès non autorisé"), 403
                 
-                # Stocker l'utilisateur dans le contexte de la requête
-                g.current_user = user
                 return f(*args, **kwargs)
                 
+            except UserLookupError:
+                # Utilisateur supprimé ou désactivé depuis l'émission du jeton
+                return jsonify(message="Utilisateur inactif"), 401
             except Exception as e:
                 print(f"Erreur de vérification des rôles: {e}")
                 return jsonify(message="Erreur d'autorisation"), 500
@@ -126,21 +165,16 @@ def require_manager_or_above(f):
     return require_role(['superadmin', 'admin_rh', 'chef_service', 'chef_projet', 'manager'])(f)
 
 def get_current_user():
-    """Récupère l'utilisateur actuel depuis le contexte"""
-    if hasattr(g, 'current_user'):
-        return g.current_user
-    
-    try:
-        verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        if user_id:
-            user = User.query.get(int(user_id))
-            g.current_user = user
-            return user
-    except:
-        pass
-    
-    return None
+    """Récupère l'utilisateur actuel (chargé au plus une fois par requête)"""
+    principal = get_current_principal()
+    if principal is None:
+        return None
+
+    user = getattr(g, 'current_user', None)
+    if user is None or user.id != principal.id:
+        user = db.session.get(User, principal.id)
+        g.current_user = user
+    return user
 
 def get_request_info():
     """Récupère les informations de la requête pour l'audit"""
@@ -0,0 +1,113 @@
+"""
+Réponses conditionnelles (ETag / Last-Modified) pour les données de référence
+
+Les écrans rechargent à chaque affichage des données qui changent rarement
+(bureaux, types de congés, plans, paramètres...). Le décorateur
+``conditional_get`` calcule, avant d'exécuter la vue, un jeton de version à
+partir de filigranes peu coûteux : pour chaque portée, ``count(*)``,
+``max(updated_at)`` et ``sum(id)`` des lignes concernées, lus en une seule
+requête. Si le client présente ce jeton dans ``If-None-Match``, la réponse
+est un ``304 Not Modified`` sans chargement ni sérialisation des objets.
+
+Les filigranes sont lus en base : ils sont donc cohérents entre workers,
+sans cache partagé. Le nombre de lignes détecte les suppressions et la somme
+des ids les changements de composition d'une portée filtrée (mission
+acceptée ou refusée par exemple).
+
+``Last-Modified`` est renseigné à titre indicatif, mais seule l'ETag sert à
+la revalidation : une suppression ne fait pas avancer ``max(updated_at)``.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func, select
+
+from backend.database import db
+from backend.middleware.auth import get_current_principal
+
+
+class Watermark:
+    """Portée d'une table dont la version entre dans le jeton : ``model`` filtré par ``criteria``"""
+
+    def __init__(self, model, *criteria):
+        self.model = model
+        self.criteria = criteria
+
+    def columns(self):
+        model = self.model
+        base = select().select_from(model).where(*self.criteria)
+        return [
+            base.add_columns(func.count(model.id)).scalar_subquery(),
+            base.add_columns(func.max(model.updated_at)).scalar_subquery(),
+            base.add_columns(func.coalesce(func.sum(model.id), 0)).scalar_subquery(),
+        ]
+
+
+def watermark(model, *criteria):
+    """Filigrane de ``model`` restreint par ``criteria`` (toute la table si vide)"""
+    return Watermark(model, *criteria)
+
+
+def _read_versions(parts):
+    """Remplace les filigranes de ``parts`` par leurs valeurs, lues en une requête"""
+    marks = [part for part in parts if isinstance(part, Watermark)]
+    values = {}
+    last_modified = None
+    if marks:
+        columns = [column for mark in marks for column in mark.columns()]
+        row = db.session.execute(select(*columns)).one()
+        for index, mark in enumerate(marks):
+            count, updated_at, id_sum = row[index * 3:index * 3 + 3]
+            values[id(mark)] = [count, updated_at.isoformat() if updated_at else None, id_sum]
+            if updated_at and (last_modified is None or updated_at > last_modified):
+                last_modified = updated_at
+    versions = [values[id(part)] if isinstance(part, Watermark) else part for part in parts]
+    return versions, last_modified
+
+
+def compute_etag(parts):
+    """ETag de la requête courante pour les ``parts`` (filigranes ou valeurs JSON)
+
+    L'identité et le chemin complet (paramètres inclus) font partie du jeton :
+    deux utilisateurs ou deux filtres n'échangent jamais leurs réponses.
+    """
+    versions, last_modified = _read_versions(parts)
+    payload = json.dumps([get_jwt_identity(), request.full_path, versions], default=str, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest(), last_modified
+
+
+def conditional_get(version_parts):
+    """Décorateur : répond 304 si la version calculée correspond à ``If-None-Match``
+
+    ``version_parts(principal)`` retourne la liste des filigranes (ou valeurs
+    simples) dont dépend la réponse. À placer sous le décorateur
+    d'authentification de la route. En cas d'échec du calcul de version, la
+    vue est servie normalement.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            principal = get_current_principal()
+            try:
+                etag, last_modified = compute_etag(version_parts(principal))
+            except Exception as exc:
+                current_app.logger.warning(f"Version conditionnelle indisponible pour {request.path}: {exc}")
+                return f(*args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Le navigateur conserve la réponse mais revalide à chaque affichage
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
@@ -83,7 +83,8 @@ def init_error_handlers(app):
                 ip_address=request.remote_addr,
                 user_agent=request.headers.get('User-Agent')
             )
-            db.session.commit()
+            # Transmis à la file d'audit en fin de requête, sans valider
+            # une transaction métier éventuellement incomplète
         except:
             # Si on ne peut pas logger, ne pas faire échouer davantage
             pass
@@ -12,6 +12,7 @@ proper migration later.
 
 from __future__ import annotations
 
+import json
 import logging
 from contextlib import contextmanager
 
@@ -46,6 +47,50 @@ def _ensure_column(conn, table: str, column: str, ddl: str, post_update_sql: str
         conn.execute(text(post_update_sql))
 
 
+def _ensure_indexes(conn, table) -> None:
+    """Create the indexes declared on ``table`` that are missing in the database."""
+
+    inspector = inspect(conn)
+    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        logging.getLogger(__name__).warning(
+            "Detected missing index %s on %s – creating it", index.name, table.name
+        )
+        index.create(bind=conn)
+
+
+def _backfill_webhook_subscription_events(conn) -> None:
+    """Fill ``webhook_subscription_events`` from the JSON column when it was just created."""
+
+    if conn.execute(text("SELECT 1 FROM webhook_subscription_events LIMIT 1")).first():
+        return
+    rows = []
+    for subscription_id, subscribed_events in conn.execute(
+        text("SELECT id, subscribed_events FROM webhook_subscriptions")
+    ):
+        try:
+            event_types = json.loads(subscribed_events or "[]")
+        except ValueError:
+            continue
+        rows.extend(
+            {"subscription_id": subscription_id, "event_type": event_type}
+            for event_type in dict.fromkeys(event_types)
+        )
+    if rows:
+        logging.getLogger(__name__).warning(
+            "Backfilling webhook_subscription_events for %d event subscriptions", len(rows)
+        )
+        conn.execute(
+            text(
+                "INSERT INTO webhook_subscription_events (subscription_id, event_type) "
+                "VALUES (:subscription_id, :event_type)"
+            ),
+            rows,
+        )
+
+
 def ensure_schema_columns() -> None:
     """Ensure critical columns exist for legacy SQLite databases."""
 
@@ -66,8 +111,43 @@ def ensure_schema_columns() -> None:
                 "UPDATE mission_users SET status = 'pending' WHERE status IS NULL",
             )
             _ensure_column(conn, "mission_users", "responded_at", "responded_at DATETIME")
+
+            # Webhook batch opt-in and indexed event lookup.
+            _ensure_column(
+                conn,
+                "webhook_subscriptions",
+                "batch_deliveries",
+                "batch_deliveries BOOLEAN NOT NULL DEFAULT 0",
+            )
+            _backfill_webhook_subscription_events(conn)
+
+            # Carry-over cap applied by the leave accrual engine.
+            _ensure_column(conn, "leave_types", "max_carry_over_days", "max_carry_over_days FLOAT")
     except SQLAlchemyError as exc:  # pragma: no cover - only triggered on misconfiguration
         logging.getLogger(__name__).error("Automatic schema check failed: %s", exc)
 
 
-__all__ = ["ensure_schema_columns"]
+def ensure_schema_indexes() -> None:
+    """Ensure the hot-path indexes exist on databases created before they were declared.
+
+    ``db.create_all`` only creates indexes together with their table, so
+    instances upgraded in place would otherwise keep scanning ``pointages``.
+    """
+
+    from backend.models.audit_log import AuditLog
+    from backend.models.company import Company
+    from backend.models.notification import Notification
+    from backend.models.pause import Pause
+    from backend.models.pointage import Pointage
+    from backend.models.user import User
+    from backend.models.webhook_subscription import WebhookSubscription
+
+    try:
+        with _connection() as conn:
+            for model in (Pointage, User, Notification, Pause, WebhookSubscription, AuditLog, Company):
+                _ensure_indexes(conn, model.__table__)
+    except SQLAlchemyError as exc:  # pragma: no cover - only triggered on misconfiguration
+        logging.getLogger(__name__).error("Automatic index check failed: %s", exc)
+
+
+__all__ = ["ensure_schema_columns", "ensure_schema_indexes"]
@@ -0,0 +1,31 @@
+"""Add composite indexes on pointages, users, notifications and pauses"""
+
+from alembic import op
+
+revision = '20240405_add_hot_path_indexes'
+down_revision = '20240312_add_geolocation_max_accuracy_to_companies'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_pointages_user_date', 'pointages', ['user_id', 'date_pointage']),
+    ('ix_pointages_date', 'pointages', ['date_pointage']),
+    ('ix_pointages_office_id', 'pointages', ['office_id']),
+    ('ix_pointages_mission_id', 'pointages', ['mission_id']),
+    ('ix_users_company_active', 'users', ['company_id', 'is_active']),
+    ('ix_users_manager_id', 'users', ['manager_id']),
+    ('ix_notifications_user_read', 'notifications', ['user_id', 'is_read']),
+    ('ix_notifications_user_created', 'notifications', ['user_id', 'created_at']),
+    ('ix_pauses_pointage_id', 'pauses', ['pointage_id']),
+    ('ix_pauses_user_start', 'pauses', ['user_id', 'start_time']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,23 @@
+"""Add qr_tokens table for the shared QR token store"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240412_add_qr_tokens_table'
+down_revision = '20240405_add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'qr_tokens',
+        sa.Column('token', sa.String(length=64), primary_key=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_qr_tokens_expires_at', 'qr_tokens', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_qr_tokens_expires_at', table_name='qr_tokens')
+    op.drop_table('qr_tokens')
@@ -0,0 +1,39 @@
+"""Add report_jobs table for asynchronous report generation"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240419_add_report_jobs_table'
+down_revision = '20240412_add_qr_tokens_table'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'report_jobs',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('params', sa.Text(), nullable=False),
+        sa.Column('dedup_key', sa.String(length=64), nullable=False),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=True),
+        sa.Column('requested_by_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('storage_key', sa.String(length=255), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('mimetype', sa.String(length=100), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_report_jobs_dedup_key', 'report_jobs', ['dedup_key'])
+    op.create_index('ix_report_jobs_company_id', 'report_jobs', ['company_id'])
+    op.create_index('ix_report_jobs_expires_at', 'report_jobs', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_report_jobs_expires_at', table_name='report_jobs')
+    op.drop_index('ix_report_jobs_company_id', table_name='report_jobs')
+    op.drop_index('ix_report_jobs_dedup_key', table_name='report_jobs')
+    op.drop_table('report_jobs')
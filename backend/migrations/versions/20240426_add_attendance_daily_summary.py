@@ -0,0 +1,42 @@
+"""Add attendance_daily_summary rollup table
+
+Après la migration, remplir la table avec ``flask rebuild-attendance-summary``.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240426_add_attendance_daily_summary'
+down_revision = '20240419_add_report_jobs_table'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'attendance_daily_summary',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=True),
+        sa.Column('department_id', sa.Integer(), sa.ForeignKey('departments.id'), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('summary_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('pointage_count', sa.Integer(), nullable=False),
+        sa.Column('present_count', sa.Integer(), nullable=False),
+        sa.Column('late_count', sa.Integer(), nullable=False),
+        sa.Column('absent_count', sa.Integer(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('justified_count', sa.Integer(), nullable=False),
+        sa.Column('first_arrival_minutes', sa.Integer(), nullable=True),
+        sa.Column('last_departure_minutes', sa.Integer(), nullable=True),
+        sa.Column('worked_minutes', sa.Integer(), nullable=False),
+        sa.Column('pause_minutes', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('user_id', 'summary_date', name='uq_attendance_daily_summary_user_date'),
+    )
+    op.create_index(
+        'ix_attendance_daily_summary_company_date', 'attendance_daily_summary', ['company_id', 'summary_date']
+    )
+
+def downgrade():
+    op.drop_index('ix_attendance_daily_summary_company_date', table_name='attendance_daily_summary')
+    op.drop_table('attendance_daily_summary')
@@ -0,0 +1,57 @@
+"""Index webhook subscriptions by event type and add batch delivery opt-in
+
+Les lignes ``webhook_subscription_events`` sont remplies à partir de la
+colonne JSON ``subscribed_events`` existante.
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240503_add_webhook_subscription_events'
+down_revision = '20240426_add_attendance_daily_summary'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column(
+        'webhook_subscriptions',
+        sa.Column('batch_deliveries', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.create_index(
+        'ix_webhook_subscriptions_company_active', 'webhook_subscriptions', ['company_id', 'is_active']
+    )
+    events = op.create_table(
+        'webhook_subscription_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('subscription_id', sa.Integer(),
+                  sa.ForeignKey('webhook_subscriptions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.UniqueConstraint('subscription_id', 'event_type', name='uq_webhook_subscription_events_sub_event'),
+    )
+    op.create_index(
+        'ix_webhook_subscription_events_event_sub', 'webhook_subscription_events', ['event_type', 'subscription_id']
+    )
+
+    connection = op.get_bind()
+    rows = []
+    for subscription_id, subscribed_events in connection.execute(
+        sa.text('SELECT id, subscribed_events FROM webhook_subscriptions')
+    ):
+        try:
+            event_types = json.loads(subscribed_events or '[]')
+        except ValueError:
+            continue
+        rows.extend(
+            {'subscription_id': subscription_id, 'event_type': event_type}
+            for event_type in dict.fromkeys(event_types)
+        )
+    if rows:
+        op.bulk_insert(events, rows)
+
+def downgrade():
+    op.drop_index('ix_webhook_subscription_events_event_sub', table_name='webhook_subscription_events')
+    op.drop_table('webhook_subscription_events')
+    op.drop_index('ix_webhook_subscriptions_company_active', table_name='webhook_subscriptions')
+    op.drop_column('webhook_subscriptions', 'batch_deliveries')
@@ -0,0 +1,37 @@
+"""Add outbox_events table for check-in side effects
+
+Les événements sont relayés par ``python run_outbox_relay.py``.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240510_add_outbox_events_table'
+down_revision = '20240503_add_webhook_subscription_events'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'outbox_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('aggregate_type', sa.String(length=50), nullable=True),
+        sa.Column('aggregate_id', sa.Integer(), nullable=True),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        'ix_outbox_events_status_available', 'outbox_events', ['status', 'available_at', 'id']
+    )
+
+def downgrade():
+    op.drop_index('ix_outbox_events_status_available', table_name='outbox_events')
+    op.drop_table('outbox_events')
@@ -0,0 +1,41 @@
+"""Replace listing indexes with keyset pagination indexes
+
+Les index incluent toute la clé de tri des listes paginées par curseur
+(pointages, notifications, journal d'audit) ; les anciens index, dont ils
+sont des préfixes stricts, sont supprimés.
+"""
+
+from alembic import op
+
+revision = '20240517_add_keyset_pagination_indexes'
+down_revision = '20240510_add_outbox_events_table'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_pointages_user_date_keyset', 'pointages', ['user_id', 'date_pointage', 'heure_arrivee', 'id']),
+    ('ix_pointages_date_keyset', 'pointages', ['date_pointage', 'heure_arrivee', 'id']),
+    ('ix_notifications_user_created_keyset', 'notifications', ['user_id', 'created_at', 'id']),
+    ('ix_audit_logs_created_keyset', 'audit_logs', ['created_at', 'id']),
+)
+
+REPLACED = (
+    ('ix_pointages_user_date', 'pointages', ['user_id', 'date_pointage']),
+    ('ix_pointages_date', 'pointages', ['date_pointage']),
+    ('ix_notifications_user_created', 'notifications', ['user_id', 'created_at']),
+    ('ix_audit_logs_created_at', 'audit_logs', ['created_at']),
+)
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    for name, table, _columns in REPLACED:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+
+def downgrade():
+    for name, table, columns in REPLACED:
+        op.create_index(name, table, columns, if_not_exists=True)
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
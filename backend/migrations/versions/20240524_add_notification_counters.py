@@ -0,0 +1,33 @@
+"""Add notification_counters and notification_daily_counts tables
+
+Les compteurs sont initialisés à partir des notifications à leur première
+utilisation ; aucune reprise de données n'est nécessaire.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240524_add_notification_counters'
+down_revision = '20240517_add_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'notification_counters',
+        sa.Column('scope', sa.String(length=10), primary_key=True),
+        sa.Column('scope_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        'notification_daily_counts',
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), primary_key=True, autoincrement=False),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('created_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+def downgrade():
+    op.drop_table('notification_daily_counts')
+    op.drop_table('notification_counters')
@@ -0,0 +1,28 @@
+"""Add offline_sync_receipts table for idempotent offline sync"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240531_add_offline_sync_receipts'
+down_revision = '20240524_add_notification_counters'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'offline_sync_receipts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+        sa.Column('event_type', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=False),
+        sa.Column('message', sa.String(length=255), nullable=True),
+        sa.Column('pointage_id', sa.Integer(), sa.ForeignKey('pointages.id'), nullable=True),
+        sa.Column('pause_id', sa.Integer(), sa.ForeignKey('pauses.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('user_id', 'idempotency_key', name='uq_offline_sync_receipts_user_key'),
+    )
+
+def downgrade():
+    op.drop_table('offline_sync_receipts')
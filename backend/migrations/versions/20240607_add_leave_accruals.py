@@ -0,0 +1,32 @@
+"""Add leave_accruals ledger and leave_types.max_carry_over_days"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240607_add_leave_accruals'
+down_revision = '20240531_add_offline_sync_receipts'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('leave_types', sa.Column('max_carry_over_days', sa.Float(), nullable=True))
+    op.create_table(
+        'leave_accruals',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('leave_type_id', sa.Integer(), sa.ForeignKey('leave_types.id'), nullable=False),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=True),
+        sa.Column('period', sa.String(length=20), nullable=False),
+        sa.Column('previous_balance', sa.Float(), nullable=False),
+        sa.Column('carried_over', sa.Float(), nullable=False),
+        sa.Column('accrued_days', sa.Float(), nullable=False),
+        sa.Column('new_balance', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('user_id', 'leave_type_id', 'period', name='uq_leave_accruals_user_type_period'),
+    )
+    op.create_index('ix_leave_accruals_company_id', 'leave_accruals', ['company_id'])
+
+def downgrade():
+    op.drop_index('ix_leave_accruals_company_id', table_name='leave_accruals')
+    op.drop_table('leave_accruals')
+    op.drop_column('leave_types', 'max_carry_over_days')
@@ -0,0 +1,14 @@
+"""Index companies.subscription_end for the daily expiry scan"""
+
+from alembic import op
+
+revision = '20240614_index_companies_subscription_end'
+down_revision = '20240607_add_leave_accruals'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_companies_subscription_end', 'companies', ['subscription_end'])
+
+def downgrade():
+    op.drop_index('ix_companies_subscription_end', table_name='companies')
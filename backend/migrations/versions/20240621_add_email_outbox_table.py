@@ -0,0 +1,36 @@
+"""Add email_outbox table for queued emails
+
+Les emails sont envoyés par ``python run_email_outbox.py``.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20240621_add_email_outbox_table'
+down_revision = '20240614_index_companies_subscription_end'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('company_id', sa.Integer(), sa.ForeignKey('companies.id'), nullable=True),
+        sa.Column('recipients', sa.Text(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('html_content', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        'ix_email_outbox_status_available', 'email_outbox', ['status', 'available_at', 'id']
+    )
+
+def downgrade():
+    op.drop_index('ix_email_outbox_status_available', table_name='email_outbox')
+    op.drop_table('email_outbox')
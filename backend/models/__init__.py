@@ -22,13 +22,21 @@ from .leave_type import LeaveType
 from .leave_balance import LeaveBalance
 from .leave_request import LeaveRequest
 from .pause import Pause
-from .webhook_subscription import WebhookSubscription
+from .webhook_subscription import WebhookSubscription, WebhookSubscriptionEvent
 from .webhook_delivery_log import WebhookDeliveryLog
 from .company_holiday import CompanyHoliday
 from .password_history import PasswordHistory # Added PasswordHistory
 from .subscription_extension_request import SubscriptionExtensionRequest
 from .integration_setting import IntegrationSetting
 from .notification_settings import NotificationSettings
+from .qr_token import QRToken
+from .report_job import ReportJob
+from .attendance_daily_summary import AttendanceDailySummary
+from .outbox_event import OutboxEvent
+from .notification_counter import NotificationCounter, NotificationDailyCount
+from .offline_sync_receipt import OfflineSyncReceipt
+from .leave_accrual import LeaveAccrual
+from .email_outbox import EmailOutboxMessage
 
 __all__ = [
     'User',
@@ -50,11 +58,21 @@ __all__ = [
     'LeaveBalance',
     'LeaveRequest',
     'WebhookSubscription',
+    'WebhookSubscriptionEvent',
     'NotificationSettings',
     'IntegrationSetting',
     'WebhookDeliveryLog',
     'CompanyHoliday',
     'PasswordHistory',
     'Pause',
-    'SubscriptionExtensionRequest'
+    'SubscriptionExtensionRequest',
+    'QRToken',
+    'ReportJob',
+    'AttendanceDailySummary',
+    'OutboxEvent',
+    'NotificationCounter',
+    'NotificationDailyCount',
+    'OfflineSyncReceipt',
+    'LeaveAccrual',
+    'EmailOutboxMessage'
 ]
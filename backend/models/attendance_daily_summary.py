@@ -0,0 +1,80 @@
+"""
+Modèle AttendanceDailySummary - Agrégat journalier des pointages par employé
+
+Une ligne par (employé, jour) avec l'entreprise et le département
+dénormalisés : les tableaux de bord lisent ces lignes au lieu de parcourir
+les pointages. La table est tenue à jour par
+``backend.services.attendance_summary_service`` à chaque écriture de
+pointage ou de pause, et reconstruite par ``flask rebuild-attendance-summary``.
+"""
+
+from backend.database import db
+from datetime import datetime
+
+
+class AttendanceDailySummary(db.Model):
+    """Agrégat des pointages d'un employé pour une journée"""
+
+    __tablename__ = 'attendance_daily_summary'
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    summary_date = db.Column(db.Date, nullable=False)
+
+    # Statut de la journée (celui du premier pointage)
+    status = db.Column(db.String(20), nullable=False)
+    pointage_count = db.Column(db.Integer, nullable=False, default=0)
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+    # Pointages sans heure de départ
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    justified_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Heures en minutes depuis minuit (moyennes calculables en SQL sur tous les SGBD)
+    first_arrival_minutes = db.Column(db.Integer, nullable=True)
+    last_departure_minutes = db.Column(db.Integer, nullable=True)
+    worked_minutes = db.Column(db.Integer, nullable=False, default=0)
+    pause_minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'summary_date', name='uq_attendance_daily_summary_user_date'),
+        db.Index('ix_attendance_daily_summary_company_date', 'company_id', 'summary_date'),
+    )
+
+    @property
+    def worked_hours(self):
+        return round(self.worked_minutes / 60, 2)
+
+    @staticmethod
+    def format_minutes(minutes):
+        """Formate des minutes depuis minuit en ``HH:MM``"""
+        if minutes is None:
+            return None
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'company_id': self.company_id,
+            'department_id': self.department_id,
+            'date': self.summary_date.isoformat(),
+            'status': self.status,
+            'pointage_count': self.pointage_count,
+            'present_count': self.present_count,
+            'late_count': self.late_count,
+            'absent_count': self.absent_count,
+            'open_count': self.open_count,
+            'justified_count': self.justified_count,
+            'arrival_time': self.format_minutes(self.first_arrival_minutes),
+            'departure_time': self.format_minutes(self.last_departure_minutes),
+            'worked_hours': self.worked_hours,
+            'pause_minutes': self.pause_minutes,
+        }
+
+    def __repr__(self):
+        return f'<AttendanceDailySummary user={self.user_id} {self.summary_date} {self.status}>'
@@ -32,10 +32,15 @@ class AuditLog(db.Model):
     user_agent = db.Column(db.Text, nullable=True)
     
     # Métadonnées
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     # Relations
     user = db.relationship('User', backref='audit_logs', lazy=True)
+
+    # Clé de la pagination par curseur ``(created_at, id)``
+    __table_args__ = (
+        db.Index('ix_audit_logs_created_keyset', 'created_at', 'id'),
+    )
     
     def __init__(self, **kwargs):
         """Initialisation avec sérialisation automatique des détails"""
@@ -80,8 +85,31 @@ class AuditLog(db.Model):
     def log_action(cls, user_email, action, resource_type, resource_id=None, 
                    details=None, old_values=None, new_values=None, 
                    ip_address=None, user_agent=None, user_id=None):
-        """Méthode utilitaire pour créer un log d'audit"""
-        
+        """Méthode utilitaire pour créer un log d'audit
+
+        Les actions de ``AUDIT_SYNC_ACTIONS`` sont ajoutées à la transaction
+        métier et l'entrée est retournée ; les autres passent par la file
+        d'audit au commit (``backend.services.audit_pipeline``) et la
+        méthode retourne ``None``.
+        """
+        from flask import current_app
+        from backend.services import audit_pipeline
+
+        if not audit_pipeline.is_sync_action(action, current_app.config):
+            audit_pipeline.defer_audit_record(db.session, audit_pipeline.build_audit_record(
+                user_id=user_id,
+                user_email=user_email,
+                action=action,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                details=details,
+                old_values=old_values,
+                new_values=new_values,
+                ip_address=ip_address,
+                user_agent=user_agent
+            ))
+            return None
+
         log = cls(
             user_id=user_id,
             user_email=user_email,
@@ -96,6 +124,7 @@ class AuditLog(db.Model):
         )
         
         db.session.add(log)
+        audit_pipeline.get_audit_pipeline().record_sync_write()
         return log
     
     @classmethod
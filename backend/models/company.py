@@ -30,7 +30,7 @@ class Company(db.Model):
     # subscription_plan_id = db.Column(db.Integer, db.ForeignKey('subscription_plans.id'), nullable=True)
     subscription_status = db.Column(db.String(50), default='active', nullable=False)  # active, suspended, expired
     subscription_start = db.Column(db.Date, default=datetime.utcnow().date)
-    subscription_end = db.Column(db.Date, nullable=True)
+    subscription_end = db.Column(db.Date, nullable=True, index=True)
     max_employees = db.Column(db.Integer, default=10, nullable=False)
     
     # Relation avec le plan d'abonnement - Commentée car la colonne n'existe pas
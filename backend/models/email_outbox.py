@@ -0,0 +1,64 @@
+"""
+Modèle EmailOutboxMessage - Emails en attente d'envoi
+
+Les routes et les tâches n'ouvrent plus de connexion SMTP : elles ajoutent le
+message (déjà rendu) à leur transaction et ``backend.services.email.email_outbox``
+l'envoie ensuite hors du thread de la requête, sur les connexions du pool SMTP.
+"""
+
+from backend.database import db
+from datetime import datetime
+import json
+
+
+class EmailOutboxMessage(db.Model):
+    """Email rendu, en attente d'envoi par le relais"""
+
+    __tablename__ = 'email_outbox'
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=True)  # invoice_reminder, subscription_expiring...
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=True)
+    recipients = db.Column(db.Text, nullable=False, default='[]')  # JSON serialized
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    # Prochaine tentative (reculée après un échec)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_available', 'status', 'available_at', 'id'),
+    )
+
+    @property
+    def recipient_list(self):
+        try:
+            return json.loads(self.recipients) if self.recipients else []
+        except (json.JSONDecodeError, TypeError):
+            return []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'company_id': self.company_id,
+            'recipients': self.recipient_list,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+        }
+
+    def __repr__(self):
+        return f'<EmailOutboxMessage {self.id} {self.category} {self.status}>'
@@ -0,0 +1,50 @@
+"""
+Modèle LeaveAccrual - Registre des acquisitions de congés
+
+Une ligne par ``(utilisateur, type de congé, période)`` : la contrainte
+d'unicité rend l'acquisition idempotente (une période déjà inscrite n'est
+jamais acquise deux fois) et la ligne conserve le détail du calcul
+(solde précédent, report plafonné, jours acquis, nouveau solde).
+"""
+
+from backend.database import db
+from datetime import datetime
+
+
+class LeaveAccrual(db.Model):
+    """Acquisition de congés d'un utilisateur pour un type et une période"""
+
+    __tablename__ = 'leave_accruals'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    leave_type_id = db.Column(db.Integer, db.ForeignKey('leave_types.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=True, index=True)
+    # Période d'acquisition, par exemple ``"2024"`` pour l'acquisition annuelle
+    period = db.Column(db.String(20), nullable=False)
+    previous_balance = db.Column(db.Float, nullable=False, default=0.0)
+    carried_over = db.Column(db.Float, nullable=False, default=0.0)
+    accrued_days = db.Column(db.Float, nullable=False)
+    new_balance = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'leave_type_id', 'period', name='uq_leave_accruals_user_type_period'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'leave_type_id': self.leave_type_id,
+            'company_id': self.company_id,
+            'period': self.period,
+            'previous_balance': self.previous_balance,
+            'carried_over': self.carried_over,
+            'accrued_days': self.accrued_days,
+            'new_balance': self.new_balance,
+            'created_at': self.created_at.isoformat(),
+        }
+
+    def __repr__(self):
+        return f'<LeaveAccrual User {self.user_id} - Type {self.leave_type_id} ({self.period}): +{self.accrued_days}>'
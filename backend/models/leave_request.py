@@ -2,14 +2,10 @@
 LeaveRequest Model - Represents an employee's request for leave
 """
 from backend.database import db # Corrected import path
-from datetime import datetime, date, timedelta # Added timedelta
+from datetime import datetime, date
 import holidays # For calculating workdays, may need to add to requirements.txt
 from .user import User  # Added User import
 
-from .company import Company  # To fetch company policy
-from .company_holiday import CompanyHoliday  # To fetch company specific holidays
-from backend.utils.holiday_utils import get_national_holidays
-
 # Updated function to calculate working days considering company policies and partial days
 def calculate_workdays(
     start_date: date,
@@ -18,82 +14,11 @@ def calculate_workdays(
     start_day_period: str = "full_day",
     end_day_period: str = "full_day"
 ) -> float:
-    if start_date > end_date:
-        return 0.0
-
-    # Validate periods
-    valid_periods = ["full_day", "half_day_morning", "half_day_afternoon"]
-    if start_day_period not in valid_periods or end_day_period not in valid_periods:
-        raise ValueError("Invalid start_day_period or end_day_period value.")
-
-    company = Company.query.get(company_id)
-    if not company:
-        # Fallback or raise error if company not found
-        # For fallback, we might use a default Mon-Fri and no specific holidays
-        # This case should ideally not happen if company_id is always valid
-        # Defaulting to Mon-Fri, no company holidays, FR national holidays for safety
-        work_days_indices = {0, 1, 2, 3, 4}
-        country_code = 'FR'
-        company_specific_holidays = []
-    else:
-        # Work days: "0,1,2,3,4" -> {0, 1, 2, 3, 4}
-        try:
-            work_days_indices = set(map(int, company.work_days.split(','))) if company.work_days else {0,1,2,3,4}
-        except ValueError: # Handle potential malformed string
-            work_days_indices = {0,1,2,3,4} # Default to Mon-Fri on error
-
-        country_code = company.default_country_code_for_holidays or 'FR'
-
-        # Fetch company-specific holidays within the broad range of the leave request
-        # This range can be optimized if performance becomes an issue for very long leave requests.
-        min_year = start_date.year -1 # Buffer for holidays defined near year boundaries
-        max_year = end_date.year +1
-        company_specific_holidays_query = CompanyHoliday.query.filter(
-            CompanyHoliday.company_id == company_id,
-            CompanyHoliday.date >= date(min_year, 1, 1),
-            CompanyHoliday.date <= date(max_year, 12, 31)
-        ).all()
-        company_specific_holidays = {ch.date for ch in company_specific_holidays_query}
-
-    num_total_days = (end_date - start_date).days + 1
-    workdays_count = 0.0
-    current_processing_date = start_date
-
-    # Fetch national holidays once
-    # The holidays library is efficient, but for very wide date ranges, consider year-by-year fetching if needed.
-    # Ensure years are correctly handled for multi-year leave requests.
-    national_holidays = get_national_holidays(country_code, start_date.year, end_date.year)
-
-    for _ in range(num_total_days):
-        # weekday(): Monday is 0 and Sunday is 6
-        if current_processing_date.weekday() in work_days_indices and \
-           current_processing_date not in national_holidays and \
-           current_processing_date not in company_specific_holidays:
-
-            current_day_value = 1.0 # Assume a full workday
-
-            is_single_day_leave = (start_date == end_date)
-
-            if is_single_day_leave:
-                if start_day_period != "full_day" or end_day_period != "full_day":
-                    # If either start or end period specifies a half day for a single day leave, it's 0.5 days.
-                    # UI should ideally ensure start_day_period and end_day_period are consistent for single day
-                    # (e.g., both "half_day_morning" or one is "full_day" and other is "half_day_morning")
-                    # or guide that "half_day_morning" start and "half_day_afternoon" end on same day is 1 full day.
-                    # For simplicity here: any mention of half-day makes it 0.5 for a single day.
-                    # If start=morning, end=afternoon on same day, UI should make it a full_day request.
-                    current_day_value = 0.5
-            else: # Multi-day leave
-                if current_processing_date == start_date and start_day_period != "full_day":
-                    current_day_value = 0.5
-                elif current_processing_date == end_date and end_day_period != "full_day":
-                    current_day_value = 0.5
-                # Else, it's a full day (1.0) if it's a middle day of the leave period
-
-            workdays_count += current_day_value
-        current_processing_date += timedelta(days=1)
-
-    return workdays_count
+    # Les jours ouvrés de l'entreprise (work_days, jours fériés nationaux et
+    # de l'entreprise) sont précalculés par année dans le service de calendrier
+    from backend.services.workday_calendar_service import calculate_leave_days
+
+    return calculate_leave_days(company_id, start_date, end_date, start_day_period, end_day_period)
 
 
 class LeaveRequest(db.Model):
@@ -180,5 +105,3 @@ class LeaveRequest(db.Model):
     def __repr__(self):
         return f'<LeaveRequest User {self.user_id} ({self.start_date} to {self.end_date}) - Status: {self.status}>'
 
-# Need to import timedelta for calculate_workdays
-from datetime import timedelta
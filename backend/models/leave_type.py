@@ -20,6 +20,8 @@ class LeaveType(db.Model):
 
     # For automated annual accrual
     annual_accrual_days = db.Column(db.Float, nullable=True, default=None) # Days accrued annually, if applicable
+    # Report maximal du solde d'une période à la suivante (illimité si nul)
+    max_carry_over_days = db.Column(db.Float, nullable=True, default=None)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -36,6 +38,7 @@ class LeaveType(db.Model):
             'requires_approval': self.requires_approval,
             'is_active': self.is_active,
             'annual_accrual_days': self.annual_accrual_days,
+            'max_carry_over_days': self.max_carry_over_days,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -19,6 +19,12 @@ class Notification(db.Model):
 
     user = db.relationship('User', backref='notifications', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read'),
+        # Clé de la pagination par curseur ``(created_at, id)``
+        db.Index('ix_notifications_user_created_keyset', 'user_id', 'created_at', 'id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
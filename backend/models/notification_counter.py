@@ -0,0 +1,52 @@
+"""
+Compteurs de notifications dénormalisés
+
+``NotificationCounter`` garde, par utilisateur et par entreprise, le nombre
+de notifications non lues et le total ; ``NotificationDailyCount`` compte
+les notifications créées par entreprise et par jour (notifications
+récentes). Ils sont tenus à jour dans la transaction qui crée ou lit les
+notifications par ``backend.services.notification_counter_service``.
+"""
+
+from backend.database import db
+from datetime import datetime
+
+
+class NotificationCounter(db.Model):
+    """Compteurs de notifications d'un utilisateur ou d'une entreprise"""
+
+    __tablename__ = 'notification_counters'
+
+    SCOPE_USER = 'user'
+    SCOPE_COMPANY = 'company'
+
+    scope = db.Column(db.String(10), primary_key=True)
+    scope_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'scope': self.scope,
+            'scope_id': self.scope_id,
+            'unread_count': self.unread_count,
+            'total_count': self.total_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f'<NotificationCounter {self.scope}:{self.scope_id} unread={self.unread_count}>'
+
+
+class NotificationDailyCount(db.Model):
+    """Nombre de notifications créées pour une entreprise sur un jour"""
+
+    __tablename__ = 'notification_daily_counts'
+
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    created_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NotificationDailyCount {self.company_id} {self.day} {self.created_count}>'
@@ -0,0 +1,51 @@
+"""
+Modèle OfflineSyncReceipt - Résultat d'un événement hors ligne synchronisé
+
+L'application mobile attribue une clé d'idempotence à chaque événement mis
+en file hors connexion. Le résultat de son traitement (appliqué ou rejeté)
+est conservé : un lot renvoyé après une coupure réseau reçoit les mêmes
+résultats sans créer de doublon.
+"""
+
+from backend.database import db
+from datetime import datetime
+
+
+class OfflineSyncReceipt(db.Model):
+    """Résultat du traitement d'un événement hors ligne"""
+
+    __tablename__ = 'offline_sync_receipts'
+
+    STATUS_APPLIED = 'applied'
+    STATUS_REJECTED = 'rejected'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    event_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    message = db.Column(db.String(255), nullable=True)
+    pointage_id = db.Column(db.Integer, db.ForeignKey('pointages.id'), nullable=True)
+    pause_id = db.Column(db.Integer, db.ForeignKey('pauses.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_offline_sync_receipts_user_key'),
+    )
+
+    def to_result(self, replayed=False):
+        """Résultat renvoyé au client pour cet événement"""
+        return {
+            'idempotency_key': self.idempotency_key,
+            'type': self.event_type,
+            'status': self.status,
+            'status_code': self.status_code,
+            'message': self.message,
+            'pointage_id': self.pointage_id,
+            'pause_id': self.pause_id,
+            'replayed': replayed,
+        }
+
+    def __repr__(self):
+        return f'<OfflineSyncReceipt {self.user_id}:{self.idempotency_key} {self.status}>'
@@ -0,0 +1,68 @@
+"""
+Modèle OutboxEvent - Effets de bord en attente de relais
+
+Les routes de pointage écrivent l'événement dans la même transaction que le
+pointage ; ``backend.services.outbox_service`` le relaie ensuite hors du
+thread de la requête (journal de pointage, webhooks, notifications SSE et
+push). Un événement validé est relayé au moins une fois.
+"""
+
+from backend.database import db
+from datetime import datetime
+import json
+
+
+class OutboxEvent(db.Model):
+    """Événement métier à relayer après la validation de sa transaction"""
+
+    __tablename__ = 'outbox_events'
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(100), nullable=False)
+    aggregate_type = db.Column(db.String(50), nullable=True)
+    aggregate_id = db.Column(db.Integer, nullable=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON serialized
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    # Prochaine tentative (reculée après un échec)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_outbox_events_status_available', 'status', 'available_at', 'id'),
+    )
+
+    @property
+    def parsed_payload(self):
+        try:
+            return json.loads(self.payload) if self.payload else {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_type': self.event_type,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'company_id': self.company_id,
+            'user_id': self.user_id,
+            'payload': self.parsed_payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+        }
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.event_type} {self.status}>'
@@ -19,6 +19,11 @@ class Pause(db.Model):
     user = db.relationship('User', backref='pauses', lazy=True)
     pointage = db.relationship('Pointage', backref='pauses', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_pauses_pointage_id', 'pointage_id'),
+        db.Index('ix_pauses_user_start', 'user_id', 'start_time'),
+    )
+
     def to_dict(self):
         """Convertit l'objet en dictionnaire pour l'API"""
         return {
@@ -64,6 +64,16 @@ class Pointage(db.Model):
     # Relations
     office = db.relationship('Office', backref='pointages', lazy=True)
     mission = db.relationship('Mission', backref='pointages', lazy=True)
+
+    # Index composites pour les chemins critiques (doublon du jour, historique,
+    # rapports entreprise sur une plage de dates) ; ils suivent la clé de la
+    # pagination par curseur ``(date_pointage, heure_arrivee, id)``
+    __table_args__ = (
+        db.Index('ix_pointages_user_date_keyset', 'user_id', 'date_pointage', 'heure_arrivee', 'id'),
+        db.Index('ix_pointages_date_keyset', 'date_pointage', 'heure_arrivee', 'id'),
+        db.Index('ix_pointages_office_id', 'office_id'),
+        db.Index('ix_pointages_mission_id', 'mission_id'),
+    )
     
     def __init__(self, **kwargs):
         """Initialisation avec calcul automatique du statut"""
@@ -120,8 +130,12 @@ class Pointage(db.Model):
             self.heure_arrivee = datetime.combine(self.date_pointage, work_start, tzinfo=tz).astimezone(ZoneInfo('UTC')).time()
             self.is_equalized = True
     
-    def calculate_worked_hours(self):
-        """Calcule les heures travaillées en soustrayant les pauses"""
+    def calculate_worked_hours(self, pauses=None):
+        """Calcule les heures travaillées en soustrayant les pauses
+
+        ``pauses`` permet de fournir des pauses déjà chargées (sérialisation en
+        masse) pour éviter une requête par pointage.
+        """
         if not self.heure_depart:
             return None
 
@@ -135,8 +149,10 @@ class Pointage(db.Model):
         
         # Calcul des pauses avec gestion d'erreur
         try:
+            if pauses is not None:
+                pause_minutes = sum(p.duration_minutes or 0 for p in pauses)
             # Vérifier si self.pauses existe et n'est pas None
-            if hasattr(self, 'pauses') and self.pauses is not None:
+            elif hasattr(self, 'pauses') and self.pauses is not None:
                 pause_minutes = sum(p.duration_minutes or 0 for p in self.pauses)
             else:
                 # Récupérer les pauses manuellement si la relation ne fonctionne pas
@@ -157,16 +173,21 @@ class Pointage(db.Model):
     @property
     def delay_minutes(self):
         """Retourne le retard en minutes en tenant compte du fuseau horaire"""
-        if not self.user or not self.user.company:
+        company = self.user.company if self.user else None
+        return self._compute_delay_minutes(company, self.office)
+
+    def _compute_delay_minutes(self, company, office, default_timezone=None):
+        """Calcule le retard à partir d'une entreprise et d'un bureau déjà résolus"""
+        if not company:
             return 0
 
-        work_start = self.user.company.work_start_time or time(9, 0)
+        work_start = company.work_start_time or time(9, 0)
 
         tz_name = 'UTC'
-        if self.office and self.office.timezone:
-            tz_name = self.office.timezone
+        if office and office.timezone:
+            tz_name = office.timezone
         else:
-            tz_name = SystemSettings.get_setting('general', 'default_timezone', 'UTC')
+            tz_name = default_timezone or SystemSettings.get_setting('general', 'default_timezone', 'UTC')
 
         tz = ZoneInfo(tz_name)
         arrival_dt_utc = datetime.combine(self.date_pointage, self.heure_arrivee, tzinfo=ZoneInfo('UTC'))
@@ -176,14 +197,80 @@ class Pointage(db.Model):
 
         delay = arrival_minutes - work_start_minutes
         return max(0, delay)
-    
-    def to_dict(self):
-        """Convertit le pointage en dictionnaire"""
-        worked_hours = self.calculate_worked_hours()
+
+    @classmethod
+    def build_serialization_context(cls, pointages):
+        """Précharge en un nombre fixe de requêtes tout ce dont ``to_dict`` a besoin.
+
+        Retourne un dictionnaire ``users``, ``companies``, ``offices``, ``missions``
+        (indexés par id), ``pauses`` (listes indexées par pointage_id) et
+        ``default_timezone`` (réglage système résolu une seule fois).
+        """
+        from backend.models.user import User
+        from backend.models.company import Company
+        from backend.models.office import Office
+        from backend.models.mission import Mission
+        from backend.models.pause import Pause
+
+        users = _load_by_ids(User, (p.user_id for p in pointages))
+        companies = _load_by_ids(Company, (u.company_id for u in users.values()))
+        offices = _load_by_ids(Office, (p.office_id for p in pointages))
+        missions = _load_by_ids(Mission, (p.mission_id for p in pointages))
+
+        pauses = {}
+        pointage_ids = sorted({p.id for p in pointages if p.id is not None})
+        for chunk in _chunked(pointage_ids):
+            for pause in Pause.query.filter(Pause.pointage_id.in_(chunk)).all():
+                pauses.setdefault(pause.pointage_id, []).append(pause)
+
+        default_timezone = None
+        if any(not (offices.get(p.office_id) and offices[p.office_id].timezone) for p in pointages):
+            default_timezone = SystemSettings.get_setting('general', 'default_timezone', 'UTC')
+
+        return {
+            'users': users,
+            'companies': companies,
+            'offices': offices,
+            'missions': missions,
+            'pauses': pauses,
+            'default_timezone': default_timezone,
+        }
+
+    @classmethod
+    def serialize_many(cls, pointages):
+        """Sérialise une liste de pointages sans requête par ligne"""
+        pointages = list(pointages)
+        if not pointages:
+            return []
+        context = cls.build_serialization_context(pointages)
+        return [p.to_dict(context) for p in pointages]
+
+    def to_dict(self, context=None):
+        """Convertit le pointage en dictionnaire
+
+        ``context`` provient de :meth:`build_serialization_context` ; sans lui les
+        relations sont chargées à la demande.
+        """
+        if context is None:
+            user = self.user
+            company = user.company if user else None
+            office = self.office
+            mission = self.mission
+            pauses = None
+            default_timezone = None
+        else:
+            user = context['users'].get(self.user_id)
+            company = context['companies'].get(user.company_id) if user else None
+            office = context['offices'].get(self.office_id)
+            mission = context['missions'].get(self.mission_id)
+            pauses = context['pauses'].get(self.id, [])
+            default_timezone = context['default_timezone']
+
+        worked_hours = self.calculate_worked_hours(pauses)
         data = {
             'id': self.id,
             'user_id': self.user_id,
-            'user_name': f"{self.user.prenom} {self.user.nom}" if self.user else None,
+            'user_name': f"{user.prenom} {user.nom}" if user else None,
             'type': self.type,
             'date_pointage': self.date_pointage.isoformat(),
             'heure_arrivee': self.heure_arrivee.strftime('%H:%M'),
@@ -200,25 +287,41 @@ class Pointage(db.Model):
             'office_id': self.office_id,
             'distance': self.distance,
             'mission_id': self.mission_id,
-            'mission_order_number': self.mission.order_number if self.mission else self.mission_order_number,
+            'mission_order_number': mission.order_number if mission else self.mission_order_number,
             'worked_hours': worked_hours,
             'worked_hours_adjusted': worked_hours,
-            'delay_minutes': self.delay_minutes,
+            'delay_minutes': self._compute_delay_minutes(company, office, default_timezone),
             'is_equalized': self.is_equalized,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
         
         # Ajouter les informations du bureau si disponible
-        if self.office:
+        if office:
             data['office'] = {
-                'id': self.office.id,
-                'name': self.office.name,
-                'address': self.office.address,
-                'city': self.office.city
+                'id': office.id,
+                'name': office.name,
+                'address': office.address,
+                'city': office.city
             }
         
         return data
     
     def __repr__(self):
-        return f'<Pointage {self.user_id} - {self.date_pointage} - {self.type}>'
\ No newline at end of file
+        return f'<Pointage {self.user_id} - {self.date_pointage} - {self.type}>'
+
+
+def _chunked(values, size=500):
+    """Découpe une liste d'identifiants pour rester sous la limite de paramètres SQL"""
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _load_by_ids(model, ids):
+    """Charge les instances de ``model`` correspondant à ``ids`` et les indexe par id"""
+    ids = sorted({i for i in ids if i is not None})
+    loaded = {}
+    for chunk in _chunked(ids):
+        for obj in model.query.filter(model.id.in_(chunk)).all():
+            loaded[obj.id] = obj
+    return loaded
@@ -0,0 +1,20 @@
+"""
+Modèle QRToken - Tokens QR de pointage (stockage SQL partagé entre workers)
+"""
+
+from backend.database import db
+from datetime import datetime
+
+
+class QRToken(db.Model):
+    """Token QR à usage unique, valable jusqu'à ``expires_at``"""
+
+    __tablename__ = 'qr_tokens'
+
+    token = db.Column(db.String(64), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON serialized
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<QRToken expires_at={self.expires_at}>'
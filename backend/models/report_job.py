@@ -0,0 +1,79 @@
+"""
+Modèle ReportJob - Génération asynchrone de rapports et d'exports
+"""
+
+from backend.database import db
+from datetime import datetime
+import json
+
+
+class ReportJob(db.Model):
+    """Job de génération d'un rapport (PDF ou export) exécuté par la file ``pointflex_reports``"""
+
+    __tablename__ = 'report_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON serialized
+    # Empreinte (type, paramètres, périmètre) servant à dédupliquer les demandes identiques
+    dedup_key = db.Column(db.String(64), nullable=False, index=True)
+
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'), nullable=True, index=True)
+    requested_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    error_message = db.Column(db.Text, nullable=True)
+
+    # Fichier produit
+    storage_key = db.Column(db.String(255), nullable=True)
+    filename = db.Column(db.String(255), nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    size_bytes = db.Column(db.Integer, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    @property
+    def parsed_params(self):
+        try:
+            return json.loads(self.params) if self.params else {}
+        except (json.JSONDecodeError, TypeError):
+            return {}
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+    @property
+    def is_pending(self):
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.parsed_params,
+            'status': self.status,
+            'error_message': self.error_message,
+            'filename': self.filename,
+            'mimetype': self.mimetype,
+            'size_bytes': self.size_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'download_url': (
+                f'/api/reports/jobs/{self.id}/download'
+                if self.status == self.STATUS_FINISHED and not self.is_expired else None
+            ),
+        }
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.kind} {self.status}>'
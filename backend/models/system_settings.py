@@ -3,6 +3,7 @@ Modèle SystemSettings - Paramètres système configurables
 """
 
 from backend.database import db
+from backend.utils import settings_cache
 from datetime import datetime
 import json
 
@@ -47,11 +48,15 @@ class SystemSettings(db.Model):
     
     @classmethod
     def get_setting(cls, category, key, default=None):
-        """Récupère une valeur de paramètre"""
-        setting = cls.query.filter_by(category=category, key=key).first()
-        if setting:
-            return setting.parsed_value
-        return default
+        """Récupère une valeur de paramètre (mise en cache, voir ``utils/settings_cache``)"""
+        def load():
+            setting = cls.query.filter_by(category=category, key=key).first()
+            return setting.parsed_value if setting else settings_cache.MISSING
+
+        value = settings_cache.get(category, key, load)
+        if value is settings_cache.MISSING:
+            return default
+        return value
     
     @classmethod
     def set_setting(cls, category, key, value, description=None):
@@ -70,7 +75,10 @@ class SystemSettings(db.Model):
                 description=description
             )
             db.session.add(setting)
-        
+
+        # Cache local seulement : la version partagée est publiée après le commit
+        # (``settings_cache.register_settings_hooks``)
+        settings_cache.invalidate(category, key)
         return setting
     
     @classmethod
@@ -106,6 +114,7 @@ class SystemSettings(db.Model):
         """Remet tous les paramètres aux valeurs par défaut"""
         # Supprimer tous les paramètres existants
         cls.query.delete()
+        settings_cache.bump_version_on_commit(db.session)
         
         # Recréer les paramètres par défaut
         from backend.database import init_db
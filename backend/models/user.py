@@ -55,6 +55,12 @@ class User(db.Model):
     manager = db.relationship('User', remote_side=[id], backref=db.backref('direct_reports', lazy='dynamic'))
     # 'remote_side=[id]' is necessary for self-referential many-to-one relationships.
     # 'direct_reports' will be the collection on the manager User object.
+
+    # Index pour les jointures par entreprise (rapports, statistiques) et la hiérarchie
+    __table_args__ = (
+        db.Index('ix_users_company_active', 'company_id', 'is_active'),
+        db.Index('ix_users_manager_id', 'manager_id'),
+    )
     
     def __init__(self, **kwargs):
         """Initialisation avec génération automatique du numéro d'employé"""
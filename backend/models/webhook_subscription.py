@@ -22,10 +22,19 @@ class WebhookSubscription(db.Model):
     secret = db.Column(db.String(128), nullable=False, default=lambda: secrets.token_hex(32))
     is_active = db.Column(db.Boolean, default=True, nullable=False, index=True)
 
+    # Opt-in : les événements sont regroupés et envoyés en un seul POST par fenêtre
+    batch_deliveries = db.Column(db.Boolean, default=False, nullable=False)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     company = db.relationship('Company', backref=db.backref('webhook_subscriptions', lazy='dynamic'))
+    # Une ligne par type d'événement, pour une recherche indexée (entreprise, événement)
+    event_links = db.relationship('WebhookSubscriptionEvent', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_webhook_subscriptions_company_active', 'company_id', 'is_active'),
+    )
 
     @property
     def subscribed_events(self):
@@ -38,6 +47,7 @@ class WebhookSubscription(db.Model):
     def subscribed_events(self, value):
         if isinstance(value, list):
             self._subscribed_events = json.dumps(value)
+            self._sync_event_links(value)
         elif isinstance(value, str):
              # Try to parse to ensure it's a valid JSON list string, then re-dump for consistency
             try:
@@ -45,11 +55,19 @@ class WebhookSubscription(db.Model):
                 if not isinstance(parsed_value, list):
                     raise ValueError("Subscribed events must be a list.")
                 self._subscribed_events = json.dumps(parsed_value)
+                self._sync_event_links(parsed_value)
             except json.JSONDecodeError:
                 raise ValueError("Invalid JSON string for subscribed events.")
         else:
             raise ValueError("Subscribed events must be a list or a valid JSON string representation of a list.")
 
+    def _sync_event_links(self, event_types):
+        """Aligne les lignes ``webhook_subscription_events`` sur la liste d'événements"""
+        wanted = list(dict.fromkeys(event_types))
+        existing = {link.event_type: link for link in self.event_links}
+        self.event_links = [existing.get(event_type) or WebhookSubscriptionEvent(event_type=event_type)
+                            for event_type in wanted]
+
     def generate_signature(self, payload_body: bytes) -> str:
         """Generates an HMAC SHA256 signature for the payload."""
         if not self.secret:
@@ -66,6 +84,7 @@ class WebhookSubscription(db.Model):
             'target_url': self.target_url,
             'subscribed_events': self.subscribed_events,
             'is_active': self.is_active,
+            'batch_deliveries': self.batch_deliveries,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -75,3 +94,20 @@ class WebhookSubscription(db.Model):
 
     def __repr__(self):
         return f'<WebhookSubscription {self.id} for Company {self.company_id} to {self.target_url[:30]}>'
+
+
+class WebhookSubscriptionEvent(db.Model):
+    """Type d'événement souscrit (miroir indexé de ``subscribed_events``)"""
+    __tablename__ = 'webhook_subscription_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('webhook_subscriptions.id', ondelete='CASCADE'), nullable=False)
+    event_type = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('subscription_id', 'event_type', name='uq_webhook_subscription_events_sub_event'),
+        db.Index('ix_webhook_subscription_events_event_sub', 'event_type', 'subscription_id'),
+    )
+
+    def __repr__(self):
+        return f'<WebhookSubscriptionEvent {self.subscription_id} {self.event_type}>'
@@ -1,16 +1,19 @@
 """
 Routes Admin - Gestion des pointages pour les administrateurs d'entreprise
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import require_admin, require_manager_or_above, get_current_user
 from backend.middleware.audit import log_user_action
 from backend.models.user import User
 from backend.models.company import Company
 from backend.models.pointage import Pointage
+from backend.models.attendance_daily_summary import AttendanceDailySummary
 from backend.models.department import Department
 from backend.models.service import Service
 from backend.database import db
+from backend.services.attendance_report_service import DEFAULT_TOP_N, build_comprehensive_report
+from backend.utils.pagination import InvalidCursorError, paginate_keyset, wants_exact_count
 from datetime import datetime, date, time, timedelta
 from sqlalchemy import func, desc, and_, case
 
@@ -83,11 +86,18 @@ def get_company_attendance():
         if status_filter and status_filter != 'all':
             query = query.filter(Pointage.statut == status_filter)
             
-        # Ordonner par date décroissante et heure d'arrivée
-        query = query.order_by(Pointage.date_pointage.desc(), Pointage.heure_arrivee.desc())
-        
-        # Pagination
-        paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Pagination par curseur, par date et heure d'arrivée décroissantes
+        cursor = request.args.get('cursor')
+        try:
+            paginated = paginate_keyset(
+                query,
+                (Pointage.date_pointage, Pointage.heure_arrivee, Pointage.id),
+                cursor=cursor, page=page, per_page=per_page,
+                key=lambda row: (row[0].date_pointage, row[0].heure_arrivee, row[0].id),
+                exact_count=wants_exact_count(request.args),
+            )
+        except InvalidCursorError as e:
+            return jsonify(message=str(e)), 400
         
         # Formater les résultats
         results = []
@@ -109,6 +119,9 @@ def get_company_attendance():
                 'mission_order_number': pointage.mission_order_number
             })
         
+        pagination = paginated.pagination(cursor)
+        pagination.update(total_pages=pagination['pages'], total_items=pagination['total'])
+
         # Journal d'audit
         log_user_action(
             action='VIEW_COMPANY_ATTENDANCE',
@@ -128,12 +141,7 @@ def get_company_attendance():
         
         return jsonify({
             'records': results,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total_pages': paginated.pages,
-                'total_items': paginated.total
-            }
+            'pagination': pagination
         }), 200
         
     except Exception as e:
@@ -183,66 +191,32 @@ def get_company_attendance_stats():
             User.is_active == True
         ).scalar()
         
-        # 2. Statistiques de présence pour la période
-        # Requête pour compter les présents, retards et absents dans la période
-        attendance_stats = db.session.query(
-            Pointage.statut,
-            func.count(Pointage.id).label('count')
-        ).join(
-            User, Pointage.user_id == User.id
+        # 2. Statistiques de présence, heure d'arrivée et heures travaillées moyennes
+        #    en une requête sur les agrégats journaliers
+        totals = db.session.query(
+            func.coalesce(func.sum(AttendanceDailySummary.present_count), 0),
+            func.coalesce(func.sum(AttendanceDailySummary.late_count), 0),
+            func.coalesce(func.sum(AttendanceDailySummary.absent_count), 0),
+            func.avg(AttendanceDailySummary.first_arrival_minutes),
+            func.coalesce(func.sum(AttendanceDailySummary.worked_minutes), 0),
+            func.coalesce(func.sum(AttendanceDailySummary.pointage_count - AttendanceDailySummary.open_count), 0),
         ).filter(
-            User.company_id == current_user.company_id,
-            Pointage.date_pointage >= start_date_obj,
-            Pointage.date_pointage <= end_date_obj
-        ).group_by(
-            Pointage.statut
-        ).all()
-        
-        # Initialiser les compteurs
-        present_count = 0
-        late_count = 0
-        absent_count = 0
-        
-        # Remplir les compteurs à partir des résultats de la requête
-        for statut, count in attendance_stats:
-            if statut == 'present':
-                present_count = count
-            elif statut == 'retard':
-                late_count = count
-            elif statut == 'absent':
-                absent_count = count
+            AttendanceDailySummary.company_id == current_user.company_id,
+            AttendanceDailySummary.summary_date >= start_date_obj,
+            AttendanceDailySummary.summary_date <= end_date_obj
+        ).one()
+        present_count, late_count, absent_count = int(totals[0]), int(totals[1]), int(totals[2])
+        avg_arrival_time, worked_minutes, closed_count = totals[3], int(totals[4]), int(totals[5])
         
         # 3. Heure moyenne d'arrivée
-        avg_arrival_time = db.session.query(
-            func.avg(func.extract('hour', Pointage.heure_arrivee) * 60 + 
-                     func.extract('minute', Pointage.heure_arrivee)).label('avg_minutes')
-        ).join(
-            User, Pointage.user_id == User.id
-        ).filter(
-            User.company_id == current_user.company_id,
-            Pointage.date_pointage >= start_date_obj,
-            Pointage.date_pointage <= end_date_obj
-        ).scalar()
-        
         avg_arrival_time_formatted = "N/A"
         if avg_arrival_time:
             hours = int(avg_arrival_time // 60)
             minutes = int(avg_arrival_time % 60)
             avg_arrival_time_formatted = f"{hours:02d}:{minutes:02d}"
         
-        # 4. Heures de travail moyennes (si heure_depart est renseignée)
-        avg_work_hours = db.session.query(
-            func.avg(
-                func.extract('epoch', Pointage.heure_depart - Pointage.heure_arrivee) / 3600
-            ).label('avg_hours')
-        ).join(
-            User, Pointage.user_id == User.id
-        ).filter(
-            User.company_id == current_user.company_id,
-            Pointage.date_pointage >= start_date_obj,
-            Pointage.date_pointage <= end_date_obj,
-            Pointage.heure_depart != None
-        ).scalar() or 0
+        # 4. Heures de travail moyennes (pointages avec heure de départ)
+        avg_work_hours = worked_minutes / 60 / closed_count if closed_count else 0
         
         # Journal d'audit
         log_user_action(
@@ -384,6 +358,9 @@ def get_comprehensive_attendance_report():
     """
     Génère un rapport complet d'assiduité incluant les statistiques de présence,
     données par département, employés, et missions
+
+    Paramètres : ``start_date`` / ``end_date`` (YYYY-MM-DD, 30 derniers jours
+    par défaut) et ``top`` (nombre de meilleurs employés, 5 par défaut).
     """
     try:
         current_user = get_current_user()
@@ -393,593 +370,33 @@ def get_comprehensive_attendance_report():
         # Paramètres de requête
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        top_n = request.args.get('top', DEFAULT_TOP_N, type=int)
         
         today = date.today()
-        print(f"Date d'aujourd'hui: {today}")
-        print(f"Paramètres reçus - start_date: {start_date}, end_date: {end_date}")
         
         # Définir la période par défaut (1 mois)
         if not start_date:
             start_date_obj = today - timedelta(days=30)
-            print(f"Aucune date de début fournie, utilisation de la date par défaut: {start_date_obj}")
         else:
             try:
                 start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                print(f"Date de début parsée: {start_date_obj}")
-            except ValueError as e:
-                current_app.logger.error(
-                    f"Erreur de format de date pour start_date: {str(e)}", exc_info=e
-                )
+            except ValueError:
                 return jsonify(message="Format de date invalide pour start_date (YYYY-MM-DD)"), 400
                 
         if not end_date:
             end_date_obj = today
-            print(f"Aucune date de fin fournie, utilisation de la date par défaut: {end_date_obj}")
         else:
             try:
                 end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                print(f"Date de fin parsée: {end_date_obj}")
-            except ValueError as e:
-                current_app.logger.error(
-                    f"Erreur de format de date pour end_date: {str(e)}", exc_info=e
-                )
+            except ValueError:
                 return jsonify(message="Format de date invalide pour end_date (YYYY-MM-DD)"), 400
+
+        if start_date_obj > end_date_obj:
+            return jsonify(message="La date de début doit précéder la date de fin"), 400
         
-        # Initialiser les données du rapport
-        report_data = {
-            'period': {
-                'start': start_date_obj.isoformat(),
-                'end': end_date_obj.isoformat(),
-                'days': (end_date_obj - start_date_obj).days + 1
-            },
-            'stats': {},
-            'departmentStats': [],
-            'employeeStats': [],
-            'topEmployees': []
-        }
-        
-        # 1. Récupérer le total des employés (séparé et simplifié)
-        try:
-            total_employees = db.session.query(User).filter(
-                User.company_id == current_user.company_id,
-                User.is_active == True
-            ).count()
-            report_data['stats']['totalEmployees'] = total_employees
-        except Exception as e:
-            current_app.logger.error(
-                f"Erreur lors du calcul du nombre d'employés: {str(e)}",
-                exc_info=e
-            )
-            report_data['stats']['totalEmployees'] = 0
-            
-        # 2. Récupérer les données de pointage pour la période (séparé et simplifié)
-        try:
-            # Afficher des informations sur la compagnie de l'utilisateur
-            print(f"ID de l'entreprise actuelle: {current_user.company_id}")
-            
-            # Vérifier les utilisateurs de cette entreprise
-            users = db.session.query(User).filter(
-                User.company_id == current_user.company_id,
-                User.is_active == True
-            ).all()
-            print(f"Nombre d'utilisateurs dans l'entreprise: {len(users)}")
-            for user in users:
-                print(f"User ID: {user.id}, Nom: {user.prenom} {user.nom}")
-            
-            # Vérification directe des pointages dans la base de données (sans filtres)
-            all_pointages = db.session.query(Pointage).all()
-            print(f"Nombre total de pointages dans la base de données (sans filtre): {len(all_pointages)}")
-            
-            # Vérification des pointages par date
-            date_pointages = db.session.query(Pointage).filter(
-                Pointage.date_pointage >= start_date_obj,
-                Pointage.date_pointage <= end_date_obj
-            ).all()
-            print(f"Nombre de pointages pour la période (sans filtre utilisateur): {len(date_pointages)}")
-            
-            # VÉRIFICATION CRITIQUE: Récupérer TOUS les pointages pour comprendre le problème
-            print(f"IMPORTANT: Période demandée du {start_date_obj} au {end_date_obj}")
-            
-            # 1. Récupérer tous les pointages de la base sans filtres
-            all_db_pointages = db.session.query(Pointage).all()
-            print(f"DIAGNOSTIC: Nombre total de pointages dans la base: {len(all_db_pointages)}")
-            if all_db_pointages:
-                print("EXEMPLE DE DONNÉES:")
-                for i, p in enumerate(all_db_pointages[:5]):
-                    print(f"  - ID: {p.id}, User ID: {p.user_id}, Date: {p.date_pointage}, Statut: {p.statut}")
-                
-                # Afficher les dates distinctes des pointages
-                dates_distinctes = set(p.date_pointage for p in all_db_pointages)
-                print(f"DATES DISTINCTES DANS LA BASE: {sorted(dates_distinctes)}")
-            
-            # 2. Maintenant essayons la requête sans filtre d'entreprise, juste les dates
-            date_pointages = db.session.query(Pointage).filter(
-                Pointage.date_pointage >= start_date_obj,
-                Pointage.date_pointage <= end_date_obj
-            ).all()
-            print(f"FILTRE DATE UNIQUEMENT: {len(date_pointages)} pointages pour la période")
-            
-            # 3. La requête complète comme avant
-            pointages = db.session.query(Pointage).join(
-                User, Pointage.user_id == User.id
-            ).filter(
-                User.company_id == current_user.company_id,
-                Pointage.date_pointage >= start_date_obj,
-                Pointage.date_pointage <= end_date_obj
-            ).all()
-            
-            print(f"REQUÊTE COMPLÈTE: {len(pointages)} pointages trouvés pour l'entreprise")
-            
-            # Afficher les détails de quelques pointages (si disponibles)
-            if all_pointages:
-                print("Détails de quelques pointages dans la base:")
-                for i, p in enumerate(all_pointages[:5]):  # Afficher max 5 pointages
-                    print(f"Pointage ID: {p.id}, User ID: {p.user_id}, Date: {p.date_pointage}, Statut: {p.statut}")
-            
-            # Variable pour indiquer si nous utilisons des données simulées ou non
-            using_simulated_data = False
-            
-            # VÉRIFICATION IMPORTANTE: Même s'il y a des pointages, vérifions s'ils contiennent les données pertinentes
-            # pour cette période et cet utilisateur (période du 26 au 29 juillet 2025)
-            target_period_start = datetime.strptime('2025-07-26', '%Y-%m-%d').date()
-            target_period_end = datetime.strptime('2025-07-29', '%Y-%m-%d').date()
-            
-            # Si nous sommes dans la période cible (26-29 juillet), forcer l'utilisation des pointages
-            if (start_date_obj <= target_period_end and end_date_obj >= target_period_start):
-                print("PÉRIODE CIBLE DÉTECTÉE: Nous sommes dans la période du 26-29 juillet 2025!")
-                # Récupérer directement les pointages pour cette période spécifique
-                direct_pointages = db.session.query(Pointage).filter(
-                    Pointage.date_pointage >= target_period_start,
-                    Pointage.date_pointage <= target_period_end
-                ).all()
-                
-                if direct_pointages:
-                    print(f"DONNÉES CIBLES TROUVÉES: {len(direct_pointages)} pointages trouvés pour la période cible")
-                    pointages = direct_pointages  # Utiliser ces pointages directement
-                    
-                    # Afficher le détail de ces pointages
-                    for p in direct_pointages:
-                        print(f"POINTAGE CIBLE: ID={p.id}, User={p.user_id}, Date={p.date_pointage}, Statut={p.statut}")
-            
-            # Si aucun pointage n'est trouvé, noter que nous utiliserons des données simulées
-            if not pointages:
-                print(f"Aucun pointage trouvé pour la période du {start_date_obj} au {end_date_obj} dans cette entreprise.")
-                print("Des données simulées seront ajoutées aux statistiques générales.")
-                using_simulated_data = True
-                # Mais on ne retourne pas encore, on continue le traitement pour pouvoir mélanger les données réelles et simulées
-            
-            # Compter manuellement au lieu d'utiliser des requêtes complexes
-            total_records = len(pointages)
-            
-            # Afficher un échantillon des statuts pour vérifier
-            status_sample = [p.statut for p in pointages[:20]] if pointages else []
-            print(f"Échantillon des statuts: {status_sample}")
-            
-            # IMPORTANT: Normalisez les statuts pour être plus tolérant aux variations
-            # Convertir les statuts en minuscules et nettoyer les espaces
-            normalized_statuts = {}
-            for p in pointages:
-                if not p.statut:
-                    continue
-                
-                norm_statut = p.statut.lower().strip()
-                if 'present' in norm_statut:
-                    normalized_statuts[p.id] = 'present'
-                elif 'retard' in norm_statut:
-                    normalized_statuts[p.id] = 'retard'
-                elif 'absent' in norm_statut:
-                    normalized_statuts[p.id] = 'absent'
-                else:
-                    normalized_statuts[p.id] = norm_statut
-            
-            # Utiliser les statuts normalisés
-            total_present = sum(1 for p in pointages if p.id in normalized_statuts and normalized_statuts[p.id] == 'present')
-            total_late = sum(1 for p in pointages if p.id in normalized_statuts and normalized_statuts[p.id] == 'retard')
-            total_absent = sum(1 for p in pointages if p.id in normalized_statuts and normalized_statuts[p.id] == 'absent')
-            
-            print(f"Statistiques trouvées (après normalisation): présences={total_present}, retards={total_late}, absences={total_absent}")
-            
-            # Détecter si nous avons besoin de compléter avec des données simulées
-            has_valid_status = total_present > 0 or total_late > 0 or total_absent > 0
-            if not has_valid_status:
-                print("ATTENTION: Aucun pointage avec statut valide trouvé (present, retard, absent).")
-                if pointages:
-                    print(f"Statuts uniques présents dans les données: {set(p.statut for p in pointages)}")
-                    # Si nous avons des pointages mais pas de statut valide, essayons de forcer l'utilisation des données
-                    # pour la période cible (26-29 juillet 2025) si c'est celle qui est demandée
-                    target_period_start = datetime.strptime('2025-07-26', '%Y-%m-%d').date()
-                    target_period_end = datetime.strptime('2025-07-29', '%Y-%m-%d').date()
-                    
-                    if (start_date_obj <= target_period_end and end_date_obj >= target_period_start):
-                        print("PÉRIODE CIBLE DÉTECTÉE: Correction forcée des statuts pour afficher les données réelles!")
-                        # Forcer l'utilisation de 'retard' comme statut pour tous les pointages
-                        total_present = 0
-                        total_late = len(pointages)  # Tous en retard (comme dans l'image)
-                        total_absent = 0
-                        has_valid_status = True
-                        using_simulated_data = False
-                else:
-                    using_simulated_data = True
-            
-            # Calculer les heures de travail total
-            total_work_hours = 0
-            missing_times = 0
-            for p in pointages:
-                if p.heure_arrivee and p.heure_depart:
-                    try:
-                        # Calculer la différence en heures
-                        delta = p.heure_depart - p.heure_arrivee
-                        hours = delta.total_seconds() / 3600
-                        total_work_hours += hours
-                        print(f"Pointage {p.id}: {p.heure_arrivee} -> {p.heure_depart} = {hours} heures")
-                    except Exception as time_error:
-                        current_app.logger.error(
-                            f"Erreur lors du calcul des heures pour pointage {p.id}: {str(time_error)}",
-                            exc_info=time_error
-                        )
-                else:
-                    missing_times += 1
-            
-            if missing_times > 0:
-                print(f"ATTENTION: {missing_times} pointages sans heure d'arrivée ou de départ.")
-                
-            print(f"Heures totales travaillées: {total_work_hours}")
-            
-            # Si nous n'avons pas trouvé d'heures valides, utiliser des données simulées
-            if total_work_hours <= 0:
-                print("Aucune heure de travail valide trouvée. Utilisation de données simulées pour les heures.")
-                using_simulated_data = True
-            
-            # Mettre à jour les statistiques avec les données réelles ou simulées
-            if using_simulated_data:
-                print("Utilisation de données simulées pour compléter les statistiques manquantes.")
-                # Créer une structure hybride qui conserve les données réelles et complète avec des simulées
-                sim_total_records = max(total_records, 125)  # Utiliser le plus grand nombre
-                sim_total_present = total_present if total_present > 0 else 98
-                sim_total_late = total_late if total_late > 0 else 15
-                sim_total_absent = total_absent if total_absent > 0 else 12
-                sim_work_hours = total_work_hours if total_work_hours > 0 else 784.5
-                
-                report_data['stats'].update({
-                    'totalRecords': sim_total_records,
-                    'totalPresences': sim_total_present,
-                    'totalLate': sim_total_late,
-                    'totalAbsences': sim_total_absent,
-                    'totalWorkHours': round(sim_work_hours, 2),
-                    'containsSimulatedData': True  # Indicateur que les données contiennent des éléments simulés
-                })
-            else:
-                report_data['stats'].update({
-                    'totalRecords': total_records,
-                    'totalPresences': total_present,
-                    'totalLate': total_late,
-                    'totalAbsences': total_absent,
-                    'totalWorkHours': round(total_work_hours, 2),
-                    'containsSimulatedData': False  # Indicateur que les données sont entièrement réelles
-                })
-        except Exception as e:
-            current_app.logger.error(
-                f"Erreur lors du calcul des statistiques globales: {str(e)}",
-                exc_info=e
-            )
-            report_data['stats'].update({
-                'totalRecords': 0,
-                'totalPresences': 0,
-                'totalLate': 0,
-                'totalAbsences': 0,
-                'totalWorkHours': 0
-            })
-            
-        # 3. Récupérer les statistiques par département (séparé et simplifié)
-        try:
-            # Préparer les données simulées des départements à utiliser si nécessaire
-            simulated_dept_stats = [
-                {
-                    'id': 1,
-                    'name': 'Ressources Humaines',
-                    'employeeCount': 12,
-                    'presences': 30,
-                    'absences': 3,
-                    'lates': 5,
-                    'workHours': 240.5,
-                    'attendanceRate': 92.1,
-                    'isSimulated': True
-                },
-                {
-                    'id': 2,
-                    'name': 'Développement',
-                    'employeeCount': 18,
-                    'presences': 42,
-                    'absences': 2,
-                    'lates': 4,
-                    'workHours': 348.0,
-                    'attendanceRate': 95.8,
-                    'isSimulated': True
-                },
-                {
-                    'id': 3,
-                    'name': 'Marketing',
-                    'employeeCount': 8,
-                    'presences': 16,
-                    'absences': 5,
-                    'lates': 3,
-                    'workHours': 125.5,
-                    'attendanceRate': 79.2,
-                    'isSimulated': True
-                }
-            ]
-            
-            # Si aucun pointage n'a été trouvé OU si nous utilisons des données simulées et qu'il n'y a pas de départements réels
-            # Alors on utilise directement les données simulées
-            if (not pointages or len(pointages) == 0) and using_simulated_data:
-                print("Aucun pointage trouvé pour les départements. Utilisation de données simulées pour les départements.")
-                report_data['departmentStats'] = simulated_dept_stats
-            else:
-                # Récupérer tous les départements de l'entreprise
-                departments = db.session.query(Department).join(
-                    User, Department.id == User.department_id
-                ).filter(
-                    User.company_id == current_user.company_id
-                ).distinct().all()
-                
-                print(f"Nombre de départements trouvés: {len(departments)}")
-                
-                for dept in departments:
-                    # Compter les employés du département
-                    employee_count = db.session.query(User).filter(
-                        User.company_id == current_user.company_id,
-                        User.department_id == dept.id,
-                        User.is_active == True
-                    ).count()
-                    
-                    # Récupérer les pointages du département pour la période
-                    dept_pointages = db.session.query(Pointage).join(
-                        User, Pointage.user_id == User.id
-                    ).filter(
-                        User.company_id == current_user.company_id,
-                        User.department_id == dept.id,
-                        Pointage.date_pointage >= start_date_obj,
-                        Pointage.date_pointage <= end_date_obj
-                    ).all()
-                    
-                    print(f"Département {dept.name}: {len(dept_pointages)} pointages trouvés")
-                    
-                    # Compter manuellement
-                    present_count = sum(1 for p in dept_pointages if p.statut == 'present')
-                    late_count = sum(1 for p in dept_pointages if p.statut == 'retard')
-                    absent_count = sum(1 for p in dept_pointages if p.statut == 'absent')
-                    
-                    print(f"  - Présences: {present_count}, Retards: {late_count}, Absences: {absent_count}")
-                    
-                    # Calculer les heures de travail
-                    work_hours = 0
-                    for p in dept_pointages:
-                        if p.heure_arrivee and p.heure_depart:
-                            try:
-                                delta = p.heure_depart - p.heure_arrivee
-                                hours = delta.total_seconds() / 3600
-                                work_hours += hours
-                            except Exception as time_error:
-                                current_app.logger.error(
-                                    f"Erreur lors du calcul des heures pour pointage {p.id}: {str(time_error)}",
-                                    exc_info=time_error
-                                )
-                    
-                    # Calculer le taux de présence
-                    total_points = present_count + late_count + absent_count
-                    attendance_rate = round((present_count + late_count) / total_points * 100, 1) if total_points > 0 else 0
-                    
-                    # Vérifier si nous avons des données valides pour ce département
-                    has_dept_data = present_count > 0 or late_count > 0 or absent_count > 0 or work_hours > 0
-                    
-                    # Ajouter les statistiques du département
-                    report_data['departmentStats'].append({
-                        'id': dept.id,
-                        'name': dept.name,
-                        'employeeCount': employee_count,
-                        'presences': present_count,
-                        'absences': absent_count,
-                        'lates': late_count,
-                        'workHours': round(work_hours, 2),
-                        'attendanceRate': attendance_rate,
-                        'isSimulated': False
-                    })
-                    
-                # Si nous utilisons des données simulées et que nous n'avons pas assez de départements réels
-                if using_simulated_data and len(report_data['departmentStats']) < 2:
-                    print("Pas assez de départements avec des données. Ajout de départements simulés.")
-                    # Ajout des départements simulés qui ne sont pas déjà présents
-                    real_dept_ids = {dept_stats['id'] for dept_stats in report_data['departmentStats']}
-                    for sim_dept in simulated_dept_stats:
-                        if sim_dept['id'] not in real_dept_ids:
-                            report_data['departmentStats'].append(sim_dept)
-        except Exception as e:
-            current_app.logger.error(
-                f"Erreur lors du calcul des statistiques par département: {str(e)}",
-                exc_info=e
-            )
-            
-        # 4. Récupérer les statistiques par employé (séparé et simplifié)
-        try:
-            # Préparer les données simulées des employés à utiliser si nécessaire
-            simulated_employee_stats = [
-                {
-                    'id': 1001,  # Utiliser des IDs élevés pour éviter les conflits avec les vrais IDs
-                    'name': 'Jean Martin',
-                    'department': 'Ressources Humaines',
-                    'presences': 10,
-                    'absences': 0,
-                    'lates': 1,
-                    'workHours': 80.5,
-                    'attendanceRate': 100.0,
-                    'isSimulated': True
-                },
-                {
-                    'id': 1002,
-                    'name': 'Sophie Dubois',
-                    'department': 'Développement',
-                    'presences': 9,
-                    'absences': 1,
-                    'lates': 0,
-                    'workHours': 72.0,
-                    'attendanceRate': 90.0,
-                    'isSimulated': True
-                },
-                {
-                    'id': 1003,
-                    'name': 'Thomas Bernard',
-                    'department': 'Marketing',
-                    'presences': 6,
-                    'absences': 2,
-                    'lates': 2,
-                    'workHours': 48.0,
-                    'attendanceRate': 80.0,
-                    'isSimulated': True
-                },
-                {
-                    'id': 1004,
-                    'name': 'Marie Lefevre',
-                    'department': 'Développement',
-                    'presences': 8,
-                    'absences': 0,
-                    'lates': 2,
-                    'workHours': 64.0,
-                    'attendanceRate': 100.0,
-                    'isSimulated': True
-                },
-                {
-                    'id': 1005,
-                    'name': 'Lucas Robert',
-                    'department': 'Ressources Humaines',
-                    'presences': 7,
-                    'absences': 1,
-                    'lates': 2,
-                    'workHours': 56.0,
-                    'attendanceRate': 90.0,
-                    'isSimulated': True
-                }
-            ]
-            
-            # Si aucun pointage n'a été trouvé ET que nous utilisons des données simulées
-            # Alors on utilise les données simulées uniquement
-            if (not pointages or len(pointages) == 0) and using_simulated_data:
-                print("Aucun pointage trouvé pour les employés. Utilisation de données simulées.")
-                employee_stats_list = simulated_employee_stats
-                report_data['employeeStats'] = employee_stats_list
-                report_data['topEmployees'] = [
-                    employee_stats_list[0],
-                    employee_stats_list[3],
-                    employee_stats_list[1],
-                    employee_stats_list[4],
-                    employee_stats_list[2]
-                ]
-            else:
-                # Récupérer tous les employés actifs de l'entreprise
-                employees = db.session.query(User).outerjoin(
-                    Department, User.department_id == Department.id
-                ).filter(
-                    User.company_id == current_user.company_id,
-                    User.is_active == True
-                ).all()
-                
-                print(f"Nombre d'employés actifs trouvés: {len(employees)}")
-                
-                employee_stats_list = []
-                
-                for emp in employees:
-                    # Récupérer le nom du département de l'employé
-                    department_name = "Non assigné"
-                    if emp.department_id:
-                        dept = db.session.query(Department).get(emp.department_id)
-                        if dept:
-                            department_name = dept.name
-                    
-                    # Récupérer les pointages de l'employé pour la période
-                    emp_pointages = db.session.query(Pointage).filter(
-                        Pointage.user_id == emp.id,
-                        Pointage.date_pointage >= start_date_obj,
-                        Pointage.date_pointage <= end_date_obj
-                    ).all()
-                    
-                    print(f"Employé {emp.prenom} {emp.nom}: {len(emp_pointages)} pointages trouvés")
-                    
-                    # Compter manuellement
-                    present_count = sum(1 for p in emp_pointages if p.statut == 'present')
-                    late_count = sum(1 for p in emp_pointages if p.statut == 'retard')
-                    absent_count = sum(1 for p in emp_pointages if p.statut == 'absent')
-                    
-                    print(f"  - Présences: {present_count}, Retards: {late_count}, Absences: {absent_count}")
-                    
-                    # Calculer les heures de travail
-                    work_hours = 0
-                    for p in emp_pointages:
-                        if p.heure_arrivee and p.heure_depart:
-                            try:
-                                delta = p.heure_depart - p.heure_arrivee
-                                hours = delta.total_seconds() / 3600
-                                work_hours += hours
-                            except Exception as time_error:
-                                current_app.logger.error(
-                                    f"Erreur lors du calcul des heures pour pointage {p.id}: {str(time_error)}",
-                                    exc_info=time_error
-                                )
-                    
-                    # Calculer le taux de présence
-                    total_points = present_count + late_count + absent_count
-                    attendance_rate = round((present_count + late_count) / total_points * 100, 1) if total_points > 0 else 0
-                    
-                    # Ajouter les statistiques de l'employé
-                    emp_stats = {
-                        'id': emp.id,
-                        'name': f"{emp.prenom} {emp.nom}",
-                        'department': department_name,
-                        'presences': present_count,
-                        'absences': absent_count,
-                        'lates': late_count,
-                        'workHours': round(work_hours, 2),
-                        'attendanceRate': attendance_rate,
-                        'isSimulated': False
-                    }
-                    
-                    employee_stats_list.append(emp_stats)
-                
-                # Si nous utilisons des données simulées et nous n'avons pas assez d'employés avec des données
-                if using_simulated_data and (len(employee_stats_list) == 0 or all(
-                    emp['presences'] == 0 and emp['absences'] == 0 and emp['lates'] == 0 for emp in employee_stats_list)):
-                    print("Pas assez d'employés avec des données. Ajout d'employés simulés.")
-                    
-                    # Si nous avons des employés réels sans données, complétons-les
-                    if len(employee_stats_list) > 0:
-                        print("Compléter les données des employés réels.")
-                        for emp in employee_stats_list:
-                            emp['presences'] = 10 if emp['presences'] == 0 else emp['presences']
-                            emp['absences'] = 1 if emp['absences'] == 0 else emp['absences']
-                            emp['lates'] = 2 if emp['lates'] == 0 else emp['lates']
-                            emp['workHours'] = 75.0 if emp['workHours'] == 0 else emp['workHours']
-                            emp['attendanceRate'] = 90.0 if emp['attendanceRate'] == 0 else emp['attendanceRate']
-                            emp['containsSimulatedData'] = True
-                    else:
-                        # Sinon, ajouter les employés simulés
-                        employee_stats_list = simulated_employee_stats
-                
-                report_data['employeeStats'] = employee_stats_list
-                
-                # 5. Identifier les 5 meilleurs employés par taux de présence
-                if employee_stats_list:
-                    top_employees = sorted(
-                        employee_stats_list, 
-                        key=lambda x: (x['attendanceRate'], x['presences'], -x['absences']), 
-                        reverse=True
-                    )[:5]
-                    report_data['topEmployees'] = top_employees
-                else:
-                    # Utiliser les employés simulés pour les meilleurs employés si nécessaire
-                    report_data['topEmployees'] = simulated_employee_stats[:5]
-        except Exception as e:
-            current_app.logger.error(
-                f"Erreur lors du calcul des statistiques par employé: {str(e)}",
-                exc_info=e
-            )
+        report_data = build_comprehensive_report(
+            current_user.company_id, start_date_obj, end_date_obj, top_n=top_n
+        )
         
         # Journal d'audit
         try:
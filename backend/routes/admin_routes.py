@@ -6,11 +6,12 @@ from flask import Blueprint, request, jsonify, send_file, send_from_directory, c
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import require_admin, require_manager_or_above, get_current_user
 from backend.middleware.audit import log_user_action
+from backend.middleware.conditional import conditional_get, watermark
 from backend.models.user import User
 from backend.models.company import Company
 from backend.models.notification import Notification
 import stripe
-from datetime import time, timedelta, datetime
+from datetime import time, datetime
 import json
 import os
 from reportlab.lib import colors
@@ -31,6 +32,9 @@ from reportlab.lib.units import inch # Keep only what's directly used here
 # Removed other direct reportlab imports as they are now in pdf_utils
 from datetime import datetime
 from backend.utils.pdf_utils import build_pdf_document, create_styled_table, get_report_styles, generate_report_title_elements
+from backend.utils.geo_utils import invalidate_office_index
+from backend.services.report_job_service import submit_report_job, wants_async_report
+from backend.services.report_pdf_service import build_company_attendance_pdf, build_employee_attendance_pdf
 from backend.database import db
 import json
 from werkzeug.utils import secure_filename
@@ -53,6 +57,15 @@ def get_admin_company():
     return company, None
 
 
+def _company_scoped_versions(model):
+    """Version d'une liste de référence : toute la table pour le superadmin, sinon l'entreprise"""
+    def versions(principal):
+        if principal.role == 'superadmin':
+            return [principal.role, watermark(model)]
+        return [watermark(model, model.company_id == principal.company_id)]
+    return versions
+
+
 @admin_bp.route('/subscription', methods=['GET'])
 @admin_bp.route('/company/subscription', methods=['GET'])  # Ajouter l'endpoint qui correspond au front
 @require_admin
@@ -512,11 +525,9 @@ def get_company_attendance():
 
         pointages = query.order_by(Pointage.date_pointage.desc()).all()
 
-        records = []
-        for p in pointages:
-            data = p.to_dict()
-            data['user_name'] = f"{p.user.prenom} {p.user.nom}" if p.user else str(p.user_id)
-            records.append(data)
+        records = Pointage.serialize_many(pointages)
+        for data in records:
+            data['user_name'] = data['user_name'] or str(data['user_id'])
 
         return jsonify({'records': records}), 200
 
@@ -553,6 +564,7 @@ def get_organization_data():
 
 @admin_bp.route('/departments', methods=['GET'])
 @require_admin
+@conditional_get(_company_scoped_versions(Department))
 def get_departments():
     """Liste les départements de l'entreprise."""
     try:
@@ -785,6 +797,7 @@ def delete_service(service_id):
 
 @admin_bp.route('/positions', methods=['GET'])
 @require_admin
+@conditional_get(_company_scoped_versions(Position))
 def get_positions():
     """Liste les postes."""
     try:
@@ -901,6 +914,7 @@ def delete_position(position_id):
 
 @admin_bp.route('/offices', methods=['GET'])
 @require_admin
+@conditional_get(_company_scoped_versions(Office))
 def get_offices():
     """Récupère les bureaux de l'entreprise"""
     try:
@@ -985,6 +999,7 @@ def create_office():
         )
         
         db.session.commit()
+        invalidate_office_index(company_id)
         
         return jsonify({
             'message': 'Bureau créé avec succès',
@@ -1038,6 +1053,7 @@ def update_office(office_id):
         )
         
         db.session.commit()
+        invalidate_office_index(office.company_id)
         
         return jsonify({
             'message': 'Bureau mis à jour avec succès',
@@ -1072,8 +1088,10 @@ def delete_office(office_id):
             old_values=old_values
         )
         
+        company_id = office.company_id
         db.session.delete(office)
         db.session.commit()
+        invalidate_office_index(company_id)
         
         return jsonify(message="Bureau supprimé avec succès"), 200
         
@@ -1082,8 +1100,18 @@ def delete_office(office_id):
         db.session.rollback()
         return jsonify(message="Erreur interne du serveur"), 500
 
+def _company_settings_versions(principal):
+    """Version des paramètres : l'entreprise, ses utilisateurs (effectif) et le jour (durée d'abonnement)"""
+    return [
+        watermark(Company, Company.id == principal.company_id),
+        watermark(User, User.company_id == principal.company_id),
+        datetime.utcnow().date().isoformat(),
+    ]
+
+
 @admin_bp.route('/company/settings', methods=['GET'])
 @require_admin
+@conditional_get(_company_settings_versions)
 def get_company_settings():
     """Récupère les paramètres de l'entreprise"""
     current_user = get_current_user()
@@ -1233,23 +1261,12 @@ def get_company_stats():
         total_employees = User.query.filter_by(company_id=company.id).count()
         active_employees = User.query.filter_by(company_id=company.id, is_active=True).count()
         
-        # Récupérer les statistiques des notifications
-        company_users = User.query.filter_by(company_id=company.id).all()
-        user_ids = [user.id for user in company_users]
-        
-        # Statistiques des notifications
-        total_notifications = Notification.query.filter(Notification.user_id.in_(user_ids)).count()
-        unread_notifications = Notification.query.filter(
-            Notification.user_id.in_(user_ids),
-            Notification.is_read == False
-        ).count()
-        
-        # Notifications des derniers 30 jours
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_notifications = Notification.query.filter(
-            Notification.user_id.in_(user_ids),
-            Notification.created_at >= thirty_days_ago
-        ).count()
+        # Statistiques des notifications (compteurs dénormalisés)
+        from backend.services.notification_counter_service import get_company_notification_stats
+        notification_stats = get_company_notification_stats(company.id)
+        total_notifications = notification_stats['total']
+        unread_notifications = notification_stats['unread']
+        recent_notifications = notification_stats['recent']
         
         # Statistiques des abonnements
         from backend.models.subscription_plan import SubscriptionPlan
@@ -1392,7 +1409,11 @@ def get_company_notifications_history():
 @admin_bp.route('/attendance-report/pdf', methods=['GET'])
 @require_admin
 def attendance_report_pdf():
-    """Génère un rapport PDF détaillé des pointages de l'entreprise."""
+    """Génère un rapport PDF détaillé des pointages de l'entreprise.
+
+    Avec ``?async=1`` le rapport est généré par la file de rapports et la
+    réponse 202 contient le job à suivre.
+    """
     try:
         current_user = get_current_user()
         company_id = current_user.company_id
@@ -1400,152 +1421,20 @@ def attendance_report_pdf():
         if not company_id:
             return jsonify(message="Aucune entreprise associée"), 400
 
-        company = Company.query.get(company_id)
-        if not company:
-            return jsonify(message="Entreprise non trouvée"), 404
-
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
-        pointage_type_filter = request.args.get('pointage_type') # 'office' or 'mission'
-        pointage_status_filter = request.args.get('pointage_status') # 'present', 'retard'
-        user_id_filter = request.args.get('user_id', type=int)
-        sort_by_filter = request.args.get('sort_by', 'user_then_date') # e.g., 'date', 'user', 'type', 'status'
-        sort_direction_filter = request.args.get('sort_direction', 'asc') # 'asc' or 'desc'
-
+        filters = request.args.to_dict()
+        if wants_async_report():
+            result = submit_report_job('attendance_pdf', filters, current_user)
+            if result['error']:
+                return jsonify(message=result['message']), result['status_code']
+            return jsonify(job=result['job'].to_dict()), result['status_code']
 
-        query = Pointage.query.join(User).filter(User.company_id == company_id)
-
-        report_filters_texts = []
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(Pointage.date_pointage >= start_date)
-            report_filters_texts.append(f"Début: {start_date.strftime('%d/%m/%Y')}")
-        if end_date_str:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(Pointage.date_pointage <= end_date) # Corrected to <= for end_date
-            report_filters_texts.append(f"Fin: {end_date.strftime('%d/%m/%Y')}")
-        if pointage_type_filter:
-            query = query.filter(Pointage.type == pointage_type_filter)
-            report_filters_texts.append(f"Type: {pointage_type_filter}")
-        if pointage_status_filter:
-            query = query.filter(Pointage.statut == pointage_status_filter)
-            report_filters_texts.append(f"Statut Pointage: {pointage_status_filter}")
-        if user_id_filter:
-            # Ensure admin can access this user (user is in their company)
-            user_to_filter = User.query.filter_by(id=user_id_filter, company_id=company_id).first()
-            if not user_to_filter:
-                return jsonify(message=f"Utilisateur avec ID {user_id_filter} non trouvé ou non autorisé."), 404
-            query = query.filter(Pointage.user_id == user_id_filter)
-            report_filters_texts.append(f"Employé: {user_to_filter.prenom} {user_to_filter.nom}")
-
-        date_filter_text = ", ".join(report_filters_texts) if report_filters_texts else "toutes périodes"
-
-        # Sorting logic
-        order_criteria = []
-        if sort_by_filter == 'date':
-            order_criteria.extend([Pointage.date_pointage, Pointage.heure_arrivee, User.nom, User.prenom])
-        elif sort_by_filter == 'type':
-            order_criteria.extend([Pointage.type, User.nom, User.prenom, Pointage.date_pointage])
-        elif sort_by_filter == 'status':
-            order_criteria.extend([Pointage.statut, User.nom, User.prenom, Pointage.date_pointage])
-        else: # Default: user_then_date
-            order_criteria.extend([User.nom, User.prenom, Pointage.date_pointage, Pointage.heure_arrivee])
-
-        if sort_direction_filter == 'desc':
-            order_criteria = [criterion.desc() for criterion in order_criteria]
-
-        query = query.order_by(*order_criteria)
-        pointages = query.all()
-
-        buffer = BytesIO()
-        styles = get_report_styles() # Get styles from pdf_utils
-
-        story = generate_report_title_elements(
-            title_str="Rapport de Présence",
-            period_str=date_filter_text,
-            company_name=company.name
-        )
-
-        if not pointages:
-            story.append(Paragraph("Aucun pointage trouvé pour la période sélectionnée.", styles['Normal']))
-        else:
-            table_data = [
-                # Header Row - Using Paragraphs for potential styling and consistency
-                [
-                    Paragraph("Employé", styles['SmallText']),
-                    Paragraph("Date", styles['SmallText']),
-                    Paragraph("Arrivée", styles['SmallText']),
-                    Paragraph("Départ", styles['SmallText']),
-                    Paragraph("Durée (H)", styles['SmallText']),
-                    Paragraph("Type", styles['SmallText']),
-                    Paragraph("Retard (min)", styles['SmallText']),
-                    Paragraph("Commentaire", styles['SmallText'])
-                ]
-            ]
-
-            for p in pointages:
-                user_name = f"{p.user.prenom} {p.user.nom}" if p.user else str(p.user_id)
-                heure_arrivee_str = p.heure_arrivee.strftime('%H:%M') if p.heure_arrivee else "N/A"
-                heure_depart_str = p.heure_depart.strftime('%H:%M') if p.heure_depart else "N/A"
-
-                duration_hours_str = ""
-                if p.heure_arrivee and p.heure_depart:
-                    try:
-                        # Ensure date_pointage is a date object, heure_arrivee/depart are time objects
-                        datetime_arrivee = datetime.combine(p.date_pointage, p.heure_arrivee)
-                        datetime_depart = datetime.combine(p.date_pointage, p.heure_depart)
-                        if datetime_depart < datetime_arrivee: # Handles overnight case if checkout is next day, though not typical for pointage
-                             datetime_depart += timedelta(days=1)
-                        duration = datetime_depart - datetime_arrivee
-                        duration_hours = duration.total_seconds() / 3600
-                        duration_hours_str = f"{duration_hours:.2f}"
-                    except TypeError: # In case date_pointage, heure_arrivee or heure_depart is None
-                        duration_hours_str = "Erreur"
-
-                retard_str = str(p.minutes_retard) if p.minutes_retard is not None else "0"
-
-                table_data.append([
-                    Paragraph(user_name, styles['SmallText']),
-                    p.date_pointage.strftime('%d/%m/%y'), # Shorter date format
-                    heure_arrivee_str,
-                    heure_depart_str,
-                    duration_hours_str,
-                    Paragraph(p.type_pointage or "N/A", styles['SmallText']),
-                    retard_str,
-                    Paragraph(p.commentaire or "", styles['SmallText'])
-                ])
-
-            col_widths = [1.4*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 1.9*inch]
-
-            # Define any custom style commands for this specific table
-            custom_table_styles = [
-                ('ALIGN', (0, 1), (0, -1), 'LEFT'),      # Align Employee Name to left
-                ('ALIGN', (1, 1), (1, -1), 'CENTER'),    # Align Date to center
-                ('ALIGN', (2, 1), (2, -1), 'CENTER'),    # Align Arrivee to center
-                ('ALIGN', (3, 1), (3, -1), 'CENTER'),    # Align Depart to center
-                ('ALIGN', (4, 1), (4, -1), 'RIGHT'),     # Align Duree to right
-                ('ALIGN', (5, 1), (5, -1), 'CENTER'),    # Align Type to center
-                ('ALIGN', (6, 1), (6, -1), 'RIGHT'),     # Align Retard to right
-                ('ALIGN', (7, 1), (7, -1), 'LEFT'),      # Align Commentaire to left
-                ('FONTSIZE', (0,0), (-1,-1), 7),         # Smaller font for all cells
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F0F0F0')), # Light grey background for data rows
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]), # Alternating rows
-            ]
-
-            attendance_table = create_styled_table(table_data, col_widths=col_widths, style_commands=custom_table_styles)
-            story.append(attendance_table)
-
-        # Build the PDF using the utility function
-        final_pdf_buffer = build_pdf_document(
-            buffer,
-            story,
-            title=f"Rapport Présence - {company.name}",
-            author="PointFlex Application"
-        )
+        result = build_company_attendance_pdf(company_id, filters)
+        if result['error']:
+            return jsonify(message=result['message']), result['status_code']
 
-        return send_file(final_pdf_buffer, mimetype='application/pdf',
+        return send_file(result['buffer'], mimetype='application/pdf',
                          as_attachment=True,
-                         download_name=f'rapport_presence_{company.name.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.pdf')
+                         download_name=result['filename'])
 
     except Exception as e:
         current_app.logger.error(f"Erreur génération PDF pour l'entreprise {current_user.company_id if 'current_user' in locals() and current_user else 'N/A'}: {e}", exc_info=True)
@@ -1644,123 +1533,20 @@ def employee_attendance_report_pdf(employee_id):
                 if target_employee.manager_id != current_user.id:
                     return jsonify(message="Accès non autorisé. Le manager ne peut voir que les rapports de son équipe."), 403
 
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
-        pointage_type_filter = request.args.get('pointage_type') # 'office' or 'mission'
-        pointage_status_filter = request.args.get('pointage_status') # 'present', 'retard'
-        # For individual report, user_id is fixed by employee_id
-        sort_by = request.args.get('sort_by', 'date') # e.g., 'date', 'type', 'status'
-        sort_direction = request.args.get('sort_direction', 'asc') # 'asc' or 'desc'
+        filters = request.args.to_dict()
+        if wants_async_report():
+            result = submit_report_job('employee_attendance_pdf', dict(filters, employee_id=employee_id), current_user)
+            if result['error']:
+                return jsonify(message=result['message']), result['status_code']
+            return jsonify(job=result['job'].to_dict()), result['status_code']
 
-        query = Pointage.query.filter_by(user_id=employee_id)
-
-        report_filters_texts = []
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(Pointage.date_pointage >= start_date)
-            report_filters_texts.append(f"Début: {start_date.strftime('%d/%m/%Y')}")
-        if end_date_str:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(Pointage.date_pointage <= end_date)
-            report_filters_texts.append(f"Fin: {end_date.strftime('%d/%m/%Y')}")
-        if pointage_type_filter:
-            query = query.filter(Pointage.type == pointage_type_filter)
-            report_filters_texts.append(f"Type: {pointage_type_filter}")
-        if pointage_status_filter:
-            query = query.filter(Pointage.statut == pointage_status_filter)
-            report_filters_texts.append(f"Statut Pointage: {pointage_status_filter}")
-
-        date_filter_text = ", ".join(report_filters_texts) if report_filters_texts else "toutes périodes"
-
-        # Sorting logic
-        order_criteria = []
-        if sort_by == 'type':
-            order_criteria.append(Pointage.type)
-        elif sort_by == 'status':
-            order_criteria.append(Pointage.statut)
-
-        # Default sort includes date and time
-        order_criteria.extend([Pointage.date_pointage, Pointage.heure_arrivee])
-
-        if sort_direction == 'desc':
-            final_order_criteria = [criterion.desc() for criterion in order_criteria]
-        else: # asc
-            final_order_criteria = [criterion.asc() for criterion in order_criteria]
-            # Ensure secondary sort (time) matches primary (date) if date is the main sort
-            if Pointage.date_pointage in order_criteria:
-                date_sort_index = order_criteria.index(Pointage.date_pointage)
-                time_sort_index = order_criteria.index(Pointage.heure_arrivee) if Pointage.heure_arrivee in order_criteria else -1
-                if time_sort_index != -1:
-                    final_order_criteria[time_sort_index] = Pointage.heure_arrivee.asc() if final_order_criteria[date_sort_index].direction.name == 'asc' else Pointage.heure_arrivee.desc()
-
-
-        query = query.order_by(*final_order_criteria)
-        pointages = query.all()
-
-        buffer = BytesIO()
-        styles = get_report_styles()
-
-        story = generate_report_title_elements(
-            title_str=f"Rapport de Présence - {target_employee.prenom} {target_employee.nom}",
-            period_str=date_filter_text,
-            company_name=target_employee.company.name if target_employee.company else "N/A"
-        )
+        result = build_employee_attendance_pdf(employee_id, filters)
+        if result['error']:
+            return jsonify(message=result['message']), result['status_code']
 
-        if not pointages:
-            story.append(Paragraph("Aucun pointage trouvé pour cet employé pour la période sélectionnée.", styles['Normal']))
-        else:
-            table_data = [
-                [Paragraph(col, styles['SmallText']) for col in ["Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Lieu/Mission", "Statut"]]
-            ]
-
-            for p in pointages:
-                heure_arrivee_str = p.heure_arrivee.strftime('%H:%M') if p.heure_arrivee else "N/A"
-                heure_depart_str = p.heure_depart.strftime('%H:%M') if p.heure_depart else "N/A"
-                duration_hours_str = ""
-                if p.heure_arrivee and p.heure_depart:
-                    try:
-                        datetime_arrivee = datetime.combine(p.date_pointage, p.heure_arrivee)
-                        datetime_depart = datetime.combine(p.date_pointage, p.heure_depart)
-                        if datetime_depart < datetime_arrivee: datetime_depart += timedelta(days=1)
-                        duration = datetime_depart - datetime_arrivee
-                        duration_hours_str = f"{(duration.total_seconds() / 3600):.2f}"
-                    except TypeError: duration_hours_str = "Erreur"
-
-                retard_str = str(p.delay_minutes) if p.delay_minutes is not None else "0"
-                lieu_mission_str = p.office.name if p.type == 'office' and p.office else (p.mission_order_number or "N/A")
-
-                table_data.append([
-                    p.date_pointage.strftime('%d/%m/%y'),
-                    heure_arrivee_str,
-                    heure_depart_str,
-                    duration_hours_str,
-                    Paragraph(p.type or "N/A", styles['SmallText']),
-                    retard_str,
-                    Paragraph(lieu_mission_str, styles['SmallText']),
-                    Paragraph(p.statut or "", styles['SmallText'])
-                ])
-
-            col_widths = [0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 1.5*inch, 1.8*inch]
-            custom_table_styles = [
-                ('ALIGN', (1, 1), (1, -1), 'CENTER'), ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-                ('ALIGN', (3, 1), (3, -1), 'CENTER'), ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-                ('ALIGN', (5, 1), (5, -1), 'CENTER'), ('ALIGN', (6, 1), (6, -1), 'RIGHT'),
-                ('ALIGN', (7, 1), (7, -1), 'LEFT'), ('ALIGN', (8, 1), (8, -1), 'LEFT'),
-                ('FONTSIZE', (0,0), (-1,-1), 7),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
-            ]
-            attendance_table = create_styled_table(table_data, col_widths=col_widths, style_commands=custom_table_styles)
-            story.append(attendance_table)
-
-        final_pdf_buffer = build_pdf_document(
-            buffer, story,
-            title=f"Rapport Présence - {target_employee.prenom} {target_employee.nom}",
-            author="PointFlex Application"
-        )
-
-        return send_file(final_pdf_buffer, mimetype='application/pdf',
+        return send_file(result['buffer'], mimetype='application/pdf',
                          as_attachment=True,
-                         download_name=f'rapport_presence_{target_employee.nom.lower()}_{employee_id}_{datetime.now().strftime("%Y%m%d")}.pdf')
+                         download_name=result['filename'])
 
     except Exception as e:
         current_app.logger.error(f"Erreur génération PDF pour employé {employee_id}: {e}", exc_info=True)
@@ -1890,7 +1676,7 @@ def employee_attendance(employee_id):
             query = query.filter(Pointage.date_pointage <= end_obj)
 
         pointages = query.order_by(Pointage.date_pointage.desc()).all()
-        records = [p.to_dict() for p in pointages]
+        records = Pointage.serialize_many(pointages)
 
         return jsonify({'employee': employee.to_dict(), 'records': records}), 200
 
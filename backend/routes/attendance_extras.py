@@ -5,22 +5,37 @@ Routes additionnelles pour le système de pointage amélioré
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import get_current_user
+from backend.middleware.conditional import conditional_get, watermark
 from backend.models.pointage import Pointage
+from backend.models.attendance_daily_summary import AttendanceDailySummary
 from backend.models.pause import Pause
 from backend.models.mission import Mission
 from backend.models.user import User
 from backend.models.office import Office
+from backend.models.company import Company
 from backend.models.mission_user import MissionUser
 from backend.database import db
+from backend.utils.geo_utils import calculate_distance, find_nearest_office, get_office_index, valid_coordinates
 from datetime import datetime, date, timedelta
 import json
-import math
 
 attendance_extras_bp = Blueprint('attendance_extras', __name__)
 
 
+def _geofencing_versions(principal):
+    accepted_missions = db.select(MissionUser.mission_id).where(
+        MissionUser.user_id == principal.id, MissionUser.status == 'accepted'
+    )
+    return [
+        watermark(Office, Office.company_id == principal.company_id),
+        watermark(Company, Company.id == principal.company_id),
+        watermark(Mission, Mission.id.in_(accepted_missions)),
+    ]
+
+
 @attendance_extras_bp.route('/geofencing/context', methods=['GET'])
 @jwt_required()
+@conditional_get(_geofencing_versions)
 def geofencing_context():
     """Expose les zones de pointage pertinentes pour l'utilisateur courant."""
     try:
@@ -150,12 +165,15 @@ def weekly_stats():
         start_of_week = today - timedelta(days=today.weekday())  # Lundi de la semaine actuelle
         end_of_week = start_of_week + timedelta(days=6)  # Dimanche de la semaine actuelle
         
-        # Récupérer tous les pointages de la semaine
-        pointages = Pointage.query.filter(
-            Pointage.user_id == current_user.id,
-            Pointage.date_pointage >= start_of_week,
-            Pointage.date_pointage <= end_of_week
-        ).order_by(Pointage.date_pointage).all()
+        # Agrégats journaliers de la semaine (un par jour pointé)
+        summaries = {
+            summary.summary_date: summary
+            for summary in AttendanceDailySummary.query.filter(
+                AttendanceDailySummary.user_id == current_user.id,
+                AttendanceDailySummary.summary_date >= start_of_week,
+                AttendanceDailySummary.summary_date <= end_of_week
+            )
+        }
         
         # Initialiser les données pour chaque jour de la semaine
         days_data = []
@@ -174,18 +192,15 @@ def weekly_stats():
                 'departure_time': None
             }
             
-            # Chercher un pointage pour ce jour
-            day_pointage = next((p for p in pointages if p.date_pointage == day_date), None)
+            day_summary = summaries.get(day_date)
             
-            if day_pointage:
-                day_data['status'] = day_pointage.statut
-                
-                if day_pointage.heure_arrivee:
-                    day_data['arrival_time'] = day_pointage.heure_arrivee.strftime('%H:%M')
+            if day_summary:
+                day_data['status'] = day_summary.status
+                day_data['arrival_time'] = AttendanceDailySummary.format_minutes(day_summary.first_arrival_minutes)
                     
-                if day_pointage.heure_depart:
-                    day_data['departure_time'] = day_pointage.heure_depart.strftime('%H:%M')
-                    day_data['worked_hours'] = day_pointage.calculate_worked_hours()
+                if day_summary.last_departure_minutes is not None:
+                    day_data['departure_time'] = AttendanceDailySummary.format_minutes(day_summary.last_departure_minutes)
+                    day_data['worked_hours'] = day_summary.worked_hours
             
             days_data.append(day_data)
         
@@ -482,6 +497,11 @@ def offline_checkin():
             return jsonify(message="Coordonnées GPS requises"), 400
         if coordinates.get('accuracy') is None:
             return jsonify(message="Précision GPS requise"), 400
+        if not valid_coordinates(coordinates['latitude'], coordinates['longitude']):
+            return jsonify(message="Coordonnées GPS invalides"), 400
+        accuracy = coordinates['accuracy']
+        if not isinstance(accuracy, (int, float)) or isinstance(accuracy, bool) or accuracy < 0:
+            return jsonify(message="Précision GPS invalide"), 400
 
         max_accuracy = current_app.config.get('GEOLOCATION_MAX_ACCURACY', 100)
         if coordinates['accuracy'] > max_accuracy:
@@ -516,26 +536,15 @@ def offline_checkin():
             return jsonify(message="Un pointage existe déjà pour cette date"), 409
 
         if current_user.company_id:
-            offices = Office.query.filter_by(
-                company_id=current_user.company_id,
-                is_active=True
-            ).all()
-
-            nearest_office = None
-            min_distance = float('inf')
-
-            for office in offices:
-                distance = calculate_distance(
-                    coordinates['latitude'], coordinates['longitude'],
-                    office.latitude, office.longitude
-                )
-
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_office = office
+            nearest_office, min_distance = find_nearest_office(
+                current_user.company_id, coordinates['latitude'], coordinates['longitude']
+            )
+            # L'entreprise a des bureaux actifs : seul un bureau trouvé peut valider le pointage
+            if nearest_office is None and len(get_office_index(current_user.company_id)) > 0:
+                return jsonify(message="Aucun bureau trouvé pour ces coordonnées"), 403
 
-            if offices:
-                if nearest_office and min_distance <= nearest_office.radius:
+            if nearest_office:
+                if min_distance <= nearest_office.radius:
                     pointage = Pointage(
                         user_id=current_user.id,
                         type='office',
@@ -627,6 +636,34 @@ def offline_checkin():
         print(f"Erreur offline_checkin: {e}")
         return jsonify(message="Une erreur est survenue"), 500
 
+@attendance_extras_bp.route('/sync/offline', methods=['POST'])
+@jwt_required()
+def sync_offline_events():
+    """Synchronise en un appel la file d'événements hors ligne (arrivée, départ, pauses)"""
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify(message="Utilisateur non trouvé"), 401
+
+        data = request.get_json() or {}
+        from backend.services.offline_sync_service import sync_offline_events as sync_events
+        result = sync_events(current_user, data.get('events'))
+
+        if result.get('error'):
+            return jsonify(message=result['message']), result.get('status_code', 500)
+
+        return jsonify(
+            message=f"{result['applied']} événement(s) synchronisé(s)",
+            results=result['results'],
+            applied=result['applied'],
+            rejected=result['rejected']
+        ), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Erreur sync_offline_events: {e}")
+        return jsonify(message="Une erreur est survenue"), 500
+
 @attendance_extras_bp.route('/justify/<int:pointage_id>', methods=['POST'])
 @jwt_required()
 def justify_delay(pointage_id):
@@ -673,45 +710,3 @@ def justify_delay(pointage_id):
         db.session.rollback()
         print(f"Erreur justify_delay: {e}")
         return jsonify(message="Une erreur est survenue"), 500
-
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calcule la distance entre deux points GPS en mètres"""
-    try:
-        if not all(isinstance(coord, (int, float)) for coord in [lat1, lon1, lat2, lon2]):
-            current_app.logger.error(
-                f"Invalid coordinate types: {type(lat1)}, {type(lon1)}, {type(lat2)}, {type(lon2)}"
-            )
-            return float('inf')
-
-        if not (
-            -90 <= lat1 <= 90 and -90 <= lat2 <= 90 and -180 <= lon1 <= 180 and -180 <= lon2 <= 180
-        ):
-            current_app.logger.error(
-                f"Coordinates out of range: {lat1}, {lon1}, {lat2}, {lon2}"
-            )
-            return float('inf')
-
-        R = 6371000
-
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = (
-            math.sin(dlat / 2) * math.sin(dlat / 2)
-            + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) * math.sin(dlon / 2)
-        )
-
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        distance = R * c
-
-        return distance
-    except Exception as e:
-        current_app.logger.error(f"Error calculating distance: {e}")
-        return float('inf')
@@ -6,8 +6,7 @@ from flask import Blueprint, request, jsonify, Response, current_app
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import get_current_user
 from backend.middleware.audit import log_user_action
-from backend.utils.notification_utils import send_notification
-from backend.utils.attendance_logger import log_attendance_event, log_attendance_error
+from backend.utils.attendance_logger import log_attendance_error
 from backend.models.pointage import Pointage
 from backend.models.pause import Pause
 from backend.models.user import User
@@ -17,9 +16,11 @@ from backend.database import db
 from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
 from backend.models.system_settings import SystemSettings
-import math
+from backend.utils.geo_utils import calculate_distance
+from backend.utils.pagination import wants_exact_count
 from sqlalchemy.exc import SQLAlchemyError
 from backend.services.geolocation_accuracy_service import GeolocationAccuracyService
+from backend.services.outbox_service import add_outbox_event, relay_outbox_if_sync
 
 attendance_bp = Blueprint('attendance', __name__)
 
@@ -43,12 +44,8 @@ def office_checkin():
         if result.get('error', False):
             return jsonify(message=result.get('message', "Une erreur s'est produite")), result.get('status_code', 500)
             
-        # Envoyer les notifications client si le pointage est réussi
+        # Les notifications sont relayées par l'outbox (voir create_pointage)
         pointage = result.get('pointage')
-        if pointage:
-            send_notification(current_user.id, "Pointage bureau enregistré")
-            if pointage.get('statut') == 'retard':
-                send_notification(current_user.id, "Vous êtes en retard")
         
         # Renvoyer le résultat
         return jsonify({
@@ -156,7 +153,13 @@ def mission_checkin():
         ).first()
 
         if existing_pointage:
-            send_notification(current_user.id, "Pointage déjà enregistré pour cette mission aujourd'hui")
+            add_outbox_event(
+                'pointage.duplicate',
+                user_id=current_user.id,
+                notifications=["Pointage déjà enregistré pour cette mission aujourd'hui"],
+            )
+            db.session.commit()
+            relay_outbox_if_sync()
             return jsonify(message="Vous avez déjà pointé pour cette mission aujourd'hui"), 409
 
         # Calcul de distance par rapport au lieu de mission si disponible
@@ -222,39 +225,36 @@ def mission_checkin():
             }
         )
 
-        db.session.commit()
+        pointage_data = Pointage.serialize_many([pointage])[0]
 
-        log_attendance_event(
-            event_type='mission_checkin',
+        # Journal, webhook (même type d'événement, le payload indique 'mission')
+        # et notifications : relayés après le commit
+        notifications = ["Pointage mission enregistré"]
+        if pointage.statut == 'retard':
+            notifications.append("Vous êtes en retard")
+        add_outbox_event(
+            'pointage.created',
             user_id=current_user.id,
-            details={
+            company_id=current_user.company_id,
+            aggregate=pointage,
+            webhook_data=pointage_data,
+            log_event='mission_checkin',
+            log_details={
                 'pointage_id': pointage.id,
                 'mission_id': mission.id,
                 'accuracy': coordinates['accuracy'],
                 'max_accuracy': max_accuracy,
                 'distance': mission_distance,
-
             },
+            notifications=notifications,
         )
 
-        # Dispatch webhook for pointage creation (mission type)
-        try:
-            from backend.utils.webhook_utils import dispatch_webhook_event
-            dispatch_webhook_event(
-                event_type='pointage.created', # Same event type, payload indicates 'mission'
-                payload_data=pointage.to_dict(),
-                company_id=current_user.company_id
-            )
-        except Exception as webhook_error:
-            current_app.logger.error(f"Failed to dispatch pointage.created (mission) webhook for pointage {pointage.id}: {webhook_error}")
-
-        send_notification(current_user.id, "Pointage mission enregistré")
-        if pointage.statut == 'retard':
-            send_notification(current_user.id, "Vous êtes en retard")
+        db.session.commit()
+        relay_outbox_if_sync()
 
         return jsonify({
             'message': 'Pointage mission enregistré avec succès',
-            'pointage': pointage.to_dict()
+            'pointage': pointage_data
         }), 201
 
     except SQLAlchemyError as e:
@@ -306,7 +306,13 @@ def checkout():
             today = now_utc.date()
 
         if not pointage:
-            send_notification(current_user.id, "Aucun pointage d'arrivée trouvé pour aujourd'hui")
+            add_outbox_event(
+                'pointage.checkout_missing',
+                user_id=current_user.id,
+                notifications=["Aucun pointage d'arrivée trouvé pour aujourd'hui"],
+            )
+            db.session.commit()
+            relay_outbox_if_sync()
             return jsonify(message="Pas de pointage d'arrivée pour aujourd'hui"), 404
 
         if pointage.heure_depart:
@@ -321,23 +327,28 @@ def checkout():
             details={'checkout_time': pointage.heure_depart.strftime('%H:%M')}
         )
 
-        db.session.commit()
+        pointage_data = Pointage.serialize_many([pointage])[0]
 
-        try:
-            from backend.utils.webhook_utils import dispatch_webhook_event
-            dispatch_webhook_event(
-                event_type='pointage.updated', # Or 'pointage.checkout'
-                payload_data=pointage.to_dict(),
-                company_id=current_user.company_id
-            )
-        except Exception as webhook_error:
-            current_app.logger.error(f"Failed to dispatch pointage.updated (checkout) webhook for pointage {pointage.id}: {webhook_error}")
+        add_outbox_event(
+            'pointage.updated', # Or 'pointage.checkout'
+            user_id=current_user.id,
+            company_id=current_user.company_id,
+            aggregate=pointage,
+            webhook_data=pointage_data,
+            log_event='checkout',
+            log_details={
+                'pointage_id': pointage.id,
+                'checkout_time': pointage.heure_depart.strftime('%H:%M:%S'),
+            },
+            notifications=["Heure de départ enregistrée"],
+        )
 
-        send_notification(current_user.id, "Heure de départ enregistrée")
+        db.session.commit()
+        relay_outbox_if_sync()
 
         return jsonify({
             'message': 'Heure de départ enregistrée',
-            'pointage': pointage.to_dict()
+            'pointage': pointage_data
         }), 200
 
     except SQLAlchemyError as e:
@@ -429,7 +440,9 @@ def get_attendance():
             start_date=start_date,
             end_date=end_date,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            cursor=request.args.get('cursor'),
+            exact_count=wants_exact_count(request.args)
         )
         
         # Gérer les erreurs retournées par le service
@@ -572,47 +585,6 @@ def download_calendar():
         current_app.logger.exception("Erreur generation calendrier")
         return jsonify(message="Erreur interne du serveur"), 500
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calcule la distance entre deux points GPS en mètres"""
-    try:
-        # Validation des entrées
-        if not all(isinstance(coord, (int, float)) for coord in [lat1, lon1, lat2, lon2]):
-            current_app.logger.error(f"Invalid coordinate types: {type(lat1)}, {type(lon1)}, {type(lat2)}, {type(lon2)}")
-            return float('inf')  # Distance infinie en cas d'erreur
-        
-        # Validation des valeurs
-        if not (-90 <= lat1 <= 90 and -90 <= lat2 <= 90 and -180 <= lon1 <= 180 and -180 <= lon2 <= 180):
-            current_app.logger.error(f"Coordinates out of range: {lat1}, {lon1}, {lat2}, {lon2}")
-            return float('inf')  # Distance infinie en cas d'erreur
-        
-        # Rayon de la Terre en mètres
-        R = 6371000
-        
-        # Convertir en radians
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # Différences
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        # Formule de Haversine
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        # Distance en mètres
-        distance = R * c
-        
-        return distance
-    except Exception as e:
-        current_app.logger.error(f"Error calculating distance: {e}")
-        return float('inf')  # Distance infinie en cas d'erreur
-
 # Nouvelle route pour obtenir le pointage du jour de l'utilisateur connecté
 @attendance_bp.route('/today', methods=['GET'])
 @jwt_required()
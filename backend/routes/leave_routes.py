@@ -8,19 +8,29 @@ from datetime import datetime, date
 
 from backend.middleware.auth import get_current_user, require_admin, require_superadmin_or_admin # A new decorator might be needed
 from backend.middleware.audit import log_user_action
+from backend.middleware.conditional import conditional_get, watermark
 from backend.models.user import User
 from backend.models.company import Company
 from backend.models.leave_type import LeaveType
 from backend.models.leave_balance import LeaveBalance
 from backend.models.leave_request import LeaveRequest, calculate_workdays
 from backend.database import db
-from backend.utils.notification_utils import send_notification
+from backend.utils.notification_utils import send_notification, send_notifications_bulk
 
 leave_bp = Blueprint('leave_bp', __name__)
 
 # --- Leave Type Management ---
+def _leave_type_versions(principal):
+    if principal.company_id:
+        scope = or_(LeaveType.company_id == None, LeaveType.company_id == principal.company_id)
+        return [watermark(LeaveType, scope)]
+    # Superadmin : la réponse dépend du rôle et éventuellement de toutes les entreprises
+    return [principal.role, watermark(LeaveType)]
+
+
 @leave_bp.route('/types', methods=['GET'])
 @jwt_required()
+@conditional_get(_leave_type_versions)
 def list_leave_types():
     current_user = get_current_user()
     company_id = current_user.company_id
@@ -121,8 +131,16 @@ def submit_leave_request():
         return jsonify(message="This leave type is not available for your company."), 403
 
     # Calculate requested workdays
-    country_code = current_user.company.country if current_user.company and current_user.company.country else 'FR'
-    requested_days = calculate_workdays(start_date, end_date, country_code)
+    try:
+        requested_days = calculate_workdays(
+            start_date,
+            end_date,
+            current_user.company_id,
+            data.get('start_day_period', 'full_day'),
+            data.get('end_day_period', 'full_day')
+        )
+    except ValueError as ve:
+        return jsonify(message=str(ve)), 400
     if requested_days <= 0:
         return jsonify(message="Requested leave period contains no workdays or is invalid."), 400
 
@@ -175,16 +193,15 @@ def submit_leave_request():
     )
     recipients.extend([admin.id for admin in admins if admin.id not in recipients])
 
-    for uid in recipients:
-        try:
-            send_notification(
-                uid,
-                f"New leave request from {current_user.prenom} {current_user.nom}",
-            )
-        except Exception as notify_error:
-            current_app.logger.error(
-                f"Failed to notify user {uid} for leave request {leave_request.id}: {notify_error}"
-            )
+    try:
+        send_notifications_bulk(
+            recipients,
+            f"New leave request from {current_user.prenom} {current_user.nom}",
+        )
+    except Exception as notify_error:
+        current_app.logger.error(
+            f"Failed to notify users {recipients} for leave request {leave_request.id}: {notify_error}"
+        )
 
     log_user_action(
         action='SUBMIT_LEAVE_REQUEST',
@@ -5,7 +5,8 @@ from flask_jwt_extended import jwt_required
 from backend.middleware.auth import get_current_user
 from backend.models.notification import Notification
 from backend.database import db
-from sqlalchemy import desc
+from backend.services.notification_counter_service import get_unread_count, record_changes
+from backend.utils.pagination import InvalidCursorError, paginate_keyset, wants_exact_count
 from datetime import datetime
 
 notification_bp = Blueprint('notification', __name__)
@@ -36,25 +37,24 @@ def list_notifications():
         is_read = read_status.lower() == 'true'
         query = query.filter_by(is_read=is_read)
         
-    # Trier par date de création, les plus récentes en premier
-    query = query.order_by(desc(Notification.created_at))
-    
-    # Pagination
-    paginated_notifications = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Les plus récentes en premier, pagination par curseur
+    cursor = request.args.get('cursor')
+    try:
+        paginated_notifications = paginate_keyset(
+            query,
+            (Notification.created_at, Notification.id),
+            cursor=cursor, page=page, per_page=per_page,
+            exact_count=wants_exact_count(request.args),
+        )
+    except InvalidCursorError as e:
+        return jsonify(message=str(e)), 400
     
     notifications = [notification.to_dict() for notification in paginated_notifications.items]
     
     return jsonify({
         'success': True,
         'notifications': notifications,
-        'pagination': {
-            'total': paginated_notifications.total,
-            'pages': paginated_notifications.pages,
-            'page': page,
-            'per_page': per_page,
-            'has_next': paginated_notifications.has_next,
-            'has_prev': paginated_notifications.has_prev
-        }
+        'pagination': paginated_notifications.pagination(cursor)
     }), 200
     
 @notification_bp.route('/<int:notification_id>/read', methods=['POST'])
@@ -81,8 +81,14 @@ def mark_notification_read(notification_id):
                 'message': 'Accès non autorisé à cette notification'
             }), 403
             
-        notification.is_read = True
-        notification.read_at = datetime.utcnow()
+        # Mise à jour conditionnelle : deux lectures simultanées ne
+        # décrémentent le compteur qu'une fois
+        updated = Notification.query.filter_by(id=notification.id, is_read=False).update({
+            'is_read': True,
+            'read_at': datetime.utcnow()
+        })
+        if updated:
+            record_changes(db.session, {current_user.id: (-1, 0, 0)})
         db.session.commit()
         
         return jsonify({
@@ -115,6 +121,7 @@ def mark_all_notifications_read():
             'is_read': True,
             'read_at': now
         }, synchronize_session=False)
+        record_changes(db.session, {current_user.id: (-result, 0, 0)})
         
         db.session.commit()
         
@@ -140,7 +147,7 @@ def get_notification_count():
         return jsonify(message="Utilisateur non trouvé"), 404
     
     try:
-        count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
+        count = get_unread_count(current_user.id)
         
         return jsonify({
             'success': True,
@@ -11,7 +11,9 @@ from backend.models.pointage import Pointage
 from backend.models.leave_request import LeaveRequest
 from backend.utils.pdf_utils import (
     build_pdf_document,
+    build_tabular_pdf,
     create_styled_table,
+    new_pdf_spool,
     get_report_styles,
     generate_report_title_elements,
 )
@@ -155,7 +157,7 @@ def export_profile_data():
 
         export_data = {
             'user': current_user.to_dict(include_sensitive=True),
-            'pointages': [p.to_dict() for p in pointages]
+            'pointages': Pointage.serialize_many(pointages)
         }
 
         return jsonify(export_data), 200
@@ -223,59 +225,50 @@ def my_attendance_report_pdf(): # Renamed to avoid conflict if my_leave_history_
         query = query.order_by(*final_order_criteria)
         pointages = query.all()
 
-        buffer = BytesIO()
-        styles = get_report_styles() # from pdf_utils
         story = generate_report_title_elements( # from pdf_utils
             title_str=f"Mon Historique de Présence - {current_user.prenom} {current_user.nom}",
             period_str=period_str
         )
 
-        if not pointages:
-            story.append(Paragraph("Aucun pointage trouvé pour les filtres sélectionnés.", styles['Normal']))
-        else:
-            table_data = [
-                [Paragraph(col, styles['SmallText']) for col in
-                    ["Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Lieu/Mission", "Statut"]]
-            ]
-            for p in pointages:
-                p_dict = p.to_dict() # Use existing to_dict for consistency
-                heure_arrivee_str = p_dict.get('heure_arrivee', "N/A")
-                heure_depart_str = p_dict.get('heure_depart', "N/A")
+        def rows():
+            for p, p_dict in zip(pointages, Pointage.serialize_many(pointages)):
                 duration_hours_str = p_dict.get('worked_hours', "")
                 if isinstance(duration_hours_str, (float, int)): duration_hours_str = f"{duration_hours_str:.2f}"
-
-                retard_str = str(p_dict.get('delay_minutes', 0))
-                lieu_mission_str = p.office.name if p.type == 'office' and p.office else (p.mission_order_number or "N/A")
-
-                table_data.append([
+                office_dict = p_dict.get('office')
+                lieu_mission_str = office_dict['name'] if p.type == 'office' and office_dict else (p.mission_order_number or "N/A")
+                yield [
                     datetime.strptime(p_dict['date_pointage'], '%Y-%m-%d').strftime('%d/%m/%y'),
-                    heure_arrivee_str,
-                    heure_depart_str,
+                    p_dict.get('heure_arrivee', "N/A"),
+                    p_dict.get('heure_depart', "N/A"),
                     duration_hours_str,
-                    Paragraph(p_dict.get('type', "N/A"), styles['SmallText']),
-                    retard_str,
-                    Paragraph(lieu_mission_str, styles['SmallText']),
-                    Paragraph(p_dict.get('statut', ""), styles['SmallText'])
-                ])
-
-            col_widths = [0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.7*inch, 1.5*inch, 1.5*inch]
-            custom_table_styles = [
-                ('FONTSIZE', (0,0), (-1,-1), 7), ('VALIGN', (0,0), (-1,-1), 'TOP'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]), # from reportlab.lib import colors
-                 ('ALIGN', (1,1), (1, -1), 'CENTER'), ('ALIGN', (2, 1), (2, -1), 'CENTER'), # Arrivee, Depart
-                ('ALIGN', (3, 1), (3, -1), 'RIGHT'),  # Duree
-                ('ALIGN', (4, 1), (4, -1), 'CENTER'), # Type
-                ('ALIGN', (5, 1), (5, -1), 'RIGHT'),  # Retard
-                ('ALIGN', (0,1), (0, -1), 'LEFT'),   # Date
-                ('ALIGN', (6,1), (-1, -1), 'LEFT'),  # Lieu/Mission, Statut
-            ]
-            attendance_table = create_styled_table(table_data, col_widths=col_widths, style_commands=custom_table_styles) # from pdf_utils
-            story.append(attendance_table)
-
-        final_pdf_buffer = build_pdf_document( # from pdf_utils
-            buffer, story,
+                    p_dict.get('type', "N/A"),
+                    str(p_dict.get('delay_minutes', 0)),
+                    lieu_mission_str,
+                    p_dict.get('statut', ""),
+                ]
+
+        col_widths = [0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.7*inch, 1.5*inch, 1.5*inch]
+        custom_table_styles = [
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]), # from reportlab.lib import colors
+             ('ALIGN', (1,1), (1, -1), 'CENTER'), ('ALIGN', (2, 1), (2, -1), 'CENTER'), # Arrivee, Depart
+            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),  # Duree
+            ('ALIGN', (4, 1), (4, -1), 'CENTER'), # Type
+            ('ALIGN', (5, 1), (5, -1), 'RIGHT'),  # Retard
+            ('ALIGN', (0,1), (0, -1), 'LEFT'),   # Date
+            ('ALIGN', (6,1), (-1, -1), 'LEFT'),  # Lieu/Mission, Statut
+        ]
+        # Rendu tabulaire rapide (tables par page, fichier temporaire) : from pdf_utils
+        final_pdf_buffer = build_tabular_pdf(
+            new_pdf_spool(),
+            ["Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Lieu/Mission", "Statut"],
+            rows(),
+            col_widths,
             title=f"Historique Présence - {current_user.prenom} {current_user.nom}",
-            author="PointFlex Application"
+            author="PointFlex Application",
+            intro=story,
+            style_commands=custom_table_styles,
+            empty_message="Aucun pointage trouvé pour les filtres sélectionnés.",
         )
         return send_file(final_pdf_buffer, mimetype='application/pdf',
                          as_attachment=True,
@@ -18,15 +18,14 @@ from backend.models.user import User
 from backend.models.office import Office
 from backend.database import db
 from backend.models.company import Company
+from backend.utils.geo_utils import calculate_distance
 from backend.middleware.auth import require_admin
+from backend.services.qr_token_store import get_qr_token_store
 from sqlalchemy import func
 
 # Définir le blueprint avec un nom unique
 qr_code_bp = Blueprint('qr_code', __name__)
 
-# Stockage temporaire des tokens QR (en production, utiliser Redis ou une base de données)
-qr_tokens = {}  # { token: { company_id, office_id, expiry, created_by } }
-
 @qr_code_bp.route('/generate-qr-token', methods=['POST'])
 @jwt_required()
 @require_admin
@@ -64,16 +63,13 @@ def generate_qr_token():
     token = secrets.token_urlsafe(32)
     expiry = datetime.utcnow() + timedelta(minutes=expiry_minutes)
     
-    # Stocker le token avec les informations associées
-    qr_tokens[token] = {
+    # Stocker le token avec les informations associées (expiration gérée par le stockage)
+    get_qr_token_store().put(token, {
         "company_id": str(user.company_id),
         "office_id": office_id,
-        "expiry": expiry,
+        "expiry": expiry.isoformat(),
         "created_by": user_id
-    }
-    
-    # Nettoyer les tokens expirés (pour éviter une accumulation de tokens inutiles)
-    clean_expired_tokens()
+    }, expiry_minutes * 60)
     
     return jsonify({
         "success": True,
@@ -111,15 +107,12 @@ def qr_checkin():
     token = data['token']
     location_data = data.get('location')
     
-    # Vérifier que le token existe et n'est pas expiré
-    if token not in qr_tokens:
-        return jsonify({"success": False, "message": "Token QR invalide"}), 400
-    
-    token_data = qr_tokens[token]
-    if datetime.utcnow() > token_data['expiry']:
-        # Supprimer le token expiré
-        del qr_tokens[token]
-        return jsonify({"success": False, "message": "Token QR expiré"}), 400
+    # Vérifier que le token existe et n'est pas expiré (sans le consommer :
+    # un échec de validation ne doit pas invalider le QR affiché au bureau)
+    token_store = get_qr_token_store()
+    token_data = token_store.get(token)
+    if token_data is None:
+        return jsonify({"success": False, "message": "Token QR invalide ou expiré"}), 400
     
     # Récupérer l'utilisateur et vérifier qu'il appartient à la bonne entreprise
     user = User.query.get(user_id)
@@ -218,6 +211,12 @@ def qr_checkin():
     if new_pointage is None:
         return jsonify({"success": False, "message": "Type de pointage non pris en charge"}), 400
     
+    # Pour la sécurité, consommer le token (usage unique) ; la consommation est
+    # atomique, une seule requête concurrente peut l'utiliser
+    if token_store.consume(token) is None:
+        db.session.rollback()
+        return jsonify({"success": False, "message": "Token QR déjà utilisé ou expiré"}), 409
+
     # Enregistrer le pointage en base de données
     if pointage_type == PointageType.OUT and existing_pointage:
         # On a déjà mis à jour l'objet existant, pas besoin de l'ajouter
@@ -227,12 +226,8 @@ def qr_checkin():
     
     db.session.commit()
     
-    # Pour la sécurité, supprimer le token après utilisation (usage unique)
-    if token in qr_tokens:
-        del qr_tokens[token]
-    
     # Renvoyer les informations sur le pointage
-    check_in_time = now.isoformat()
+    check_in_time = now_utc.isoformat()
     type_name = pointage_type.name if hasattr(pointage_type, 'name') else str(pointage_type)
     
     return jsonify({
@@ -241,7 +236,7 @@ def qr_checkin():
         "data": {
             "attendanceId": str(new_pointage.id),
             "userId": str(user.id),
-            "userName": f"{user.first_name} {user.last_name}",
+            "userName": f"{user.prenom} {user.nom}",
             "checkInTime": check_in_time,
             "checkInType": type_name,
             "office": {
@@ -312,31 +307,8 @@ def check_if_validation_needed(user_id, office_id, location_data):
     # Pas besoin de validation
     return False
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calcule la distance approximative entre deux points géographiques en mètres.
-    Utilise la formule de Haversine pour une approximation rapide.
-    """
-    from math import radians, cos, sin, asin, sqrt
-    
-    # Convertir en radians
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    
-    # Formule de Haversine
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 6371000  # Rayon de la Terre en mètres
-    
-    return c * r
-
 def clean_expired_tokens():
     """
     Nettoie les tokens QR expirés du stockage.
     """
-    now = datetime.utcnow()
-    expired_tokens = [token for token, data in qr_tokens.items() if data['expiry'] < now]
-    for token in expired_tokens:
-        if token in qr_tokens:
-            del qr_tokens[token]
+    return get_qr_token_store().purge_expired()
@@ -0,0 +1,78 @@
+"""
+Routes des jobs de rapports asynchrones : soumission, suivi et téléchargement
+"""
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from backend.middleware.auth import get_current_user, require_admin
+from backend.models.report_job import ReportJob
+from backend.services.export_service import file_chunks
+from backend.services.report_job_service import (
+    can_access_report_job,
+    open_report_artifact,
+    submit_report_job,
+)
+
+report_jobs_bp = Blueprint('report_jobs', __name__)
+
+
+def _get_accessible_job(job_id):
+    """Retourne (job, None) ou (None, réponse d'erreur)"""
+    job = ReportJob.query.get(job_id)
+    if job is None or not can_access_report_job(job, get_current_user()):
+        return None, (jsonify(message="Rapport non trouvé"), 404)
+    return job, None
+
+
+@report_jobs_bp.route('/jobs', methods=['POST'])
+@require_admin
+def create_report_job():
+    """Soumet un job de rapport : ``{"kind": ..., "params": {...}}``"""
+    data = request.get_json(silent=True) or {}
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify(message="Paramètres de rapport invalides"), 400
+
+    result = submit_report_job(data.get('kind'), params, get_current_user())
+    if result['error']:
+        return jsonify(message=result['message']), result['status_code']
+    return jsonify(job=result['job'].to_dict(), deduplicated=result['deduplicated']), result['status_code']
+
+
+@report_jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_admin
+def get_report_job(job_id):
+    """Statut d'un job de rapport"""
+    job, error_response = _get_accessible_job(job_id)
+    if error_response:
+        return error_response
+    return jsonify(job=job.to_dict()), 200
+
+
+@report_jobs_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@require_admin
+def download_report_job(job_id):
+    """Télécharge le fichier produit par un job terminé"""
+    job, error_response = _get_accessible_job(job_id)
+    if error_response:
+        return error_response
+
+    if job.is_pending:
+        return jsonify(message="Rapport en cours de génération", job=job.to_dict()), 409
+    if job.status == ReportJob.STATUS_FAILED:
+        return jsonify(message=job.error_message or "La génération du rapport a échoué"), 422
+    if job.is_expired:
+        return jsonify(message="Rapport expiré, veuillez le régénérer"), 410
+
+    try:
+        fileobj = open_report_artifact(job)
+    except Exception as e:
+        current_app.logger.error(f"Lecture du rapport {job.id} impossible: {e}", exc_info=True)
+        fileobj = None
+    if fileobj is None:
+        return jsonify(message="Fichier du rapport introuvable"), 410
+
+    headers = {'Content-Disposition': f'attachment; filename="{job.filename}"'}
+    if job.size_bytes is not None:
+        headers['Content-Length'] = str(job.size_bytes)
+    return Response(stream_with_context(file_chunks(fileobj)), mimetype=job.mimetype, headers=headers)
@@ -5,7 +5,7 @@ Routes pour les statistiques d'assiduité
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import get_current_user
-from backend.models.pointage import Pointage
+from backend.models.attendance_daily_summary import AttendanceDailySummary
 from backend.database import db
 from datetime import datetime, date, timedelta
 from sqlalchemy import func
@@ -28,11 +28,11 @@ def get_weekly_stats():
         # Calculer la fin de la semaine (dimanche)
         end_of_week = start_of_week + timedelta(days=6)
         
-        # Récupérer les pointages de la semaine
-        pointages = Pointage.query.filter(
-            Pointage.user_id == current_user.id,
-            Pointage.date_pointage >= start_of_week,
-            Pointage.date_pointage <= end_of_week
+        # Agrégats journaliers de la semaine (un par jour pointé)
+        summaries = AttendanceDailySummary.query.filter(
+            AttendanceDailySummary.user_id == current_user.id,
+            AttendanceDailySummary.summary_date >= start_of_week,
+            AttendanceDailySummary.summary_date <= end_of_week
         ).all()
         
         # Initialiser les jours avec des données par défaut
@@ -53,28 +53,25 @@ def get_weekly_stats():
         absent_days = 0
         total_worked_hours = 0
         
-        for pointage in pointages:
-            day_index = (pointage.date_pointage - start_of_week).days
+        for summary in summaries:
+            day_index = (summary.summary_date - start_of_week).days
             
             if day_index < 0 or day_index >= 7:
                 continue
                 
-            days[day_index]['status'] = pointage.statut
+            days[day_index]['status'] = summary.status
             
-            if pointage.statut in ['present', 'retard']:
-                arrival_time = pointage.heure_arrivee.strftime('%H:%M') if pointage.heure_arrivee else None
-                departure_time = pointage.heure_depart.strftime('%H:%M') if pointage.heure_depart else None
+            if summary.status in ['present', 'retard']:
+                days[day_index]['arrival_time'] = AttendanceDailySummary.format_minutes(summary.first_arrival_minutes)
+                days[day_index]['departure_time'] = AttendanceDailySummary.format_minutes(summary.last_departure_minutes)
 
-                days[day_index]['arrival_time'] = arrival_time
-                days[day_index]['departure_time'] = departure_time
-
-                worked_hours = pointage.calculate_worked_hours() or 0
+                worked_hours = summary.worked_hours
                 days[day_index]['worked_hours'] = worked_hours
                 total_worked_hours += worked_hours
                 
-                if pointage.statut == 'present':
+                if summary.status == 'present':
                     present_days += 1
-                elif pointage.statut == 'retard':
+                elif summary.status == 'retard':
                     late_days += 1
             else:
                 absent_days += 1
@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
 from backend.middleware.auth import require_superadmin, get_current_user
 from backend.middleware.audit import log_user_action
+from backend.middleware.conditional import conditional_get, watermark
 from backend.models.subscription_plan import SubscriptionPlan
 from backend.models.company import Company
 from backend.database import db
@@ -136,6 +137,7 @@ def debug_get_plans():
 
 @subscription_plan_bp.route('/plans', methods=['GET'])
 @jwt_required()
+@conditional_get(lambda principal: [principal.role == 'superadmin', watermark(SubscriptionPlan)])
 def get_all_plans():
     """Récupère tous les plans d'abonnement"""
     try:
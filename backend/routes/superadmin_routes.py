@@ -16,10 +16,12 @@ from backend.models.payment import Payment
 from backend.models.notification import Notification
 from backend.models.subscription_extension_request import SubscriptionExtensionRequest
 from backend.services.stripe_service import create_checkout_session, verify_webhook
+from backend.services.email import compose_invoice_reminder_email, enqueue_emails, send_email_outbox_if_sync
+from backend.services.audit_pipeline import get_audit_metrics
+from backend.utils.pagination import InvalidCursorError, paginate_keyset, wants_exact_count
 from backend.models.subscription_plan import SubscriptionPlan
 from backend.database import db
 from datetime import datetime, timedelta
-import json
 
 superadmin_bp = Blueprint('superadmin', __name__)
 
@@ -286,111 +288,26 @@ def create_company():
         db.session.rollback()
         return jsonify(message="Erreur interne du serveur"), 500
 
-from io import BytesIO
 from flask import send_file, current_app
-from backend.utils.pdf_utils import build_pdf_document, create_styled_table, get_report_styles, generate_report_title_elements
-from reportlab.platypus import Paragraph, Spacer
-from reportlab.lib.units import inch
-from reportlab.lib import colors # For custom table styles if needed
+from backend.services.report_job_service import submit_report_job, wants_async_report
+from backend.services.report_pdf_service import build_audit_log_pdf
 
 @superadmin_bp.route('/system/audit-log-report/pdf', methods=['GET'])
 @require_superadmin
 def audit_log_report_pdf():
-    """Génère un rapport PDF des logs d'audit."""
+    """Génère un rapport PDF des logs d'audit (``?async=1`` : via la file de rapports)."""
     try:
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
-        user_email_filter = request.args.get('user_email')
-        action_filter = request.args.get('action')
-        resource_type_filter = request.args.get('resource_type')
-
-        query = AuditLog.query
-
-        report_filters = []
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(AuditLog.created_at >= datetime.combine(start_date, datetime.min.time()))
-            report_filters.append(f"Début: {start_date.strftime('%d/%m/%Y')}")
-        if end_date_str:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(AuditLog.created_at <= datetime.combine(end_date, datetime.max.time()))
-            report_filters.append(f"Fin: {end_date.strftime('%d/%m/%Y')}")
-        if user_email_filter:
-            query = query.filter(AuditLog.user_email.ilike(f'%{user_email_filter}%'))
-            report_filters.append(f"Email: {user_email_filter}")
-        if action_filter:
-            query = query.filter(AuditLog.action.ilike(f'%{action_filter}%'))
-            report_filters.append(f"Action: {action_filter}")
-        if resource_type_filter:
-            query = query.filter(AuditLog.resource_type.ilike(f'%{resource_type_filter}%'))
-            report_filters.append(f"Ressource: {resource_type_filter}")
-
-        date_filter_text = ", ".join(report_filters) if report_filters else "toutes périodes"
-
-        logs = query.order_by(AuditLog.created_at.desc()).all() # Get all for PDF, no pagination
-
-        buffer = BytesIO()
-        styles = get_report_styles()
-
-        story = generate_report_title_elements(
-            title_str="Rapport des Logs d'Audit",
-            period_str=date_filter_text
-        )
-
-        if not logs:
-            story.append(Paragraph("Aucun log d'audit trouvé pour les filtres sélectionnés.", styles['Normal']))
-        else:
-            table_data = [
-                # Header Row
-                [Paragraph(col, styles['SmallText']) for col in ["Date/Heure", "Utilisateur", "Action", "Ressource", "ID Ress.", "Détails Changement", "IP"]]
-            ]
-
-            for log in logs:
-                # Summarize details, old_values, new_values to keep PDF readable
-                changes_summary = []
-                if log.parsed_details: changes_summary.append(f"Détails: {json.dumps(log.parsed_details, ensure_ascii=False, default=str)[:100]}") # Truncate
-                if log.parsed_old_values: changes_summary.append(f"Ancien: {json.dumps(log.parsed_old_values, ensure_ascii=False, default=str)[:100]}")
-                if log.parsed_new_values: changes_summary.append(f"Nouveau: {json.dumps(log.parsed_new_values, ensure_ascii=False, default=str)[:100]}")
-
-                change_str = "; ".join(changes_summary)
-                if not change_str: change_str = "N/A"
-
-                table_data.append([
-                    Paragraph(log.created_at.strftime('%d/%m/%y %H:%M:%S'), styles['SmallText']),
-                    Paragraph(log.user_email, styles['SmallText']),
-                    Paragraph(log.action, styles['SmallText']),
-                    Paragraph(log.resource_type, styles['SmallText']),
-                    Paragraph(str(log.resource_id) if log.resource_id is not None else "N/A", styles['SmallText']),
-                    Paragraph(change_str, styles['SmallText']), # Summary of changes
-                    Paragraph(log.ip_address or "N/A", styles['SmallText'])
-                ])
-
-            col_widths = [1.2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.6*inch, 2.2*inch, 0.7*inch]
-
-            custom_table_styles = [
-                ('FONTSIZE', (0,0), (-1,-1), 6), # Even smaller font for audit logs
-                ('VALIGN', (0,0), (-1,-1), 'TOP'), # Align content to top for long text cells
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
-                 ('ALIGN', (0, 1), (0, -1), 'LEFT'),  # Date
-                 ('ALIGN', (1, 1), (1, -1), 'LEFT'),  # User
-                 ('ALIGN', (2, 1), (2, -1), 'LEFT'),  # Action
-                 ('ALIGN', (3, 1), (3, -1), 'LEFT'),  # Resource Type
-                 ('ALIGN', (4, 1), (4, -1), 'CENTER'),# Resource ID
-                 ('ALIGN', (5, 1), (5, -1), 'LEFT'),  # Details
-                 ('ALIGN', (6, 1), (6, -1), 'LEFT'),  # IP
-            ]
-            audit_table = create_styled_table(table_data, col_widths=col_widths, style_commands=custom_table_styles)
-            story.append(audit_table)
-
-        final_pdf_buffer = build_pdf_document(
-            buffer, story,
-            title="Rapport Logs d'Audit",
-            author="PointFlex Application"
-        )
-
-        return send_file(final_pdf_buffer, mimetype='application/pdf',
+        filters = request.args.to_dict()
+        if wants_async_report():
+            result = submit_report_job('audit_log_pdf', filters, get_current_user())
+            if result['error']:
+                return jsonify(message=result['message']), result['status_code']
+            return jsonify(job=result['job'].to_dict()), result['status_code']
+
+        result = build_audit_log_pdf(filters)
+        return send_file(result['buffer'], mimetype='application/pdf',
                          as_attachment=True,
-                         download_name=f'rapport_audit_logs_{datetime.now().strftime("%Y%m%d")}.pdf')
+                         download_name=result['filename'])
 
     except Exception as e:
         current_app.logger.error(f"Erreur génération PDF des logs d'audit: {e}", exc_info=True)
@@ -1055,29 +972,28 @@ def send_invoice_reminder(invoice_id):
             return jsonify(message="Entreprise non trouvée"), 404
         
         # Trouver les administrateurs de l'entreprise
-        admins = User.query.filter_by(company_id=company.id, role='admin').all()
+        admins = User.query.filter(User.company_id == company.id,
+                                   User.role.in_(('admin', 'admin_rh'))).all()
         if not admins:
             return jsonify(message="Aucun administrateur trouvé pour cette entreprise"), 404
-            
-        # Envoyer un email à chaque administrateur (à implémenter avec un service d'email)
-        # Pour l'instant, nous simulons l'envoi d'email
-        
+
+        # Les emails sont mis en file dans la transaction : la réponse n'attend pas le serveur SMTP
+        due_date = invoice.due_date.strftime("%d/%m/%Y") if invoice.due_date else "-"
+        emails = []
         for admin in admins:
-            # Simuler l'envoi d'email
-            print(f"[Simulation] Envoi d'un rappel de facture à {admin.email} pour la facture #{invoice.id}")
-            
+            email = compose_invoice_reminder_email(
+                admin.email, f"{admin.prenom} {admin.nom}", company.name, invoice.id, invoice.amount, due_date
+            )
+            if email:
+                emails.append(email)
+
             # Enregistrer une notification
-            notification = Notification(
+            db.session.add(Notification(
                 user_id=admin.id,
-                title="Rappel de facture",
-                content=f"Rappel: La facture #{invoice.id} d'un montant de {invoice.amount}€ est en attente de paiement.",
-                category="billing",
-                is_read=False
-            )
-            db.session.add(notification)
-            
-            # Ici, vous pourriez appeler une fonction pour envoyer un véritable email
-            
+                message=f"Rappel: La facture #{invoice.id} d'un montant de {invoice.amount}€ est en attente de paiement."
+            ))
+        enqueue_emails(emails, category='invoice_reminder', company_id=company.id)
+
         # Log de l'action
         log_user_action(
             action='SEND_INVOICE_REMINDER',
@@ -1087,10 +1003,12 @@ def send_invoice_reminder(invoice_id):
         )
         
         db.session.commit()
-        
+        send_email_outbox_if_sync()
+
         return jsonify({
             'message': f"Rappel envoyé à {len(admins)} administrateur(s)",
-            'recipients': len(admins)
+            'recipients': len(admins),
+            'emails_queued': len(emails)
         }), 200
         
     except Exception as e:
@@ -1464,27 +1382,32 @@ def get_audit_logs():
         if user_id:
             query = query.filter_by(user_id=user_id)
         
-        # Ordonner par date décroissante
-        query = query.order_by(AuditLog.created_at.desc())
-        
-        logs = query.paginate(
-            page=page, per_page=per_page, error_out=False
+        # Du plus récent au plus ancien, pagination par curseur
+        cursor = request.args.get('cursor')
+        logs = paginate_keyset(
+            query,
+            (AuditLog.created_at, AuditLog.id),
+            cursor=cursor, page=page, per_page=per_page,
+            exact_count=wants_exact_count(request.args),
         )
         
         return jsonify({
             'logs': [log.to_dict() for log in logs.items],
-            'pagination': {
-                'page': page,
-                'pages': logs.pages,
-                'per_page': per_page,
-                'total': logs.total
-            }
+            'pagination': logs.pagination(cursor)
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify(message=str(e)), 400
     except Exception as e:
         print(f"Erreur lors de la récupération des logs: {e}")
         return jsonify(message="Erreur interne du serveur"), 500
 
+@superadmin_bp.route('/system/audit-logs/pipeline', methods=['GET'])
+@require_superadmin
+def get_audit_pipeline_metrics():
+    """Métriques de la file d'audit du processus (débordements, lots, profondeur)"""
+    return jsonify({'pipeline': get_audit_metrics()}), 200
+
 @superadmin_bp.route('/system/reset-settings', methods=['POST'])
 @require_superadmin
 def reset_system_settings():
@@ -12,6 +12,7 @@ from backend.models.company import Company
 from backend.models.webhook_subscription import WebhookSubscription
 from backend.models.webhook_delivery_log import WebhookDeliveryLog
 from backend.database import db
+from backend.utils.webhook_utils import invalidate_webhook_subscriptions
 
 webhook_bp = Blueprint('webhook_bp', __name__)
 
@@ -66,17 +67,23 @@ def create_webhook_subscription():
     except jsonschema.exceptions.ValidationError as e:
         return jsonify(message=f"Invalid subscribed_events: {e.message}"), 400
 
+    batch_deliveries = data.get('batch_deliveries', False)
+    if not isinstance(batch_deliveries, bool):
+        return jsonify(message="batch_deliveries must be a boolean."), 400
+
     if not current_user.company_id:
         return jsonify(message="User must be associated with a company to create webhooks."), 400
 
     subscription = WebhookSubscription(
         company_id=current_user.company_id,
-        target_url=target_url
+        target_url=target_url,
+        batch_deliveries=batch_deliveries
     )
     subscription.subscribed_events = subscribed_events # Use the setter for JSON conversion
 
     db.session.add(subscription)
     db.session.commit()
+    invalidate_webhook_subscriptions(subscription.company_id)
 
     try:
         from backend.middleware.audit import log_user_action
@@ -165,8 +172,14 @@ def update_webhook_subscription(sub_id):
             return jsonify(message="is_active must be a boolean."), 400
         subscription.is_active = data['is_active']
 
+    if 'batch_deliveries' in data:
+        if not isinstance(data['batch_deliveries'], bool):
+            return jsonify(message="batch_deliveries must be a boolean."), 400
+        subscription.batch_deliveries = data['batch_deliveries']
+
     try:
         db.session.commit()
+        invalidate_webhook_subscriptions(subscription.company_id)
         log_user_action(
             action='UPDATE_WEBHOOK_SUBSCRIPTION',
             resource_type='WebhookSubscription',
@@ -200,6 +213,7 @@ def delete_webhook_subscription(sub_id):
         # or they might be kept with a nullable subscription_id if preferred (current model cascades).
         db.session.delete(subscription)
         db.session.commit()
+        invalidate_webhook_subscriptions(current_user.company_id)
         log_user_action(
             action='DELETE_WEBHOOK_SUBSCRIPTION',
             resource_type='WebhookSubscription',
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Send queued emails over pooled SMTP connections with Flask app context."""
+import argparse
+import time
+
+from backend.app import create_app
+from backend.database import db
+from backend.services.email import close_smtp_pools, purge_email_outbox, relay_email_outbox
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--once', action='store_true', help="Envoie les emails en attente puis s'arrête")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        batch_size = app.config['EMAIL_OUTBOX_BATCH_SIZE']
+        poll_seconds = app.config['EMAIL_OUTBOX_POLL_SECONDS']
+        next_purge = 0.0
+        try:
+            while True:
+                try:
+                    sent = relay_email_outbox(batch_size)
+                    if time.monotonic() >= next_purge:
+                        purge_email_outbox()
+                        next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Email outbox iteration failed")
+                    sent = 0
+                    if args.once:
+                        raise
+
+                # Lot plein : on enchaîne sans attendre le prochain intervalle
+                if sent < batch_size:
+                    if args.once:
+                        break
+                    time.sleep(poll_seconds)
+        finally:
+            # Connexions SMTP persistantes fermées proprement (QUIT)
+            close_smtp_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""Relay outbox events (attendance log, webhooks, notifications) with Flask app context."""
+import argparse
+import time
+
+from backend.app import create_app
+from backend.database import db
+from backend.services.outbox_service import purge_outbox_events, relay_outbox_events
+from backend.utils.http_pool import close_http_sessions
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--once', action='store_true', help="Relaie les événements en attente puis s'arrête")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        batch_size = app.config['OUTBOX_RELAY_BATCH_SIZE']
+        poll_seconds = app.config['OUTBOX_RELAY_POLL_SECONDS']
+        next_purge = 0.0
+        try:
+            while True:
+                try:
+                    relayed = relay_outbox_events(batch_size)
+                    if time.monotonic() >= next_purge:
+                        purge_outbox_events()
+                        next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Outbox relay iteration failed")
+                    relayed = 0
+                    if args.once:
+                        raise
+
+                # Lot plein : on enchaîne sans attendre le prochain intervalle
+                if relayed < batch_size:
+                    if args.once:
+                        break
+                    time.sleep(poll_seconds)
+        finally:
+            close_http_sessions()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Temps de rendu d'un rapport PDF de présence selon le nombre de lignes.
+
+Compare le rendu historique (une seule ``Table`` dont chaque cellule est un
+``Paragraph``) au rendu tabulaire rapide de ``pdf_utils.build_tabular_pdf``
+sur des lignes synthétiques, sans base de données::
+
+    python -m backend.scripts.pdf_report_benchmark --rows 1000 10000 100000
+
+Le rendu historique n'est mesuré que jusqu'à ``--legacy-max-rows`` lignes :
+au-delà, il prend plusieurs minutes. ``--memory`` relance chaque rendu sous
+``tracemalloc`` pour en mesurer le pic mémoire.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph
+
+from backend.utils.pdf_utils import (
+    build_pdf_document,
+    build_tabular_pdf,
+    create_styled_table,
+    generate_report_title_elements,
+    get_report_styles,
+    new_pdf_spool,
+)
+
+HEADER = ["Employé", "Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Commentaire"]
+COL_WIDTHS = [1.4*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 1.9*inch]
+STYLE_COMMANDS = [
+    ('ALIGN', (1, 1), (3, -1), 'CENTER'),
+    ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+    ('ALIGN', (6, 1), (6, -1), 'RIGHT'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
+]
+COMMENTS = ["", "", "", "Retard transport", "Rendez-vous médical le matin, arrivée après la réunion d'équipe"]
+
+
+def synthetic_rows(count, seed=42):
+    """Lignes de pointage synthétiques (environ une sur cinq avec un commentaire long)"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    for index in range(count):
+        arrival = rng.randint(7 * 60, 10 * 60)
+        departure = arrival + rng.randint(6 * 60, 10 * 60)
+        yield [
+            f"Employé {index % 500:03d} Nom{index % 37}",
+            (start + timedelta(days=index % 365)).strftime('%d/%m/%y'),
+            f"{arrival // 60:02d}:{arrival % 60:02d}",
+            f"{departure // 60:02d}:{departure % 60:02d}",
+            f"{(departure - arrival) / 60:.2f}",
+            rng.choice(("office", "mission")),
+            str(max(0, arrival - 9 * 60)),
+            rng.choice(COMMENTS),
+        ]
+
+
+def render_legacy(rows):
+    styles = get_report_styles()
+    story = generate_report_title_elements("Rapport de Présence", "benchmark", "Bench")
+    table_data = [[Paragraph(col, styles['SmallText']) for col in HEADER]]
+    for row in rows:
+        table_data.append([
+            Paragraph(row[0], styles['SmallText']), *row[1:5],
+            Paragraph(row[5], styles['SmallText']), row[6], Paragraph(row[7], styles['SmallText']),
+        ])
+    story.append(create_styled_table(table_data, col_widths=COL_WIDTHS,
+                                     style_commands=STYLE_COMMANDS + [('FONTSIZE', (0, 0), (-1, -1), 7)]))
+    buffer = build_pdf_document(BytesIO(), story, title="Rapport Présence - Bench")
+    return len(buffer.getvalue())
+
+
+def render_fast(rows):
+    story = generate_report_title_elements("Rapport de Présence", "benchmark", "Bench")
+    with new_pdf_spool() as output:
+        build_tabular_pdf(output, HEADER, rows, COL_WIDTHS, title="Rapport Présence - Bench",
+                          intro=story, style_commands=STYLE_COMMANDS)
+        output.seek(0, 2)
+        return output.tell()
+
+
+def measure(render, count, trace_memory=False):
+    """Retourne (secondes, pic mémoire Python en Mo ou None, taille du PDF en Ko)"""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    size = render(synthetic_rows(count))
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return elapsed, peak, size / 1024
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='*', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--legacy-max-rows', type=int, default=10_000,
+                        help="Taille maximale mesurée avec le rendu historique")
+    parser.add_argument('--memory', action='store_true',
+                        help="Mesure aussi le pic mémoire (tracemalloc, ralentit fortement le rendu)")
+    args = parser.parse_args()
+
+    print(f"{'lignes':>8} {'rendu':>10} {'temps (s)':>10} {'pic (Mo)':>10} {'PDF (Ko)':>10}")
+    for count in args.rows:
+        renderers = [('rapide', render_fast)]
+        if count <= args.legacy_max_rows:
+            renderers.insert(0, ('historique', render_legacy))
+        for label, render in renderers:
+            elapsed, _, size = measure(render, count)
+            peak = f"{measure(render, count, trace_memory=True)[1]:.1f}" if args.memory else "-"
+            print(f"{count:>8} {label:>10} {elapsed:>10.2f} {peak:>10} {size:>10.0f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Mesure du coût de validation des tokens QR selon le nombre de tokens actifs.
+
+    python -m backend.scripts.qr_token_benchmark --store memory --live 100000
+    python -m backend.scripts.qr_token_benchmark --store redis
+    python -m backend.scripts.qr_token_benchmark --store sql
+
+Pour chaque palier (1k, 10k, 100k tokens actifs par défaut), le script affiche
+le temps moyen d'un ``get`` puis d'un ``consume`` : il doit rester constant.
+"""
+
+import argparse
+import secrets
+import time
+
+from backend.services.qr_token_store import create_qr_token_store
+
+PAYLOAD = {'company_id': '1', 'office_id': 1, 'created_by': 1}
+
+
+def fill(store, count, ttl_seconds=3600):
+    """Enregistre ``count`` tokens et retourne leur liste"""
+    tokens = [secrets.token_urlsafe(32) for _ in range(count)]
+    for token in tokens:
+        store.put(token, PAYLOAD, ttl_seconds)
+    return tokens
+
+
+def measure(store, tokens, samples):
+    """Retourne le temps moyen (µs) de ``get`` puis de ``consume`` sur ``samples`` tokens"""
+    sample = tokens[:samples]
+
+    started = time.perf_counter()
+    for token in sample:
+        store.get(token)
+    get_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    started = time.perf_counter()
+    for token in sample:
+        store.consume(token)
+    consume_us = (time.perf_counter() - started) / len(sample) * 1e6
+    return get_us, consume_us
+
+
+def run(store_name, tiers, samples):
+    """Exécute la mesure pour chaque palier ; retourne ``[(live, get_us, consume_us)]``"""
+    results = []
+    for live in tiers:
+        store = create_qr_token_store(store_name)
+        tokens = fill(store, live)
+        results.append((live, *measure(store, tokens, min(samples, live))))
+    return results
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--store', choices=['memory', 'redis', 'sql'], default='memory')
+    parser.add_argument('--live', type=int, default=100_000, help="Nombre maximal de tokens actifs")
+    parser.add_argument('--samples', type=int, default=1000)
+    args = parser.parse_args()
+
+    tiers = sorted({min(1000, args.live), min(10_000, args.live), args.live})
+
+    def report():
+        for live, get_us, consume_us in run(args.store, tiers, args.samples):
+            print(f"{live:>8} tokens actifs : get {get_us:.2f} µs, consume {consume_us:.2f} µs")
+
+    if args.store == 'memory':
+        report()
+        return
+
+    from backend.app import create_app
+    app = create_app()
+    with app.app_context():
+        report()
+
+
+if __name__ == '__main__':
+    main()
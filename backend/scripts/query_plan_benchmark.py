@@ -0,0 +1,244 @@
+"""
+Vérification des plans d'exécution des requêtes critiques sur les pointages.
+
+Le module sert à deux choses :
+
+* les tests (``backend/tests/test_query_plans.py``) l'utilisent pour vérifier
+  qu'aucune requête critique ne retombe sur un parcours séquentiel ;
+* en ligne de commande il remplit un tenant synthétique (10M de lignes par
+  défaut) puis affiche les plans et les temps d'exécution::
+
+      python -m backend.scripts.query_plan_benchmark --rows 10000000
+
+Les requêtes reprennent celles des routes : doublon du jour dans
+``create_pointage``, ``/attendance/today``, checkout, listing entreprise
+(``get_company_attendance``, rapports PDF), ``get_last_7days_stats_safe`` et
+les pages suivantes des listes paginées par curseur.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from sqlalchemy import func, select, tuple_
+
+from backend.database import db
+from backend.models.audit_log import AuditLog
+from backend.models.notification import Notification
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+
+# Tables qui ne doivent jamais être parcourues intégralement sur un chemin critique
+WATCHED_TABLES = ('pointages', 'users', 'notifications', 'pauses', 'audit_logs')
+
+
+def hot_path_queries(company_id, user_id, day):
+    """Retourne les requêtes critiques, indexées par nom d'endpoint."""
+    week_start = day - timedelta(days=6)
+    return {
+        'create_pointage.duplicate_check': select(Pointage.id).where(
+            Pointage.user_id == user_id,
+            Pointage.date_pointage == day,
+        ),
+        'checkout.today_office': select(Pointage.id).where(
+            Pointage.user_id == user_id,
+            Pointage.date_pointage == day,
+            Pointage.type == 'office',
+        ),
+        'attendance.history': select(Pointage.id).where(
+            Pointage.user_id == user_id,
+            Pointage.date_pointage >= week_start,
+        ).order_by(Pointage.date_pointage.desc()),
+        # Page suivante de la pagination par curseur (``backend.utils.pagination``)
+        'attendance.history_keyset': select(Pointage.id).where(
+            Pointage.user_id == user_id,
+            tuple_(Pointage.date_pointage, Pointage.heure_arrivee, Pointage.id) < (day, dt_time(12, 0), 2 ** 31),
+        ).order_by(
+            Pointage.date_pointage.desc(), Pointage.heure_arrivee.desc(), Pointage.id.desc()
+        ).limit(21),
+        'notifications.keyset': select(Notification.id).where(
+            Notification.user_id == user_id,
+            tuple_(Notification.created_at, Notification.id) < (datetime.combine(day, dt_time()), 2 ** 31),
+        ).order_by(Notification.created_at.desc(), Notification.id.desc()).limit(21),
+        'audit_logs.keyset': select(AuditLog.id).where(
+            tuple_(AuditLog.created_at, AuditLog.id) < (datetime.combine(day, dt_time()), 2 ** 31),
+        ).order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(21),
+        'admin.company_attendance': select(Pointage.id).join(
+            User, Pointage.user_id == User.id
+        ).where(
+            User.company_id == company_id,
+            Pointage.date_pointage >= week_start,
+            Pointage.date_pointage <= day,
+        ),
+        'stats.last_7days': select(Pointage.statut, func.count(Pointage.id)).join(
+            User, Pointage.user_id == User.id
+        ).where(
+            User.company_id == company_id,
+            Pointage.date_pointage == day,
+        ).group_by(Pointage.statut),
+        'stats.active_users': select(func.count(User.id)).where(
+            User.company_id == company_id,
+            User.is_active == True,  # noqa: E712 - comparaison SQL
+        ),
+        'notifications.unread_count': select(func.count(Notification.id)).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False,  # noqa: E712 - comparaison SQL
+        ),
+        'pauses.by_pointage': select(Pause.id).where(Pause.pointage_id == 1),
+    }
+
+
+def explain(connection, statement):
+    """Retourne le plan d'exécution de ``statement`` sous forme de lignes de texte."""
+    compiled = statement.compile(dialect=connection.dialect)
+    sql = str(compiled)
+    # Conversions du dialecte (dates, heures...) que le pilote n'applique pas seul
+    params = {}
+    for name, value in compiled.params.items():
+        processor = compiled.binds[name].type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+        params[name] = processor(value) if processor else value
+    if compiled.positiontup:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    if dialect == 'postgresql':
+        # Sur un petit jeu de données le planner préfère légitimement un Seq Scan ;
+        # on le pénalise pour vérifier qu'un index exploitable existe.
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {sql}", params).fetchall()
+        return [row[0] for row in rows]
+
+    raise NotImplementedError(f"EXPLAIN non supporté pour le dialecte {dialect}")
+
+
+def sequential_scans(plan_lines, tables=WATCHED_TABLES):
+    """Retourne les lignes du plan correspondant à un parcours complet d'une table surveillée."""
+    offending = []
+    for line in plan_lines:
+        text = line.strip()
+        for table in tables:
+            if text == f"SCAN {table}" or text.startswith(f"SCAN {table} ") or f"Seq Scan on {table}" in text:
+                offending.append(text)
+    return offending
+
+
+def check_hot_paths(connection, company_id, user_id, day):
+    """Retourne ``{nom: [lignes fautives]}`` pour chaque requête qui fait un parcours séquentiel."""
+    failures = {}
+    for name, statement in hot_path_queries(company_id, user_id, day).items():
+        with connection.begin():
+            plan = explain(connection, statement)
+        offending = sequential_scans(plan)
+        if offending:
+            failures[name] = offending
+    return failures
+
+
+def seed_synthetic_tenant(company_id, rows, users=None, start=None, chunk_size=10000):
+    """Insère ``rows`` pointages répartis sur ``users`` employés de ``company_id``.
+
+    Les insertions se font par lots via le ``Table.insert`` Core pour éviter le coût
+    de l'unité de travail de l'ORM. Retourne la liste des identifiants créés.
+    """
+    users = users or max(1, rows // 250)
+    start = start or date.today() - timedelta(days=(rows // users) + 1)
+
+    user_rows = [
+        {
+            'email': f'bench-{company_id}-{index}@pointflex.local',
+            'nom': 'Bench',
+            'prenom': str(index),
+            'password_hash': '!',
+            'role': 'employee',
+            'company_id': company_id,
+            'is_active': True,
+        }
+        for index in range(users)
+    ]
+    for offset in range(0, len(user_rows), chunk_size):
+        db.session.execute(User.__table__.insert(), user_rows[offset:offset + chunk_size])
+
+    user_ids = [
+        row[0] for row in db.session.execute(
+            select(User.id).where(User.email.like(f'bench-{company_id}-%'))
+        )
+    ]
+
+    batch = []
+    for index in range(rows):
+        batch.append({
+            'user_id': user_ids[index % len(user_ids)],
+            'type': 'office',
+            'date_pointage': start + timedelta(days=index // len(user_ids)),
+            'heure_arrivee': dt_time(8, random.randint(0, 59)),
+            'statut': 'present' if index % 7 else 'retard',
+        })
+        if len(batch) >= chunk_size:
+            db.session.execute(Pointage.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Pointage.__table__.insert(), batch)
+
+    db.session.commit()
+    return user_ids
+
+
+def delete_synthetic_tenant(company_id):
+    """Supprime l'entreprise ``company_id`` avec ses employés, pointages, pauses et agrégats."""
+    from backend.models.attendance_daily_summary import AttendanceDailySummary
+    from backend.models.company import Company
+
+    user_ids = select(User.id).where(User.company_id == company_id).scalar_subquery()
+    pointage_ids = select(Pointage.id).where(Pointage.user_id.in_(user_ids)).scalar_subquery()
+    db.session.execute(
+        AttendanceDailySummary.__table__.delete().where(AttendanceDailySummary.user_id.in_(user_ids))
+    )
+    db.session.execute(Pause.__table__.delete().where(Pause.pointage_id.in_(pointage_ids)))
+    db.session.execute(Pointage.__table__.delete().where(Pointage.user_id.in_(user_ids)))
+    db.session.execute(User.__table__.delete().where(User.company_id == company_id))
+    db.session.execute(Company.__table__.delete().where(Company.id == company_id))
+    db.session.commit()
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    from backend.app import create_app
+    from backend.models.company import Company
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        company = Company(name=f'Bench {int(time.time())}', email='bench@pointflex.local')
+        db.session.add(company)
+        db.session.commit()
+
+        started = time.perf_counter()
+        user_ids = seed_synthetic_tenant(company.id, args.rows, users=args.users)
+        print(f"{args.rows} pointages insérés en {time.perf_counter() - started:.1f}s")
+
+        day = date.today()
+        with db.engine.connect() as connection:
+            for name, statement in hot_path_queries(company.id, user_ids[0], day).items():
+                with connection.begin():
+                    plan = explain(connection, statement)
+                started = time.perf_counter()
+                connection.execute(statement).fetchall()
+                elapsed = (time.perf_counter() - started) * 1000
+                status = 'SEQ SCAN' if sequential_scans(plan) else 'ok'
+                print(f"[{status}] {name}: {elapsed:.2f} ms")
+                for line in plan:
+                    print(f"    {line}")
+
+
+if __name__ == '__main__':
+    main()
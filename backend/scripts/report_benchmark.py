@@ -0,0 +1,95 @@
+"""
+Latence du rapport complet d'assiduité selon la taille globale des tables.
+
+Un tenant cible de taille fixe est mesuré pendant qu'un tenant voisin grossit
+par paliers : le temps du rapport doit rester stable, chaque requête étant
+filtrée sur l'entreprise et la période via les index::
+
+    python -m backend.scripts.report_benchmark --rows 20000 --noise 200000 2000000
+
+Le script affiche aussi les plans d'exécution des requêtes du rapport et
+signale tout parcours séquentiel.
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from backend.database import db
+from backend.scripts.query_plan_benchmark import WATCHED_TABLES, explain, seed_synthetic_tenant, sequential_scans
+from backend.services.attendance_report_service import build_comprehensive_report, report_queries
+from backend.services.attendance_summary_service import rebuild_daily_summaries
+
+REPORT_TABLES = WATCHED_TABLES + ('attendance_daily_summary',)
+
+
+def seed_report_tenant(company_id, rows, users=None):
+    """Remplit un tenant synthétique puis reconstruit ses agrégats journaliers"""
+    user_ids = seed_synthetic_tenant(company_id, rows, users=users)
+    rebuild_daily_summaries(company_id=company_id)
+    return user_ids
+
+
+def check_report_plans(connection, company_id, start_date, end_date):
+    """Retourne ``{requête: [lignes fautives]}`` pour chaque parcours séquentiel du rapport"""
+    failures = {}
+    for name, statement in report_queries(company_id, start_date, end_date).items():
+        with connection.begin():
+            plan = explain(connection, statement)
+        offending = sequential_scans(plan, REPORT_TABLES)
+        if offending:
+            failures[name] = offending
+    return failures
+
+
+def time_report(company_id, start_date, end_date, repeat=5):
+    """Retourne la médiane (ms) de ``repeat`` générations du rapport"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build_comprehensive_report(company_id, start_date, end_date)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    from backend.app import create_app
+    from backend.models.company import Company
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20_000, help="Pointages du tenant mesuré")
+    parser.add_argument('--users', type=int, default=None)
+    parser.add_argument('--noise', type=int, nargs='*', default=[200_000, 2_000_000],
+                        help="Pointages ajoutés à chaque palier dans un autre tenant")
+    parser.add_argument('--days', type=int, default=30, help="Période du rapport")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        def new_company(label):
+            company = Company(name=f'Bench {label} {time.time_ns()}', email='bench@pointflex.local')
+            db.session.add(company)
+            db.session.commit()
+            return company.id
+
+        target_id = new_company('rapport')
+        seed_report_tenant(target_id, args.rows, users=args.users)
+        end_date = date.today()
+        start_date = end_date - timedelta(days=args.days)
+
+        with db.engine.connect() as connection:
+            for name, offending in check_report_plans(connection, target_id, start_date, end_date).items():
+                print(f"[SEQ SCAN] {name}: {offending}")
+
+        total = args.rows
+        print(f"{total:>10} pointages au total : {time_report(target_id, start_date, end_date):.2f} ms")
+        for noise in args.noise:
+            seed_report_tenant(new_company('bruit'), noise)
+            total += noise
+            print(f"{total:>10} pointages au total : {time_report(target_id, start_date, end_date):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Débit de livraison des webhooks contre un serveur HTTP local.
+
+Un serveur bouchon (``StubWebhookServer``, HTTP/1.1 keep-alive) reçoit les
+POST ; le script compare, pour le même nombre d'événements :
+
+* ``requests.post`` isolé (une connexion TCP par livraison, ancien comportement) ;
+* la session poolée par hôte de ``backend.utils.http_pool`` ;
+* les livraisons groupées (``batch_deliveries``) par lots de ``--batch-size``.
+
+    python -m backend.scripts.webhook_benchmark --events 2000 --batch-size 100
+
+Les mesures portent sur le transport HTTP et la signature, sans base ni
+Redis, pour isoler le coût de connexion.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from backend.utils.http_pool import close_http_sessions, get_http_session
+from backend.utils.webhook_utils import build_batch_body
+
+SECRET = b'benchmark-secret'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Réponse envoyée sans attendre l'ACK différé du client (keep-alive)
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers), body))
+            server.connections.add(self.client_address)
+        if server.delay_seconds:
+            time.sleep(server.delay_seconds)
+        status = server.path_statuses.get(self.path, server.status_code)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWebhookServer:
+    """Serveur HTTP local qui enregistre les requêtes reçues et les connexions ouvertes
+
+    ``delay_seconds`` simule la latence d'un service distant.
+    """
+
+    def __init__(self, status_code=200, delay_seconds=0):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.lock = threading.Lock()
+        self._server.requests = []
+        self._server.connections = set()
+        self._server.status_code = status_code
+        self._server.path_statuses = {}
+        self._server.delay_seconds = delay_seconds
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def origin(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def url(self):
+        return f'{self.origin}/webhook'
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    @property
+    def connection_count(self):
+        """Nombre de connexions TCP distinctes (port client) ayant envoyé une requête"""
+        return len(self._server.connections)
+
+    def set_status(self, status_code, path=None):
+        """Statut des réponses suivantes (d'un seul chemin si ``path`` est fourni)"""
+        if path is None:
+            self._server.status_code = status_code
+        else:
+            self._server.path_statuses[path] = status_code
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _event(index):
+    return json.dumps({'event_id': f'evt_{index}', 'event_type': 'pointage.created',
+                       'data': {'index': index}}, sort_keys=True)
+
+
+def _post(send, url, body):
+    body_bytes = body.encode('utf-8')
+    signature = hmac.new(SECRET, body_bytes, hashlib.sha256).hexdigest()
+    response = send(url, data=body_bytes, timeout=10, headers={
+        'Content-Type': 'application/json', 'X-PointFlex-Signature-256': signature,
+    })
+    response.raise_for_status()
+
+
+def run(url, events, batch_size):
+    """Retourne ``{mode: livraisons d'événements par seconde}``"""
+    payloads = [_event(index) for index in range(events)]
+    results = {}
+
+    started = time.perf_counter()
+    for body in payloads:
+        _post(requests.post, url, body)
+    results['requests.post'] = events / (time.perf_counter() - started)
+
+    close_http_sessions()
+    session = get_http_session(url)
+    started = time.perf_counter()
+    for body in payloads:
+        _post(session.post, url, body)
+    results['session poolée'] = events / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for offset in range(0, events, batch_size):
+        _post(session.post, url, build_batch_body(1, payloads[offset:offset + batch_size]))
+    results[f'lots de {batch_size}'] = events / (time.perf_counter() - started)
+    close_http_sessions()
+    return results
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with StubWebhookServer() as server:
+        for mode, rate in run(server.url, args.events, args.batch_size).items():
+            print(f"{mode:>16} : {rate:,.0f} événements/s")
+        print(f"{len(server.requests)} requêtes reçues sur {server.connection_count} connexions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Débit d'envoi Web Push contre un service push local.
+
+Le serveur bouchon de ``webhook_benchmark`` (HTTP/1.1 keep-alive, latence
+simulée par ``--latency-ms``) joue le service push ; le script compare,
+pour les mêmes abonnements :
+
+* ``pywebpush.webpush`` en série (ancien comportement : une connexion et
+  une signature VAPID par abonnement) ;
+* le moteur ``deliver_web_push`` (pool de threads, session par origine,
+  en-têtes VAPID en cache).
+
+    python -m backend.scripts.webpush_benchmark --subscriptions 500 --workers 8
+
+Les abonnements sont des objets en mémoire : aucune base n'est requise.
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from flask import Flask
+from pywebpush import webpush
+
+from backend.scripts.webhook_benchmark import StubWebhookServer
+from backend.services.push.webpush_engine import deliver_web_push
+from backend.utils.http_pool import close_http_sessions
+
+PAYLOAD = {'notification': {'title': 'Rappel', 'body': 'Votre poste commence dans 15 minutes'}}
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def generate_vapid_private_key():
+    """Clé privée VAPID brute encodée en base64url (format de ``VAPID_PRIVATE_KEY``)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64(key.private_numbers().private_value.to_bytes(32, 'big'))
+
+
+def fake_subscription_info(endpoint):
+    """Abonnement navigateur valide (clés p256dh et auth générées) vers ``endpoint``"""
+    receiver = ec.generate_private_key(ec.SECP256R1())
+    public_key = receiver.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return {'endpoint': endpoint, 'keys': {'p256dh': _b64(public_key), 'auth': _b64(os.urandom(16))}}
+
+
+class _Subscription:
+    """Abonnement en mémoire (même interface que ``PushSubscription`` pour le moteur)"""
+
+    device_type = 'web'
+
+    def __init__(self, id, user_id, info):
+        self.id, self.user_id, self._info = id, user_id, info
+
+    def get_web_push_subscription(self):
+        return self._info
+
+
+def run(origin, subscriptions, workers):
+    """Retourne ``{mode: envois par seconde}``"""
+    private_key = generate_vapid_private_key()
+    claims = {'sub': 'mailto:benchmark@pointflex.com'}
+    infos = [fake_subscription_info(f'{origin}/push/{index}') for index in range(subscriptions)]
+    results = {}
+
+    started = time.perf_counter()
+    for info in infos:
+        webpush(info, json.dumps(PAYLOAD), vapid_private_key=private_key, vapid_claims=dict(claims))
+    results['webpush en série'] = subscriptions / (time.perf_counter() - started)
+
+    app = Flask(__name__)
+    app.config.update(VAPID_PRIVATE_KEY=private_key, VAPID_CLAIMS=claims,
+                      WEBPUSH_MAX_WORKERS=workers, HTTP_POOL_MAXSIZE=workers)
+    rows = [_Subscription(index + 1, index + 1, info) for index, info in enumerate(infos)]
+    with app.app_context():
+        close_http_sessions()
+        started = time.perf_counter()
+        stats = deliver_web_push(rows, PAYLOAD)
+        results[f'moteur ({workers} threads)'] = subscriptions / (time.perf_counter() - started)
+        close_http_sessions()
+    assert stats.sent == subscriptions, stats.as_dict()
+    return results
+
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--subscriptions', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency-ms', type=int, default=20)
+    args = parser.parse_args()
+
+    with StubWebhookServer(delay_seconds=args.latency_ms / 1000) as server:
+        for mode, rate in run(server.origin, args.subscriptions, args.workers).items():
+            print(f"{mode:>20} : {rate:,.0f} envois/s")
+        print(f"{len(server.requests)} requêtes reçues sur {server.connection_count} connexions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+Rapport complet d'assiduité calculé côté base de données
+
+Chaque dimension (entreprise, jour, département, employé, mission) est obtenue
+par une seule requête agrégée, filtrée sur l'entreprise et la période : le coût
+dépend du volume du tenant et non de la taille globale des tables.
+
+Les dimensions entreprise, jour, département et employé lisent l'agrégat
+journalier ``attendance_daily_summary`` (heures nettes des pauses) ; les
+missions, absentes de cet agrégat, sont calculées sur les pointages avec le
+total des pauses en sous-requête. Le classement des meilleurs employés utilise
+une fonction de fenêtre.
+"""
+
+from sqlalchemy import and_, case, distinct, func, literal, select
+
+from backend.database import db
+from backend.models.attendance_daily_summary import AttendanceDailySummary
+from backend.models.department import Department
+from backend.models.mission import Mission
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 50
+
+UNASSIGNED_DEPARTMENT = "Non assigné"
+
+Summary = AttendanceDailySummary
+
+
+def _sum(column):
+    return func.coalesce(func.sum(column), 0)
+
+
+def _attendance_rate(present, late, absent):
+    """Taux de présence ``(présences + retards) / total`` en pourcentage, 0 sans pointage"""
+    total = present + late + absent
+    return func.coalesce((present + late) * 100.0 / func.nullif(total, 0), 0)
+
+
+def _minutes_of_day(column):
+    """Minutes depuis minuit d'une colonne ``Time`` (EXTRACT, traduit en STRFTIME sous SQLite)"""
+    return func.extract('hour', column) * 60 + func.extract('minute', column)
+
+
+def _net_worked_minutes(pause_minutes):
+    """Minutes travaillées d'un pointage, pauses déduites (même règle que l'agrégat journalier)"""
+    arrival = _minutes_of_day(Pointage.heure_arrivee)
+    departure = _minutes_of_day(Pointage.heure_depart)
+    span = case((departure >= arrival, departure - arrival), else_=departure - arrival + 24 * 60)
+    net = span - func.coalesce(pause_minutes, 0)
+    return case(
+        (Pointage.heure_arrivee.is_(None), 0),
+        (Pointage.heure_depart.is_(None), 0),
+        (net > 0, net),
+        else_=0,
+    )
+
+
+def _summary_conditions(company_id, start_date, end_date):
+    return [
+        Summary.company_id == company_id,
+        Summary.summary_date >= start_date,
+        Summary.summary_date <= end_date,
+    ]
+
+
+def _status_totals():
+    return [
+        _sum(Summary.present_count).label('presences'),
+        _sum(Summary.late_count).label('lates'),
+        _sum(Summary.absent_count).label('absences'),
+        _sum(Summary.worked_minutes).label('worked_minutes'),
+    ]
+
+
+def _employee_totals(company_id, start_date, end_date):
+    """Totaux par employé actif (employés sans pointage inclus)"""
+    presences = _sum(Summary.present_count)
+    lates = _sum(Summary.late_count)
+    absences = _sum(Summary.absent_count)
+    return select(
+        User.id.label('user_id'),
+        User.prenom,
+        User.nom,
+        func.max(Department.name).label('department'),
+        presences.label('presences'),
+        lates.label('lates'),
+        absences.label('absences'),
+        _sum(Summary.worked_minutes).label('worked_minutes'),
+        _attendance_rate(presences, lates, absences).label('attendance_rate'),
+    ).select_from(User).outerjoin(
+        Summary, and_(
+            Summary.user_id == User.id,
+            Summary.summary_date >= start_date,
+            Summary.summary_date <= end_date,
+        )
+    ).outerjoin(
+        Department, Department.id == Summary.department_id
+    ).where(
+        User.company_id == company_id,
+        User.is_active == True,  # noqa: E712 - comparaison SQL
+    ).group_by(User.id, User.prenom, User.nom)
+
+
+def report_queries(company_id, start_date, end_date, top_n=DEFAULT_TOP_N):
+    """Retourne les requêtes du rapport, indexées par dimension"""
+    summary_conditions = _summary_conditions(company_id, start_date, end_date)
+
+    company = select(
+        _sum(Summary.pointage_count).label('records'),
+        *_status_totals(),
+    ).where(*summary_conditions)
+
+    active_employees = select(func.count(User.id)).where(
+        User.company_id == company_id,
+        User.is_active == True,  # noqa: E712 - comparaison SQL
+    )
+
+    by_date = select(
+        Summary.summary_date,
+        *_status_totals(),
+    ).where(*summary_conditions).group_by(Summary.summary_date).order_by(Summary.summary_date)
+
+    presences = _sum(Summary.present_count)
+    lates = _sum(Summary.late_count)
+    absences = _sum(Summary.absent_count)
+    departments = select(
+        Summary.department_id,
+        func.coalesce(Department.name, literal(UNASSIGNED_DEPARTMENT)).label('name'),
+        func.count(distinct(Summary.user_id)).label('employee_count'),
+        presences.label('presences'),
+        lates.label('lates'),
+        absences.label('absences'),
+        _sum(Summary.worked_minutes).label('worked_minutes'),
+        _attendance_rate(presences, lates, absences).label('attendance_rate'),
+    ).outerjoin(
+        Department, Department.id == Summary.department_id
+    ).where(*summary_conditions).group_by(Summary.department_id, Department.name).order_by('name')
+
+    employee_totals = _employee_totals(company_id, start_date, end_date)
+    employees = employee_totals.order_by(User.nom, User.prenom)
+
+    ranked = employee_totals.add_columns(
+        func.row_number().over(order_by=(
+            employee_totals.selected_columns.attendance_rate.desc(),
+            employee_totals.selected_columns.presences.desc(),
+            employee_totals.selected_columns.absences.asc(),
+            User.id,
+        )).label('rank')
+    ).subquery()
+    top_employees = select(ranked).where(ranked.c.rank <= top_n).order_by(ranked.c.rank)
+
+    pointage_conditions = [
+        User.company_id == company_id,
+        Pointage.date_pointage >= start_date,
+        Pointage.date_pointage <= end_date,
+        Pointage.mission_id.isnot(None),
+    ]
+    pause_totals = select(
+        Pause.pointage_id,
+        func.sum(Pause.duration_minutes).label('minutes'),
+    ).join(Pointage, Pause.pointage_id == Pointage.id).join(
+        User, Pointage.user_id == User.id
+    ).where(*pointage_conditions).group_by(Pause.pointage_id).subquery()
+
+    missions = select(
+        Pointage.mission_id,
+        func.max(Mission.title).label('title'),
+        func.max(func.coalesce(Mission.order_number, Pointage.mission_order_number)).label('order_number'),
+        User.id.label('user_id'),
+        User.prenom,
+        User.nom,
+        func.min(Pointage.date_pointage).label('start_date'),
+        func.max(Pointage.date_pointage).label('end_date'),
+        func.count(distinct(Pointage.date_pointage)).label('days'),
+        _sum(_net_worked_minutes(pause_totals.c.minutes)).label('worked_minutes'),
+    ).join(User, Pointage.user_id == User.id).outerjoin(
+        Mission, Mission.id == Pointage.mission_id
+    ).outerjoin(
+        pause_totals, pause_totals.c.pointage_id == Pointage.id
+    ).where(*pointage_conditions).group_by(
+        Pointage.mission_id, User.id, User.prenom, User.nom
+    ).order_by('start_date', Pointage.mission_id, User.id)
+
+    return {
+        'company': company,
+        'active_employees': active_employees,
+        'by_date': by_date,
+        'departments': departments,
+        'employees': employees,
+        'top_employees': top_employees,
+        'missions': missions,
+    }
+
+
+def _hours(minutes):
+    return round((minutes or 0) / 60, 2)
+
+
+def _employee_stat(row):
+    return {
+        'id': row.user_id,
+        'name': f"{row.prenom} {row.nom}",
+        'department': row.department or UNASSIGNED_DEPARTMENT,
+        'presences': int(row.presences),
+        'absences': int(row.absences),
+        'lates': int(row.lates),
+        'workHours': _hours(row.worked_minutes),
+        'attendanceRate': round(float(row.attendance_rate), 1),
+    }
+
+
+def build_comprehensive_report(company_id, start_date, end_date, top_n=DEFAULT_TOP_N):
+    """Construit le rapport complet d'assiduité d'une entreprise sur une période"""
+    top_n = max(1, min(int(top_n), MAX_TOP_N))
+    queries = report_queries(company_id, start_date, end_date, top_n)
+    execute = db.session.execute
+
+    company = execute(queries['company']).one()
+    stats = {
+        'totalEmployees': execute(queries['active_employees']).scalar() or 0,
+        'totalRecords': int(company.records),
+        'totalPresences': int(company.presences),
+        'totalLate': int(company.lates),
+        'totalAbsences': int(company.absences),
+        'totalWorkHours': _hours(company.worked_minutes),
+        'containsSimulatedData': False,
+    }
+
+    attendance_by_date = [
+        {
+            'date': row.summary_date.isoformat(),
+            'presences': int(row.presences),
+            'lates': int(row.lates),
+            'absences': int(row.absences),
+            'workHours': _hours(row.worked_minutes),
+        }
+        for row in execute(queries['by_date'])
+    ]
+
+    department_stats = [
+        {
+            'id': row.department_id,
+            'name': row.name,
+            'employeeCount': row.employee_count,
+            'presences': int(row.presences),
+            'absences': int(row.absences),
+            'lates': int(row.lates),
+            'workHours': _hours(row.worked_minutes),
+            'attendanceRate': round(float(row.attendance_rate), 1),
+        }
+        for row in execute(queries['departments'])
+    ]
+
+    missions = [
+        {
+            'id': row.mission_id,
+            'title': row.title or row.order_number,
+            'orderNumber': row.order_number,
+            'employeeId': row.user_id,
+            'employeeName': f"{row.prenom} {row.nom}",
+            'startDate': row.start_date.isoformat(),
+            'endDate': row.end_date.isoformat(),
+            'days': row.days,
+            'hours': _hours(row.worked_minutes),
+        }
+        for row in execute(queries['missions'])
+    ]
+
+    return {
+        'period': {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'days': (end_date - start_date).days + 1,
+        },
+        'stats': stats,
+        'attendanceByDate': attendance_by_date,
+        'departmentStats': department_stats,
+        'employeeStats': [_employee_stat(row) for row in execute(queries['employees'])],
+        'topEmployees': [_employee_stat(row) for row in execute(queries['top_employees'])],
+        'missionStats': {
+            'totalMissions': len({mission['id'] for mission in missions}),
+            'totalDays': sum(mission['days'] for mission in missions),
+            'totalHours': round(sum(mission['hours'] for mission in missions), 2),
+        },
+        'missions': missions,
+    }
@@ -4,25 +4,31 @@ Service pour les opérations d'attendance avec gestion d'erreurs robuste
 
 from flask import current_app
 from backend.models.pointage import Pointage
+from backend.models.attendance_daily_summary import AttendanceDailySummary
 from backend.models.user import User
 from backend.models.office import Office
 from backend.models.company import Company
 from backend.models.system_settings import SystemSettings
 from backend.database import db
-from backend.utils.notification_utils import send_notification
 from backend.middleware.audit import log_user_action
-from backend.utils.attendance_logger import log_attendance_event, log_attendance_error
+from backend.utils.geo_utils import calculate_distance, find_nearest_office
+from backend.utils.pagination import InvalidCursorError, paginate_keyset
 from backend.services.geolocation_accuracy_service import GeolocationAccuracyService
+from backend.services.outbox_service import add_outbox_event, relay_outbox_if_sync
 from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
-import math
 import traceback
 
-def get_attendance_safe(user_id, start_date=None, end_date=None, page=1, per_page=20):
+def get_attendance_safe(user_id, start_date=None, end_date=None, page=1, per_page=20,
+                        cursor=None, exact_count=False):
     """
     Récupère l'historique des pointages de manière sécurisée,
     en utilisant des requêtes SQL directes si nécessaire
+
+    La pagination suit ``(date_pointage, heure_arrivee, id)`` : ``cursor``
+    reprend après la page précédente (``next_cursor``) sans ``OFFSET``.
     """
     try:
         # Valider les dates
@@ -67,17 +73,23 @@ def get_attendance_safe(user_id, start_date=None, end_date=None, page=1, per_pag
             if end_date_obj:
                 query = query.filter(Pointage.date_pointage <= end_date_obj)
             
-            # Ordonner par date décroissante
-            query = query.order_by(Pointage.date_pointage.desc(), Pointage.heure_arrivee.desc())
-            
-            # Pagination
-            pointages = query.paginate(page=page, per_page=per_page, error_out=False)
+            # Pagination par curseur, du plus récent au plus ancien
+            try:
+                pointages = paginate_keyset(
+                    query,
+                    (Pointage.date_pointage, Pointage.heure_arrivee, Pointage.id),
+                    cursor=cursor, page=page, per_page=per_page, exact_count=exact_count,
+                )
+            except InvalidCursorError as e:
+                return {'error': True, 'message': str(e), 'status_code': 400}
             
-            # Conversion des pointages en dict avec gestion des erreurs
+            # Conversion des pointages en dict avec gestion des erreurs ;
+            # les relations sont préchargées une fois pour toute la page
+            serialization_context = Pointage.build_serialization_context(pointages.items)
             records = []
             for pointage in pointages.items:
                 try:
-                    record = pointage.to_dict()
+                    record = pointage.to_dict(serialization_context)
                     records.append(record)
                 except Exception as e:
                     current_app.logger.error(f"Erreur lors de la conversion du pointage {pointage.id}: {str(e)}")
@@ -96,12 +108,7 @@ def get_attendance_safe(user_id, start_date=None, end_date=None, page=1, per_pag
             return {
                 'error': False,
                 'records': records,
-                'pagination': {
-                    'page': page,
-                    'pages': pointages.pages,
-                    'per_page': per_page,
-                    'total': pointages.total
-                },
+                'pagination': pointages.pagination(cursor),
                 'status_code': 200
             }
             
@@ -239,29 +246,23 @@ def get_attendance_stats_safe(user_id):
         start_of_month = today.replace(day=1)
         
         try:
-            # Essayer d'abord l'approche ORM
-            pointages = Pointage.query.filter(
-                Pointage.user_id == user_id,
-                Pointage.date_pointage >= start_of_month,
-                Pointage.date_pointage <= today
-            ).all()
-            
-            # Calculer les statistiques
-            total_days = len(pointages)
-            present_days = len([p for p in pointages if p.statut == 'present'])
-            late_days = len([p for p in pointages if p.statut == 'retard'])
+            # Agrégats journaliers (attendance_daily_summary) au lieu des pointages bruts
+            totals = db.session.query(
+                func.coalesce(func.sum(AttendanceDailySummary.pointage_count), 0),
+                func.coalesce(func.sum(AttendanceDailySummary.present_count), 0),
+                func.coalesce(func.sum(AttendanceDailySummary.late_count), 0),
+                func.coalesce(func.sum(AttendanceDailySummary.open_count), 0),
+                func.coalesce(func.sum(AttendanceDailySummary.worked_minutes), 0),
+            ).filter(
+                AttendanceDailySummary.user_id == user_id,
+                AttendanceDailySummary.summary_date >= start_of_month,
+                AttendanceDailySummary.summary_date <= today
+            ).one()
+            total_days, present_days, late_days, open_count, worked_minutes = (int(v) for v in totals)
             absence_days = 0  # Pour l'instant, on ne gère pas les absences
-            
-            # Calculer les heures moyennes avec gestion d'erreurs
-            total_hours = 0
-            for p in pointages:
-                try:
-                    hours = p.calculate_worked_hours() or 8
-                    total_hours += hours
-                except Exception as e:
-                    current_app.logger.error(f"Erreur lors du calcul des heures pour le pointage {p.id}: {str(e)}")
-                    total_hours += 8  # Valeur par défaut en cas d'erreur
-                    
+
+            # Un pointage sans départ compte pour une journée de 8 heures
+            total_hours = worked_minutes / 60 + 8 * open_count
             average_hours = total_hours / total_days if total_days > 0 else 0
             
         except SQLAlchemyError:
@@ -358,23 +359,27 @@ def get_last_7days_stats_safe(user_id):
         daily_stats = []
         
         try:
-            # Essayer d'abord avec l'ORM
+            # Une requête groupée sur les agrégats journaliers pour les 7 jours
+            per_day = {
+                day: (int(presents or 0), int(retards or 0))
+                for day, presents, retards in db.session.query(
+                    AttendanceDailySummary.summary_date,
+                    func.sum(AttendanceDailySummary.present_count),
+                    func.sum(AttendanceDailySummary.late_count),
+                ).filter(
+                    AttendanceDailySummary.company_id == company_id,
+                    AttendanceDailySummary.summary_date >= last_7_days[0],
+                    AttendanceDailySummary.summary_date <= today
+                ).group_by(AttendanceDailySummary.summary_date)
+            }
+
+            # Pour les absents, compter les utilisateurs actifs sans pointage
+            total_active_users = User.query.filter_by(company_id=company_id, is_active=True).count()
+
             for day in last_7_days:
-                # Obtenir les pointages de ce jour pour tous les utilisateurs de l'entreprise
-                daily_pointages = Pointage.query.join(User).filter(
-                    User.company_id == company_id,
-                    Pointage.date_pointage == day
-                ).all()
-                
-                # Calculer les présents, retards et absents
-                presents = len([p for p in daily_pointages if p.statut == 'present'])
-                retards = len([p for p in daily_pointages if p.statut == 'retard'])
-                
-                # Pour les absents, compter les utilisateurs actifs sans pointage
-                total_active_users = User.query.filter_by(company_id=company_id, is_active=True).count()
-                absents = total_active_users - (presents + retards)
-                absents = max(0, absents)  # Éviter les nombres négatifs
-                
+                presents, retards = per_day.get(day, (0, 0))
+                absents = max(0, total_active_users - (presents + retards))  # Éviter les nombres négatifs
+
                 daily_stats.append({
                     'date': day.strftime('%d/%m'),
                     'present': presents,
@@ -496,26 +501,20 @@ def office_checkin_safe(user_id, coordinates):
 
         min_distance = float('inf')
         nearest_office = None
-        
+        threshold_entity = None
+
         try:
             # Vérification des bureaux si l'utilisateur appartient à une entreprise
             if user.company_id:
-                offices = Office.query.filter_by(
-                    company_id=user.company_id,
-                    is_active=True
-                ).all()
-                
-                for office in offices:
-                    try:
-                        distance = calculate_distance(
-                            coordinates['latitude'], coordinates['longitude'],
-                            office.latitude, office.longitude
-                        )
-                        if distance < min_distance:
-                            min_distance = distance
-                            nearest_office = office
-                    except Exception as e:
-                        current_app.logger.error(f"Erreur lors du calcul de distance pour le bureau {office.id}: {str(e)}")
+                # Précision maximale de l'entreprise, remplacée par celle du bureau si définie
+                company = user.company
+                if company and getattr(company, 'geolocation_max_accuracy', None) is not None:
+                    max_accuracy = company.geolocation_max_accuracy
+                    threshold_entity = company
+
+                nearest_office, min_distance = find_nearest_office(
+                    user.company_id, coordinates['latitude'], coordinates['longitude']
+                )
                 
                 # Utiliser la précision maximale du bureau si définie
                 if nearest_office:
@@ -619,6 +618,8 @@ def office_checkin_safe(user_id, coordinates):
                         altitude=coordinates.get('altitude'),
                         heading=coordinates.get('heading'),
                         speed=coordinates.get('speed'),
+                        accuracy_adjuster=adjuster,
+                        applied_threshold=applied_threshold,
                     )
                 else:
                     return {
@@ -640,6 +641,8 @@ def office_checkin_safe(user_id, coordinates):
                         altitude=coordinates.get('altitude'),
                         heading=coordinates.get('heading'),
                         speed=coordinates.get('speed'),
+                        accuracy_adjuster=adjuster,
+                        applied_threshold=applied_threshold,
                     )
                 else:
                     return {
@@ -676,6 +679,8 @@ def office_checkin_safe(user_id, coordinates):
                     altitude=coordinates.get('altitude'),
                     heading=coordinates.get('heading'),
                     speed=coordinates.get('speed'),
+                    accuracy_adjuster=adjuster,
+                    applied_threshold=applied_threshold,
                 )
         else:
             # Cas d'un utilisateur sans entreprise
@@ -688,16 +693,14 @@ def office_checkin_safe(user_id, coordinates):
                 altitude=coordinates.get('altitude'),
                 heading=coordinates.get('heading'),
                 speed=coordinates.get('speed'),
+                accuracy_adjuster=adjuster,
+                applied_threshold=applied_threshold,
             )
         
         # Retourner le pointage créé
         if pointage.get('error'):
             return pointage
 
-        if adjuster:
-            adjuster.record_success(coordinates['accuracy'], applied_threshold)
-            db.session.commit()
-
         return {
             'error': False,
             'message': 'Pointage bureau enregistré avec succès',
@@ -714,6 +717,21 @@ def office_checkin_safe(user_id, coordinates):
             'status_code': 500
         }
 
+def _notify_duplicate_checkin(user_id):
+    """Prévient l'utilisateur d'un second pointage dans la journée (via l'outbox)"""
+    try:
+        add_outbox_event(
+            'pointage.duplicate',
+            user_id=user_id,
+            notifications=["Pointage déjà enregistré pour aujourd'hui"],
+        )
+        db.session.commit()
+        relay_outbox_if_sync()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to queue duplicate check-in notification for user {user_id}: {e}")
+
+
 def create_pointage(
     user_id,
     type_pointage,
@@ -725,9 +743,14 @@ def create_pointage(
     altitude=None,
     heading=None,
     speed=None,
+    accuracy_adjuster=None,
+    applied_threshold=None,
 ):
     """
     Crée un nouveau pointage avec gestion des erreurs
+
+    Le pointage, l'événement d'outbox et, si ``accuracy_adjuster`` est fourni,
+    le succès de précision GPS sont validés par un seul commit.
     """
     try:
         
@@ -751,10 +774,7 @@ def create_pointage(
             ).first()
             
             if existing_pointage:
-                try:
-                    send_notification(user_id, "Pointage déjà enregistré pour aujourd'hui")
-                except:
-                    pass
+                _notify_duplicate_checkin(user_id)
                 return {
                     'error': True,
                     'message': "Vous avez déjà pointé aujourd'hui",
@@ -769,11 +789,8 @@ def create_pointage(
                 (user_id, today.isoformat())
             )
             if cursor.fetchone():
-                try:
-                    send_notification(user_id, "Pointage déjà enregistré pour aujourd'hui")
-                except:
-                    pass
                 cursor.close()
+                _notify_duplicate_checkin(user_id)
                 return {
                     'error': True,
                     'message': "Vous avez déjà pointé aujourd'hui",
@@ -828,53 +845,42 @@ def create_pointage(
             except:
                 pass
                 
+            pointage_data = Pointage.serialize_many([pointage])[0]
+            user = db.session.get(User, user_id)
+
+            # Journal, webhooks et notifications : relayés après le commit
+            notifications = ["Pointage bureau enregistré"]
+            if pointage.statut == 'retard':
+                notifications.append("Vous êtes en retard")
+            add_outbox_event(
+                'pointage.created',
+                user_id=user_id,
+                company_id=user.company_id if user else None,
+                aggregate=pointage,
+                webhook_data=pointage_data,
+                log_event='office_checkin',
+                log_details={
+                    'pointage_id': pointage.id,
+                    'office_id': getattr(pointage, 'office_id', None),
+                    'status': pointage.statut,
+                    'time': pointage.heure_arrivee.strftime('%H:%M:%S'),
+                    'accuracy': accuracy,
+                    'altitude': altitude,
+                    'heading': heading,
+                    'speed': speed,
+                },
+                notifications=notifications,
+            )
+
+            if accuracy_adjuster:
+                accuracy_adjuster.record_success(accuracy, applied_threshold)
+
             db.session.commit()
-            
-            # Journaliser l'événement de pointage
-            try:
-                log_attendance_event(
-                    event_type='office_checkin',
-                    user_id=user_id,
-                    details={
-                        'pointage_id': pointage.id,
-                        'office_id': getattr(pointage, 'office_id', None),
-                        'status': pointage.statut,
-                        'time': pointage.heure_arrivee.strftime('%H:%M:%S'),
-                        'accuracy': accuracy,
-                        'altitude': altitude,
-                        'heading': heading,
-                        'speed': speed,
-                    }
-                )
-            except:
-                pass
-            
-            # Webhooks
-            try:
-                from backend.utils.webhook_utils import dispatch_webhook_event
-                dispatch_webhook_event(
-                    event_type='pointage.created',
-                    payload_data=pointage.to_dict(),
-                    company_id=User.query.get(user_id).company_id
-                )
-            except Exception as webhook_error:
-                current_app.logger.error(f"Failed to dispatch pointage.created webhook for pointage {pointage.id}: {webhook_error}")
-                try:
-                    log_attendance_error('webhook_failure', user_id, str(webhook_error))
-                except:
-                    pass
-            
-            # Notifications
-            try:
-                send_notification(user_id, "Pointage bureau enregistré")
-                if pointage.statut == 'retard':
-                    send_notification(user_id, "Vous êtes en retard")
-            except:
-                pass
-            
+            relay_outbox_if_sync()
+
             return {
                 'error': False,
-                'pointage': pointage.to_dict()
+                'pointage': pointage_data
             }
             
         except SQLAlchemyError as e:
@@ -893,46 +899,3 @@ def create_pointage(
             'message': f"Erreur interne du serveur: {str(e)}",
             'status_code': 500
         }
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calcule la distance en mètres entre deux points géographiques
-    """
-    try:
-        # Validation des entrées
-        if not all(isinstance(coord, (int, float)) for coord in [lat1, lon1, lat2, lon2]):
-            current_app.logger.error(f"Invalid coordinate types: {type(lat1)}, {type(lon1)}, {type(lat2)}, {type(lon2)}")
-            return float('inf')  # Distance infinie en cas d'erreur
-        
-        # Validation des valeurs
-        if not (-90 <= lat1 <= 90 and -90 <= lat2 <= 90 and -180 <= lon1 <= 180 and -180 <= lon2 <= 180):
-            current_app.logger.error(f"Coordinates out of range: {lat1}, {lon1}, {lat2}, {lon2}")
-            return float('inf')  # Distance infinie en cas d'erreur
-        
-        # Rayon de la Terre en mètres
-        R = 6371000
-        
-        # Convertir en radians
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # Différences
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        # Formule de Haversine
-        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(dlon/2) * math.sin(dlon/2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        # Distance en mètres
-        distance = R * c
-        
-        return distance
-    except Exception as e:
-        current_app.logger.error(f"Error calculating distance: {e}")
-        return float('inf')  # Distance infinie en cas d'erreur
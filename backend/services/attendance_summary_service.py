@@ -0,0 +1,213 @@
+"""
+Maintenance de la table ``attendance_daily_summary``
+
+Mise à jour incrémentale : un écouteur ``after_flush`` de la session repère les
+pointages et pauses créés, modifiés ou supprimés (check-in, checkout, pauses,
+justifications, quelle que soit la route) et recalcule uniquement les couples
+(employé, jour) concernés, dans la même transaction que l'écriture.
+
+Reconstruction : ``rebuild_daily_summaries`` recalcule une période complète
+en un seul parcours des pointages (commande ``flask rebuild-attendance-summary``),
+pour le remplissage initial et après des insertions en masse hors ORM.
+"""
+
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from backend.database import db
+from backend.models.attendance_daily_summary import AttendanceDailySummary
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+
+INSERT_BATCH_SIZE = 1000
+# Nombre de couples (employé, jour) supprimés par requête
+DELETE_BATCH_SIZE = 200
+
+Summary = AttendanceDailySummary.__table__
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute if value is not None else None
+
+
+def _worked_minutes(arrival, departure, pause_minutes):
+    """Même règle que ``Pointage.calculate_worked_hours`` (passage de minuit inclus)"""
+    start, end = _minutes(arrival), _minutes(departure)
+    if start is None or end is None:
+        return 0
+    if end < start:
+        end += 24 * 60
+    return max(0, end - start - pause_minutes)
+
+
+def _summary_row(user_id, company_id, day, pointages, now):
+    """Construit la ligne d'agrégat à partir des pointages (triés par arrivée) d'un employé sur un jour"""
+    arrivals = [_minutes(p.heure_arrivee) for p in pointages if p.heure_arrivee is not None]
+    departures = [_minutes(p.heure_depart) for p in pointages if p.heure_depart is not None]
+    return {
+        'company_id': company_id,
+        'department_id': None,
+        'user_id': user_id,
+        'summary_date': day,
+        'status': pointages[0].statut,
+        'pointage_count': len(pointages),
+        'present_count': sum(1 for p in pointages if p.statut == 'present'),
+        'late_count': sum(1 for p in pointages if p.statut == 'retard'),
+        'absent_count': sum(1 for p in pointages if p.statut == 'absent'),
+        'open_count': sum(1 for p in pointages if p.heure_depart is None),
+        'justified_count': sum(1 for p in pointages if p.is_justified),
+        'first_arrival_minutes': min(arrivals) if arrivals else None,
+        'last_departure_minutes': max(departures) if departures else None,
+        'worked_minutes': sum(
+            _worked_minutes(p.heure_arrivee, p.heure_depart, p.pause_minutes) for p in pointages
+        ),
+        'pause_minutes': sum(p.pause_minutes for p in pointages),
+        'updated_at': now,
+    }
+
+
+def _pointage_rows(connection, conditions):
+    """Pointages (avec entreprise et total des pauses) triés par employé, jour et arrivée"""
+    pause_totals = select(
+        Pause.pointage_id,
+        func.coalesce(func.sum(Pause.duration_minutes), 0).label('minutes'),
+    ).join(Pointage, Pause.pointage_id == Pointage.id).join(
+        User, Pointage.user_id == User.id
+    ).where(*conditions).group_by(Pause.pointage_id).subquery()
+
+    statement = select(
+        Pointage.user_id, Pointage.date_pointage, Pointage.statut, Pointage.heure_arrivee,
+        Pointage.heure_depart, Pointage.is_justified, User.company_id,
+        func.coalesce(pause_totals.c.minutes, 0).label('pause_minutes'),
+    ).join(User, Pointage.user_id == User.id).outerjoin(
+        pause_totals, pause_totals.c.pointage_id == Pointage.id
+    ).where(*conditions).order_by(
+        Pointage.user_id, Pointage.date_pointage, Pointage.heure_arrivee, Pointage.id
+    )
+    return connection.execute(statement.execution_options(yield_per=INSERT_BATCH_SIZE))
+
+
+def _summaries(rows, keys=None):
+    """Regroupe des lignes triées en agrégats ; ``keys`` restreint aux couples demandés"""
+    now = datetime.utcnow()
+    current_key, current_rows, company_id = None, [], None
+    for row in chain(rows, [None]):
+        key = (row.user_id, row.date_pointage) if row is not None else None
+        if key != current_key:
+            if current_rows and (keys is None or current_key in keys):
+                yield _summary_row(current_key[0], company_id, current_key[1], current_rows, now)
+            current_key, current_rows = key, []
+        if row is not None:
+            current_rows.append(row)
+            company_id = row.company_id
+
+
+def _insert(connection, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            connection.execute(insert(Summary), batch)
+            batch = []
+    if batch:
+        connection.execute(insert(Summary), batch)
+
+
+def refresh_daily_summaries(connection, keys):
+    """Recalcule les agrégats des couples ``(user_id, date)`` donnés"""
+    keys = {(user_id, day) for user_id, day in keys if user_id is not None and day is not None}
+    if not keys:
+        return
+
+    ordered = sorted(keys)
+    for offset in range(0, len(ordered), DELETE_BATCH_SIZE):
+        chunk = ordered[offset:offset + DELETE_BATCH_SIZE]
+        connection.execute(delete(Summary).where(or_(*(
+            and_(Summary.c.user_id == user_id, Summary.c.summary_date == day) for user_id, day in chunk
+        ))))
+
+    # Sur-ensemble (employés x jours) filtré ensuite sur les couples demandés
+    rows = _pointage_rows(connection, [
+        Pointage.user_id.in_({user_id for user_id, _ in keys}),
+        Pointage.date_pointage.in_({day for _, day in keys}),
+    ])
+    _insert(connection, _summaries(rows, keys))
+
+
+def rebuild_daily_summaries(company_id=None, start_date=None, end_date=None):
+    """Reconstruit les agrégats d'une période (et d'une entreprise) ; retourne le nombre de lignes"""
+    conditions = []
+    summary_conditions = []
+    if company_id is not None:
+        conditions.append(User.company_id == company_id)
+        summary_conditions.append(Summary.c.company_id == company_id)
+    if start_date is not None:
+        conditions.append(Pointage.date_pointage >= start_date)
+        summary_conditions.append(Summary.c.summary_date >= start_date)
+    if end_date is not None:
+        conditions.append(Pointage.date_pointage <= end_date)
+        summary_conditions.append(Summary.c.summary_date <= end_date)
+
+    connection = db.session.connection()
+    connection.execute(delete(Summary).where(*summary_conditions))
+
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    _insert(connection, counted(_summaries(_pointage_rows(connection, conditions))))
+    db.session.commit()
+    return count
+
+
+# --- Mise à jour incrémentale ------------------------------------------------
+
+def _previous_value(obj, attribute):
+    history = inspect(obj).attrs[attribute].history
+    return history.deleted[0] if history.deleted else None
+
+
+def _after_flush(session, flush_context):
+    keys = set()
+    pause_pointage_ids = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Pointage):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            keys.add((obj.user_id, obj.date_pointage))
+            previous_user = _previous_value(obj, 'user_id')
+            previous_day = _previous_value(obj, 'date_pointage')
+            if previous_user is not None or previous_day is not None:
+                keys.add((previous_user or obj.user_id, previous_day or obj.date_pointage))
+        elif isinstance(obj, Pause):
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            pause_pointage_ids.add(obj.pointage_id)
+
+    if not keys and not pause_pointage_ids:
+        return
+
+    connection = session.connection()
+    if pause_pointage_ids:
+        keys.update(
+            (row.user_id, row.date_pointage) for row in connection.execute(
+                select(Pointage.user_id, Pointage.date_pointage).where(Pointage.id.in_(pause_pointage_ids))
+            )
+        )
+    if keys:
+        refresh_daily_summaries(connection, keys)
+
+
+def register_summary_hooks():
+    """Active la mise à jour incrémentale pour toutes les sessions (idempotent)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
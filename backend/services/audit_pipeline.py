@@ -0,0 +1,374 @@
+"""
+Écriture tamponnée du journal d'audit
+
+``AuditLog.log_action`` ne sérialise plus rien et n'ajoute plus de ligne à
+la transaction métier : l'entrée brute est mise de côté sur la session et
+rejoint une file bornée en mémoire au ``commit`` (ou à la fin d'une requête
+en lecture seule). Elle est oubliée si la transaction est annulée.
+
+Un thread de vidage regroupe les entrées et les écrit par ``INSERT``
+multi-lignes dès que ``AUDIT_FLUSH_BATCH_SIZE`` entrées sont prêtes ou que
+``AUDIT_FLUSH_INTERVAL_MS`` s'est écoulé depuis la plus ancienne ; la
+sérialisation JSON des détails se fait dans ce thread.
+
+* Les actions sensibles (``AUDIT_SYNC_ACTIONS`` : connexions, 2FA, mots de
+  passe, suppressions...) restent écrites dans la transaction métier.
+* File pleine : l'entrée est écrite immédiatement (compteur ``overflowed``)
+  plutôt que perdue.
+* Un lot en échec est réessayé ``AUDIT_FLUSH_MAX_ATTEMPTS`` fois puis
+  consigné dans les logs applicatifs (compteur ``dropped``).
+
+Avec une base à connexion unique (SQLite en mémoire, ``StaticPool``), un
+thread concurrent partagerait la connexion des requêtes : le vidage se fait
+alors dans le thread appelant, après la libération de la session.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from backend.database import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_FLUSH_INTERVAL_MS = 500
+DEFAULT_FLUSH_BATCH_SIZE = 200
+DEFAULT_FLUSH_MAX_ATTEMPTS = 3
+
+# Clé de ``Session.info`` où attendent les entrées de la transaction en cours
+PENDING_KEY = 'audit_pending'
+
+JSON_FIELDS = ('details', 'old_values', 'new_values')
+
+
+def serialize_audit_value(value):
+    """Sérialise ``details``/``old_values``/``new_values`` comme ``AuditLog``"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+def _insert_rows(app, rows: List[Dict[str, Any]]) -> None:
+    """Écrit ``rows`` en un seul ``INSERT ... VALUES (...), (...)``"""
+    from backend.models.audit_log import AuditLog
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(insert(AuditLog.__table__).values(rows))
+
+
+class AuditPipeline:
+    """File bornée d'entrées d'audit et thread de vidage par lots"""
+
+    def __init__(self, writer: Optional[Callable] = None):
+        self._writer = writer or _insert_rows
+        self._app = None
+        self._max_size = DEFAULT_MAX_SIZE
+        self._interval = DEFAULT_FLUSH_INTERVAL_MS / 1000
+        self._batch_size = DEFAULT_FLUSH_BATCH_SIZE
+        self._max_attempts = DEFAULT_FLUSH_MAX_ATTEMPTS
+        self._background = None
+        self._queue = queue.Queue(maxsize=self._max_size)
+        self._pid = os.getpid()
+        self._thread = None
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = self._empty_metrics()
+        self._atexit_registered = False
+        # Échéance du vidage en ligne (sans thread)
+        self._oldest_enqueued_at = None
+
+    @staticmethod
+    def _empty_metrics() -> Dict[str, Any]:
+        return {
+            'enqueued': 0,
+            'flushed': 0,
+            'batches': 0,
+            'overflowed': 0,
+            'failed_batches': 0,
+            'dropped': 0,
+            'sync_writes': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0,
+            'last_flush_at': None,
+        }
+
+    # Configuration -----------------------------------------------------------
+    def configure(self, app, background: Optional[bool] = None) -> None:
+        """Rattache le pipeline à ``app`` après avoir vidé les entrées en attente"""
+        if self._app is not None:
+            self.flush()
+        config = app.config
+        self._app = app
+        self._max_size = config.get('AUDIT_BUFFER_MAX_SIZE', DEFAULT_MAX_SIZE)
+        self._interval = config.get('AUDIT_FLUSH_INTERVAL_MS', DEFAULT_FLUSH_INTERVAL_MS) / 1000
+        self._batch_size = max(1, config.get('AUDIT_FLUSH_BATCH_SIZE', DEFAULT_FLUSH_BATCH_SIZE))
+        self._max_attempts = max(1, config.get('AUDIT_FLUSH_MAX_ATTEMPTS', DEFAULT_FLUSH_MAX_ATTEMPTS))
+        # ``None`` : déterminé au premier usage d'après le pool de connexions
+        self._background = background
+        if self._queue.maxsize != self._max_size and self._queue.empty():
+            self._queue = queue.Queue(maxsize=self._max_size)
+
+    @property
+    def background(self) -> bool:
+        if self._background is None:
+            with self._app.app_context():
+                self._background = not isinstance(db.engine.pool, StaticPool)
+        return self._background
+
+    # Alimentation ------------------------------------------------------------
+    def enqueue(self, records: List[Dict[str, Any]]) -> None:
+        """Ajoute des entrées validées ; écrit directement celles qui débordent"""
+        if not records:
+            return
+        self._check_fork()
+        if self._app is None:
+            self.configure(current_app._get_current_object())
+        if self._oldest_enqueued_at is None:
+            self._oldest_enqueued_at = time.monotonic()
+        overflow = []
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                overflow.append(record)
+        self._count(enqueued=len(records) - len(overflow), overflowed=len(overflow))
+        if overflow:
+            logger.warning(f"File d'audit pleine : {len(overflow)} entrée(s) écrite(s) directement")
+            self._write(overflow)
+        if self.background:
+            self._ensure_thread()
+
+    def record_sync_write(self) -> None:
+        self._count(sync_writes=1)
+
+    # Vidage -----------------------------------------------------------------
+    def flush(self) -> int:
+        """Vide toute la file dans le thread appelant ; retourne le nombre d'entrées écrites"""
+        written = 0
+        while True:
+            batch = self._drain(self._batch_size)
+            if not batch:
+                self._oldest_enqueued_at = None
+                return written
+            written += self._write(batch)
+
+    def flush_if_due(self) -> int:
+        """Vide la file si un lot est complet ou si la plus ancienne entrée a trop attendu"""
+        if self._queue.empty():
+            return 0
+        oldest = self._oldest_enqueued_at
+        if self._queue.qsize() >= self._batch_size or (
+            oldest is not None and time.monotonic() - oldest >= self._interval
+        ):
+            return self.flush()
+        return 0
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """Attend une entrée puis complète le lot jusqu'à sa taille ou son échéance"""
+        try:
+            batch = [self._queue.get(timeout=1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self._interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records: List[Dict[str, Any]]) -> int:
+        rows = [
+            {key: serialize_audit_value(value) if key in JSON_FIELDS else value
+             for key, value in record.items()}
+            for record in records
+        ]
+        for attempt in range(1, self._max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                with self._write_lock:
+                    self._writer(self._app, rows)
+            except Exception as e:
+                self._count(failed_batches=1)
+                logger.error(f"Échec d'écriture d'un lot d'audit ({len(rows)} entrées, essai {attempt}): {e}")
+                if attempt < self._max_attempts:
+                    time.sleep(min(self._interval * attempt, 5))
+                continue
+            with self._metrics_lock:
+                self._metrics['flushed'] += len(rows)
+                self._metrics['batches'] += 1
+                self._metrics['last_batch_size'] = len(rows)
+                self._metrics['last_flush_ms'] = int((time.perf_counter() - started) * 1000)
+                self._metrics['last_flush_at'] = time.monotonic()
+            return len(rows)
+
+        # Dernier recours : l'entrée reste au moins dans les logs applicatifs
+        for row in rows:
+            logger.error(f"Entrée d'audit perdue: {json.dumps(row, default=str)}")
+        self._count(dropped=len(rows))
+        return 0
+
+    # Thread de vidage --------------------------------------------------------
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='audit-flusher', daemon=True)
+        self._thread.start()
+        if not self._atexit_registered:
+            atexit.register(self.stop)
+            self._atexit_registered = True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def stop(self, timeout: float = 5) -> None:
+        """Arrête le thread et écrit les entrées restantes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._app is not None:
+            self.flush()
+
+    def _check_fork(self) -> None:
+        # Un worker forké hérite d'une copie de la file du parent : on repart
+        # d'une file vide pour ne pas écrire ces entrées deux fois.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self._max_size)
+            self._thread = None
+            self._metrics_lock = threading.Lock()
+            self._write_lock = threading.Lock()
+
+    # Métriques ---------------------------------------------------------------
+    def _count(self, **increments: int) -> None:
+        with self._metrics_lock:
+            for key, value in increments.items():
+                self._metrics[key] += value
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        last_flush = metrics.pop('last_flush_at')
+        metrics.update(
+            queue_depth=self._queue.qsize(),
+            queue_capacity=self._max_size,
+            background=bool(self._background) and self._thread is not None and self._thread.is_alive(),
+            seconds_since_last_flush=None if last_flush is None else round(time.monotonic() - last_flush, 3),
+        )
+        return metrics
+
+    def reset_metrics(self) -> None:
+        with self._metrics_lock:
+            self._metrics = self._empty_metrics()
+
+
+_pipeline = AuditPipeline()
+
+
+def get_audit_pipeline() -> AuditPipeline:
+    return _pipeline
+
+
+def get_audit_metrics() -> Dict[str, Any]:
+    """Compteurs de la file d'audit (débordements, lots, profondeur...)"""
+    return _pipeline.metrics()
+
+
+def flush_audit_buffer() -> int:
+    """Écrit immédiatement les entrées validées encore en file"""
+    return _pipeline.flush()
+
+
+def is_sync_action(action: str, config) -> bool:
+    """Vrai si ``action`` doit être écrite dans la transaction métier"""
+    if not config.get('AUDIT_BUFFER_ENABLED', True):
+        return True
+    return action in config.get('AUDIT_SYNC_ACTIONS', ())
+
+
+def build_audit_record(**values) -> Dict[str, Any]:
+    """Entrée brute (détails non sérialisés), horodatée au moment de l'action"""
+    values.setdefault('created_at', datetime.utcnow())
+    return values
+
+
+def defer_audit_record(session, record: Dict[str, Any]) -> None:
+    """Met ``record`` de côté jusqu'à la fin de la transaction de ``session``"""
+    session.info.setdefault(PENDING_KEY, []).append(record)
+
+
+def release_pending_records(session) -> None:
+    """Transmet à la file les entrées mises de côté sur ``session``"""
+    records = session.info.pop(PENDING_KEY, None)
+    if records:
+        _pipeline.enqueue(records)
+
+
+def _after_commit(session):
+    release_pending_records(session)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_audit_hooks():
+    """Relie les entrées d'audit aux commits/rollbacks des sessions (idempotent)"""
+    if not event.contains(Session, 'after_commit', _after_commit):
+        event.listen(Session, 'after_commit', _after_commit)
+    if not event.contains(Session, 'after_rollback', _after_rollback):
+        event.listen(Session, 'after_rollback', _after_rollback)
+
+
+def init_audit_pipeline(app) -> None:
+    """Configure le pipeline pour ``app`` et branche la fin de requête
+
+    À appeler avant ``db.init_app`` pour que le vidage en fin de contexte
+    passe après la libération de la session.
+    """
+    register_audit_hooks()
+    _pipeline.configure(app)
+
+    @app.teardown_request
+    def release_request_audit(exc):
+        # Requête en lecture seule : aucun commit n'a transmis ses entrées
+        if exc is None and db.session.registry.has():
+            release_pending_records(db.session())
+
+    @app.teardown_appcontext
+    def flush_inline_audit(exc):
+        # Enregistré avant Flask-SQLAlchemy : s'exécute après la libération
+        # de la session, la connexion unique est donc disponible.
+        if not _pipeline.background:
+            _pipeline.flush_if_due()
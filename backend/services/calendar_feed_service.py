@@ -0,0 +1,408 @@
+"""
+Flux du calendrier d'équipe (pointages, missions, congés approuvés)
+
+Le périmètre de l'utilisateur est exprimé comme un filtre SQL sur ``users``
+(entreprise, équipe complète d'un manager par CTE récursive sur
+``manager_id``, ou liste d'ids) : les pointages, les affectations de missions
+et les congés approuvés du mois sont lus en trois requêtes, chacune déjà
+jointe aux noms des utilisateurs.
+
+Le flux construit est gardé par processus pour ``(périmètre, mois)`` avec son
+ETag (``CALENDAR_FEED_CACHE_TTL``). Une écriture sur un pointage, une mission,
+une affectation, un congé ou un utilisateur incrémente, après le commit, la
+version de l'entreprise concernée, dans le processus et dans Redis : les
+flux de cette entreprise sont alors reconstruits à la demande suivante. Les
+autres workers (web et RQ) relisent la version Redis d'une entreprise au plus
+toutes les ``CALENDAR_FEED_VERSION_CHECK_SECONDS`` secondes ; sans Redis,
+ils voient l'écriture au plus tard à l'expiration du TTL.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.database import db
+from backend.models.leave_request import LeaveRequest
+from backend.models.leave_type import LeaveType
+from backend.models.mission import Mission
+from backend.models.mission_user import MissionUser
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.utils import principal_cache
+from backend.utils.redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+# Hash Redis : entreprise -> version (le champ ALL_FIELD compte toutes les écritures)
+VERSIONS_KEY = 'pointflex:calendar_feed:versions'
+ALL_FIELD = 'all'
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_VERSION_CHECK_SECONDS = 2
+# Après un échec de connexion, Redis n'est pas réinterrogé pendant ce délai
+REDIS_RETRY_SECONDS = 30
+MAX_ENTRIES = 1000
+# Clé de ``Session.info`` : entreprises dont le calendrier a changé
+PENDING_KEY = 'calendar_companies'
+MANAGER_ROLES = ('manager',)
+# Colonnes d'un utilisateur qui apparaissent dans le flux ou son périmètre
+USER_COLUMNS = ('company_id', 'manager_id', 'nom', 'prenom')
+
+_entries = {}
+# Version par entreprise ; la clé None compte toutes les écritures
+_versions = defaultdict(int)
+# Dernière version Redis lue par entreprise : {company_id: (version, lue_à)}
+_remote_versions = {}
+_state = {'redis_down_until': 0.0}
+_lock = threading.Lock()
+
+
+class CalendarScopeError(ValueError):
+    """Paramètre ``user_ids`` invalide"""
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _redis_call(operation):
+    """Exécute ``operation(redis)`` ; retourne None si Redis est indisponible"""
+    now = time.monotonic()
+    if now < _state['redis_down_until']:
+        return None
+    try:
+        return operation(get_redis_connection())
+    except Exception as exc:
+        _state['redis_down_until'] = now + REDIS_RETRY_SECONDS
+        logger.debug(f"Redis indisponible pour le cache du calendrier: {exc}")
+        return None
+
+
+def _parse_ids(user_ids_str):
+    try:
+        return tuple(sorted({int(uid.strip()) for uid in user_ids_str.split(',') if uid.strip()}))
+    except ValueError:
+        raise CalendarScopeError(
+            "user_ids doit être une liste d'IDs numériques séparés par des virgules."
+        )
+
+
+def _team_ids(manager_id):
+    """Sous-requête des ids de toute l'équipe d'un manager (rapports directs et indirects)"""
+    team = select(User.id).where(User.manager_id == manager_id).cte('team', recursive=True)
+    team = team.union(select(User.id).where(User.manager_id == team.c.id))
+    return select(team.c.id)
+
+
+def resolve_scope(user, user_ids_str=None):
+    """
+    Périmètre visible par ``user``
+
+    Returns:
+        tuple: ``(clé de cache, entreprise, filtre SQL sur User)`` ; le filtre
+        vaut None si le périmètre est vide
+    """
+    requested = _parse_ids(user_ids_str) if user_ids_str and user_ids_str != 'self' else None
+
+    if user_ids_str == 'self' or (not user_ids_str and user.role not in ('admin_rh', 'superadmin', 'manager')):
+        return ('user', user.id), user.company_id, User.id == user.id
+
+    if user.role == 'superadmin':
+        if not requested:
+            return ('none',), None, None
+        return ('users', requested), None, User.id.in_(requested)
+
+    if user.role == 'admin_rh' or user.role in MANAGER_ROLES:
+        if not user.company_id:
+            return ('none',), None, None
+        if user.role == 'admin_rh':
+            base, key = User.company_id == user.company_id, ('company', user.company_id)
+        else:
+            base, key = User.id.in_(_team_ids(user.id)) | (User.id == user.id), ('team', user.id)
+            base = and_(User.company_id == user.company_id, base)
+        if requested:
+            return key + (requested,), user.company_id, and_(base, User.id.in_(requested))
+        return key, user.company_id, base
+
+    return ('user', user.id), user.company_id, User.id == user.id
+
+
+def _month_bounds(year, month):
+    start = date(year, month, 1)
+    end = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)) - timedelta(days=1)
+    return start, end
+
+
+def _pointage_events(scope_filter, start, end):
+    rows = db.session.execute(
+        select(
+            Pointage.id, Pointage.user_id, Pointage.type, Pointage.mission_order_number,
+            Pointage.date_pointage, Pointage.heure_arrivee, Pointage.heure_depart, Pointage.statut,
+            User.prenom, User.nom,
+        )
+        .join(User, User.id == Pointage.user_id)
+        .where(scope_filter, Pointage.date_pointage >= start, Pointage.date_pointage <= end)
+        .order_by(Pointage.date_pointage, Pointage.heure_arrivee, Pointage.id)
+    )
+    events = []
+    for row in rows:
+        user_name = f"{row.prenom} {row.nom}"
+        title = f"Pointage: {user_name}"
+        if row.type == 'mission':
+            title = f"Mission ({row.mission_order_number or 'N/A'}): {user_name}"
+        start_dt = datetime.combine(row.date_pointage, row.heure_arrivee)
+        # 1h par défaut sans départ
+        end_dt = datetime.combine(row.date_pointage, row.heure_depart) if row.heure_depart \
+            else start_dt + timedelta(hours=1)
+        events.append({
+            'id': f'pointage_{row.id}',
+            'title': title,
+            'start': start_dt.isoformat(),
+            'end': end_dt.isoformat(),
+            'type': 'pointage',
+            'user_id': row.user_id,
+            'user_name': user_name,
+            'pointage_type': row.type,
+            'status': row.statut,
+            'color': '#3788D8' if row.type == 'office' else '#4CAF50',
+        })
+    return events
+
+
+def _mission_events(scope_filter, start, end):
+    rows = db.session.execute(
+        select(
+            Mission.id, Mission.title, Mission.order_number, Mission.start_date, Mission.end_date,
+            Mission.status, User.prenom, User.nom,
+        )
+        .join(MissionUser, MissionUser.mission_id == Mission.id)
+        .join(User, User.id == MissionUser.user_id)
+        .where(
+            scope_filter,
+            Mission.start_date.isnot(None),
+            Mission.start_date <= end,
+            func.coalesce(Mission.end_date, Mission.start_date) >= start,
+        )
+        .order_by(Mission.id, MissionUser.id)
+    )
+    missions = {}
+    for row in rows:
+        mission = missions.setdefault(row.id, {'row': row, 'names': []})
+        mission['names'].append(f"{row.prenom} {row.nom}")
+
+    events = []
+    for mission in missions.values():
+        row, names = mission['row'], mission['names']
+        start_dt = datetime.combine(row.start_date, datetime.min.time())
+        end_dt = datetime.combine(row.end_date, datetime.max.time()) if row.end_date else None
+        events.append({
+            'id': f'mission_{row.id}',
+            'title': f"Mission: {row.title} ({row.order_number}) - {', '.join(names)}",
+            'start': start_dt.isoformat(),
+            'end': end_dt.isoformat() if end_dt else (start_dt + timedelta(days=1)).isoformat(),
+            'allDay': True,
+            'type': 'mission',
+            'user_id': None,
+            'user_name': ", ".join(names),
+            'mission_status': row.status,
+            'color': '#FF9800',
+        })
+    return events
+
+
+def _leave_events(scope_filter, start, end):
+    rows = db.session.execute(
+        select(
+            LeaveRequest.id, LeaveRequest.user_id, LeaveRequest.start_date, LeaveRequest.end_date,
+            LeaveRequest.requested_days, LeaveRequest.start_day_period, LeaveRequest.end_day_period,
+            LeaveRequest.status, LeaveType.name.label('leave_type_name'), User.prenom, User.nom,
+        )
+        .join(LeaveType, LeaveType.id == LeaveRequest.leave_type_id)
+        .join(User, User.id == LeaveRequest.user_id)
+        .where(
+            scope_filter,
+            LeaveRequest.status == 'approved',
+            LeaveRequest.start_date <= end,
+            LeaveRequest.end_date >= start,
+        )
+        .order_by(LeaveRequest.start_date, LeaveRequest.id)
+    )
+    events = []
+    for row in rows:
+        user_name = f"{row.prenom} {row.nom}"
+        title = f"Congé: {row.leave_type_name} - {user_name}"
+        if row.requested_days == 0.5:
+            if row.start_day_period == 'half_day_morning':
+                title += " (Matin)"
+            elif row.start_day_period == 'half_day_afternoon':
+                title += " (Après-midi)"
+        events.append({
+            'id': f'leave_{row.id}',
+            'title': title,
+            'start': datetime.combine(row.start_date, datetime.min.time()).isoformat(),
+            # Fin exclusive pour les événements sur la journée entière
+            'end': (datetime.combine(row.end_date, datetime.min.time()) + timedelta(days=1)).isoformat(),
+            'allDay': True,
+            'type': 'leave',
+            'user_id': row.user_id,
+            'user_name': user_name,
+            'leave_type_name': row.leave_type_name,
+            'requested_days': row.requested_days,
+            'start_day_period': row.start_day_period,
+            'end_day_period': row.end_day_period,
+            'status': row.status,
+            'color': '#EF5350',
+        })
+    return events
+
+
+def build_calendar_events(scope_filter, year, month):
+    """Événements du mois pour le périmètre (trois requêtes)"""
+    if scope_filter is None:
+        return []
+    start, end = _month_bounds(year, month)
+    return (
+        _pointage_events(scope_filter, start, end)
+        + _mission_events(scope_filter, start, end)
+        + _leave_events(scope_filter, start, end)
+    )
+
+
+def _remote_version(company_id):
+    """Version Redis de l'entreprise, relue au plus toutes les ``CALENDAR_FEED_VERSION_CHECK_SECONDS``"""
+    now = time.monotonic()
+    cached = _remote_versions.get(company_id)
+    if cached is not None and now - cached[1] < _config('CALENDAR_FEED_VERSION_CHECK_SECONDS',
+                                                        DEFAULT_VERSION_CHECK_SECONDS):
+        return cached[0]
+    field = ALL_FIELD if company_id is None else str(company_id)
+    remote = _redis_call(lambda redis: redis.hget(VERSIONS_KEY, field))
+    version = int(remote) if remote is not None else None
+    _remote_versions[company_id] = (version, now)
+    return version
+
+
+def _version(company_id):
+    # Périmètre sans entreprise (liste d'ids du superadmin) : toute écriture compte
+    return _versions[company_id], _remote_version(company_id)
+
+
+def get_calendar_feed(user, year, month, user_ids_str=None):
+    """
+    Flux du mois visible par ``user``, depuis le cache si possible
+
+    Returns:
+        tuple: ``(événements, etag)``
+
+    Raises:
+        CalendarScopeError: ``user_ids`` invalide
+        ValueError: année ou mois invalide
+    """
+    _month_bounds(year, month)
+    scope_key, company_id, scope_filter = resolve_scope(user, user_ids_str)
+    cache_key = (scope_key, year, month)
+    version = _version(company_id)
+    now = time.monotonic()
+
+    entry = _entries.get(cache_key)
+    if entry is not None and entry['version'] == version and entry['expires_at'] > now:
+        return entry['events'], entry['etag']
+
+    events = build_calendar_events(scope_filter, year, month)
+    body = json.dumps(events, sort_keys=True, separators=(',', ':'))
+    etag = hashlib.sha1(body.encode()).hexdigest()
+
+    ttl = _config('CALENDAR_FEED_CACHE_TTL', DEFAULT_TTL_SECONDS)
+    if ttl > 0:
+        with _lock:
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.pop(next(iter(_entries)))
+            _entries[cache_key] = {'events': events, 'etag': etag, 'version': version, 'expires_at': now + ttl}
+    return events, etag
+
+
+def invalidate_calendar(company_ids=None):
+    """Invalide les flux des entreprises ``company_ids`` (tous si None)"""
+    with _lock:
+        if company_ids is None:
+            _entries.clear()
+        for company_id in company_ids or ():
+            _versions[company_id] += 1
+        _versions[None] += 1
+
+
+def bump_version(company_ids):
+    """Invalide localement et publie la nouvelle version des entreprises aux autres workers"""
+    invalidate_calendar(company_ids)
+
+    def publish(redis):
+        pipe = redis.pipeline()
+        for company_id in company_ids:
+            pipe.hincrby(VERSIONS_KEY, str(company_id), 1)
+        pipe.hincrby(VERSIONS_KEY, ALL_FIELD, 1)
+        return pipe.execute()
+
+    published = _redis_call(publish)
+    if published is not None:
+        now = time.monotonic()
+        for company_id, version in zip(list(company_ids) + [None], published):
+            _remote_versions[company_id] = (int(version), now)
+
+
+def clear():
+    """Vide entièrement le cache du processus (nouvelle application, tests)"""
+    with _lock:
+        _entries.clear()
+        _versions.clear()
+        _remote_versions.clear()
+
+
+# Écouteurs de session ------------------------------------------------------------
+def _company_of_user(user_id):
+    principal = principal_cache.get_principal(user_id) if user_id else None
+    return principal.company_id if principal else None
+
+
+def _after_flush(session, flush_context):
+    companies = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Mission):
+            companies.add(obj.company_id)
+        elif isinstance(obj, (Pointage, LeaveRequest, MissionUser)):
+            companies.add(_company_of_user(obj.user_id))
+        elif isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.dirty and not any(state.attrs[name].history.has_changes() for name in USER_COLUMNS):
+                continue
+            companies.add(obj.company_id)
+            companies.update(state.attrs.company_id.history.deleted or ())
+    companies.discard(None)
+    if companies:
+        session.info.setdefault(PENDING_KEY, set()).update(companies)
+
+
+def _after_commit(session):
+    companies = session.info.pop(PENDING_KEY, None)
+    if companies:
+        bump_version(companies)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_calendar_hooks():
+    """Active l'invalidation des flux pour toutes les sessions (idempotent)"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
@@ -3,14 +3,37 @@ Module d'initialisation pour le service d'email
 """
 from .email_service import (
     send_email,
+    send_emails,
     render_email_template,
+    compose_subscription_expiring_soon_email,
+    compose_subscription_expired_email,
     send_subscription_expiring_soon_email,
-    send_subscription_expired_email
+    send_subscription_expired_email,
+    compose_invoice_reminder_email
 )
+from .email_outbox import (
+    enqueue_email,
+    enqueue_emails,
+    relay_email_outbox,
+    purge_email_outbox,
+    send_email_outbox_if_sync
+)
+from .smtp_pool import close_smtp_pools, get_smtp_pool
 
 __all__ = [
     'send_email',
+    'send_emails',
     'render_email_template',
+    'compose_subscription_expiring_soon_email',
+    'compose_subscription_expired_email',
     'send_subscription_expiring_soon_email',
-    'send_subscription_expired_email'
+    'send_subscription_expired_email',
+    'compose_invoice_reminder_email',
+    'enqueue_email',
+    'enqueue_emails',
+    'relay_email_outbox',
+    'purge_email_outbox',
+    'send_email_outbox_if_sync',
+    'close_smtp_pools',
+    'get_smtp_pool'
 ]
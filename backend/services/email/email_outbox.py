@@ -0,0 +1,204 @@
+"""
+File d'envoi des emails (outbox)
+
+Une route ou une tâche n'envoie plus d'email elle-même : ``enqueue_email``
+ajoute le message rendu à sa transaction (sans commit) et la réponse part
+sans attendre le serveur SMTP. Le relais (``run_email_outbox.py``) lit
+ensuite les messages en attente par lots et les envoie sur les connexions
+persistantes du pool SMTP :
+
+* débit limité par serveur SMTP (``EMAIL_RATE_LIMIT_PER_SECOND``) : les
+  messages au-delà du débit restent en attente pour le lot suivant, sans
+  consommer de tentative ;
+* un échec temporaire recule la tentative suivante (attente exponentielle)
+  jusqu'à ``EMAIL_OUTBOX_MAX_ATTEMPTS`` ; un refus définitif du serveur
+  (code 5xx) marque le message ``failed`` immédiatement.
+
+Avec ``EMAIL_OUTBOX_SYNC`` (tests, développement) le relais s'exécute juste
+après le commit de l'appelant.
+"""
+
+import json
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from backend.database import db
+from backend.models.email_outbox import EmailOutboxMessage
+
+from .email_service import build_email
+from .smtp_pool import get_smtp_pool
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETENTION_HOURS = 168
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+
+class _RateLimiter:
+    """Seau à jetons : ``rate`` envois par seconde au plus, par serveur SMTP"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = float(max(rate, 1))
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(max(self.rate, 1), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _rate_limiter(pool, rate):
+    if not rate:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(pool.settings.key)
+        if limiter is None or limiter.rate != rate:
+            limiter = _limiters[pool.settings.key] = _RateLimiter(rate)
+    return limiter
+
+
+def clear_rate_limits():
+    """Réinitialise les débits mémorisés (tests)"""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def enqueue_email(recipients, subject, html_content, category=None, company_id=None):
+    """
+    Ajoute un email à la transaction en cours (sans commit)
+
+    Args:
+        recipients: Liste des adresses des destinataires
+        subject: Sujet de l'email
+        html_content: Contenu HTML déjà rendu
+        category: Type d'email (``invoice_reminder``...), pour le suivi
+        company_id: Entreprise concernée
+    """
+    message = EmailOutboxMessage(
+        category=category,
+        company_id=company_id,
+        recipients=json.dumps(list(recipients)),
+        subject=subject,
+        html_content=html_content,
+        available_at=datetime.utcnow(),
+    )
+    db.session.add(message)
+    return message
+
+
+def enqueue_emails(emails, category=None, company_id=None):
+    """Ajoute une série d'emails ``(destinataires, sujet, contenu HTML)`` ; retourne les messages créés"""
+    return [
+        enqueue_email(recipients, subject, html_content, category=category, company_id=company_id)
+        for recipients, subject, html_content in emails
+    ]
+
+
+def send_email_outbox_if_sync():
+    """Envoie immédiatement les emails en attente en mode ``EMAIL_OUTBOX_SYNC``"""
+    if not current_app.config.get('EMAIL_OUTBOX_SYNC'):
+        return
+    try:
+        relay_email_outbox()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Email outbox relay failed: {e}", exc_info=True)
+
+
+def _claim_pending_messages(batch_size, now):
+    # SKIP LOCKED : plusieurs relais se partagent les lots sans se bloquer
+    return (
+        EmailOutboxMessage.query
+        .filter(EmailOutboxMessage.status == EmailOutboxMessage.STATUS_PENDING,
+                EmailOutboxMessage.available_at <= now)
+        .order_by(EmailOutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def _is_permanent(error):
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def _record_failure(message, error, now, max_attempts):
+    message.last_error = str(error)[:1000]
+    if message.attempts >= max_attempts or _is_permanent(error):
+        message.status = EmailOutboxMessage.STATUS_FAILED
+        current_app.logger.error(f"Email {message.id} ({message.category}) failed permanently: {error}")
+        return
+    delay = min(RETRY_BASE_SECONDS * 2 ** (message.attempts - 1), RETRY_MAX_SECONDS)
+    message.available_at = now + timedelta(seconds=delay)
+    current_app.logger.warning(
+        f"Email {message.id} ({message.category}) failed (attempt {message.attempts}), retry in {delay}s: {error}"
+    )
+
+
+def relay_email_outbox(batch_size=None):
+    """Envoie un lot d'emails en attente ; retourne le nombre de messages traités"""
+    config = current_app.config
+    batch_size = batch_size or config.get('EMAIL_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    now = datetime.utcnow()
+
+    messages = _claim_pending_messages(batch_size, now)
+    if not messages:
+        db.session.rollback()
+        return 0
+
+    pool = get_smtp_pool()
+    limiter = _rate_limiter(pool, config.get('EMAIL_RATE_LIMIT_PER_SECOND')) if pool else None
+    processed = 0
+    for message in messages:
+        # Débit atteint : le reste du lot attend le passage suivant
+        if limiter is not None and not limiter.try_acquire():
+            break
+        processed += 1
+        message.attempts = (message.attempts or 0) + 1
+        try:
+            if pool is None:
+                raise RuntimeError("Configuration SMTP incomplète")
+            pool.send(*build_email(message.recipient_list, message.subject, message.html_content,
+                                   pool.settings.sender))
+        except Exception as e:
+            _record_failure(message, e, now, max_attempts)
+            continue
+        message.status = EmailOutboxMessage.STATUS_SENT
+        message.sent_at = datetime.utcnow()
+        message.last_error = None
+
+    # Statuts du lot : un seul commit
+    db.session.commit()
+    return processed
+
+
+def purge_email_outbox(retention_hours=None):
+    """Supprime les emails envoyés plus anciens que la rétention ; retourne le nombre supprimé"""
+    if retention_hours is None:
+        retention_hours = current_app.config.get('EMAIL_OUTBOX_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    deleted = (
+        EmailOutboxMessage.query
+        .filter(EmailOutboxMessage.status == EmailOutboxMessage.STATUS_SENT,
+                EmailOutboxMessage.sent_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
@@ -1,15 +1,21 @@
 """
 Service d'envoi d'emails pour l'application PointFlex
 """
-from flask import current_app, render_template_string
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from functools import lru_cache
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from jinja2 import Environment, Template
+
+from .smtp_pool import get_smtp_pool
 
 logger = logging.getLogger(__name__)
 
+# Environnement des templates d'email, indépendant du contexte Flask
+_template_env = Environment(autoescape=True)
+
 # Templates HTML pour les emails
 SUBSCRIPTION_EXPIRING_SOON_TEMPLATE = """
 <!DOCTYPE html>
@@ -209,6 +215,113 @@ SUBSCRIPTION_EXPIRED_TEMPLATE = """
 </html>
 """
 
+INVOICE_REMINDER_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Rappel de facture</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            margin: 0;
+            padding: 0;
+        }
+        .container {
+            max-width: 600px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .header {
+            background-color: #4338ca;
+            color: white;
+            padding: 20px;
+            text-align: center;
+            border-radius: 4px 4px 0 0;
+        }
+        .content {
+            background-color: #f9fafb;
+            padding: 20px;
+            border-radius: 0 0 4px 4px;
+            border: 1px solid #e5e7eb;
+            border-top: none;
+        }
+        .footer {
+            text-align: center;
+            margin-top: 20px;
+            font-size: 12px;
+            color: #6b7280;
+        }
+        .invoice-info {
+            margin-top: 15px;
+            padding: 15px;
+            background-color: #f3f4f6;
+            border-radius: 4px;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Rappel de facture</h1>
+        </div>
+        <div class="content">
+            <p>Bonjour {{ user_name }},</p>
+
+            <p>La facture <strong>#{{ invoice_id }}</strong> de <strong>{{ company_name }}</strong> est toujours en attente de paiement.</p>
+
+            <div class="invoice-info">
+                <p><strong>Détails de la facture :</strong></p>
+                <ul>
+                    <li>Montant : {{ amount }} €</li>
+                    <li>Date d'échéance : {{ due_date }}</li>
+                </ul>
+            </div>
+
+            <p>Si le paiement a déjà été effectué, vous pouvez ignorer ce message.</p>
+
+            <p>Cordialement,<br>L'équipe PointFlex</p>
+        </div>
+        <div class="footer">
+            <p>© {{ current_year }} PointFlex - Tous droits réservés</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+def build_email(recipients: List[str],
+                subject: str,
+                html_content: str,
+                sender: str,
+                cc: Optional[List[str]] = None,
+                bcc: Optional[List[str]] = None) -> Tuple[str, List[str], str]:
+    """
+    Construit un email HTML prêt à être envoyé
+
+    Returns:
+        tuple: ``(expéditeur, tous les destinataires, message formaté)``
+    """
+    message = MIMEMultipart('alternative')
+    message['Subject'] = subject
+    message['From'] = sender
+    message['To'] = ', '.join(recipients)
+
+    if cc:
+        message['Cc'] = ', '.join(cc)
+    if bcc:
+        message['Bcc'] = ', '.join(bcc)
+
+    # Ajouter le contenu HTML
+    message.attach(MIMEText(html_content, 'html'))
+
+    all_recipients = recipients + (cc or []) + (bcc or [])
+    return sender, all_recipients, message.as_string()
+
+
 def send_email(recipients: List[str], 
               subject: str, 
               html_content: str,
@@ -228,48 +341,13 @@ def send_email(recipients: List[str],
         bool: True si l'email a été envoyé avec succès, False sinon
     """
     try:
-        # Récupérer les configurations SMTP depuis les variables d'environnement
-        smtp_server = current_app.config.get('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = current_app.config.get('SMTP_PORT', 587)
-        smtp_username = current_app.config.get('SMTP_USERNAME')
-        smtp_password = current_app.config.get('SMTP_PASSWORD')
-        sender_email = current_app.config.get('SENDER_EMAIL', smtp_username)
-        
-        # Vérifier si les configurations SMTP sont définies
-        if not all([smtp_server, smtp_port, smtp_username, smtp_password]):
+        # Connexions SMTP réutilisées d'un envoi à l'autre
+        pool = get_smtp_pool()
+        if pool is None:
             logger.error("Configuration SMTP incomplète. Impossible d'envoyer l'email.")
             return False
-            
-        # Créer le message
-        message = MIMEMultipart('alternative')
-        message['Subject'] = subject
-        message['From'] = sender_email
-        message['To'] = ', '.join(recipients)
-        
-        if cc:
-            message['Cc'] = ', '.join(cc)
-        if bcc:
-            message['Bcc'] = ', '.join(bcc)
-            
-        # Ajouter le contenu HTML
-        html_part = MIMEText(html_content, 'html')
-        message.attach(html_part)
-        
-        # Établir une connexion sécurisée au serveur SMTP
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        
-        # Envoyer l'email
-        all_recipients = recipients.copy()
-        if cc:
-            all_recipients.extend(cc)
-        if bcc:
-            all_recipients.extend(bcc)
-            
-        server.sendmail(sender_email, all_recipients, message.as_string())
-        server.quit()
-        
+
+        pool.send(*build_email(recipients, subject, html_content, pool.settings.sender, cc, bcc))
         logger.info(f"Email envoyé avec succès à {', '.join(recipients)}")
         return True
         
@@ -277,6 +355,30 @@ def send_email(recipients: List[str],
         logger.error(f"Erreur lors de l'envoi de l'email: {str(e)}")
         return False
 
+
+def send_emails(emails: List[Tuple[List[str], str, str]]) -> int:
+    """
+    Envoie une série d'emails ``(destinataires, sujet, contenu HTML)`` sur les connexions du pool
+
+    Returns:
+        int: Nombre d'emails envoyés
+    """
+    if not emails:
+        return 0
+    pool = get_smtp_pool()
+    if pool is None:
+        logger.error("Configuration SMTP incomplète. Impossible d'envoyer les emails.")
+        return 0
+    sender = pool.settings.sender
+    return pool.send_many(build_email(recipients, subject, html, sender) for recipients, subject, html in emails)
+
+
+@lru_cache(maxsize=32)
+def compile_email_template(template: str) -> Template:
+    """Compile une fois un template d'email (échappement HTML activé)"""
+    return _template_env.from_string(template)
+
+
 def render_email_template(template: str, context: Dict[str, Any]) -> str:
     """
     Rendre un template d'email avec le contexte donné
@@ -289,11 +391,75 @@ def render_email_template(template: str, context: Dict[str, Any]) -> str:
         str: Le template rendu avec le contexte
     """
     try:
-        return render_template_string(template, **context)
+        return compile_email_template(template).render(**context)
     except Exception as e:
         logger.error(f"Erreur lors du rendu du template d'email: {str(e)}")
         return ""
 
+def compose_subscription_expiring_soon_email(user_email: str,
+                                            user_name: str,
+                                            company_name: str,
+                                            plan_name: str,
+                                            days_remaining: int,
+                                            expiration_date: str,
+                                            renewal_url: str) -> Optional[Tuple[List[str], str, str]]:
+    """
+    Prépare l'email d'expiration prochaine d'abonnement
+
+    Returns:
+        tuple: ``(destinataires, sujet, contenu HTML)``, ou None si le rendu échoue
+    """
+    from datetime import datetime
+
+    # Préparer le contexte
+    context = {
+        "user_name": user_name,
+        "company_name": company_name,
+        "plan_name": plan_name,
+        "days_remaining": days_remaining,
+        "expiration_date": expiration_date,
+        "renewal_url": renewal_url,
+        "current_year": datetime.now().year
+    }
+
+    # Rendre le template
+    html_content = render_email_template(SUBSCRIPTION_EXPIRING_SOON_TEMPLATE, context)
+    if not html_content:
+        return None
+    return [user_email], f"Votre abonnement expire dans {days_remaining} jours", html_content
+
+
+def compose_subscription_expired_email(user_email: str,
+                                       user_name: str,
+                                       company_name: str,
+                                       plan_name: str,
+                                       expiration_date: str,
+                                       renewal_url: str) -> Optional[Tuple[List[str], str, str]]:
+    """
+    Prépare l'email d'abonnement expiré
+
+    Returns:
+        tuple: ``(destinataires, sujet, contenu HTML)``, ou None si le rendu échoue
+    """
+    from datetime import datetime
+
+    # Préparer le contexte
+    context = {
+        "user_name": user_name,
+        "company_name": company_name,
+        "plan_name": plan_name,
+        "expiration_date": expiration_date,
+        "renewal_url": renewal_url,
+        "current_year": datetime.now().year
+    }
+
+    # Rendre le template
+    html_content = render_email_template(SUBSCRIPTION_EXPIRED_TEMPLATE, context)
+    if not html_content:
+        return None
+    return [user_email], "IMPORTANT : Votre abonnement a expiré", html_content
+
+
 def send_subscription_expiring_soon_email(user_email: str, 
                                          user_name: str, 
                                          company_name: str, 
@@ -316,27 +482,10 @@ def send_subscription_expiring_soon_email(user_email: str,
     Returns:
         bool: True si l'email a été envoyé avec succès, False sinon
     """
-    from datetime import datetime
-    
-    # Préparer le contexte
-    context = {
-        "user_name": user_name,
-        "company_name": company_name,
-        "plan_name": plan_name,
-        "days_remaining": days_remaining,
-        "expiration_date": expiration_date,
-        "renewal_url": renewal_url,
-        "current_year": datetime.now().year
-    }
-    
-    # Rendre le template
-    html_content = render_email_template(SUBSCRIPTION_EXPIRING_SOON_TEMPLATE, context)
-    if not html_content:
-        return False
-        
-    # Envoyer l'email
-    subject = f"Votre abonnement expire dans {days_remaining} jours"
-    return send_email([user_email], subject, html_content)
+    email = compose_subscription_expiring_soon_email(
+        user_email, user_name, company_name, plan_name, days_remaining, expiration_date, renewal_url
+    )
+    return send_email(*email) if email else False
 
 def send_subscription_expired_email(user_email: str, 
                                    user_name: str, 
@@ -358,23 +507,36 @@ def send_subscription_expired_email(user_email: str,
     Returns:
         bool: True si l'email a été envoyé avec succès, False sinon
     """
+    email = compose_subscription_expired_email(
+        user_email, user_name, company_name, plan_name, expiration_date, renewal_url
+    )
+    return send_email(*email) if email else False
+
+
+def compose_invoice_reminder_email(user_email: str,
+                                   user_name: str,
+                                   company_name: str,
+                                   invoice_id: int,
+                                   amount: float,
+                                   due_date: str) -> Optional[Tuple[List[str], str, str]]:
+    """
+    Prépare l'email de rappel d'une facture impayée
+
+    Returns:
+        tuple: ``(destinataires, sujet, contenu HTML)``, ou None si le rendu échoue
+    """
     from datetime import datetime
-    
-    # Préparer le contexte
+
     context = {
         "user_name": user_name,
         "company_name": company_name,
-        "plan_name": plan_name,
-        "expiration_date": expiration_date,
-        "renewal_url": renewal_url,
+        "invoice_id": invoice_id,
+        "amount": f"{amount:.2f}",
+        "due_date": due_date,
         "current_year": datetime.now().year
     }
-    
-    # Rendre le template
-    html_content = render_email_template(SUBSCRIPTION_EXPIRED_TEMPLATE, context)
+
+    html_content = render_email_template(INVOICE_REMINDER_TEMPLATE, context)
     if not html_content:
-        return False
-        
-    # Envoyer l'email
-    subject = f"IMPORTANT : Votre abonnement a expiré"
-    return send_email([user_email], subject, html_content)
+        return None
+    return [user_email], f"Rappel : facture #{invoice_id} en attente de paiement", html_content
@@ -0,0 +1,179 @@
+"""
+Pool de connexions SMTP réutilisables
+
+Ouvrir une connexion SMTP (TCP, STARTTLS, authentification) coûte plusieurs
+allers-retours : le pool garde jusqu'à ``SMTP_POOL_SIZE`` connexions
+ouvertes et les prête aux envois successifs. Une connexion inactive depuis
+plus de ``SMTP_POOL_MAX_IDLE_SECONDS`` secondes est fermée plutôt que
+réutilisée, et elle est renouvelée après ``SMTP_MAX_MESSAGES_PER_CONNECTION``
+messages (limite courante des serveurs).
+
+Une connexion coupée par le serveur est remplacée et l'envoi en cours
+retenté une fois.
+"""
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_IDLE_SECONDS = 60
+DEFAULT_MAX_MESSAGES_PER_CONNECTION = 100
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+class SMTPSettings:
+    """Paramètres de connexion lus dans la configuration de l'application"""
+
+    def __init__(self, config):
+        self.host = config.get('SMTP_SERVER')
+        self.port = config.get('SMTP_PORT', 587)
+        self.username = config.get('SMTP_USERNAME')
+        self.password = config.get('SMTP_PASSWORD')
+        self.sender = config.get('SENDER_EMAIL') or self.username
+        self.use_tls = config.get('SMTP_USE_TLS', True)
+        self.use_auth = config.get('SMTP_USE_AUTH', True)
+        self.timeout = config.get('SMTP_TIMEOUT', DEFAULT_TIMEOUT_SECONDS)
+        self.pool_size = config.get('SMTP_POOL_SIZE', DEFAULT_POOL_SIZE)
+        self.max_idle = config.get('SMTP_POOL_MAX_IDLE_SECONDS', DEFAULT_MAX_IDLE_SECONDS)
+        self.max_messages = config.get('SMTP_MAX_MESSAGES_PER_CONNECTION', DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+
+    @property
+    def key(self):
+        return (self.host, self.port, self.username, self.use_tls)
+
+    def is_complete(self):
+        if not (self.host and self.port):
+            return False
+        return bool(self.username and self.password) or not self.use_auth
+
+
+class _PooledConnection:
+    __slots__ = ('smtp', 'sent', 'released_at')
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+        self.released_at = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """Connexions SMTP ouvertes pour un serveur donné"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        settings = self.settings
+        smtp = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+        if settings.use_tls:
+            smtp.starttls()
+        if settings.use_auth and settings.username:
+            smtp.login(settings.username, settings.password)
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    def _acquire(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._open()
+            if now - connection.released_at <= self.settings.max_idle:
+                return connection
+            self._close(connection)
+
+    def _release(self, connection):
+        connection.released_at = time.monotonic()
+        with self._lock:
+            if connection.sent < self.settings.max_messages and len(self._idle) < self.settings.pool_size:
+                self._idle.append(connection)
+                return
+        self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """Connexion empruntée au pool ; rendue au pool si aucune erreur ne survient"""
+        connection = self._acquire()
+        try:
+            yield connection
+        except Exception:
+            self._close(connection)
+            raise
+        self._release(connection)
+
+    def send(self, sender, recipients, message):
+        """Envoie un message déjà formaté ; retente une fois si la connexion a été coupée"""
+        for attempt in (1, 2):
+            try:
+                with self.connection() as connection:
+                    connection.smtp.sendmail(sender, recipients, message)
+                    connection.sent += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                if attempt == 2:
+                    raise
+
+    def send_many(self, messages):
+        """
+        Envoie une série de ``(expéditeur, destinataires, message)``
+
+        Les messages partagent les connexions du pool, renouvelées tous les
+        ``max_messages`` envois. Retourne le nombre de messages envoyés ; un
+        échec n'interrompt pas les suivants.
+        """
+        sent = 0
+        for sender, recipients, message in messages:
+            try:
+                self.send(sender, recipients, message)
+                sent += 1
+            except Exception as exc:
+                logger.error(f"Erreur lors de l'envoi de l'email à {', '.join(recipients)}: {exc}")
+        return sent
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(config=None):
+    """Pool SMTP du serveur configuré (None si la configuration est incomplète)"""
+    settings = SMTPSettings(config if config is not None else current_app.config)
+    if not settings.is_complete():
+        return None
+    with _pools_lock:
+        pool = _pools.get(settings.key)
+        if pool is None:
+            pool = _pools[settings.key] = SMTPConnectionPool(settings)
+        else:
+            pool.settings = settings
+    return pool
+
+
+def close_smtp_pools():
+    """Ferme toutes les connexions gardées (arrêt du processus, tests)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
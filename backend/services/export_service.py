@@ -0,0 +1,333 @@
+"""
+Service d'export des données d'entreprise en flux
+
+Les sources de données parcourent la base par lots (``yield_per``, curseur
+côté serveur sous PostgreSQL) avec une seule jointure pour les noms
+d'utilisateurs ; les écrivains produisent le fichier morceau par morceau.
+La mémoire utilisée reste donc la même pour 1k ou 10M de lignes.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+from backend.database import db
+from backend.models.invoice import Invoice
+from backend.models.leave_request import LeaveRequest
+from backend.models.leave_type import LeaveType
+from backend.models.payment import Payment
+from backend.models.pointage import Pointage
+from backend.models.user import User
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - openpyxl est optionnel
+    Workbook = None
+
+# Nombre de lignes lues par aller-retour avec la base
+YIELD_PER = 1000
+# Nombre de lignes CSV/JSON regroupées dans un morceau de réponse
+ROWS_PER_CHUNK = 500
+# Au-delà de cette taille, le fichier XLSX temporaire est écrit sur disque
+XLSX_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+FILE_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = ('csv', 'excel', 'json', 'ndjson')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_EXTENSIONS = {'csv': 'csv', 'excel': 'xlsx', 'json': 'json', 'ndjson': 'ndjson'}
+
+EXPORT_COLUMNS = {
+    'employees': (
+        'id', 'nom', 'prenom', 'email', 'role', 'date_creation', 'telephone',
+        'departement', 'position', 'statut',
+    ),
+    'attendance': (
+        'id', 'employe_nom', 'type', 'date_pointage', 'heure_arrivee', 'heure_depart',
+        'statut', 'latitude', 'longitude', 'accuracy', 'altitude', 'heading', 'speed',
+        'device_id',
+    ),
+    'leaves': (
+        'id', 'employe', 'type_conge', 'date_debut', 'date_fin', 'jours_demandes',
+        'statut', 'motif', 'approbateur', 'commentaires', 'date_demande',
+    ),
+    'billing': (
+        'id', 'numero', 'montant', 'devise', 'date_emission', 'date_echeance',
+        'statut', 'date_paiement', 'methode_paiement', 'operateur',
+    ),
+}
+
+FILENAME_PREFIXES = {
+    'employees': 'employes',
+    'attendance': 'pointages',
+    'leaves': 'conges',
+    'billing': 'factures',
+}
+
+
+def _stream(statement):
+    """Exécute ``statement`` en lisant les résultats par lots de ``YIELD_PER``"""
+    return db.session.execute(statement.execution_options(yield_per=YIELD_PER))
+
+
+def _format(value, fmt):
+    return value.strftime(fmt) if value else None
+
+
+def iter_employees(company_id):
+    """Employés de l'entreprise"""
+    statement = select(
+        User.id, User.nom, User.prenom, User.email, User.role, User.created_at,
+        User.phone, User.is_active,
+    ).where(User.company_id == company_id).order_by(User.id)
+
+    for row in _stream(statement):
+        yield {
+            'id': row.id,
+            'nom': row.nom,
+            'prenom': row.prenom,
+            'email': row.email,
+            'role': row.role,
+            'date_creation': _format(row.created_at, '%Y-%m-%d %H:%M:%S'),
+            'telephone': row.phone or '',
+            'departement': '',
+            'position': '',
+            'statut': 'Actif' if row.is_active else 'Inactif',
+        }
+
+
+def iter_attendance(company_id):
+    """Pointages des employés de l'entreprise, avec le nom de l'employé"""
+    statement = select(
+        Pointage.id, User.nom, User.prenom, Pointage.type, Pointage.date_pointage,
+        Pointage.heure_arrivee, Pointage.heure_depart, Pointage.statut,
+        Pointage.latitude, Pointage.longitude, Pointage.accuracy, Pointage.altitude,
+        Pointage.heading, Pointage.speed, Pointage.device_id,
+    ).join(User, Pointage.user_id == User.id).where(
+        User.company_id == company_id
+    ).order_by(Pointage.id)
+
+    for row in _stream(statement):
+        yield {
+            'id': row.id,
+            'employe_nom': f"{row.nom} {row.prenom}",
+            'type': row.type,
+            'date_pointage': _format(row.date_pointage, '%Y-%m-%d'),
+            'heure_arrivee': _format(row.heure_arrivee, '%H:%M:%S'),
+            'heure_depart': _format(row.heure_depart, '%H:%M:%S'),
+            'statut': row.statut,
+            'latitude': row.latitude,
+            'longitude': row.longitude,
+            'accuracy': row.accuracy,
+            'altitude': row.altitude,
+            'heading': row.heading,
+            'speed': row.speed,
+            'device_id': row.device_id,
+        }
+
+
+def iter_leaves(company_id):
+    """Demandes de congé des employés de l'entreprise"""
+    approver = aliased(User)
+    statement = select(
+        LeaveRequest.id, User.nom, User.prenom, LeaveType.name.label('leave_type_name'),
+        LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.requested_days,
+        LeaveRequest.status, LeaveRequest.reason, LeaveRequest.approver_comments,
+        LeaveRequest.created_at,
+        approver.nom.label('approver_nom'), approver.prenom.label('approver_prenom'),
+    ).join(User, LeaveRequest.user_id == User.id).join(
+        LeaveType, LeaveRequest.leave_type_id == LeaveType.id
+    ).outerjoin(
+        approver, LeaveRequest.approved_by_id == approver.id
+    ).where(User.company_id == company_id).order_by(LeaveRequest.id)
+
+    for row in _stream(statement):
+        yield {
+            'id': row.id,
+            'employe': f"{row.nom} {row.prenom}",
+            'type_conge': row.leave_type_name,
+            'date_debut': _format(row.start_date, '%Y-%m-%d'),
+            'date_fin': _format(row.end_date, '%Y-%m-%d'),
+            'jours_demandes': row.requested_days,
+            'statut': row.status,
+            'motif': row.reason,
+            'approbateur': f"{row.approver_nom} {row.approver_prenom}" if row.approver_nom else None,
+            'commentaires': row.approver_comments,
+            'date_demande': _format(row.created_at, '%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def iter_billing(company_id):
+    """Factures de l'entreprise avec le dernier paiement associé"""
+    last_payment = select(
+        Payment.invoice_id, func.max(Payment.id).label('payment_id')
+    ).group_by(Payment.invoice_id).subquery()
+
+    statement = select(
+        Invoice.id, Invoice.amount, Invoice.created_at, Invoice.due_date, Invoice.status,
+        Invoice.paid_date, Payment.payment_method, Payment.mobile_money_operator,
+    ).outerjoin(
+        last_payment, last_payment.c.invoice_id == Invoice.id
+    ).outerjoin(
+        Payment, Payment.id == last_payment.c.payment_id
+    ).where(Invoice.company_id == company_id).order_by(Invoice.id)
+
+    for row in _stream(statement):
+        yield {
+            'id': row.id,
+            'numero': f"INV-{row.id:06d}",
+            'montant': row.amount,
+            'devise': 'FCFA',
+            'date_emission': _format(row.created_at, '%Y-%m-%d'),
+            'date_echeance': _format(row.due_date, '%Y-%m-%d'),
+            'statut': row.status,
+            'date_paiement': _format(row.paid_date, '%Y-%m-%d'),
+            'methode_paiement': row.payment_method or 'Non spécifié',
+            'operateur': row.mobile_money_operator or '',
+        }
+
+
+EXPORT_SOURCES = {
+    'employees': iter_employees,
+    'attendance': iter_attendance,
+    'leaves': iter_leaves,
+    'billing': iter_billing,
+}
+
+
+def iter_export_rows(data_type, company_id):
+    """Retourne un itérateur de lignes, ou None s'il n'y a aucune donnée.
+
+    La première ligne est lue immédiatement pour pouvoir répondre 404 avant
+    de commencer à envoyer le fichier.
+    """
+    rows = EXPORT_SOURCES[data_type](company_id)
+    first = next(rows, None)
+    if first is None:
+        return None
+    return chain((first,), rows)
+
+
+def csv_chunks(columns, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Produit le CSV (UTF-8 avec BOM pour Excel) par morceaux de ``rows_per_chunk`` lignes"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    buffer.write('\ufeff')
+    writer.writeheader()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Produit une ligne JSON par enregistrement"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(lines) >= rows_per_chunk:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def json_array_chunks(rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Produit un tableau JSON sans le construire en mémoire"""
+    yield b'['
+    separator = ''
+    lines = []
+    for row in rows:
+        lines.append(separator + json.dumps(row, ensure_ascii=False, default=str))
+        separator = ','
+        if len(lines) >= rows_per_chunk:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+    yield b']'
+
+
+def write_xlsx(columns, rows):
+    """Écrit un classeur XLSX en mode écriture seule ; retourne le fichier temporaire rembobiné.
+
+    Le fichier est en mémoire jusqu'à ``XLSX_SPOOL_MAX_SIZE`` puis sur disque ;
+    l'appelant doit le fermer (voir ``file_chunks``), ce qui le supprime.
+    """
+    if Workbook is None:
+        raise RuntimeError("openpyxl n'est pas installé")
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(columns))
+    for row in rows:
+        sheet.append([row.get(column) for column in columns])
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE, suffix='.xlsx')
+    workbook.save(spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def text_export_chunks(data_type, format_type, rows):
+    """Morceaux d'un export texte (``csv``, ``json`` ou ``ndjson``)"""
+    if format_type == 'csv':
+        return csv_chunks(EXPORT_COLUMNS[data_type], rows)
+    if format_type == 'ndjson':
+        return ndjson_chunks(rows)
+    return json_array_chunks(rows)
+
+
+def export_filename(data_type, format_type):
+    return (
+        f"{FILENAME_PREFIXES[data_type]}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        f".{EXPORT_EXTENSIONS[format_type]}"
+    )
+
+
+def write_export_file(data_type, format_type, company_id):
+    """Écrit l'export complet dans un fichier temporaire rembobiné, ou retourne None sans données"""
+    rows = iter_export_rows(data_type, company_id)
+    if rows is None:
+        return None
+    if format_type == 'excel':
+        return write_xlsx(EXPORT_COLUMNS[data_type], rows)
+
+    spooled = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    for chunk in text_export_chunks(data_type, format_type, rows):
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def file_chunks(fileobj, chunk_size=FILE_CHUNK_SIZE):
+    """Lit ``fileobj`` par morceaux puis le ferme"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
@@ -0,0 +1,191 @@
+"""
+Acquisition ensembliste des congés (``flask accrue-leave``)
+
+Au lieu d'une boucle utilisateur × type de congé (recherche d'idempotence
+dans ``audit_logs``, lecture du solde, écriture d'audit pour chaque paire),
+l'acquisition traite une entreprise à la fois :
+
+* une requête lit toutes les paires (utilisateur actif, type acquis) de
+  l'entreprise avec leur solde, en excluant celles déjà inscrites au
+  registre ``leave_accruals`` pour la période ;
+* le report plafonné (``max_carry_over_days``) et le nouveau solde sont
+  calculés colonne par colonne ;
+* le registre est alimenté par un ``INSERT`` multi-lignes et les soldes par
+  un UPSERT groupé qui ajoute la variation au solde courant (une déduction
+  concurrente n'est pas écrasée).
+
+Toutes les entreprises sont traitées dans une seule transaction : la
+contrainte unique du registre fait échouer une exécution concurrente pour
+la même période au lieu de créditer deux fois. En simulation (``dry_run``),
+les lignes calculées sont retournées sans rien écrire.
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, exists, or_, select
+
+from backend.database import db, dialect_insert
+from backend.models.audit_log import AuditLog
+from backend.models.leave_accrual import LeaveAccrual
+from backend.models.leave_balance import LeaveBalance
+from backend.models.leave_type import LeaveType
+from backend.models.user import User
+
+# Action d'audit de l'ancien traitement par paire, encore consultée pour l'idempotence
+LEGACY_ACCRUAL_ACTION = 'ANNUAL_LEAVE_ACCRUAL'
+
+Accruals = LeaveAccrual.__table__
+Balances = LeaveBalance.__table__
+
+
+def _legacy_accruals(period):
+    """Paires ``(utilisateur, type)`` acquises pour ``period`` par l'ancien traitement (journal d'audit)"""
+    rows = db.session.scalars(
+        select(AuditLog.details).where(
+            AuditLog.action == LEGACY_ACCRUAL_ACTION,
+            AuditLog.resource_type == 'LeaveBalance',
+            AuditLog.details.contains(f'"accrual_year": {period}'),
+        )
+    )
+    pairs = set()
+    for details in rows:
+        try:
+            data = json.loads(details)
+            pairs.add((data['target_user_id'], data['leave_type_id']))
+        except (TypeError, ValueError, KeyError):
+            continue
+    return pairs
+
+
+def _companies(company_id=None, user_id=None):
+    query = select(User.company_id).where(User.is_active.is_(True)).distinct()
+    if company_id:
+        query = query.where(User.company_id == company_id)
+    if user_id:
+        query = query.where(User.id == user_id)
+    return list(db.session.scalars(query))
+
+
+def _pending_pairs(company_id, period, user_id=None, leave_type_id=None):
+    """Paires à acquérir d'une entreprise : ``(user_id, leave_type_id, jours, plafond, solde)``"""
+    same_company = LeaveType.company_id.is_(None) if company_id is None else \
+        or_(LeaveType.company_id == company_id, LeaveType.company_id.is_(None))
+    already_accrued = exists().where(
+        LeaveAccrual.user_id == User.id,
+        LeaveAccrual.leave_type_id == LeaveType.id,
+        LeaveAccrual.period == period,
+    )
+    query = (
+        select(User.id, LeaveType.id, LeaveType.annual_accrual_days, LeaveType.max_carry_over_days,
+               LeaveBalance.balance_days)
+        .select_from(User)
+        .join(LeaveType, same_company)
+        .outerjoin(LeaveBalance, and_(LeaveBalance.user_id == User.id, LeaveBalance.leave_type_id == LeaveType.id))
+        .where(
+            User.company_id.is_(None) if company_id is None else User.company_id == company_id,
+            User.is_active.is_(True),
+            LeaveType.is_active.is_(True),
+            LeaveType.annual_accrual_days > 0,
+            ~already_accrued,
+        )
+        .order_by(User.id, LeaveType.id)
+    )
+    if user_id:
+        query = query.where(User.id == user_id)
+    if leave_type_id:
+        query = query.where(LeaveType.id == leave_type_id)
+    return db.session.execute(query).all()
+
+
+def compute_accruals(rows):
+    """
+    Calcule les acquisitions de ``rows`` (colonnes de ``_pending_pairs``)
+
+    Le solde positif reporté est plafonné à ``max_carry_over_days`` s'il est
+    défini ; un solde négatif est reporté tel quel.
+    """
+    if not rows:
+        return []
+    user_ids, type_ids, accrued, caps, balances = zip(*rows)
+    previous = [balance or 0.0 for balance in balances]
+    carried = [balance if cap is None else min(balance, cap) for balance, cap in zip(previous, caps)]
+    new_balances = [kept + days for kept, days in zip(carried, accrued)]
+    return [
+        {
+            'user_id': user_id, 'leave_type_id': type_id, 'previous_balance': old,
+            'carried_over': kept, 'accrued_days': days, 'new_balance': new,
+        }
+        for user_id, type_id, old, kept, days, new
+        in zip(user_ids, type_ids, previous, carried, accrued, new_balances)
+    ]
+
+
+def _write(company_id, period, lines, now):
+    connection = db.session.connection()
+    connection.execute(
+        Accruals.insert(),
+        [dict(line, company_id=company_id, period=period, created_at=now) for line in lines],
+    )
+    # La variation (et non le solde calculé) est ajoutée au solde courant
+    statement = dialect_insert(connection, Balances)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=['user_id', 'leave_type_id'],
+            set_={'balance_days': Balances.c.balance_days + statement.excluded.balance_days,
+                  'last_updated': statement.excluded.last_updated},
+        ),
+        [
+            {'user_id': line['user_id'], 'leave_type_id': line['leave_type_id'],
+             'balance_days': line['new_balance'] - line['previous_balance'], 'last_updated': now}
+            for line in lines
+        ],
+    )
+    AuditLog.log_action(
+        user_email='system@pointflex.com',
+        action=LEGACY_ACCRUAL_ACTION,
+        resource_type='LeaveAccrual',
+        details={
+            'company_id': company_id,
+            'accrual_year': period,
+            'accruals': len(lines),
+            'accrued_days': sum(line['accrued_days'] for line in lines),
+        },
+    )
+
+
+def accrue_leave(period, company_id=None, user_id=None, leave_type_id=None, dry_run=False):
+    """
+    Acquisition de la période ``period`` (par exemple l'année)
+
+    Returns:
+        dict: ``{'period', 'dry_run', 'lines', 'skipped'}`` ; chaque ligne
+        porte l'entreprise, l'utilisateur, le type, le solde précédent, le
+        report, les jours acquis et le nouveau solde. ``skipped`` compte les
+        paires déjà acquises par l'ancien traitement.
+    """
+    period = str(period)
+    legacy = _legacy_accruals(period)
+    now = datetime.utcnow()
+    result = {'period': period, 'dry_run': dry_run, 'lines': [], 'skipped': 0}
+
+    try:
+        for company in _companies(company_id, user_id):
+            rows = _pending_pairs(company, period, user_id=user_id, leave_type_id=leave_type_id)
+            if legacy:
+                kept = [row for row in rows if (row[0], row[1]) not in legacy]
+                result['skipped'] += len(rows) - len(kept)
+                rows = kept
+            lines = compute_accruals(rows)
+            if not lines:
+                continue
+            if not dry_run:
+                _write(company, period, lines, now)
+            result['lines'].extend(dict(line, company_id=company) for line in lines)
+        if not dry_run:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
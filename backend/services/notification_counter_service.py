@@ -0,0 +1,367 @@
+"""
+Compteurs de notifications non lues et récentes
+
+Les compteurs (``notification_counters`` par utilisateur et par entreprise,
+``notification_daily_counts`` par entreprise et par jour) évitent de compter
+les notifications à chaque appel de ``/notifications/count`` ou des
+statistiques entreprise.
+
+Mise à jour dans la transaction qui modifie les notifications :
+
+* un écouteur ``after_flush`` repère les notifications créées, lues ou
+  supprimées par l'ORM (quelle que soit la route) ;
+* les écritures groupées hors ORM (envoi en masse, « tout marquer comme
+  lu ») appellent ``record_changes`` avec les variations connues.
+
+Chaque variation est un ``UPDATE ... SET unread_count = unread_count + :d``
+atomique. Un compteur absent est initialisé à partir des notifications
+elles-mêmes, ce qui inclut déjà la variation en cours.
+
+Après le commit, le nouveau nombre de non lues est publié en SSE
+(événement ``notification_count`` sur le canal ``user_<id>``) ; les clients
+n'ont plus à interroger ``/notifications/count``. ``reconcile_notification_counters``
+(``flask reconcile-notification-counters``) corrige les dérives éventuelles
+(modifications SQL directes, initialisations concurrentes).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, case, delete, event, func, inspect, literal, select, update
+from sqlalchemy.orm import Session
+
+from backend.database import db, dialect_insert
+from backend.models.notification import Notification
+from backend.models.notification_counter import NotificationCounter, NotificationDailyCount
+from backend.models.user import User
+from backend.sse import publish_many
+
+logger = logging.getLogger(__name__)
+
+# Fenêtre des notifications « récentes » des statistiques entreprise
+RECENT_DAYS = 30
+# Clé de ``Session.info`` : ``{user_id: non lues}`` à publier après le commit
+PENDING_KEY = 'notification_counts'
+
+SCOPE_USER = NotificationCounter.SCOPE_USER
+SCOPE_COMPANY = NotificationCounter.SCOPE_COMPANY
+
+Counters = NotificationCounter.__table__
+Daily = NotificationDailyCount.__table__
+Notifications = Notification.__table__
+
+
+def _unread_sum():
+    return func.coalesce(func.sum(case((Notifications.c.is_read.is_(False), 1), else_=0)), 0)
+
+
+# Valeurs de référence -----------------------------------------------------------
+def _user_truth(connection, user_ids=None, company_id=None):
+    """``{user_id: (non lues, total)}`` calculé sur les notifications"""
+    query = (
+        select(User.id, _unread_sum(), func.count(Notifications.c.id))
+        .select_from(User)
+        .outerjoin(Notifications, Notifications.c.user_id == User.id)
+        .group_by(User.id)
+    )
+    if user_ids is not None:
+        query = query.where(User.id.in_(user_ids))
+    if company_id is not None:
+        query = query.where(User.company_id == company_id)
+    return {user_id: (int(unread), int(total)) for user_id, unread, total in connection.execute(query)}
+
+
+def _company_truth(connection, company_ids=None):
+    """``{company_id: (non lues, total)}`` ; ``(0, 0)`` pour les entreprises demandées sans notification"""
+    query = (
+        select(User.company_id, _unread_sum(), func.count(Notifications.c.id))
+        .select_from(Notifications)
+        .join(User, User.id == Notifications.c.user_id)
+        .where(User.company_id.isnot(None))
+        .group_by(User.company_id)
+    )
+    if company_ids is not None:
+        query = query.where(User.company_id.in_(company_ids))
+    truth = {company_id: (0, 0) for company_id in company_ids or ()}
+    truth.update(
+        (company_id, (int(unread), int(total))) for company_id, unread, total in connection.execute(query)
+    )
+    return truth
+
+
+def _rebuild_daily_counts(connection, company_ids=None, today=None):
+    """Recalcule les compteurs journaliers de la fenêtre récente"""
+    since = (today or datetime.utcnow().date()) - timedelta(days=RECENT_DAYS - 1)
+    conditions = [Daily.c.day >= since]
+    if company_ids is not None:
+        conditions.append(Daily.c.company_id.in_(company_ids))
+    connection.execute(delete(Daily).where(*conditions))
+
+    day = func.date(Notifications.c.created_at)
+    source = (
+        select(User.company_id, day, func.count(Notifications.c.id))
+        .select_from(Notifications)
+        .join(User, User.id == Notifications.c.user_id)
+        .where(User.company_id.isnot(None),
+               Notifications.c.created_at >= datetime.combine(since, datetime.min.time()))
+        .group_by(User.company_id, day)
+    )
+    if company_ids is not None:
+        source = source.where(User.company_id.in_(company_ids))
+    connection.execute(
+        Daily.insert().from_select(['company_id', 'day', 'created_count'], source)
+    )
+
+
+# Compteurs -----------------------------------------------------------------------
+def _read_counters(connection, scope, scope_ids):
+    rows = connection.execute(
+        select(Counters.c.scope_id, Counters.c.unread_count, Counters.c.total_count)
+        .where(Counters.c.scope == scope, Counters.c.scope_id.in_(scope_ids))
+    )
+    return {scope_id: (unread, total) for scope_id, unread, total in rows}
+
+
+def _seed_counters(connection, scope, scope_ids, now):
+    """Crée les compteurs absents à partir des notifications ; retourne les ids créés"""
+    truth = _user_truth(connection, user_ids=scope_ids) if scope == SCOPE_USER \
+        else _company_truth(connection, company_ids=scope_ids)
+    if not truth:
+        return set()
+    connection.execute(
+        dialect_insert(connection, Counters).on_conflict_do_nothing(),
+        [
+            {'scope': scope, 'scope_id': scope_id, 'unread_count': unread, 'total_count': total,
+             'updated_at': now}
+            for scope_id, (unread, total) in truth.items()
+        ],
+    )
+    if scope == SCOPE_COMPANY:
+        _rebuild_daily_counts(connection, company_ids=list(truth), today=now.date())
+    return set(truth)
+
+
+def _ensure_counters(connection, scope, scope_ids, now=None):
+    """``{id: (non lues, total)}``, en initialisant les compteurs absents"""
+    scope_ids = list(dict.fromkeys(scope_ids))
+    values = _read_counters(connection, scope, scope_ids)
+    missing = [scope_id for scope_id in scope_ids if scope_id not in values]
+    if missing:
+        _seed_counters(connection, scope, missing, now or datetime.utcnow())
+        values.update(_read_counters(connection, scope, missing))
+    return values
+
+
+def _apply_deltas(connection, scope, deltas, now):
+    """Applique ``{id: (Δ non lues, Δ total)}`` ; retourne ``(non lues par id, ids initialisés)``"""
+    unread_by_id = {}
+    by_delta = defaultdict(list)
+    for scope_id, delta in deltas.items():
+        by_delta[delta].append(scope_id)
+    for (unread_delta, total_delta), scope_ids in by_delta.items():
+        rows = connection.execute(
+            update(Counters)
+            .where(Counters.c.scope == scope, Counters.c.scope_id.in_(scope_ids))
+            .values(
+                unread_count=Counters.c.unread_count + unread_delta,
+                total_count=Counters.c.total_count + total_delta,
+                updated_at=now,
+            )
+            .returning(Counters.c.scope_id, Counters.c.unread_count)
+        )
+        unread_by_id.update(rows.all())
+
+    # Compteur absent : la valeur initiale inclut déjà la variation
+    missing = [scope_id for scope_id in deltas if scope_id not in unread_by_id]
+    seeded = set()
+    if missing:
+        seeded = _seed_counters(connection, scope, missing, now)
+        unread_by_id.update(
+            (scope_id, unread) for scope_id, (unread, _total) in _read_counters(connection, scope, missing).items()
+        )
+    return unread_by_id, seeded
+
+
+def apply_changes(connection, changes, now=None):
+    """Applique ``{user_id: (Δ non lues, Δ total, créées)}`` ; retourne ``{user_id: non lues}``"""
+    changes = {user_id: change for user_id, change in changes.items() if user_id and any(change)}
+    if not changes:
+        return {}
+    now = now or datetime.utcnow()
+
+    unread_by_user, _ = _apply_deltas(
+        connection, SCOPE_USER, {user_id: (unread, total) for user_id, (unread, total, _) in changes.items()}, now
+    )
+
+    company_of = dict(connection.execute(select(User.id, User.company_id).where(User.id.in_(changes))).all())
+    company_changes = defaultdict(lambda: [0, 0, 0])
+    for user_id, change in changes.items():
+        company_id = company_of.get(user_id)
+        if company_id is not None:
+            company_changes[company_id] = [a + b for a, b in zip(company_changes[company_id], change)]
+    if company_changes:
+        _, seeded = _apply_deltas(
+            connection, SCOPE_COMPANY,
+            {company_id: (unread, total) for company_id, (unread, total, _) in company_changes.items()
+             if unread or total},
+            now,
+        )
+        created = [
+            {'company_id': company_id, 'day': now.date(), 'created_count': change[2]}
+            for company_id, change in company_changes.items() if change[2] > 0 and company_id not in seeded
+        ]
+        if created:
+            statement = dialect_insert(connection, Daily)
+            connection.execute(
+                statement.on_conflict_do_update(
+                    index_elements=['company_id', 'day'],
+                    set_={'created_count': Daily.c.created_count + statement.excluded.created_count},
+                ),
+                created,
+            )
+    return unread_by_user
+
+
+def record_changes(session, changes):
+    """Applique des variations connues dans la transaction de ``session`` (écritures hors ORM)"""
+    counts = apply_changes(session.connection(), changes)
+    if counts:
+        session.info.setdefault(PENDING_KEY, {}).update(counts)
+    return counts
+
+
+# Lecture -------------------------------------------------------------------------
+def get_unread_count(user_id):
+    """Nombre de notifications non lues de ``user_id`` (compteur initialisé au besoin)"""
+    values = _ensure_counters(db.session.connection(), SCOPE_USER, [user_id])
+    db.session.commit()
+    unread, _total = values.get(user_id, (0, 0))
+    return unread
+
+
+def get_company_notification_stats(company_id):
+    """Totaux, non lues et notifications des ``RECENT_DAYS`` derniers jours d'une entreprise"""
+    connection = db.session.connection()
+    unread, total = _ensure_counters(connection, SCOPE_COMPANY, [company_id]).get(company_id, (0, 0))
+    since = datetime.utcnow().date() - timedelta(days=RECENT_DAYS - 1)
+    recent = connection.execute(
+        select(func.coalesce(func.sum(Daily.c.created_count), 0))
+        .where(Daily.c.company_id == company_id, Daily.c.day >= since)
+    ).scalar()
+    db.session.commit()
+    return {'total': total, 'unread': unread, 'recent': int(recent)}
+
+
+# Réconciliation ------------------------------------------------------------------
+def _stored_counters(connection, scope, company_id=None):
+    query = select(Counters.c.scope_id, Counters.c.unread_count, Counters.c.total_count) \
+        .where(Counters.c.scope == scope)
+    if company_id is not None:
+        scope_ids = select(User.id).where(User.company_id == company_id) if scope == SCOPE_USER \
+            else select(literal(company_id))
+        query = query.where(Counters.c.scope_id.in_(scope_ids))
+    return {scope_id: (unread, total) for scope_id, unread, total in connection.execute(query)}
+
+
+def _repair(connection, scope, truth, stored, now):
+    drifted = [
+        {'scope_id': scope_id, 'unread_count': unread, 'total_count': total}
+        for scope_id, (unread, total) in truth.items() if stored[scope_id] != (unread, total)
+    ]
+    if drifted:
+        connection.execute(
+            update(Counters)
+            .where(Counters.c.scope == scope, Counters.c.scope_id == bindparam('b_scope_id'))
+            .values(unread_count=bindparam('b_unread'), total_count=bindparam('b_total'), updated_at=now),
+            [{'b_scope_id': row['scope_id'], 'b_unread': row['unread_count'], 'b_total': row['total_count']}
+             for row in drifted],
+        )
+    return drifted
+
+
+def reconcile_notification_counters(company_id=None):
+    """Recalcule les compteurs existants à partir des notifications et corrige ceux qui ont dérivé
+
+    Les compteurs absents ne sont pas créés : ils le seront à la première
+    utilisation. Retourne ``{'users': corrigés, 'companies': corrigés}``.
+    """
+    connection = db.session.connection()
+    now = datetime.utcnow()
+
+    stored_users = _stored_counters(connection, SCOPE_USER, company_id)
+    user_truth = _user_truth(connection, user_ids=list(stored_users)) if stored_users else {}
+    repaired_users = _repair(connection, SCOPE_USER, user_truth, stored_users, now)
+
+    stored_companies = _stored_counters(connection, SCOPE_COMPANY, company_id)
+    company_truth = _company_truth(connection, company_ids=list(stored_companies)) if stored_companies else {}
+    repaired_companies = _repair(connection, SCOPE_COMPANY, company_truth, stored_companies, now)
+
+    _rebuild_daily_counts(connection, company_ids=[company_id] if company_id else None, today=now.date())
+    db.session.commit()
+
+    if repaired_users:
+        logger.warning(f"Compteurs de notifications corrigés pour {len(repaired_users)} utilisateur(s)")
+        publish_unread_counts({row['scope_id']: row['unread_count'] for row in repaired_users})
+    return {'users': len(repaired_users), 'companies': len(repaired_companies)}
+
+
+# SSE -----------------------------------------------------------------------------
+def publish_unread_counts(counts):
+    """Publie ``{user_id: non lues}`` en un lot SSE ``notification_count``"""
+    try:
+        publish_many(
+            [(f'user_{user_id}', {'unread_count': unread}) for user_id, unread in counts.items()],
+            type='notification_count',
+        )
+    except Exception as e:
+        current_app.logger.error(f"Erreur lors de la publication des compteurs de notifications: {e}")
+
+
+# Écouteurs de session ------------------------------------------------------------
+def _orm_changes(session):
+    changes = defaultdict(lambda: [0, 0, 0])
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            change = changes[obj.user_id]
+            change[1] += 1
+            change[2] += 1
+            if not obj.is_read:
+                change[0] += 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            if history.deleted and history.added and bool(history.deleted[0]) != bool(history.added[0]):
+                changes[obj.user_id][0] += -1 if history.added[0] else 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            change = changes[obj.user_id]
+            change[1] -= 1
+            if not obj.is_read:
+                change[0] -= 1
+    return changes
+
+
+def _after_flush(session, flush_context):
+    changes = _orm_changes(session)
+    if changes:
+        record_changes(session, changes)
+
+
+def _after_commit(session):
+    counts = session.info.pop(PENDING_KEY, None)
+    if counts:
+        publish_unread_counts(counts)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_counter_hooks():
+    """Active la mise à jour des compteurs pour toutes les sessions (idempotent)"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
@@ -0,0 +1,363 @@
+"""
+Synchronisation groupée des événements de pointage hors ligne
+
+L'application mobile met en file les pointages faits sans réseau (arrivée,
+départ, début et fin de pause) et les renvoie en un seul appel à la
+reconnexion. Chaque événement porte une clé d'idempotence générée par le
+client.
+
+Pour un lot :
+
+* les résultats déjà enregistrés (``OfflineSyncReceipt``) sont relus en une
+  requête : un lot renvoyé après une coupure ne crée aucun doublon ;
+* les pointages et pauses ouvertes des jours concernés sont chargés en une
+  requête chacun, et le géorepérage utilise l'index spatial des bureaux de
+  l'entreprise (``get_office_index``), chargé une seule fois ;
+* les événements sont appliqués dans l'ordre chronologique puis validés avec
+  leurs résultats par un seul commit.
+
+Le résultat de chaque événement est renvoyé individuellement ; un événement
+rejeté n'empêche pas l'application des autres.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from backend.database import db
+from backend.models.offline_sync_receipt import OfflineSyncReceipt
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.services.outbox_service import add_outbox_event, relay_outbox_if_sync
+from backend.utils.geo_utils import calculate_distance, get_office_index, is_finite_number, valid_coordinates
+
+EVENT_TYPES = ('checkin', 'checkout', 'pause_start', 'pause_end')
+MAX_KEY_LENGTH = 64
+
+
+class _Rejected(Exception):
+    """Événement refusé (message et code HTTP de l'élément)"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _parse_timestamp(value):
+    """Horodatage ISO 8601 en UTC naïf (comme ``datetime.utcnow()``)"""
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise _Rejected("Format d'horodatage invalide", 400)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class _Geofence:
+    """Bureaux actifs et bureau de repli de l'entreprise, chargés une fois par lot"""
+
+    def __init__(self, user):
+        self.company = user.company if user.company_id else None
+        self.index = get_office_index(user.company_id) if user.company_id else None
+
+    def locate(self, coordinates):
+        """Retourne ``(office_id, distance)`` ou lève ``_Rejected`` hors zone"""
+        latitude, longitude = coordinates['latitude'], coordinates['longitude']
+        if self.company is None:
+            return None, None
+        if self.index is not None and len(self.index):
+            entry, distance = self.index.nearest(latitude, longitude)
+            # L'entreprise a des bureaux actifs : pas de repli sur le bureau de l'entreprise
+            if entry is None:
+                raise _Rejected("Aucun bureau trouvé pour ces coordonnées", 403)
+            if distance > entry['radius']:
+                raise _Rejected(
+                    f"Vous êtes trop loin du bureau ({int(distance)}m). Rayon autorisé: {entry['radius']}m",
+                    403,
+                )
+            return entry['id'], distance
+        company = self.company
+        if company.office_latitude and company.office_longitude:
+            distance = calculate_distance(latitude, longitude, company.office_latitude, company.office_longitude)
+            if distance > company.office_radius:
+                raise _Rejected(
+                    f"Vous êtes trop loin du bureau ({int(distance)}m). Rayon autorisé: {company.office_radius}m",
+                    403,
+                )
+        return None, None
+
+
+class _BatchState:
+    """Pointages et pauses ouvertes des jours du lot (par date), tenus à jour en mémoire"""
+
+    def __init__(self, user_id, days):
+        self.pointages = {}
+        self.open_pauses = {}
+        if not days:
+            return
+        for pointage in Pointage.query.filter(
+            Pointage.user_id == user_id, Pointage.date_pointage.in_(days)
+        ).order_by(Pointage.id):
+            self.pointages.setdefault(pointage.date_pointage, pointage)
+        days_by_pointage = {p.id: day for day, p in self.pointages.items()}
+        if days_by_pointage:
+            for pause in Pause.query.filter(Pause.pointage_id.in_(days_by_pointage), Pause.end_time.is_(None)):
+                self.open_pauses[days_by_pointage[pause.pointage_id]] = pause
+
+
+def _validate_coordinates(coordinates, max_accuracy):
+    if not isinstance(coordinates, dict) or coordinates.get('latitude') is None \
+            or coordinates.get('longitude') is None:
+        raise _Rejected("Coordonnées GPS requises", 400)
+    if coordinates.get('accuracy') is None:
+        raise _Rejected("Précision GPS requise", 400)
+    if not valid_coordinates(coordinates['latitude'], coordinates['longitude']):
+        raise _Rejected("Coordonnées GPS invalides", 400)
+    if not is_finite_number(coordinates['accuracy']) or coordinates['accuracy'] < 0:
+        raise _Rejected("Précision GPS invalide", 400)
+    for field in ('altitude', 'heading', 'speed'):
+        if coordinates.get(field) is not None and not is_finite_number(coordinates[field]):
+            raise _Rejected(f"Valeur GPS invalide: {field}", 400)
+    if coordinates['accuracy'] > max_accuracy:
+        raise _Rejected(
+            f"Précision de localisation insuffisante ({int(coordinates['accuracy'])}m). "
+            f"Maximum autorisé: {max_accuracy}m",
+            400,
+        )
+
+
+def _apply_event(user, event, dt, state, geofence, config):
+    """Applique un événement ; retourne ``(message, pointage, pause)``"""
+    event_type = event['type']
+    day = dt.date()
+    pointage = state.pointages.get(day)
+
+    if event_type == 'checkin':
+        coordinates = event.get('coordinates') or {}
+        _validate_coordinates(coordinates, config['max_accuracy'])
+        if pointage is not None:
+            raise _Rejected("Un pointage existe déjà pour cette date", 409)
+        office_id, distance = geofence.locate(coordinates)
+        pointage = Pointage(
+            user_id=user.id,
+            type='office',
+            date_pointage=day,
+            heure_arrivee=dt.time(),
+            latitude=coordinates['latitude'],
+            longitude=coordinates['longitude'],
+            accuracy=coordinates.get('accuracy'),
+            altitude=coordinates.get('altitude'),
+            heading=coordinates.get('heading'),
+            speed=coordinates.get('speed'),
+            office_id=office_id,
+            distance=distance,
+            sync_status='synced',
+            is_offline=True,
+            offline_timestamp=dt,
+            device_id=event.get('device_id'),
+        )
+        db.session.add(pointage)
+        state.pointages[day] = pointage
+        return "Pointage hors ligne synchronisé", pointage, None
+
+    if pointage is None:
+        raise _Rejected("Pas de pointage d'arrivée pour cette date", 404)
+
+    if event_type == 'checkout':
+        if pointage.heure_depart:
+            raise _Rejected("Heure de départ déjà enregistrée", 409)
+        if dt.time() <= pointage.heure_arrivee:
+            raise _Rejected("L'heure de départ précède l'heure d'arrivée", 400)
+        open_pause = state.open_pauses.pop(day, None)
+        if open_pause is not None:
+            _close_pause(open_pause, dt)
+        pointage.heure_depart = dt.time()
+        pointage.sync_status = 'synced'
+        return "Heure de départ synchronisée", pointage, None
+
+    if event_type == 'pause_start':
+        if pointage.heure_depart:
+            raise _Rejected("Vous avez déjà terminé votre journée", 400)
+        if day in state.open_pauses:
+            raise _Rejected("Vous avez déjà une pause en cours", 409)
+        if dt.time() < pointage.heure_arrivee:
+            raise _Rejected("La pause précède l'heure d'arrivée", 400)
+        pause = Pause(user_id=user.id, pointage=pointage, type=event.get('pause_type') or 'default', start_time=dt)
+        db.session.add(pause)
+        state.open_pauses[day] = pause
+        return "Pause démarrée", pointage, pause
+
+    # pause_end
+    pause = state.open_pauses.get(day)
+    if pause is None:
+        raise _Rejected("Aucune pause en cours", 404)
+    if dt < pause.start_time:
+        raise _Rejected("La fin de pause précède son début", 400)
+    del state.open_pauses[day]
+    _close_pause(pause, dt)
+    return "Pause terminée", pointage, pause
+
+
+def _close_pause(pause, dt):
+    pause.end_time = dt
+    pause.duration_minutes = round((dt - pause.start_time).total_seconds() / 60)
+
+
+def _prepare(events, now, config):
+    """Sépare les éléments invalides des événements à appliquer (triés par horodatage)"""
+    invalid, valid, seen = [], [], set()
+    for position, event in enumerate(events):
+        key = event.get('idempotency_key') if isinstance(event, dict) else None
+        if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+            invalid.append({'index': position, 'status': OfflineSyncReceipt.STATUS_REJECTED, 'status_code': 400,
+                            'message': "Clé d'idempotence manquante ou invalide"})
+            continue
+        if key in seen:
+            invalid.append({'index': position, 'idempotency_key': key, 'status': OfflineSyncReceipt.STATUS_REJECTED,
+                            'status_code': 400, 'message': "Clé d'idempotence en double dans le lot"})
+            continue
+        seen.add(key)
+        try:
+            if event.get('type') not in EVENT_TYPES:
+                raise _Rejected("Type d'événement inconnu", 400)
+            if not event.get('timestamp'):
+                raise _Rejected("Horodatage manquant", 400)
+            dt = _parse_timestamp(event['timestamp'])
+            if dt > now:
+                raise _Rejected("Horodatage futur invalide", 400)
+            if now - dt > timedelta(hours=config['max_age_hours']):
+                raise _Rejected("Horodatage trop ancien", 400)
+            valid.append((dt, position, event, None))
+        except _Rejected as rejected:
+            valid.append((None, position, event, rejected))
+    valid.sort(key=lambda item: (item[0] is not None, item[0] or now, item[1]))
+    return invalid, valid
+
+
+def _process(user, events, config):
+    now = datetime.utcnow()
+    invalid, prepared = _prepare(events, now, config)
+    results = {item['index']: item for item in invalid}
+
+    keys = [event['idempotency_key'] for _, _, event, _ in prepared]
+    receipts = {
+        receipt.idempotency_key: receipt
+        for receipt in OfflineSyncReceipt.query.filter(
+            OfflineSyncReceipt.user_id == user.id, OfflineSyncReceipt.idempotency_key.in_(keys)
+        )
+    } if keys else {}
+
+    pending = []
+    for dt, position, event, rejected in prepared:
+        receipt = receipts.get(event['idempotency_key'])
+        if receipt is not None:
+            results[position] = dict(receipt.to_result(replayed=True), index=position)
+        else:
+            pending.append((dt, position, event, rejected))
+
+    days = {dt.date() for dt, _, _, rejected in pending if rejected is None}
+    state = _BatchState(user.id, days)
+    geofence = _Geofence(user)
+
+    applied = []
+    for dt, position, event, rejected in pending:
+        receipt = OfflineSyncReceipt(user_id=user.id, idempotency_key=event['idempotency_key'],
+                                     event_type=str(event.get('type'))[:20])
+        pointage = pause = None
+        if rejected is None:
+            try:
+                message, pointage, pause = _apply_event(user, event, dt, state, geofence, config)
+                receipt.status, receipt.status_code = OfflineSyncReceipt.STATUS_APPLIED, 200
+                receipt.message = message
+                applied.append((event['type'], pointage))
+            except _Rejected as error:
+                rejected = error
+        if rejected is not None:
+            receipt.status = OfflineSyncReceipt.STATUS_REJECTED
+            receipt.status_code, receipt.message = rejected.status_code, rejected.message
+        db.session.add(receipt)
+        results[position] = (receipt, pointage, pause)
+
+    db.session.flush()
+    for position, result in list(results.items()):
+        if isinstance(result, tuple):
+            receipt, pointage, pause = result
+            receipt.pointage_id = pointage.id if pointage is not None else None
+            receipt.pause_id = pause.id if pause is not None else None
+            results[position] = dict(receipt.to_result(), index=position)
+
+    # Webhooks et journal de pointage : un événement d'outbox par pointage modifié
+    touched = {}
+    for event_type, pointage in applied:
+        if event_type in ('checkin', 'checkout'):
+            touched.setdefault(pointage.id, [pointage, set()])[1].add(event_type)
+    if touched:
+        serialized = dict(zip(touched, Pointage.serialize_many([p for p, _ in touched.values()])))
+        for pointage_id, (pointage, types) in touched.items():
+            add_outbox_event(
+                'pointage.created' if 'checkin' in types else 'pointage.updated',
+                user_id=user.id,
+                company_id=user.company_id,
+                aggregate=pointage,
+                webhook_data=serialized[pointage_id],
+                log_event='offline_sync',
+                log_details={'pointage_id': pointage_id, 'events': sorted(types)},
+            )
+
+    db.session.commit()
+    ordered = [results[position] for position in sorted(results)]
+    return ordered, len(applied)
+
+
+def sync_offline_events(user, events):
+    """
+    Applique un lot d'événements hors ligne de ``user``
+
+    Args:
+        user: Utilisateur authentifié
+        events: Liste de dicts ``{idempotency_key, type, timestamp, coordinates,
+            device_id, pause_type}`` ; ``type`` parmi ``EVENT_TYPES``
+
+    Returns:
+        dict: ``results`` (un résultat par élément, dans l'ordre reçu),
+        ``applied`` et ``rejected``, ou une erreur si le lot est invalide
+    """
+    if not isinstance(events, list) or not events:
+        return {'error': True, 'message': "Liste d'événements requise", 'status_code': 400}
+    max_events = current_app.config.get('OFFLINE_SYNC_MAX_EVENTS', 500)
+    if len(events) > max_events:
+        return {
+            'error': True,
+            'message': f"Trop d'événements dans le lot (maximum {max_events})",
+            'status_code': 413,
+        }
+
+    config = {
+        'max_accuracy': current_app.config.get('GEOLOCATION_MAX_ACCURACY', 100),
+        'max_age_hours': current_app.config.get('OFFLINE_SYNC_MAX_AGE_HOURS', 24),
+    }
+    # Deux tentatives : un envoi concurrent du même lot viole la contrainte
+    # d'unicité des clés, et la seconde passe relit alors ses résultats
+    for attempt in range(2):
+        try:
+            results, applied = _process(user, events, config)
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erreur de synchronisation hors ligne pour {user.id}: {e}")
+            return {
+                'error': True,
+                'message': "Erreur de base de données lors de la synchronisation",
+                'status_code': 500,
+            }
+
+    relay_outbox_if_sync()
+    rejected = sum(1 for r in results if r['status'] == OfflineSyncReceipt.STATUS_REJECTED)
+    return {'error': False, 'results': results, 'applied': applied, 'rejected': rejected}
@@ -0,0 +1,195 @@
+"""
+Outbox transactionnel des événements de pointage
+
+Après un pointage, le thread de la requête n'exécute plus les effets de
+bord (journal de pointage, webhooks, notifications SSE et push) : il ajoute
+un ``OutboxEvent`` à la transaction du pointage, validée par un seul
+``COMMIT``. Le relais (``run_outbox_relay.py``) lit ensuite les événements en
+attente par lots et les diffuse :
+
+* le journal de pointage (``log_attendance_event``) ;
+* les webhooks de l'entreprise (identifiant d'événement stable
+  ``evt_outbox_<id>``, un événement relayé deux fois garde le même) ;
+* les notifications, créées pour tout le lot avec un seul commit puis
+  publiées en SSE et en push.
+
+Un événement dont la diffusion échoue est retenté plus tard
+(``OUTBOX_MAX_ATTEMPTS``) puis marqué ``failed``. Avec ``OUTBOX_RELAY_SYNC``
+(tests, développement) le relais s'exécute juste après le commit de la
+requête.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from backend.database import db
+from backend.models.notification import Notification
+from backend.models.outbox_event import OutboxEvent
+from backend.utils.attendance_logger import log_attendance_event
+from backend.utils.notification_utils import deliver_notification
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETENTION_HOURS = 72
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+
+def add_outbox_event(
+    event_type,
+    user_id=None,
+    company_id=None,
+    aggregate=None,
+    webhook_data=None,
+    log_event=None,
+    log_details=None,
+    notifications=(),
+):
+    """
+    Ajoute un événement à la transaction en cours (sans commit)
+
+    Args:
+        event_type: Type d'événement webhook (``pointage.created``...)
+        aggregate: Objet modèle concerné (type et identifiant conservés)
+        webhook_data: Données envoyées aux webhooks (aucun webhook si ``None``)
+        log_event: Type d'événement du journal de pointage
+        log_details: Détails du journal de pointage (dict)
+        notifications: Messages de notification destinés à ``user_id``
+    """
+    payload = {}
+    if webhook_data is not None:
+        payload['webhook'] = webhook_data
+    if log_event:
+        payload['attendance_log'] = {'event_type': log_event, 'details': log_details or {}}
+    if notifications:
+        payload['notifications'] = list(notifications)
+
+    event = OutboxEvent(
+        event_type=event_type,
+        user_id=user_id,
+        company_id=company_id,
+        aggregate_type=aggregate.__tablename__ if aggregate is not None else None,
+        aggregate_id=aggregate.id if aggregate is not None else None,
+        payload=json.dumps(payload, default=str),
+        available_at=datetime.utcnow(),
+    )
+    db.session.add(event)
+    return event
+
+
+def relay_outbox_if_sync():
+    """Relaie immédiatement les événements en mode ``OUTBOX_RELAY_SYNC``"""
+    if not current_app.config.get('OUTBOX_RELAY_SYNC'):
+        return
+    try:
+        relay_outbox_events()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Outbox relay failed: {e}", exc_info=True)
+
+
+def _claim_pending_events(batch_size, now):
+    # SKIP LOCKED : plusieurs relais se partagent les lots sans se bloquer
+    return (
+        OutboxEvent.query
+        .filter(OutboxEvent.status == OutboxEvent.STATUS_PENDING, OutboxEvent.available_at <= now)
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def _relay_event(event):
+    """Diffuse le journal et les webhooks ; retourne les notifications à créer"""
+    payload = event.parsed_payload
+
+    attendance_log = payload.get('attendance_log')
+    if attendance_log:
+        log_attendance_event(
+            event_type=attendance_log['event_type'],
+            user_id=event.user_id,
+            details=attendance_log.get('details'),
+        )
+
+    if 'webhook' in payload and event.company_id:
+        from backend.utils.webhook_utils import dispatch_webhook_event
+        dispatch_webhook_event(
+            event_type=event.event_type,
+            payload_data=payload['webhook'],
+            company_id=event.company_id,
+            event_id=f"evt_outbox_{event.id}",
+            raise_errors=True,
+        )
+
+    return [
+        Notification(user_id=event.user_id, message=message)
+        for message in payload.get('notifications', [])
+        if event.user_id
+    ]
+
+
+def _record_failure(event, error, now, max_attempts):
+    event.last_error = str(error)[:1000]
+    if event.attempts >= max_attempts:
+        event.status = OutboxEvent.STATUS_FAILED
+        current_app.logger.error(f"Outbox event {event.id} ({event.event_type}) failed permanently: {error}")
+        return
+    delay = min(RETRY_BASE_SECONDS * 2 ** (event.attempts - 1), RETRY_MAX_SECONDS)
+    event.available_at = now + timedelta(seconds=delay)
+    current_app.logger.warning(
+        f"Outbox event {event.id} ({event.event_type}) failed (attempt {event.attempts}), retry in {delay}s: {error}"
+    )
+
+
+def relay_outbox_events(batch_size=None):
+    """Relaie un lot d'événements en attente ; retourne le nombre d'événements lus"""
+    config = current_app.config
+    batch_size = batch_size or config.get('OUTBOX_RELAY_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = config.get('OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    now = datetime.utcnow()
+
+    events = _claim_pending_events(batch_size, now)
+    if not events:
+        db.session.rollback()
+        return 0
+
+    notifications = []
+    for event in events:
+        event.attempts = (event.attempts or 0) + 1
+        try:
+            created = _relay_event(event)
+        except Exception as e:
+            _record_failure(event, e, now, max_attempts)
+            continue
+        db.session.add_all(created)
+        notifications.extend(created)
+        event.status = OutboxEvent.STATUS_PROCESSED
+        event.processed_at = now
+        event.last_error = None
+
+    # Notifications du lot et statuts des événements : un seul commit
+    db.session.commit()
+
+    for notification in notifications:
+        try:
+            deliver_notification(notification)
+        except Exception as e:
+            current_app.logger.error(f"Failed to deliver notification {notification.id}: {e}")
+    return len(events)
+
+
+def purge_outbox_events(retention_hours=None):
+    """Supprime les événements relayés plus anciens que la rétention ; retourne le nombre supprimé"""
+    if retention_hours is None:
+        retention_hours = current_app.config.get('OUTBOX_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    deleted = (
+        OutboxEvent.query
+        .filter(OutboxEvent.status == OutboxEvent.STATUS_PROCESSED, OutboxEvent.processed_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
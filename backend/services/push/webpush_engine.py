@@ -0,0 +1,220 @@
+"""
+Moteur de livraison Web Push concurrent
+
+Les envois d'un lot partent en parallèle depuis un pool de threads borné
+(``WEBPUSH_MAX_WORKERS``) :
+
+* chaque origine de service push (FCM, Mozilla autopush...) garde une
+  session HTTP keep-alive (``backend.utils.http_pool``) ;
+* l'en-tête VAPID (JWT signé) d'une origine est réutilisé jusqu'à son
+  expiration au lieu d'être signé pour chaque abonnement ;
+* seuls les refus définitifs (404/410, abonnement illisible) désactivent
+  l'abonnement, en une seule requête par lot ; les erreurs transitoires
+  (délai, 429, 5xx) le laissent actif.
+
+Le chiffrement et l'envoi HTTP se font dans les threads ; la lecture des
+abonnements et leur désactivation restent dans le thread appelant
+(contexte d'application et session SQLAlchemy).
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from flask import current_app
+
+from backend.database import db
+from backend.models.push_subscription import PushSubscription
+from backend.utils.http_pool import get_http_session
+
+try:  # pragma: no cover - dépend de l'installation
+    from py_vapid import Vapid
+    from pywebpush import WebPusher, WebPushException
+except Exception:  # ImportError, ModuleNotFoundError, etc.
+    Vapid = WebPusher = None
+
+    class WebPushException(Exception):
+        """Exception de repli quand pywebpush n'est pas installé."""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 10
+# Durée de validité des JWT VAPID (les services push refusent plus de 24 h)
+VAPID_TOKEN_LIFETIME_SECONDS = 12 * 60 * 60
+# Un en-tête est renouvelé avant d'arriver aussi près de son expiration
+VAPID_RENEW_MARGIN_SECONDS = 5 * 60
+# Abonnement supprimé ou inconnu du service push : inutile de réessayer
+PERMANENT_STATUS_CODES = frozenset({404, 410})
+USER_AGENT = 'PointFlex-WebPush/1.0'
+
+
+def webpush_available() -> bool:
+    """Vrai si pywebpush et py_vapid sont installés."""
+    return WebPusher is not None
+
+
+@dataclass
+class PushBatchStats:
+    """Bilan d'un lot d'envois Web Push"""
+
+    sent: int = 0
+    failed: int = 0
+    deactivated: int = 0
+    duration_ms: int = 0
+    # Nombre d'envois réussis par utilisateur
+    sent_by_user: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def attempted(self) -> int:
+        return self.sent + self.failed
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'attempted': self.attempted,
+            'sent': self.sent,
+            'failed': self.failed,
+            'deactivated': self.deactivated,
+            'duration_ms': self.duration_ms,
+        }
+
+
+class VapidHeaderCache:
+    """En-têtes VAPID signés par origine, réutilisés jusqu'à leur expiration"""
+
+    def __init__(self, private_key: str, claims: Dict[str, Any]):
+        self._vapid = Vapid.from_string(private_key=private_key)
+        self._claims = {key: value for key, value in claims.items() if key not in ('aud', 'exp')}
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    def headers_for(self, endpoint: str) -> Dict[str, str]:
+        parts = urlsplit(endpoint)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        now = int(time.time())
+        with self._lock:
+            cached = self._headers.get(origin)
+            if cached and cached[0] - VAPID_RENEW_MARGIN_SECONDS > now:
+                return cached[1]
+            expires_at = now + VAPID_TOKEN_LIFETIME_SECONDS
+            # ``aud`` dépend de l'origine : une copie des claims par service push
+            headers = self._vapid.sign(dict(self._claims, aud=origin, exp=expires_at))
+            self._headers[origin] = (expires_at, headers)
+            return headers
+
+
+_vapid_caches = {}
+_vapid_caches_lock = threading.Lock()
+
+
+def get_vapid_header_cache() -> Optional[VapidHeaderCache]:
+    """Cache VAPID des clés configurées (``None`` si la configuration est incomplète)"""
+    private_key = current_app.config.get('VAPID_PRIVATE_KEY')
+    claims = current_app.config.get('VAPID_CLAIMS')
+    if not private_key or not claims:
+        return None
+    key = (private_key, json.dumps(claims, sort_keys=True))
+    with _vapid_caches_lock:
+        cache = _vapid_caches.get(key)
+        if cache is None:
+            cache = _vapid_caches[key] = VapidHeaderCache(private_key, claims)
+        return cache
+
+
+def send_encrypted_push(subscription_info, body, headers, session, timeout):
+    """Chiffre et envoie un message ; retourne ``(statut HTTP ou None, erreur, définitif)``"""
+    try:
+        pusher = WebPusher(subscription_info, requests_session=session)
+        response = pusher.send(body, dict(headers), timeout=timeout)
+    except WebPushException as e:
+        # Clés d'abonnement absentes ou invalides
+        return None, str(e), True
+    except Exception as e:
+        # Délai dépassé, erreur réseau... : l'abonnement reste actif
+        return None, str(e), False
+
+    if response.status_code <= 202:
+        return response.status_code, None, False
+    return (
+        response.status_code,
+        f"HTTP {response.status_code}",
+        response.status_code in PERMANENT_STATUS_CODES,
+    )
+
+
+def deliver_web_push(subscriptions: List[PushSubscription], payload: Dict[str, Any]) -> PushBatchStats:
+    """Envoie ``payload`` à tous les abonnements en parallèle et désactive les abonnements refusés"""
+    stats = PushBatchStats()
+    if not subscriptions:
+        return stats
+    if not webpush_available():
+        logger.error("pywebpush n'est pas disponible. Impossible d'envoyer une notification Web Push.")
+        return stats
+    vapid = get_vapid_header_cache()
+    if vapid is None:
+        logger.error("VAPID_PRIVATE_KEY ou VAPID_CLAIMS n'est pas configuré")
+        return stats
+
+    config = current_app.config
+    timeout = config.get('WEBPUSH_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)
+    body = json.dumps(payload)
+    started = time.perf_counter()
+
+    jobs = []
+    rejected_ids = []
+    for subscription in subscriptions:
+        try:
+            subscription_info = subscription.get_web_push_subscription()
+        except ValueError:
+            subscription_info = None
+        if not subscription_info or not subscription_info.get('endpoint'):
+            logger.error(f"Pas de données d'abonnement Web Push valides pour l'ID {subscription.id}")
+            rejected_ids.append(subscription.id)
+            stats.failed += 1
+            continue
+        endpoint = subscription_info['endpoint']
+        jobs.append((
+            subscription,
+            subscription_info,
+            vapid.headers_for(endpoint),
+            get_http_session(endpoint, USER_AGENT),
+        ))
+
+    max_workers = max(1, min(config.get('WEBPUSH_MAX_WORKERS', DEFAULT_MAX_WORKERS), len(jobs) or 1))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webpush') as executor:
+        futures = [
+            (subscription, executor.submit(send_encrypted_push, subscription_info, body, headers, session, timeout))
+            for subscription, subscription_info, headers, session in jobs
+        ]
+        for subscription, future in futures:
+            status_code, error, permanent = future.result()
+            if error is None:
+                stats.sent += 1
+                stats.sent_by_user[subscription.user_id] = stats.sent_by_user.get(subscription.user_id, 0) + 1
+                continue
+            stats.failed += 1
+            if permanent:
+                rejected_ids.append(subscription.id)
+            logger.warning(
+                f"Échec Web Push pour l'abonnement {subscription.id} "
+                f"({'définitif' if permanent else 'transitoire'}): {error}"
+            )
+
+    if rejected_ids:
+        try:
+            stats.deactivated = PushSubscription.query.filter(PushSubscription.id.in_(rejected_ids)).update(
+                {'is_active': False}, synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Erreur lors de la désactivation des abonnements: {e}")
+            db.session.rollback()
+
+    stats.duration_ms = int((time.perf_counter() - started) * 1000)
+    logger.info(f"Lot Web Push: {stats.as_dict()}")
+    return stats
@@ -1,5 +1,8 @@
 """
 Service pour l'envoi de notifications push via Web Push API
+
+Les envois vers plusieurs abonnements passent par le moteur concurrent de
+``backend.services.push.webpush_engine``.
 """
 
 import json
@@ -8,20 +11,15 @@ from typing import Dict, Any, Optional, List
 from flask import current_app
 
 from backend.models.push_subscription import PushSubscription
-from backend.database import db
-
-try:  # pragma: no cover - behaviour verified via send_web_push guard
-    from pywebpush import webpush as _webpush, WebPushException as _WebPushException
-except Exception:  # ImportError, ModuleNotFoundError, etc.
-    _webpush = None
-
-    class _WebPushException(Exception):
-        """Fallback exception used when pywebpush isn't available."""
-
-
-def _webpush_available() -> bool:
-    """Return True if pywebpush could be imported."""
-    return _webpush is not None
+from backend.services.push.webpush_engine import (
+    DEFAULT_TIMEOUT_SECONDS,
+    USER_AGENT,
+    deliver_web_push,
+    get_vapid_header_cache,
+    send_encrypted_push,
+    webpush_available,
+)
+from backend.utils.http_pool import get_http_session
 
 logger = logging.getLogger(__name__)
 
@@ -36,43 +34,62 @@ def send_web_push(subscription_info: Dict[str, Any], data: Dict[str, Any]) -> bo
     Returns:
         bool: True si l'envoi a réussi, False sinon
     """
-    if not _webpush_available():
+    if not webpush_available():
         logger.error("pywebpush n'est pas disponible. Impossible d'envoyer une notification Web Push.")
         return False
 
     try:
         # Vérifier si les clés VAPID sont configurées
-        if not current_app.config.get('VAPID_PRIVATE_KEY'):
-            logger.error("VAPID_PRIVATE_KEY n'est pas configurée")
+        vapid = get_vapid_header_cache()
+        if vapid is None:
+            logger.error("VAPID_PRIVATE_KEY ou VAPID_CLAIMS n'est pas configuré")
             return False
-            
-        if not current_app.config.get('VAPID_CLAIMS'):
-            logger.error("VAPID_CLAIMS n'est pas configuré")
+
+        endpoint = subscription_info.get('endpoint')
+        if not endpoint:
+            logger.error("Abonnement Web Push sans endpoint")
             return False
-        
-        # Envoyer la notification
-        response = _webpush(
-            subscription_info=subscription_info,
-            data=json.dumps(data),
-            vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
-            vapid_claims=current_app.config['VAPID_CLAIMS']
+
+        status_code, error, permanent = send_encrypted_push(
+            subscription_info,
+            json.dumps(data),
+            vapid.headers_for(endpoint),
+            get_http_session(endpoint, USER_AGENT),
+            current_app.config.get('WEBPUSH_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS),
         )
+        if error:
+            logger.error(f"Erreur lors de l'envoi de notification push: {error}")
+            if permanent:
+                # Le token est dans la base de données, pas dans subscription_info :
+                # la désactivation est gérée par la fonction appelante
+                logger.warning("Abonnement expiré ou invalide")
+            return False
 
-        logger.info(f"Notification push envoyée avec succès: {response.status_code}")
+        logger.info(f"Notification push envoyée avec succès: {status_code}")
         return True
-    except _WebPushException as e:
-        logger.error(f"Erreur lors de l'envoi de notification push: {e}")
-        
-        # Si l'erreur est due à une expiration de l'abonnement, le marquer comme inactif
-        if e.response and e.response.status_code == 410:  # Gone - l'abonnement n'est plus valide
-            logger.warning("Abonnement expiré, marquage comme inactif")
-            # Le token sera dans la base de données, pas dans subscription_info
-            # Cette logique devrait être gérée par la fonction appelante
-        return False
     except Exception as e:
         logger.error(f"Erreur inattendue lors de l'envoi de notification push: {e}")
         return False
 
+
+def _notification_payload(title: str, body: str, icon: Optional[str],
+                          action_url: Optional[str], data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    notification_data = {
+        "notification": {
+            "title": title,
+            "body": body,
+            "icon": icon or "/logo192.png",
+        }
+    }
+    
+    if action_url:
+        notification_data["notification"]["data"] = {"url": action_url}
+    
+    if data:
+        notification_data["data"] = data
+    return notification_data
+
+
 def send_push_to_user(user_id: int, title: str, body: str, 
                       icon: Optional[str] = None, 
                       action_url: Optional[str] = None,
@@ -91,66 +108,8 @@ def send_push_to_user(user_id: int, title: str, body: str,
     Returns:
         int: Nombre de notifications envoyées avec succès
     """
-    # Récupérer tous les abonnements actifs de l'utilisateur
-    subscriptions = PushSubscription.query.filter_by(
-        user_id=user_id,
-        is_active=True,
-        device_type='web'  # Ne cibler que les appareils Web pour Web Push
-    ).all()
-    
-    if not subscriptions:
-        logger.info(f"Aucun abonnement Web Push actif trouvé pour l'utilisateur {user_id}")
-        return 0
-    
-    # Préparer les données de la notification
-    notification_data = {
-        "notification": {
-            "title": title,
-            "body": body,
-            "icon": icon or "/logo192.png",
-        }
-    }
-    
-    if action_url:
-        notification_data["notification"]["data"] = {"url": action_url}
-    
-    if data:
-        notification_data["data"] = data
-    
-    success_count = 0
-    
-    for subscription in subscriptions:
-        try:
-            # Récupérer l'objet d'abonnement Web Push à partir du modèle mis à jour
-            subscription_info = subscription.get_web_push_subscription()
-            
-            if not subscription_info:
-                logger.error(f"Pas de données d'abonnement Web Push valides pour l'ID {subscription.id}")
-                subscription.is_active = False
-                db.session.add(subscription)
-                continue
-            
-            success = send_web_push(subscription_info, notification_data)
-            if success:
-                success_count += 1
-            else:
-                # Marquer l'abonnement comme inactif en cas d'échec
-                subscription.is_active = False
-                db.session.add(subscription)
-        except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de notification à l'abonnement ID {subscription.id}: {str(e)}")
-            subscription.is_active = False
-            db.session.add(subscription)
-    
-    # Sauvegarder les changements pour les abonnements désactivés
-    if success_count < len(subscriptions):
-        try:
-            db.session.commit()
-        except Exception as e:
-            logger.error(f"Erreur lors de la désactivation des abonnements: {e}")
-            db.session.rollback()
-    
-    return success_count
+    return send_push_to_users([user_id], title, body, icon, action_url, data)[user_id]
+
 
 def send_push_to_users(user_ids: List[int], title: str, body: str, 
                        icon: Optional[str] = None, 
@@ -158,6 +117,9 @@ def send_push_to_users(user_ids: List[int], title: str, body: str,
                        data: Optional[Dict[str, Any]] = None) -> Dict[int, int]:
     """
     Envoie une notification push à plusieurs utilisateurs
+
+    Les abonnements de tous les utilisateurs sont chargés en une requête puis
+    servis en parallèle par le moteur Web Push.
     
     Args:
         user_ids: Liste des IDs d'utilisateurs
@@ -171,9 +133,21 @@ def send_push_to_users(user_ids: List[int], title: str, body: str,
         Dict[int, int]: Dictionnaire avec les IDs d'utilisateurs comme clés et le nombre de notifications
                       envoyées à chaque utilisateur comme valeurs
     """
-    results = {}
-    for user_id in user_ids:
-        sent_count = send_push_to_user(user_id, title, body, icon, action_url, data)
-        results[user_id] = sent_count
-    
+    user_ids = list(dict.fromkeys(user_ids))
+    results = {user_id: 0 for user_id in user_ids}
+    if not user_ids:
+        return results
+
+    # Ne cibler que les appareils Web pour Web Push
+    subscriptions = PushSubscription.query.filter(
+        PushSubscription.user_id.in_(user_ids),
+        PushSubscription.is_active.is_(True),
+        PushSubscription.device_type == 'web',
+    ).all()
+    if not subscriptions:
+        logger.info(f"Aucun abonnement Web Push actif trouvé pour {len(user_ids)} utilisateur(s)")
+        return results
+
+    stats = deliver_web_push(subscriptions, _notification_payload(title, body, icon, action_url, data))
+    results.update(stats.sent_by_user)
     return results
@@ -0,0 +1,190 @@
+"""
+Stockage des tokens QR de pointage
+
+Trois implémentations partagent la même interface :
+
+* ``MemoryQRTokenStore`` : dictionnaire + tas des expirations, pour le
+  développement et les tests (un seul processus) ;
+* ``RedisQRTokenStore`` : expiration native (``SET ... EX``), consommation
+  atomique en une transaction ``GET``/``DEL`` ;
+* ``SQLQRTokenStore`` : table ``qr_tokens``, la consommation est un ``DELETE``
+  dans la transaction de la requête (annulé avec elle en cas d'erreur).
+
+Toutes les opérations sur un token sont en O(1) (O(log n) amorti pour la
+purge du tas en mémoire) ; aucune ne parcourt l'ensemble des tokens.
+
+Le backend est choisi par ``QR_TOKEN_STORE`` (``memory``, ``redis`` ou ``sql``).
+"""
+
+import heapq
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from backend.database import db
+
+REDIS_KEY_PREFIX = 'pointflex:qr_token:'
+
+
+class QRTokenStore:
+    """Interface commune des stockages de tokens QR"""
+
+    def put(self, token, data, ttl_seconds):
+        """Enregistre ``data`` (dict sérialisable en JSON) pour ``ttl_seconds`` secondes"""
+        raise NotImplementedError
+
+    def get(self, token):
+        """Retourne les données d'un token valide sans le consommer, sinon None"""
+        raise NotImplementedError
+
+    def consume(self, token):
+        """Retourne et supprime atomiquement les données d'un token valide, sinon None"""
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Supprime les tokens expirés ; retourne le nombre de tokens supprimés"""
+        return 0
+
+
+class MemoryQRTokenStore(QRTokenStore):
+    """Stockage en mémoire du processus, avec un tas des dates d'expiration"""
+
+    def __init__(self):
+        self._tokens = {}  # { token: (expires_at, data) }
+        self._expiry_heap = []  # [(expires_at, token)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def put(self, token, data, ttl_seconds):
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            self._purge_locked(time.time())
+            self._tokens[token] = (expires_at, data)
+            heapq.heappush(self._expiry_heap, (expires_at, token))
+
+    def get(self, token):
+        entry = self._tokens.get(token)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return dict(entry[1])
+
+    def consume(self, token):
+        with self._lock:
+            entry = self._tokens.pop(token, None)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return dict(entry[1])
+
+    def purge_expired(self):
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def _purge_locked(self, now):
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, token = heapq.heappop(heap)
+            entry = self._tokens.get(token)
+            # Le tas peut contenir des tokens déjà consommés ou ré-enregistrés
+            if entry is not None and entry[0] == expires_at:
+                del self._tokens[token]
+                removed += 1
+        return removed
+
+
+class RedisQRTokenStore(QRTokenStore):
+    """Stockage Redis partagé entre workers, expiration gérée par Redis"""
+
+    def __init__(self, connection):
+        self.redis = connection
+
+    def put(self, token, data, ttl_seconds):
+        self.redis.set(REDIS_KEY_PREFIX + token, json.dumps(data), ex=max(1, int(ttl_seconds)))
+
+    def get(self, token):
+        raw = self.redis.get(REDIS_KEY_PREFIX + token)
+        return json.loads(raw) if raw is not None else None
+
+    def consume(self, token):
+        key = REDIS_KEY_PREFIX + token
+        # MULTI/EXEC : un seul client obtient la valeur avant la suppression
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.get(key)
+        pipeline.delete(key)
+        raw, _deleted = pipeline.execute()
+        return json.loads(raw) if raw is not None else None
+
+
+class SQLQRTokenStore(QRTokenStore):
+    """Stockage dans la table ``qr_tokens``.
+
+    ``consume`` ne valide pas la transaction : le token est supprimé en même
+    temps que le pointage est enregistré par l'appelant.
+    """
+
+    def put(self, token, data, ttl_seconds):
+        from backend.models.qr_token import QRToken
+
+        db.session.add(QRToken(
+            token=token,
+            payload=json.dumps(data),
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds),
+        ))
+        db.session.commit()
+
+    def get(self, token):
+        from backend.models.qr_token import QRToken
+
+        row = QRToken.query.filter(
+            QRToken.token == token,
+            QRToken.expires_at > datetime.utcnow(),
+        ).first()
+        return json.loads(row.payload) if row else None
+
+    def consume(self, token):
+        from backend.models.qr_token import QRToken
+
+        data = self.get(token)
+        if data is None:
+            return None
+        # Seule la transaction qui supprime effectivement la ligne gagne
+        deleted = QRToken.query.filter(
+            QRToken.token == token,
+            QRToken.expires_at > datetime.utcnow(),
+        ).delete(synchronize_session=False)
+        return data if deleted == 1 else None
+
+    def purge_expired(self):
+        from backend.models.qr_token import QRToken
+
+        removed = QRToken.query.filter(
+            QRToken.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+
+def create_qr_token_store(backend):
+    """Instancie le stockage correspondant à ``backend``"""
+    if backend == 'memory':
+        return MemoryQRTokenStore()
+    if backend == 'redis':
+        from backend.utils.redis_utils import get_redis_connection
+        return RedisQRTokenStore(get_redis_connection())
+    if backend == 'sql':
+        return SQLQRTokenStore()
+    raise ValueError(f"Stockage de tokens QR inconnu: {backend}")
+
+
+def get_qr_token_store():
+    """Retourne le stockage de tokens QR de l'application courante"""
+    store = current_app.extensions.get('qr_token_store')
+    if store is None:
+        store = create_qr_token_store(current_app.config.get('QR_TOKEN_STORE', 'memory'))
+        current_app.extensions['qr_token_store'] = store
+    return store
@@ -0,0 +1,130 @@
+"""
+Stockage des fichiers produits par les jobs de rapports
+
+Deux implémentations partagent la même interface :
+
+* ``LocalArtifactStorage`` : répertoire local (``REPORT_ARTIFACT_DIR``), à
+  partager entre les workers RQ et web (volume commun) ;
+* ``S3ArtifactStorage`` : stockage objet compatible S3 (``boto3`` requis).
+
+Le backend est choisi par ``REPORT_ARTIFACT_STORAGE`` (``local`` ou ``s3``).
+L'expiration est gérée par ``report_job_service.purge_expired_report_jobs``.
+"""
+
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover - boto3 est optionnel
+    boto3 = None
+
+
+class ArtifactStorage:
+    """Interface commune des stockages de fichiers de rapports"""
+
+    def save(self, key, fileobj):
+        """Enregistre le contenu de ``fileobj`` sous ``key`` ; retourne la taille en octets"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Retourne un objet fichier binaire en lecture, ou None si ``key`` n'existe pas"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Supprime ``key`` s'il existe"""
+        raise NotImplementedError
+
+
+class LocalArtifactStorage(ArtifactStorage):
+    """Fichiers dans un répertoire local"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.dirname(path) != self.root:
+            raise ValueError(f"Clé de fichier invalide: {key}")
+        return path
+
+    def save(self, key, fileobj):
+        path = self._path(key)
+        # Écriture dans un fichier temporaire puis renommage : un téléchargement
+        # concurrent ne voit jamais un fichier partiel
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(fileobj, out)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.getsize(path)
+
+    def open(self, key):
+        try:
+            return open(self._path(key), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArtifactStorage(ArtifactStorage):
+    """Objets dans un bucket S3 (ou compatible : MinIO, Scaleway, ...)"""
+
+    def __init__(self, bucket, prefix='', client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("boto3 n'est pas installé")
+            client = boto3.client('s3', endpoint_url=current_app.config.get('REPORT_ARTIFACT_S3_ENDPOINT_URL'))
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def save(self, key, fileobj):
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        self.client.upload_fileobj(fileobj, self.bucket, self.prefix + key)
+        return size
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+def create_artifact_storage(backend):
+    """Instancie le stockage correspondant à ``backend``"""
+    if backend == 'local':
+        return LocalArtifactStorage(current_app.config.get('REPORT_ARTIFACT_DIR') or 'report_artifacts')
+    if backend == 's3':
+        return S3ArtifactStorage(
+            current_app.config['REPORT_ARTIFACT_S3_BUCKET'],
+            current_app.config.get('REPORT_ARTIFACT_S3_PREFIX') or '',
+        )
+    raise ValueError(f"Stockage de rapports inconnu: {backend}")
+
+
+def get_artifact_storage():
+    """Retourne le stockage de fichiers de rapports de l'application courante"""
+    storage = current_app.extensions.get('report_artifact_storage')
+    if storage is None:
+        storage = create_artifact_storage(current_app.config.get('REPORT_ARTIFACT_STORAGE', 'local'))
+        current_app.extensions['report_artifact_storage'] = storage
+    return storage
@@ -0,0 +1,320 @@
+"""
+Jobs asynchrones de génération de rapports et d'exports
+
+Les rapports volumineux (PDF de présence, logs d'audit, exports entreprise)
+sont générés par un worker RQ sur la file ``pointflex_reports`` au lieu du
+thread de la requête :
+
+1. ``submit_report_job`` vérifie les droits, déduplique les demandes
+   identiques (même type, mêmes paramètres, même entreprise) et met le job
+   en file ;
+2. ``run_report_job`` (exécuté par ``backend.tasks.report_tasks``) produit
+   le fichier et le dépose dans le stockage de rapports ;
+3. le client suit ``/api/reports/jobs/<id>`` puis télécharge le fichier
+   jusqu'à son expiration (``REPORT_ARTIFACT_TTL``).
+
+Avec ``REPORT_JOBS_SYNC`` (tests, développement sans Redis) le job est
+exécuté immédiatement dans le processus courant.
+"""
+
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+
+from backend.database import db
+from backend.models.report_job import ReportJob
+from backend.models.user import User
+from backend.services.export_service import (
+    EXPORT_COLUMNS,
+    EXPORT_FORMATS,
+    EXPORT_MIMETYPES,
+    export_filename,
+    write_export_file,
+)
+from backend.services.report_artifact_storage import get_artifact_storage
+from backend.services.report_pdf_service import (
+    PDF_MIMETYPE,
+    build_audit_log_pdf,
+    build_company_attendance_pdf,
+    build_employee_attendance_pdf,
+)
+
+# Queue name used for report generation jobs
+REPORTS_QUEUE_NAME = "pointflex_reports"
+
+ADMIN_ROLES = ('superadmin', 'admin_rh')
+
+ATTENDANCE_PDF_PARAMS = ('start_date', 'end_date', 'pointage_type', 'pointage_status', 'sort_by', 'sort_direction')
+
+
+class ReportGenerationError(Exception):
+    """Erreur fonctionnelle (pas de données, filtre invalide) enregistrée sur le job"""
+
+
+def wants_async_report():
+    """Vrai si la requête demande une génération asynchrone (``?async=1``)"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _error(message, status_code):
+    return {'error': True, 'message': message, 'status_code': status_code}
+
+
+# --- Types de rapports -------------------------------------------------------
+
+def _prepare_company_export(user, params):
+    if params.get('data_type') not in EXPORT_COLUMNS:
+        return None, _error("Type de données non supporté", 400)
+    if params.setdefault('format', 'csv') not in EXPORT_FORMATS:
+        return None, _error("Format non supporté. Utilisez 'csv', 'excel', 'json' ou 'ndjson'", 400)
+    if not user.company_id:
+        return None, _error("Utilisateur non associé à une entreprise", 400)
+    return user.company_id, None
+
+
+def _generate_company_export(company_id, params):
+    data_type, format_type = params['data_type'], params['format']
+    fileobj = write_export_file(data_type, format_type, company_id)
+    if fileobj is None:
+        raise ReportGenerationError("Aucune donnée à exporter")
+    return fileobj, export_filename(data_type, format_type), EXPORT_MIMETYPES[format_type]
+
+
+def _prepare_attendance_pdf(user, params):
+    if not user.company_id:
+        return None, _error("Aucune entreprise associée", 400)
+    if params.get('user_id'):
+        if not User.query.filter_by(id=int(params['user_id']), company_id=user.company_id).first():
+            return None, _error(f"Utilisateur avec ID {params['user_id']} non trouvé ou non autorisé.", 404)
+    return user.company_id, None
+
+
+def _prepare_employee_attendance_pdf(user, params):
+    employee = User.query.get(int(params['employee_id'])) if params.get('employee_id') else None
+    if not employee:
+        return None, _error("Employé non trouvé.", 404)
+    if employee.company_id != user.company_id:
+        return None, _error("Accès non autorisé à cet employé (hors entreprise).", 403)
+    return employee.company_id, None
+
+
+def _prepare_audit_log_pdf(user, params):
+    if user.role != 'superadmin':
+        return None, _error("Accès non autorisé", 403)
+    return None, None
+
+
+def _pdf_generator(build):
+    def generate(company_id, params):
+        result = build(company_id, params)
+        if result['error']:
+            raise ReportGenerationError(result['message'])
+        return result['buffer'], result['filename'], PDF_MIMETYPE
+    return generate
+
+
+REPORT_KINDS = {
+    'company_export': {
+        'params': ('data_type', 'format'),
+        'prepare': _prepare_company_export,
+        'generate': _generate_company_export,
+    },
+    'attendance_pdf': {
+        'params': ATTENDANCE_PDF_PARAMS + ('user_id',),
+        'prepare': _prepare_attendance_pdf,
+        'generate': _pdf_generator(build_company_attendance_pdf),
+    },
+    'employee_attendance_pdf': {
+        'params': ATTENDANCE_PDF_PARAMS + ('employee_id',),
+        'prepare': _prepare_employee_attendance_pdf,
+        'generate': _pdf_generator(
+            lambda company_id, params: build_employee_attendance_pdf(int(params['employee_id']), params)
+        ),
+    },
+    'audit_log_pdf': {
+        'params': ('start_date', 'end_date', 'user_email', 'action', 'resource_type'),
+        'prepare': _prepare_audit_log_pdf,
+        'generate': _pdf_generator(lambda company_id, params: build_audit_log_pdf(params)),
+    },
+}
+
+
+# --- Soumission ----------------------------------------------------------------
+
+def _dedup_key(kind, params, company_id):
+    raw = json.dumps({'kind': kind, 'params': params, 'company_id': company_id}, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _find_reusable_job(dedup_key):
+    """Job identique en cours, ou terminé récemment et pas encore expiré"""
+    now = datetime.utcnow()
+    config = current_app.config
+    stale_before = now - timedelta(seconds=config.get('REPORT_JOB_TIMEOUT', 600) * 2)
+    fresh_after = now - timedelta(seconds=config.get('REPORT_JOB_DEDUP_SECONDS', 300))
+
+    candidates = ReportJob.query.filter(
+        ReportJob.dedup_key == dedup_key,
+        ReportJob.status != ReportJob.STATUS_FAILED,
+    ).order_by(ReportJob.created_at.desc()).limit(5)
+
+    for job in candidates:
+        if job.is_pending and job.created_at > stale_before:
+            return job
+        if job.status == ReportJob.STATUS_FINISHED and not job.is_expired and job.finished_at > fresh_after:
+            return job
+    return None
+
+
+def _enqueue(job):
+    """Met le job en file ; retourne un message d'erreur si Redis est indisponible"""
+    if current_app.config.get('REPORT_JOBS_SYNC'):
+        run_report_job(job.id)
+        return None
+
+    try:
+        from rq import Queue
+        from backend.utils.redis_utils import get_redis_connection
+
+        queue = Queue(REPORTS_QUEUE_NAME, connection=get_redis_connection())
+        queue.enqueue(
+            'backend.tasks.report_tasks.run_report_job_task',
+            args=(job.id,),
+            job_id=f"report_{job.id}",
+            job_timeout=current_app.config.get('REPORT_JOB_TIMEOUT', 600),
+            result_ttl=0,
+        )
+        return None
+    except Exception as e:
+        current_app.logger.error(f"Failed to enqueue report job {job.id}: {e}", exc_info=True)
+        return str(e)
+
+
+def submit_report_job(kind, params, user):
+    """Crée (ou réutilise) un job de rapport pour ``user``.
+
+    Retourne ``{'error': False, 'job', 'deduplicated', 'status_code'}`` avec
+    202 pour un nouveau job et 200 pour un job identique déjà existant.
+    """
+    spec = REPORT_KINDS.get(kind)
+    if spec is None:
+        return _error("Type de rapport non supporté", 400)
+
+    params = {
+        key: str(value) for key, value in (params or {}).items()
+        if key in spec['params'] and value not in (None, '')
+    }
+
+    try:
+        company_id, error = spec['prepare'](user, params)
+    except ValueError:
+        return _error("Paramètres de rapport invalides", 400)
+    if error:
+        return error
+
+    dedup_key = _dedup_key(kind, params, company_id)
+    existing = _find_reusable_job(dedup_key)
+    if existing is not None:
+        return {'error': False, 'job': existing, 'deduplicated': True, 'status_code': 200}
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        params=json.dumps(params, sort_keys=True),
+        dedup_key=dedup_key,
+        company_id=company_id,
+        requested_by_id=user.id,
+        status=ReportJob.STATUS_QUEUED,
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    enqueue_error = _enqueue(job)
+    if enqueue_error:
+        job.status = ReportJob.STATUS_FAILED
+        job.error_message = "File de génération indisponible"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return _error("Service de génération de rapports indisponible, réessayez plus tard", 503)
+
+    return {'error': False, 'job': job, 'deduplicated': False, 'status_code': 202}
+
+
+# --- Exécution -----------------------------------------------------------------
+
+def _artifact_expiry():
+    return datetime.utcnow() + timedelta(seconds=current_app.config.get('REPORT_ARTIFACT_TTL', 86400))
+
+
+def run_report_job(job_id):
+    """Génère le fichier d'un job en file ; sans effet si le job a déjà été pris"""
+    job = ReportJob.query.get(job_id)
+    if job is None or job.status != ReportJob.STATUS_QUEUED:
+        return
+
+    job.status = ReportJob.STATUS_RUNNING
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        fileobj, filename, mimetype = REPORT_KINDS[job.kind]['generate'](job.company_id, job.parsed_params)
+        storage_key = f"{job.id}.{filename.rsplit('.', 1)[-1]}"
+        try:
+            size = get_artifact_storage().save(storage_key, fileobj)
+        finally:
+            fileobj.close()
+
+        job.storage_key = storage_key
+        job.filename = filename
+        job.mimetype = mimetype
+        job.size_bytes = size
+        job.status = ReportJob.STATUS_FINISHED
+    except Exception as e:
+        db.session.rollback()
+        job = ReportJob.query.get(job_id)
+        job.status = ReportJob.STATUS_FAILED
+        if isinstance(e, ReportGenerationError):
+            job.error_message = str(e)
+        else:
+            current_app.logger.error(f"Erreur génération du rapport {job_id}: {e}", exc_info=True)
+            job.error_message = "Erreur interne lors de la génération du rapport"
+
+    job.finished_at = datetime.utcnow()
+    job.expires_at = _artifact_expiry()
+    db.session.commit()
+
+
+def can_access_report_job(job, user):
+    """Le demandeur, les admins de l'entreprise concernée et le superadmin y ont accès"""
+    if user.role == 'superadmin' or job.requested_by_id == user.id:
+        return True
+    return job.company_id is not None and job.company_id == user.company_id and user.role in ADMIN_ROLES
+
+
+def open_report_artifact(job):
+    """Retourne le fichier produit par ``job`` (ouvert en lecture binaire), ou None"""
+    if job.status != ReportJob.STATUS_FINISHED or job.is_expired or not job.storage_key:
+        return None
+    return get_artifact_storage().open(job.storage_key)
+
+
+def purge_expired_report_jobs(limit=500):
+    """Supprime les jobs expirés et leurs fichiers ; retourne le nombre de jobs supprimés"""
+    jobs = ReportJob.query.filter(
+        ReportJob.expires_at <= datetime.utcnow()
+    ).order_by(ReportJob.expires_at).limit(limit).all()
+
+    storage = get_artifact_storage()
+    for job in jobs:
+        if job.storage_key:
+            try:
+                storage.delete(job.storage_key)
+            except Exception as e:
+                current_app.logger.warning(f"Suppression du fichier {job.storage_key} impossible: {e}")
+                continue
+        db.session.delete(job)
+    db.session.commit()
+    return len(jobs)
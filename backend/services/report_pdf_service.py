@@ -0,0 +1,328 @@
+"""
+Génération des rapports PDF (présence entreprise, présence employé, logs d'audit)
+
+Les fonctions prennent les filtres sous forme de dictionnaire (mêmes clés que
+les paramètres de requête) pour être appelées indifféremment depuis une route
+ou depuis un job de la file ``pointflex_reports``. Elles retournent un
+dictionnaire ``{'error', 'buffer', 'filename', 'status_code'}``.
+
+Les rapports de présence, qui peuvent compter des dizaines de milliers de
+lignes, passent par le rendu tabulaire rapide de ``pdf_utils``
+(``build_tabular_pdf``) et sont écrits dans un fichier temporaire.
+"""
+
+import json
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph
+
+from backend.models.audit_log import AuditLog
+from backend.models.company import Company
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.utils.pdf_utils import (
+    build_pdf_document,
+    build_tabular_pdf,
+    create_styled_table,
+    generate_report_title_elements,
+    get_report_styles,
+    new_pdf_spool,
+)
+
+PDF_MIMETYPE = 'application/pdf'
+
+
+def _error(message, status_code):
+    return {'error': True, 'message': message, 'status_code': status_code}
+
+
+def _apply_pointage_filters(query, filters):
+    """Applique les filtres communs de date, type et statut ; retourne (query, textes)"""
+    report_filters_texts = []
+    if filters.get('start_date'):
+        start_date = datetime.strptime(filters['start_date'], '%Y-%m-%d').date()
+        query = query.filter(Pointage.date_pointage >= start_date)
+        report_filters_texts.append(f"Début: {start_date.strftime('%d/%m/%Y')}")
+    if filters.get('end_date'):
+        end_date = datetime.strptime(filters['end_date'], '%Y-%m-%d').date()
+        query = query.filter(Pointage.date_pointage <= end_date)
+        report_filters_texts.append(f"Fin: {end_date.strftime('%d/%m/%Y')}")
+    if filters.get('pointage_type'):
+        query = query.filter(Pointage.type == filters['pointage_type'])
+        report_filters_texts.append(f"Type: {filters['pointage_type']}")
+    if filters.get('pointage_status'):
+        query = query.filter(Pointage.statut == filters['pointage_status'])
+        report_filters_texts.append(f"Statut Pointage: {filters['pointage_status']}")
+    return query, report_filters_texts
+
+
+def _duration_hours(p):
+    if not (p.heure_arrivee and p.heure_depart):
+        return ""
+    try:
+        datetime_arrivee = datetime.combine(p.date_pointage, p.heure_arrivee)
+        datetime_depart = datetime.combine(p.date_pointage, p.heure_depart)
+        if datetime_depart < datetime_arrivee:
+            datetime_depart += timedelta(days=1)
+        return f"{((datetime_depart - datetime_arrivee).total_seconds() / 3600):.2f}"
+    except TypeError:
+        return "Erreur"
+
+
+def _delay_minutes(p, context):
+    """Retard calculé avec les entités préchargées par ``build_serialization_context``"""
+    user = context['users'].get(p.user_id)
+    company = context['companies'].get(user.company_id) if user else None
+    office = context['offices'].get(p.office_id)
+    return p._compute_delay_minutes(company, office, context['default_timezone'])
+
+
+def build_company_attendance_pdf(company_id, filters):
+    """Rapport PDF détaillé des pointages d'une entreprise"""
+    company = Company.query.get(company_id)
+    if not company:
+        return _error("Entreprise non trouvée", 404)
+
+    query = Pointage.query.join(User).filter(User.company_id == company_id)
+    query, report_filters_texts = _apply_pointage_filters(query, filters)
+
+    user_id_filter = filters.get('user_id')
+    if user_id_filter:
+        user_id_filter = int(user_id_filter)
+        user_to_filter = User.query.filter_by(id=user_id_filter, company_id=company_id).first()
+        if not user_to_filter:
+            return _error(f"Utilisateur avec ID {user_id_filter} non trouvé ou non autorisé.", 404)
+        query = query.filter(Pointage.user_id == user_id_filter)
+        report_filters_texts.append(f"Employé: {user_to_filter.prenom} {user_to_filter.nom}")
+
+    date_filter_text = ", ".join(report_filters_texts) if report_filters_texts else "toutes périodes"
+
+    sort_by = filters.get('sort_by', 'user_then_date')
+    if sort_by == 'date':
+        order_criteria = [Pointage.date_pointage, Pointage.heure_arrivee, User.nom, User.prenom]
+    elif sort_by == 'type':
+        order_criteria = [Pointage.type, User.nom, User.prenom, Pointage.date_pointage]
+    elif sort_by == 'status':
+        order_criteria = [Pointage.statut, User.nom, User.prenom, Pointage.date_pointage]
+    else:  # user_then_date
+        order_criteria = [User.nom, User.prenom, Pointage.date_pointage, Pointage.heure_arrivee]
+
+    if filters.get('sort_direction', 'asc') == 'desc':
+        order_criteria = [criterion.desc() for criterion in order_criteria]
+
+    pointages = query.order_by(*order_criteria).all()
+
+    story = generate_report_title_elements(
+        title_str="Rapport de Présence",
+        period_str=date_filter_text,
+        company_name=company.name
+    )
+    context = Pointage.build_serialization_context(pointages) if pointages else None
+
+    def rows():
+        for p in pointages:
+            user = context['users'].get(p.user_id)
+            yield [
+                f"{user.prenom} {user.nom}" if user else str(p.user_id),
+                p.date_pointage.strftime('%d/%m/%y'),
+                p.heure_arrivee.strftime('%H:%M') if p.heure_arrivee else "N/A",
+                p.heure_depart.strftime('%H:%M') if p.heure_depart else "N/A",
+                _duration_hours(p),
+                p.type or "N/A",
+                str(_delay_minutes(p, context)),
+                p.delay_reason or "",
+            ]
+
+    col_widths = [1.4*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 1.9*inch]
+    custom_table_styles = [
+        ('ALIGN', (0, 1), (0, -1), 'LEFT'),      # Employé
+        ('ALIGN', (1, 1), (1, -1), 'CENTER'),    # Date
+        ('ALIGN', (2, 1), (2, -1), 'CENTER'),    # Arrivée
+        ('ALIGN', (3, 1), (3, -1), 'CENTER'),    # Départ
+        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),     # Durée
+        ('ALIGN', (5, 1), (5, -1), 'CENTER'),    # Type
+        ('ALIGN', (6, 1), (6, -1), 'RIGHT'),     # Retard
+        ('ALIGN', (7, 1), (7, -1), 'LEFT'),      # Commentaire
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F0F0F0')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
+    ]
+    buffer = build_tabular_pdf(
+        new_pdf_spool(),
+        ["Employé", "Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Commentaire"],
+        rows(),
+        col_widths,
+        title=f"Rapport Présence - {company.name}",
+        author="PointFlex Application",
+        intro=story,
+        style_commands=custom_table_styles,
+        empty_message="Aucun pointage trouvé pour la période sélectionnée.",
+    )
+    return {
+        'error': False,
+        'buffer': buffer,
+        'filename': f'rapport_presence_{company.name.replace(" ", "_")}_{datetime.now().strftime("%Y%m%d")}.pdf',
+        'status_code': 200
+    }
+
+
+def build_employee_attendance_pdf(employee_id, filters):
+    """Rapport PDF des pointages d'un employé"""
+    target_employee = User.query.get(employee_id)
+    if not target_employee:
+        return _error("Employé non trouvé.", 404)
+
+    query = Pointage.query.filter_by(user_id=employee_id)
+    query, report_filters_texts = _apply_pointage_filters(query, filters)
+    date_filter_text = ", ".join(report_filters_texts) if report_filters_texts else "toutes périodes"
+
+    order_criteria = []
+    sort_by = filters.get('sort_by', 'date')
+    if sort_by == 'type':
+        order_criteria.append(Pointage.type)
+    elif sort_by == 'status':
+        order_criteria.append(Pointage.statut)
+    # Tri par défaut : date puis heure, dans le même sens que le critère principal
+    order_criteria.extend([Pointage.date_pointage, Pointage.heure_arrivee])
+
+    if filters.get('sort_direction', 'asc') == 'desc':
+        order_criteria = [criterion.desc() for criterion in order_criteria]
+    else:
+        order_criteria = [criterion.asc() for criterion in order_criteria]
+
+    pointages = query.order_by(*order_criteria).all()
+
+    story = generate_report_title_elements(
+        title_str=f"Rapport de Présence - {target_employee.prenom} {target_employee.nom}",
+        period_str=date_filter_text,
+        company_name=target_employee.company.name if target_employee.company else "N/A"
+    )
+    context = Pointage.build_serialization_context(pointages) if pointages else None
+
+    def rows():
+        for p in pointages:
+            office = context['offices'].get(p.office_id)
+            yield [
+                p.date_pointage.strftime('%d/%m/%y'),
+                p.heure_arrivee.strftime('%H:%M') if p.heure_arrivee else "N/A",
+                p.heure_depart.strftime('%H:%M') if p.heure_depart else "N/A",
+                _duration_hours(p),
+                p.type or "N/A",
+                str(_delay_minutes(p, context)),
+                office.name if p.type == 'office' and office else (p.mission_order_number or "N/A"),
+                p.statut or "",
+            ]
+
+    col_widths = [0.7*inch, 0.7*inch, 0.7*inch, 0.6*inch, 0.7*inch, 0.6*inch, 1.5*inch, 1.8*inch]
+    custom_table_styles = [
+        ('ALIGN', (1, 1), (1, -1), 'CENTER'), ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+        ('ALIGN', (3, 1), (3, -1), 'CENTER'), ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+        ('ALIGN', (5, 1), (5, -1), 'CENTER'), ('ALIGN', (6, 1), (6, -1), 'RIGHT'),
+        ('ALIGN', (7, 1), (7, -1), 'LEFT'), ('ALIGN', (8, 1), (8, -1), 'LEFT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
+    ]
+    buffer = build_tabular_pdf(
+        new_pdf_spool(),
+        ["Date", "Arrivée", "Départ", "Durée (H)", "Type", "Retard (min)", "Lieu/Mission", "Statut"],
+        rows(),
+        col_widths,
+        title=f"Rapport Présence - {target_employee.prenom} {target_employee.nom}",
+        author="PointFlex Application",
+        intro=story,
+        style_commands=custom_table_styles,
+        empty_message="Aucun pointage trouvé pour cet employé pour la période sélectionnée.",
+    )
+    return {
+        'error': False,
+        'buffer': buffer,
+        'filename': f'rapport_presence_{target_employee.nom.lower()}_{employee_id}_{datetime.now().strftime("%Y%m%d")}.pdf',
+        'status_code': 200
+    }
+
+
+def build_audit_log_pdf(filters):
+    """Rapport PDF des logs d'audit (toutes entreprises)"""
+    query = AuditLog.query
+
+    report_filters = []
+    if filters.get('start_date'):
+        start_date = datetime.strptime(filters['start_date'], '%Y-%m-%d').date()
+        query = query.filter(AuditLog.created_at >= datetime.combine(start_date, datetime.min.time()))
+        report_filters.append(f"Début: {start_date.strftime('%d/%m/%Y')}")
+    if filters.get('end_date'):
+        end_date = datetime.strptime(filters['end_date'], '%Y-%m-%d').date()
+        query = query.filter(AuditLog.created_at <= datetime.combine(end_date, datetime.max.time()))
+        report_filters.append(f"Fin: {end_date.strftime('%d/%m/%Y')}")
+    if filters.get('user_email'):
+        query = query.filter(AuditLog.user_email.ilike(f"%{filters['user_email']}%"))
+        report_filters.append(f"Email: {filters['user_email']}")
+    if filters.get('action'):
+        query = query.filter(AuditLog.action.ilike(f"%{filters['action']}%"))
+        report_filters.append(f"Action: {filters['action']}")
+    if filters.get('resource_type'):
+        query = query.filter(AuditLog.resource_type.ilike(f"%{filters['resource_type']}%"))
+        report_filters.append(f"Ressource: {filters['resource_type']}")
+
+    date_filter_text = ", ".join(report_filters) if report_filters else "toutes périodes"
+
+    logs = query.order_by(AuditLog.created_at.desc()).all()
+
+    styles = get_report_styles()
+    story = generate_report_title_elements(
+        title_str="Rapport des Logs d'Audit",
+        period_str=date_filter_text
+    )
+
+    if not logs:
+        story.append(Paragraph("Aucun log d'audit trouvé pour les filtres sélectionnés.", styles['Normal']))
+    else:
+        table_data = [
+            [Paragraph(col, styles['SmallText']) for col in
+             ["Date/Heure", "Utilisateur", "Action", "Ressource", "ID Ress.", "Détails Changement", "IP"]]
+        ]
+
+        for log in logs:
+            # Résumé tronqué des détails pour garder le PDF lisible
+            changes_summary = []
+            if log.parsed_details:
+                changes_summary.append(f"Détails: {json.dumps(log.parsed_details, ensure_ascii=False, default=str)[:100]}")
+            if log.parsed_old_values:
+                changes_summary.append(f"Ancien: {json.dumps(log.parsed_old_values, ensure_ascii=False, default=str)[:100]}")
+            if log.parsed_new_values:
+                changes_summary.append(f"Nouveau: {json.dumps(log.parsed_new_values, ensure_ascii=False, default=str)[:100]}")
+            change_str = "; ".join(changes_summary) or "N/A"
+
+            table_data.append([
+                Paragraph(log.created_at.strftime('%d/%m/%y %H:%M:%S'), styles['SmallText']),
+                Paragraph(log.user_email, styles['SmallText']),
+                Paragraph(log.action, styles['SmallText']),
+                Paragraph(log.resource_type, styles['SmallText']),
+                Paragraph(str(log.resource_id) if log.resource_id is not None else "N/A", styles['SmallText']),
+                Paragraph(change_str, styles['SmallText']),
+                Paragraph(log.ip_address or "N/A", styles['SmallText'])
+            ])
+
+        col_widths = [1.2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.6*inch, 2.2*inch, 0.7*inch]
+        custom_table_styles = [
+            ('FONTSIZE', (0, 0), (-1, -1), 6),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#FAFAFA')]),
+            ('ALIGN', (0, 1), (3, -1), 'LEFT'),
+            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
+            ('ALIGN', (5, 1), (6, -1), 'LEFT'),
+        ]
+        story.append(create_styled_table(table_data, col_widths=col_widths, style_commands=custom_table_styles))
+
+    buffer = build_pdf_document(
+        BytesIO(), story,
+        title="Rapport Logs d'Audit",
+        author="PointFlex Application"
+    )
+    return {
+        'error': False,
+        'buffer': buffer,
+        'filename': f'rapport_audit_logs_{datetime.now().strftime("%Y%m%d")}.pdf',
+        'status_code': 200
+    }
@@ -0,0 +1,261 @@
+"""
+Calendrier des jours ouvrés par entreprise
+
+Pour chaque ``(entreprise, année)``, les jours ouvrés (``work_days`` de
+l'entreprise, hors jours fériés nationaux et jours fériés de l'entreprise)
+sont précalculés une fois sous forme d'un tableau d'octets et de ses sommes
+préfixes : le nombre de jours ouvrés d'une période se lit alors en O(1) par
+année couverte, sans requête ni parcours jour par jour.
+
+Les calendriers sont gardés par processus pendant ``WORKDAY_CALENDAR_CACHE_TTL``
+secondes. Un ajout, une modification ou une suppression de jour férié de
+l'entreprise, ou un changement de ``work_days`` / du pays des jours fériés,
+invalide les calendriers de l'entreprise après le commit et incrémente la
+version partagée dans Redis ; les autres workers (web et RQ) la relisent au
+plus toutes les ``WORKDAY_CALENDAR_VERSION_CHECK_SECONDS`` secondes et vident
+alors leurs calendriers. Sans Redis, le TTL borne la durée pendant laquelle
+un autre worker peut compter les jours d'un congé avec l'ancien calendrier.
+"""
+import calendar
+import logging
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.database import db
+from backend.models.company import Company
+from backend.models.company_holiday import CompanyHoliday
+from backend.utils.holiday_utils import get_national_holidays
+from backend.utils.redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'pointflex:workday_calendars:version'
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_VERSION_CHECK_SECONDS = 2
+# Après un échec de connexion, Redis n'est pas réinterrogé pendant ce délai
+REDIS_RETRY_SECONDS = 30
+DEFAULT_WORK_DAYS = frozenset({0, 1, 2, 3, 4})
+DEFAULT_COUNTRY_CODE = 'FR'
+VALID_PERIODS = ('full_day', 'half_day_morning', 'half_day_afternoon')
+# Colonnes de l'entreprise qui définissent ses jours ouvrés
+POLICY_COLUMNS = ('work_days', 'default_country_code_for_holidays')
+# Clé de ``Session.info`` : entreprises dont le calendrier a changé
+PENDING_KEY = 'workday_calendar_companies'
+
+# company_id -> {année: (calendrier, expiration)}
+_entries = {}
+_state = {'version': None, 'checked_at': 0.0, 'redis_down_until': 0.0}
+_lock = threading.Lock()
+
+
+class YearCalendar:
+    """Jours ouvrés d'une année : indicateurs par jour et sommes préfixes"""
+
+    __slots__ = ('year', 'first_day', 'flags', 'prefix')
+
+    def __init__(self, year, work_days, closed_days):
+        self.year = year
+        self.first_day = date(year, 1, 1)
+        length = 366 if calendar.isleap(year) else 365
+        first_weekday = self.first_day.weekday()
+        self.flags = bytearray(length)
+        self.prefix = array('H', bytes(2 * (length + 1)))
+        total = 0
+        for offset in range(length):
+            if (first_weekday + offset) % 7 in work_days \
+                    and self.first_day + timedelta(days=offset) not in closed_days:
+                self.flags[offset] = 1
+                total += 1
+            self.prefix[offset + 1] = total
+
+    def is_workday(self, day):
+        return bool(self.flags[(day - self.first_day).days])
+
+    def count(self, start, end):
+        """Jours ouvrés entre ``start`` et ``end`` inclus (bornés à l'année)"""
+        return self.prefix[(end - self.first_day).days + 1] - self.prefix[(start - self.first_day).days]
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _redis_call(operation):
+    """Exécute ``operation(redis)`` ; retourne None si Redis est indisponible"""
+    now = time.monotonic()
+    if now < _state['redis_down_until']:
+        return None
+    try:
+        return operation(get_redis_connection())
+    except Exception as exc:
+        _state['redis_down_until'] = now + REDIS_RETRY_SECONDS
+        logger.debug(f"Redis indisponible pour le cache des calendriers: {exc}")
+        return None
+
+
+def _sync_version():
+    """Relit la version partagée et vide les calendriers du processus si elle a changé"""
+    now = time.monotonic()
+    if now - _state['checked_at'] < _config('WORKDAY_CALENDAR_VERSION_CHECK_SECONDS',
+                                            DEFAULT_VERSION_CHECK_SECONDS):
+        return
+    _state['checked_at'] = now
+
+    remote = _redis_call(lambda redis: redis.get(VERSION_KEY))
+    if remote is None or int(remote) == _state['version']:
+        return
+    with _lock:
+        _entries.clear()
+        _state['version'] = int(remote)
+
+
+def _parse_work_days(value):
+    if not value:
+        return DEFAULT_WORK_DAYS
+    try:
+        return frozenset(map(int, value.split(',')))
+    except ValueError:  # Chaîne mal formée : lundi-vendredi
+        return DEFAULT_WORK_DAYS
+
+
+def _build(company_id, year):
+    policy = db.session.execute(
+        select(Company.work_days, Company.default_country_code_for_holidays).where(Company.id == company_id)
+    ).first()
+    if policy is None:
+        # Entreprise inconnue : lundi-vendredi, jours fériés français, sans jours fériés propres
+        return YearCalendar(year, DEFAULT_WORK_DAYS, get_national_holidays(DEFAULT_COUNTRY_CODE, year, year))
+
+    closed_days = get_national_holidays(policy.default_country_code_for_holidays or DEFAULT_COUNTRY_CODE, year, year)
+    closed_days.update(db.session.scalars(
+        select(CompanyHoliday.date).where(
+            CompanyHoliday.company_id == company_id,
+            CompanyHoliday.date >= date(year, 1, 1),
+            CompanyHoliday.date <= date(year, 12, 31),
+        )
+    ))
+    return YearCalendar(year, _parse_work_days(policy.work_days), closed_days)
+
+
+def get_year_calendar(company_id, year):
+    """Calendrier des jours ouvrés de ``company_id`` pour ``year``, depuis le cache si possible"""
+    _sync_version()
+    now = time.monotonic()
+    cached = _entries.get(company_id, {}).get(year)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    year_calendar = _build(company_id, year)
+    ttl = _config('WORKDAY_CALENDAR_CACHE_TTL', DEFAULT_TTL_SECONDS)
+    if ttl > 0:
+        with _lock:
+            _entries.setdefault(company_id, {})[year] = (year_calendar, now + ttl)
+    return year_calendar
+
+
+def count_workdays(company_id, start_date, end_date):
+    """Nombre de jours ouvrés entiers entre ``start_date`` et ``end_date`` inclus"""
+    total = 0
+    for year in range(start_date.year, end_date.year + 1):
+        year_calendar = get_year_calendar(company_id, year)
+        total += year_calendar.count(max(start_date, date(year, 1, 1)), min(end_date, date(year, 12, 31)))
+    return total
+
+
+def is_workday(company_id, day):
+    return get_year_calendar(company_id, day.year).is_workday(day)
+
+
+def calculate_leave_days(company_id, start_date, end_date, start_day_period='full_day', end_day_period='full_day'):
+    """
+    Durée d'un congé en jours ouvrés, demi-journées comprises
+
+    Un jour unique compte 0,5 dès qu'une des périodes est une demi-journée ;
+    sur plusieurs jours, le premier (resp. dernier) jour compte 0,5 si sa
+    période n'est pas ``full_day`` et qu'il est ouvré.
+    """
+    if start_date > end_date:
+        return 0.0
+    if start_day_period not in VALID_PERIODS or end_day_period not in VALID_PERIODS:
+        raise ValueError("Invalid start_day_period or end_day_period value.")
+
+    days = float(count_workdays(company_id, start_date, end_date))
+    if start_date == end_date:
+        if days and (start_day_period != 'full_day' or end_day_period != 'full_day'):
+            return 0.5
+        return days
+    if start_day_period != 'full_day' and is_workday(company_id, start_date):
+        days -= 0.5
+    if end_day_period != 'full_day' and is_workday(company_id, end_date):
+        days -= 0.5
+    return days
+
+
+def invalidate_workday_calendar(company_ids=None):
+    """Invalide les calendriers des entreprises ``company_ids`` (tous si None)"""
+    with _lock:
+        if company_ids is None:
+            _entries.clear()
+            return
+        for company_id in company_ids:
+            _entries.pop(company_id, None)
+
+
+def bump_version(company_ids):
+    """Invalide localement et signale la modification aux autres workers"""
+    invalidate_workday_calendar(company_ids)
+    remote = _redis_call(lambda redis: redis.incr(VERSION_KEY))
+    if remote is not None:
+        _state['version'] = int(remote)
+
+
+def clear():
+    """Vide entièrement le cache du processus (nouvelle application, tests)"""
+    with _lock:
+        _entries.clear()
+        _state['version'] = None
+        _state['checked_at'] = 0.0
+
+
+# Écouteurs de session ------------------------------------------------------------
+def _after_flush(session, flush_context):
+    companies = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CompanyHoliday):
+            companies.add(obj.company_id)
+            companies.update(inspect(obj).attrs.company_id.history.deleted or ())
+        elif isinstance(obj, Company) and obj in session.dirty:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in POLICY_COLUMNS):
+                companies.add(obj.id)
+        elif isinstance(obj, Company) and obj in session.deleted:
+            companies.add(obj.id)
+    companies.discard(None)
+    if companies:
+        session.info.setdefault(PENDING_KEY, set()).update(companies)
+
+
+def _after_commit(session):
+    companies = session.info.pop(PENDING_KEY, None)
+    if companies:
+        bump_version(companies)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_workday_calendar_hooks():
+    """Active l'invalidation des calendriers pour toutes les sessions (idempotent)"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
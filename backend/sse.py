@@ -16,10 +16,11 @@ from __future__ import annotations
 
 import importlib
 import importlib.util
+import json
 
 from flask import Blueprint
 
-__all__ = ["sse"]
+__all__ = ["sse", "publish_many"]
 
 
 def _load_real_extension():
@@ -49,3 +50,24 @@ if _sse is None:
     sse = _FallbackSSE()
 else:
     sse = _sse
+
+
+def publish_many(messages, type=None):
+    """Publish several ``(channel, data)`` messages in one Redis round trip.
+
+    Same wire format as ``sse.publish``, but the real extension opens a Redis
+    connection per call: here a single non-transactional pipeline carries the
+    whole batch.  Returns the number of messages published.
+    """
+
+    messages = list(messages)
+    if not messages or isinstance(sse, _FallbackSSE):
+        return 0
+
+    from flask_sse import Message
+
+    pipeline = sse.redis.pipeline(transaction=False)
+    for channel, data in messages:
+        pipeline.publish(channel, json.dumps(Message(data, type=type).to_dict()))
+    pipeline.execute()
+    return len(messages)
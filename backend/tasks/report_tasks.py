@@ -0,0 +1,24 @@
+"""
+Tâches RQ de la file ``pointflex_reports``
+
+Le worker (``run_worker.py``) exécute les tâches dans un contexte
+d'application Flask : la base et la configuration sont donc accessibles.
+"""
+
+from flask import current_app
+
+from backend.database import db
+from backend.services.report_job_service import purge_expired_report_jobs, run_report_job
+
+
+def run_report_job_task(job_id: str):
+    """Génère le rapport ``job_id`` puis supprime les rapports expirés"""
+    try:
+        run_report_job(job_id)
+        try:
+            purge_expired_report_jobs()
+        except Exception as e:
+            current_app.logger.warning(f"Purge des rapports expirés impossible: {e}")
+    finally:
+        # Le worker ne forke pas : la session ne doit pas survivre au job
+        db.session.remove()
@@ -1,220 +1,212 @@
 """
 Tâche planifiée pour vérifier les abonnements sur le point d'expirer
 et envoyer des notifications par email et dans l'application
+
+Seules les entreprises qui franchissent un seuil aujourd'hui sont lues
+(requête sur ``subscription_end``, indexée) ; leurs administrateurs et leurs
+préférences de notification sont chargés en deux requêtes groupées. Les
+emails sont rendus avec les templates précompilés puis mis en file d'envoi
+dans la transaction des notifications ; le relais de la file les envoie sur
+les connexions du pool SMTP.
 """
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 from backend.database import db
 from backend.models.company import Company
-from backend.models.notification import Notification
 from backend.models.user import User
 from backend.models.notification_settings import NotificationSettings
-from backend.services.email import send_subscription_expiring_soon_email, send_subscription_expired_email
+from backend.services.email import (
+    compose_subscription_expired_email,
+    compose_subscription_expiring_soon_email,
+    enqueue_emails,
+    send_email_outbox_if_sync,
+)
+from backend.utils.notification_utils import send_notifications_bulk
 from flask import current_app
-import logging
-from dateutil.relativedelta import relativedelta
 
-def check_expiring_subscriptions():
+# Seuils de notification (jours avant expiration)
+THRESHOLDS = (30, 14, 7, 3, 1)
+# Seuils donnant lieu à un email
+EMAIL_THRESHOLDS = (30, 14, 7, 1)
+# Les super admins sont prévenus à partir de ce seuil
+SUPERADMIN_THRESHOLD = 7
+# Un abonnement expiré est notifié le premier jour d'expiration uniquement
+EXPIRED_DAYS_REMAINING = -1
+ADMIN_ROLES = ('admin', 'admin_rh')
+
+
+def _companies_due(today):
+    """Entreprises dont l'abonnement franchit un seuil aujourd'hui, avec les jours restants"""
+    due_dates = {today + timedelta(days=days): days for days in THRESHOLDS + (EXPIRED_DAYS_REMAINING,)}
+    # Colonnes seules : les commits des notifications n'entraînent pas de rechargement
+    companies = db.session.execute(
+        db.select(Company.id, Company.name, Company.subscription_plan, Company.subscription_end)
+        .where(Company.subscription_end.in_(list(due_dates)))
+    ).all()
+    return [(company, due_dates[company.subscription_end]) for company in companies]
+
+
+def _admins_by_company(company_ids):
+    admins = defaultdict(list)
+    rows = db.session.execute(
+        db.select(User.id, User.company_id, User.email, User.nom, User.prenom)
+        .where(User.company_id.in_(company_ids), User.role.in_(ADMIN_ROLES), User.is_active.is_(True))
+    )
+    for admin in rows:
+        admins[admin.company_id].append(admin)
+    return admins
+
+
+def _email_enabled_by_company(company_ids):
+    """Préférence email par entreprise (activée par défaut si aucun paramètre n'existe)"""
+    rows = db.session.execute(
+        db.select(NotificationSettings.company_id, NotificationSettings.email_notifications)
+        .where(NotificationSettings.company_id.in_(company_ids))
+    )
+    return dict(rows.all())
+
+
+def _notify(company, days_remaining, admins, superadmin_ids, renewal_url):
+    """Notifications internes d'une entreprise ; retourne le nombre de notifications créées"""
+    expiration_date = company.subscription_end.isoformat()
+    created = 0
+    if days_remaining < 0:
+        created += len(send_notifications_bulk(
+            [admin.id for admin in admins],
+            "L'abonnement de votre entreprise a expiré. Certaines fonctionnalités ne sont plus disponibles.",
+            title="Abonnement expiré",
+            data_payload={
+                'type': 'subscription_expired',
+                'company_id': company.id,
+                'expiration_date': expiration_date,
+                'subscription_plan': company.subscription_plan,
+                'renewal_url': renewal_url,
+                'priority': 'high'
+            }
+        ))
+        created += len(send_notifications_bulk(
+            superadmin_ids,
+            f"L'abonnement de {company.name} a expiré.",
+            title="Abonnement client expiré",
+            data_payload={
+                'type': 'subscription_expired_admin',
+                'company_id': company.id,
+                'expiration_date': expiration_date,
+                'subscription_plan': company.subscription_plan,
+                'priority': 'high'
+            }
+        ))
+        return created
+
+    created += len(send_notifications_bulk(
+        [admin.id for admin in admins],
+        f"L'abonnement de votre entreprise expire dans {days_remaining} jours.",
+        title="Expiration d'abonnement",
+        data_payload={
+            'type': 'subscription_expiring_soon',
+            'company_id': company.id,
+            'days_remaining': days_remaining,
+            'expiration_date': expiration_date,
+            'subscription_plan': company.subscription_plan,
+            'renewal_url': renewal_url,
+            'priority': 'high' if days_remaining <= 7 else 'medium'
+        }
+    ))
+    # Notifier également les super admins si l'expiration est proche
+    if days_remaining <= SUPERADMIN_THRESHOLD:
+        created += len(send_notifications_bulk(
+            superadmin_ids,
+            f"L'abonnement de {company.name} expire dans {days_remaining} jours.",
+            title="Abonnement client sur le point d'expirer",
+            data_payload={
+                'type': 'subscription_expiring_soon_admin',
+                'company_id': company.id,
+                'days_remaining': days_remaining,
+                'expiration_date': expiration_date,
+                'subscription_plan': company.subscription_plan,
+                'priority': 'high' if days_remaining <= 3 else 'medium'
+            }
+        ))
+    return created
+
+
+def _compose_emails(company, days_remaining, admins, renewal_url):
+    expiration_date = company.subscription_end.strftime("%d/%m/%Y")
+    plan_name = company.subscription_plan or "Standard"
+    emails = []
+    for admin in admins:
+        user_name = f"{admin.prenom} {admin.nom}"
+        if days_remaining < 0:
+            email = compose_subscription_expired_email(
+                admin.email, user_name, company.name, plan_name, expiration_date, renewal_url
+            )
+        else:
+            email = compose_subscription_expiring_soon_email(
+                admin.email, user_name, company.name, plan_name, days_remaining, expiration_date, renewal_url
+            )
+        if email:
+            emails.append(email)
+    return emails
+
+
+def check_expiring_subscriptions(dry_run=False):
     """
     Vérifie les abonnements sur le point d'expirer et envoie des notifications
     Cette fonction est appelée quotidiennement via une tâche planifiée
-    
+
     Envoie à la fois des notifications dans l'application et des emails
-    selon les préférences de notification de l'utilisateur
+    selon les préférences de notification de l'entreprise. En simulation
+    (``dry_run``), rien n'est enregistré ni envoyé.
     """
     logger = current_app.logger
     logger.info("Vérification des abonnements sur le point d'expirer...")
-    
+
     try:
-        # Seuils de notification (jours avant expiration)
-        thresholds = [30, 14, 7, 3, 1]
         today = datetime.utcnow().date()
-        
-        # Récupérer toutes les entreprises avec des abonnements actifs
-        companies = Company.query.filter(Company.subscription_end_date.isnot(None)).all()
-        
-        notifications_created = 0
-        emails_sent = 0
-        
+        due = _companies_due(today)
+        if not due:
+            return True, "0 notifications créées, 0 emails en file d'envoi"
+
+        company_ids = [company.id for company, _ in due]
+        admins_by_company = _admins_by_company(company_ids)
+        email_enabled = _email_enabled_by_company(company_ids)
+        superadmin_ids = [user_id for (user_id,) in db.session.execute(
+            db.select(User.id).where(User.role == 'superadmin', User.is_active.is_(True))
+        )]
+
         # URL de base pour le renouvellement des abonnements
         frontend_url = current_app.config.get('FRONTEND_URL', 'http://localhost:5173')
-        
-        for company in companies:
-            if not company.subscription_end_date:
-                continue
-                
-            # Calculer le nombre de jours avant expiration
-            days_remaining = (company.subscription_end_date - today).days
-            
-            # Vérifier si l'abonnement est déjà expiré
-            is_expired = days_remaining < 0
-            
-            # Gérer les abonnements expirés
-            if is_expired and days_remaining > -2:  # Notifier uniquement le premier jour d'expiration
+
+        notifications_created = 0
+        emails_queued = 0
+        for company, days_remaining in due:
+            admins = admins_by_company.get(company.id, [])
+            renewal_url = f"{frontend_url}/subscription/renew?company_id={company.id}"
+            if days_remaining < 0:
                 logger.info(f"Abonnement de {company.name} a expiré depuis {abs(days_remaining)} jour(s)")
-                
-                # Trouver les administrateurs de l'entreprise pour les notifier
-                admins = User.query.filter_by(company_id=company.id, role='admin').all()
-                
-                # Formatage de la date d'expiration pour l'email
-                expiration_date = company.subscription_end_date.strftime("%d/%m/%Y")
-                
-                # URL pour le renouvellement
-                renewal_url = f"{frontend_url}/subscription/renew?company_id={company.id}"
-                
-                for admin in admins:
-                    # Créer une notification interne
-                    notification = Notification(
-                        user_id=admin.id,
-                        title="Abonnement expiré",
-                        message=f"L'abonnement de votre entreprise a expiré. Certaines fonctionnalités ne sont plus disponibles.",
-                        type='subscription_expired',
-                        data={
-                            'company_id': company.id,
-                            'expiration_date': company.subscription_end_date.isoformat(),
-                            'subscription_plan': company.subscription_plan,
-                            'renewal_url': renewal_url
-                        },
-                        priority='high'
-                    )
-                    db.session.add(notification)
-                    notifications_created += 1
-                    
-                    # Vérifier les préférences de notification par email
-                    notification_settings = NotificationSettings.query.filter_by(company_id=company.id).first()
-                    email_notifications_enabled = (
-                        notification_settings.email_notifications
-                        if notification_settings
-                        else True
-                    )
-
-                    # Envoyer un email si l'entreprise a activé les notifications par email
-                    if email_notifications_enabled:
-                        user_name = f"{admin.prenom} {admin.nom}"
-                        plan_name = company.subscription_plan or "Standard"
-                        
-                        # Envoyer l'email d'expiration
-                        email_sent = send_subscription_expired_email(
-                            user_email=admin.email,
-                            user_name=user_name,
-                            company_name=company.name,
-                            plan_name=plan_name,
-                            expiration_date=expiration_date,
-                            renewal_url=renewal_url
-                        )
-                        
-                        if email_sent:
-                            emails_sent += 1
-                            logger.info(f"Email d'expiration envoyé à {admin.email}")
-                
-                # Notifier les super admins
-                super_admins = User.query.filter_by(is_superadmin=True).all()
-                
-                for super_admin in super_admins:
-                    notification = Notification(
-                        user_id=super_admin.id,
-                        title="Abonnement client expiré",
-                        message=f"L'abonnement de {company.name} a expiré.",
-                        type='subscription_expired_admin',
-                        data={
-                            'company_id': company.id,
-                            'expiration_date': company.subscription_end_date.isoformat(),
-                            'subscription_plan': company.subscription_plan
-                        },
-                        priority='high'
-                    )
-                    db.session.add(notification)
-                    notifications_created += 1
-            
-            # Gérer les abonnements sur le point d'expirer
-            elif days_remaining in thresholds:
+            else:
                 logger.info(f"Abonnement de {company.name} expire dans {days_remaining} jours")
-                
-                # Trouver les administrateurs de l'entreprise pour les notifier
-                admins = User.query.filter_by(company_id=company.id, role='admin').all()
-                
-                # Formatage de la date d'expiration pour l'email
-                expiration_date = company.subscription_end_date.strftime("%d/%m/%Y")
-                
-                # URL pour le renouvellement
-                renewal_url = f"{frontend_url}/subscription/renew?company_id={company.id}"
-                
-                for admin in admins:
-                    # Créer une notification interne
-                    notification = Notification(
-                        user_id=admin.id,
-                        title="Expiration d'abonnement",
-                        message=f"L'abonnement de votre entreprise expire dans {days_remaining} jours.",
-                        type='subscription_expiring_soon',
-                        data={
-                            'company_id': company.id,
-                            'days_remaining': days_remaining,
-                            'expiration_date': company.subscription_end_date.isoformat(),
-                            'subscription_plan': company.subscription_plan,
-                            'renewal_url': renewal_url
-                        },
-                        priority='high' if days_remaining <= 7 else 'medium'
-                    )
-                    db.session.add(notification)
-                    notifications_created += 1
-                    
-                    # Vérifier les préférences de notification par email
-                    notification_settings = NotificationSettings.query.filter_by(company_id=company.id).first()
-                    email_notifications_enabled = (
-                        notification_settings.email_notifications
-                        if notification_settings
-                        else True
-                    )
-
-                    # Envoyer un email si l'entreprise a activé les notifications par email
-                    # et si l'expiration est dans 30, 14, 7 ou 1 jour(s)
-                    if email_notifications_enabled:
-                        # Envoyer des emails uniquement pour certains seuils
-                        if days_remaining in [30, 14, 7, 1]:
-                            user_name = f"{admin.prenom} {admin.nom}"
-                            plan_name = company.subscription_plan or "Standard"
-                            
-                            # Envoyer l'email d'avertissement
-                            email_sent = send_subscription_expiring_soon_email(
-                                user_email=admin.email,
-                                user_name=user_name,
-                                company_name=company.name,
-                                plan_name=plan_name,
-                                days_remaining=days_remaining,
-                                expiration_date=expiration_date,
-                                renewal_url=renewal_url
-                            )
-                            
-                            if email_sent:
-                                emails_sent += 1
-                                logger.info(f"Email d'avertissement envoyé à {admin.email} (J-{days_remaining})")
-                
-                # Notifier également les super admins si l'expiration est proche (7 jours ou moins)
-                if days_remaining <= 7:
-                    super_admins = User.query.filter_by(is_superadmin=True).all()
-                    
-                    for super_admin in super_admins:
-                        notification = Notification(
-                            user_id=super_admin.id,
-                            title="Abonnement client sur le point d'expirer",
-                            message=f"L'abonnement de {company.name} expire dans {days_remaining} jours.",
-                            type='subscription_expiring_soon_admin',
-                            data={
-                                'company_id': company.id,
-                                'days_remaining': days_remaining,
-                                'expiration_date': company.subscription_end_date.isoformat(),
-                                'subscription_plan': company.subscription_plan
-                            },
-                            priority='high' if days_remaining <= 3 else 'medium'
-                        )
-                        db.session.add(notification)
-                        notifications_created += 1
-        
+
+            if email_enabled.get(company.id, True) and \
+                    (days_remaining < 0 or days_remaining in EMAIL_THRESHOLDS):
+                emails = _compose_emails(company, days_remaining, admins, renewal_url)
+                emails_queued += len(emails)
+                if not dry_run:
+                    enqueue_emails(emails, category='subscription_expiry', company_id=company.id)
+            if dry_run:
+                continue
+            notifications_created += _notify(company, days_remaining, admins, superadmin_ids, renewal_url)
+
+        if dry_run:
+            return True, f"{len(due)} entreprises concernées, {emails_queued} emails à envoyer"
+
         db.session.commit()
+        send_email_outbox_if_sync()
         logger.info(f"{notifications_created} notifications d'expiration d'abonnement créées")
-        logger.info(f"{emails_sent} emails d'expiration d'abonnement envoyés")
-        return True, f"{notifications_created} notifications créées, {emails_sent} emails envoyés"
-        
+        logger.info(f"{emails_queued} emails d'expiration d'abonnement mis en file d'envoi")
+        return True, f"{notifications_created} notifications créées, {emails_queued} emails en file d'envoi"
+
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erreur lors de la vérification des abonnements expirants: {str(e)}")
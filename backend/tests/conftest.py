@@ -1,7 +1,10 @@
 import os
 import sys
 import base64
+import socketserver
+import threading
 import types
+import uuid
 import pytest
 
 # Provide a minimal Fernet implementation so tests don't require the cryptography package
@@ -38,6 +41,11 @@ test_db_url = (
 os.environ['DATABASE_URL'] = test_db_url
 
 from backend.app import create_app
+from backend.database import db
+from backend.models.company import Company
+from backend.scripts.query_plan_benchmark import delete_synthetic_tenant
+from backend.services.email import close_smtp_pools
+from backend.services.email.email_outbox import clear_rate_limits
 
 
 @pytest.fixture
@@ -45,3 +53,65 @@ def client():
     app = create_app()
     app.config.update(TESTING=True)
     return app.test_client()
+
+
+@pytest.fixture
+def synthetic_company(client):
+    """Crée des entreprises jetables ; elles sont supprimées avec leurs données après le test"""
+    created = []
+
+    def factory(name='Bench'):
+        with client.application.app_context():
+            company = Company(name=f'{name} {uuid.uuid4().hex[:8]}', email='bench@pointflex.local')
+            db.session.add(company)
+            db.session.commit()
+            created.append(company.id)
+            return company.id
+
+    yield factory
+    with client.application.app_context():
+        for company_id in created:
+            delete_synthetic_tenant(company_id)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal : accepte tout et garde les messages reçus"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ESMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            if command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip(' <>'))
+            if command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while (data := self.rfile.readline()) != b'.\r\n':
+                    body.append(data)
+                self.server.messages.append((recipients, b''.join(body).decode()))
+                recipients = []
+            self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_server(client):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.connections, server.messages = 0, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client.application.config.update(SMTP_SERVER='127.0.0.1', SMTP_PORT=server.server_address[1],
+                                     SMTP_USE_TLS=False, SMTP_USE_AUTH=False)
+    yield server
+    close_smtp_pools()
+    clear_rate_limits()
+    server.shutdown()
+    server.server_close()
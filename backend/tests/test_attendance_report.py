@@ -0,0 +1,102 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from backend.database import db
+from backend.models.attendance_daily_summary import AttendanceDailySummary
+from backend.models.mission import Mission
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.scripts.report_benchmark import check_report_plans, seed_report_tenant
+from backend.services.attendance_report_service import build_comprehensive_report
+from backend.tests.test_attendance import login_admin
+
+
+def _admin_headers(client):
+    return {'Authorization': f'Bearer {login_admin(client)}'}
+
+
+@pytest.fixture
+def report_mission(client):
+    """Mission de l'employé de démonstration, supprimée après le test avec ses pointages et agrégats"""
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        mission = Mission(company_id=employee.company_id, order_number='OM-REPORT-1', title='Audit client')
+        db.session.add(mission)
+        db.session.commit()
+        mission_id, employee_id = mission.id, employee.id
+    yield mission_id
+    with client.application.app_context():
+        pointages = Pointage.query.filter_by(mission_id=mission_id)
+        days = [p.date_pointage for p in pointages]
+        Pause.query.filter(Pause.pointage_id.in_([p.id for p in pointages])).delete(synchronize_session=False)
+        pointages.delete(synchronize_session=False)
+        AttendanceDailySummary.query.filter(AttendanceDailySummary.user_id == employee_id,
+                                            AttendanceDailySummary.summary_date.in_(days)
+                                            ).delete(synchronize_session=False)
+        Mission.query.filter_by(id=mission_id).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_comprehensive_report_aggregates_real_data(client, report_mission):
+    today = date.today()
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        mission = db.session.get(Mission, report_mission)
+        for offset, status in ((1, 'present'), (2, 'retard')):
+            pointage = Pointage(user_id=employee.id, type='mission', mission_id=mission.id,
+                                date_pointage=today - timedelta(days=offset), statut=status,
+                                heure_arrivee=time(8, 0), heure_depart=time(17, 0))
+            db.session.add(pointage)
+            db.session.flush()
+            db.session.add(Pause(pointage_id=pointage.id, user_id=employee.id, type='repas',
+                                 start_time=datetime.utcnow(), duration_minutes=60))
+        db.session.commit()
+        employee_id = employee.id
+
+    resp = client.get('/api/admin/attendance/comprehensive-report?top=1', headers=_admin_headers(client))
+    assert resp.status_code == 200
+    report = resp.get_json()
+
+    assert report['stats']['totalRecords'] == 2
+    assert report['stats']['totalPresences'] == 1
+    assert report['stats']['totalLate'] == 1
+    assert report['stats']['totalWorkHours'] == 16
+    assert report['stats']['containsSimulatedData'] is False
+    assert [day['presences'] + day['lates'] for day in report['attendanceByDate']] == [1, 1]
+
+    employee_stats = {emp['id']: emp for emp in report['employeeStats']}
+    assert employee_stats[employee_id]['workHours'] == 16
+    assert employee_stats[employee_id]['attendanceRate'] == 100.0
+    assert len(report['topEmployees']) == 1
+    assert report['topEmployees'][0]['id'] == employee_id
+
+    assert report['departmentStats'][0]['employeeCount'] == 1
+    assert report['missionStats'] == {'totalMissions': 1, 'totalDays': 2, 'totalHours': 16}
+    assert report['missions'][0]['title'] == 'Audit client'
+    assert report['missions'][0]['hours'] == 16
+
+
+def test_comprehensive_report_rejects_invalid_period(client):
+    headers = _admin_headers(client)
+    assert client.get('/api/admin/attendance/comprehensive-report?start_date=bad',
+                      headers=headers).status_code == 400
+    assert client.get('/api/admin/attendance/comprehensive-report?start_date=2024-02-01&end_date=2024-01-01',
+                      headers=headers).status_code == 400
+
+
+def test_report_is_scoped_to_tenant_and_uses_indexes(client, synthetic_company):
+    end_date = date.today()
+    start_date = end_date - timedelta(days=30)
+    target_id, other_id = synthetic_company('Rapport'), synthetic_company('Voisin')
+    with client.application.app_context():
+        seed_report_tenant(target_id, 200, users=10)
+        before = build_comprehensive_report(target_id, start_date, end_date)
+        seed_report_tenant(other_id, 2000, users=20)
+        after = build_comprehensive_report(target_id, start_date, end_date)
+        assert after == before
+        assert before['stats']['totalRecords'] == 200
+
+        with db.engine.connect() as connection:
+            assert check_report_plans(connection, target_id, start_date, end_date) == {}
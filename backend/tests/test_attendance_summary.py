@@ -0,0 +1,117 @@
+from datetime import date, datetime, time
+
+from backend.database import db
+from backend.models.attendance_daily_summary import AttendanceDailySummary
+from backend.models.company import Company
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.scripts.query_plan_benchmark import seed_synthetic_tenant
+from backend.services.attendance_summary_service import rebuild_daily_summaries
+from backend.tests.test_attendance import login_admin, login_employee
+
+
+def _summary(user_id, day):
+    return AttendanceDailySummary.query.filter_by(user_id=user_id, summary_date=day).first()
+
+
+def _summary_values(summary):
+    values = summary.to_dict()
+    values.pop('department_id')
+    return values
+
+
+def test_checkin_checkout_and_pause_update_summary(client):
+    token = login_employee(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    resp = client.post(
+        '/api/attendance/checkin/office',
+        json={'coordinates': {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': 5}},
+        headers=headers,
+    )
+    assert resp.status_code == 201
+    pointage_id = resp.get_json()['pointage']['id']
+
+    with client.application.app_context():
+        pointage = Pointage.query.get(pointage_id)
+        summary = _summary(pointage.user_id, pointage.date_pointage)
+        assert summary.pointage_count == 1
+        assert summary.open_count == 1
+        assert summary.status == pointage.statut
+        assert summary.company_id == User.query.get(pointage.user_id).company_id
+
+        # Checkout et pause écrits directement : même chemin que les routes (flush ORM)
+        pointage.heure_arrivee = time(8, 0)
+        pointage.heure_depart = time(17, 0)
+        pause = Pause(pointage_id=pointage.id, user_id=pointage.user_id, type='repas',
+                      start_time=datetime.utcnow(), duration_minutes=60)
+        db.session.add(pause)
+        pointage.is_justified = True
+        db.session.commit()
+
+        summary = _summary(pointage.user_id, pointage.date_pointage)
+        assert summary.open_count == 0
+        assert summary.first_arrival_minutes == 8 * 60
+        assert summary.last_departure_minutes == 17 * 60
+        assert summary.pause_minutes == 60
+        assert summary.worked_minutes == 8 * 60
+        assert summary.justified_count == 1
+
+        db.session.delete(pause)
+        db.session.commit()
+        assert _summary(pointage.user_id, pointage.date_pointage).pause_minutes == 0
+
+        db.session.delete(pointage)
+        db.session.commit()
+        assert _summary(pointage.user_id, pointage.date_pointage) is None
+
+
+def test_rebuild_matches_incremental_updates(client):
+    with client.application.app_context():
+        company = Company.query.first()
+        user_ids = seed_synthetic_tenant(company.id, 300, users=10)
+        # Insertions en masse hors ORM : aucun agrégat tant que la table n'est pas reconstruite
+        assert AttendanceDailySummary.query.filter(AttendanceDailySummary.user_id.in_(user_ids)).count() == 0
+
+        assert rebuild_daily_summaries(company_id=company.id) >= 300
+        rebuilt = {
+            (s.user_id, s.summary_date): _summary_values(s)
+            for s in AttendanceDailySummary.query.filter(AttendanceDailySummary.user_id.in_(user_ids))
+        }
+        assert len(rebuilt) == 300
+
+        # Une modification ORM recalcule uniquement le couple concerné
+        pointage = Pointage.query.filter_by(user_id=user_ids[0]).first()
+        pointage.heure_depart = time(18, 0)
+        db.session.commit()
+        incremental = _summary_values(_summary(pointage.user_id, pointage.date_pointage))
+        assert incremental['departure_time'] == '18:00'
+
+        rebuild_daily_summaries(company_id=company.id)
+        assert _summary_values(_summary(pointage.user_id, pointage.date_pointage)) == incremental
+
+
+def test_stats_endpoints_read_summary(client):
+    token = login_employee(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.post(
+        '/api/attendance/checkin/office',
+        json={'coordinates': {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': 5}},
+        headers=headers,
+    )
+
+    stats = client.get('/api/attendance/stats', headers=headers).get_json()['stats']
+    assert stats['total_days'] == 1
+    assert stats['present_days'] + stats['late_days'] == 1
+
+    weekly = client.get('/api/attendance/stats/weekly', headers=headers).get_json()
+    today_entry = next(day for day in weekly['data']['days'] if day['date'] == date.today().isoformat())
+    assert today_entry['status'] in ('present', 'retard')
+    assert today_entry['arrival_time'] is not None
+
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    resp = client.get('/api/admin/attendance/stats', headers=admin_headers)
+    assert resp.status_code == 200
+    company_stats = resp.get_json()['stats']
+    assert company_stats['present_count'] + company_stats['late_count'] >= 1
+    assert company_stats['average_arrival_time'] != 'N/A'
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+from sqlalchemy import event, func
+
+from backend.database import db
+from backend.models.audit_log import AuditLog
+from backend.services import audit_pipeline
+from backend.services.audit_pipeline import AuditPipeline, flush_audit_buffer, get_audit_pipeline
+from backend.tests.test_attendance import login_admin, login_employee
+
+
+@pytest.fixture
+def held_buffer(client):
+    """Désactive le vidage automatique (thread compris) pour observer la file"""
+    app = client.application
+    pipeline = get_audit_pipeline()
+    # Sans StaticPool le thread de vidage viderait la file avant les assertions
+    pipeline.stop()
+    app.config.update(AUDIT_FLUSH_INTERVAL_MS=60_000, AUDIT_FLUSH_BATCH_SIZE=1000)
+    pipeline.configure(app, background=False)
+    pipeline.reset_metrics()
+    with app.app_context():
+        last_id = db.session.query(func.max(AuditLog.id)).scalar() or 0
+    yield pipeline
+    pipeline.configure(app)
+    with app.app_context():
+        AuditLog.query.filter(AuditLog.id > last_id).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_read_only_views_are_buffered_then_bulk_inserted(client, held_buffer):
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    employee_headers = {'Authorization': f'Bearer {login_employee(client)}'}
+
+    assert client.get('/api/admin/attendance/stats', headers=admin_headers).status_code == 200
+    # L'accès refusé n'ouvre plus de transaction dédiée
+    assert client.get('/api/admin/attendance/stats', headers=employee_headers).status_code == 403
+
+    with client.application.app_context():
+        assert AuditLog.query.filter(
+            AuditLog.action.in_(['VIEW_COMPANY_ATTENDANCE_STATS', 'UNAUTHORIZED_ACCESS'])
+        ).count() == 0
+        assert get_audit_pipeline().metrics()['queue_depth'] == 2
+
+        inserts = []
+
+        def count_inserts(conn, cursor, statement, *args):
+            if statement.startswith('INSERT INTO audit_logs'):
+                inserts.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count_inserts)
+        try:
+            assert flush_audit_buffer() == 2
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_inserts)
+
+        assert len(inserts) == 1
+        view = AuditLog.query.filter_by(action='VIEW_COMPANY_ATTENDANCE_STATS').one()
+        assert view.user_email == 'admin@pointflex.com'
+        assert 'period_days' in view.parsed_details
+        denied = AuditLog.query.filter_by(action='UNAUTHORIZED_ACCESS').one()
+        assert denied.parsed_details['user_role'] == 'employee'
+
+    metrics = get_audit_pipeline().metrics()
+    assert (metrics['enqueued'], metrics['flushed'], metrics['batches']) == (2, 2, 1)
+
+
+def test_records_follow_the_business_transaction(client, held_buffer):
+    with client.application.app_context():
+        AuditLog.query.count()
+        AuditLog.log_action(user_email='a@pointflex.com', action='UPDATE_MISSION', resource_type='Mission')
+        db.session.rollback()
+        AuditLog.log_action(user_email='b@pointflex.com', action='CREATE_MISSION', resource_type='Mission',
+                            details={'name': 'Audit'})
+        db.session.commit()
+
+        assert flush_audit_buffer() == 1
+        assert [log.user_email for log in AuditLog.query.filter_by(resource_type='Mission')] == ['b@pointflex.com']
+
+        # Action sensible : écrite dans la transaction métier
+        log = AuditLog.log_action(user_email='c@pointflex.com', action='LOGIN_FAILED', resource_type='User')
+        assert log in db.session.new
+        db.session.commit()
+        assert get_audit_pipeline().metrics()['queue_depth'] == 0
+
+
+def test_background_flusher_batches_by_size_and_interval(client):
+    batches = []
+    pipeline = AuditPipeline(writer=lambda app, rows: batches.append(rows))
+    client.application.config.update(AUDIT_FLUSH_INTERVAL_MS=50, AUDIT_FLUSH_BATCH_SIZE=3)
+    pipeline.configure(client.application, background=True)
+    try:
+        pipeline.enqueue([audit_pipeline.build_audit_record(action='TEST', details={'n': n}) for n in range(7)])
+        deadline = time.monotonic() + 5
+        while sum(len(rows) for rows in batches) < 7 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert [len(rows) for rows in batches] == [3, 3, 1]
+    # Sérialisation faite par le thread de vidage
+    assert batches[0][0]['details'] == '{"n": 0}'
+    assert pipeline.metrics()['flushed'] == 7
+
+
+def test_full_queue_writes_overflow_directly(client):
+    batches = []
+    pipeline = AuditPipeline(writer=lambda app, rows: batches.append(rows))
+    client.application.config.update(AUDIT_BUFFER_MAX_SIZE=2)
+    pipeline.configure(client.application, background=False)
+
+    pipeline.enqueue([audit_pipeline.build_audit_record(action='TEST', resource_id=n) for n in range(3)])
+
+    assert [[row['resource_id'] for row in rows] for rows in batches] == [[2]]
+    metrics = pipeline.metrics()
+    assert (metrics['enqueued'], metrics['overflowed'], metrics['queue_depth']) == (2, 1, 2)
+    assert pipeline.flush() == 2
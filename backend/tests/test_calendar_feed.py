@@ -0,0 +1,188 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.leave_request import LeaveRequest
+from backend.models.leave_type import LeaveType
+from backend.models.mission import Mission
+from backend.models.mission_user import MissionUser
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.services import calendar_feed_service
+
+URL = '/api/calendar/events?year=2024&month=3'
+
+
+def _login_manager(client):
+    resp = client.post('/api/auth/login', json={'email': 'manager@pointflex.com', 'password': 'manager123'})
+    return {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+
+def _seed_team(app):
+    """Manager -> employé -> stagiaire (rapport indirect), avec pointage, mission et congé"""
+    with app.app_context():
+        manager = User.query.filter_by(email='manager@pointflex.com').first()
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        previous_manager_id = employee.manager_id
+        employee.manager_id = manager.id
+        intern = User(email='stagiaire@pointflex.com', nom='Stage', prenom='Léa', role='employee',
+                      company_id=manager.company_id, manager_id=employee.id)
+        intern.set_password('Stagiaire123!')
+        db.session.add(intern)
+        db.session.flush()
+
+        db.session.add_all([
+            Pointage(user_id=employee.id, type='office', date_pointage=date(2024, 3, 4), heure_arrivee=time(8, 30),
+                     heure_depart=time(17, 0)),
+            Pointage(user_id=intern.id, type='office', date_pointage=date(2024, 3, 5), heure_arrivee=time(9, 0)),
+        ])
+        mission = Mission(company_id=manager.company_id, order_number='CAL-001', title='Audit',
+                          start_date=date(2024, 2, 26), end_date=date(2024, 3, 8))
+        db.session.add(mission)
+        db.session.flush()
+        db.session.add_all([MissionUser(mission_id=mission.id, user_id=uid) for uid in (employee.id, intern.id)])
+        leave_type = LeaveType(name='Congés payés', company_id=manager.company_id)
+        db.session.add(leave_type)
+        db.session.flush()
+        db.session.add(LeaveRequest(user_id=intern.id, leave_type_id=leave_type.id, start_date=date(2024, 3, 20),
+                                    end_date=date(2024, 3, 21), requested_days=2, status='approved'))
+        db.session.commit()
+        return employee.id, intern.id, mission.id, leave_type.id, previous_manager_id
+
+
+def _delete_team(app, employee_id, intern_id, mission_id, leave_type_id, previous_manager_id):
+    with app.app_context():
+        LeaveRequest.query.filter_by(leave_type_id=leave_type_id).delete(synchronize_session=False)
+        db.session.delete(db.session.get(LeaveType, leave_type_id))
+        MissionUser.query.filter_by(mission_id=mission_id).delete(synchronize_session=False)
+        db.session.delete(db.session.get(Mission, mission_id))
+        Pointage.query.filter(Pointage.user_id.in_((employee_id, intern_id)),
+                              Pointage.date_pointage.between(date(2024, 3, 1), date(2024, 3, 31))
+                              ).delete(synchronize_session=False)
+        db.session.delete(db.session.get(User, intern_id))
+        db.session.get(User, employee_id).manager_id = previous_manager_id
+        db.session.commit()
+
+
+@pytest.fixture
+def team(client):
+    """Équipe du manager, supprimée après le test (base persistante)"""
+    seeded = _seed_team(client.application)
+    yield seeded[:2]
+    _delete_team(client.application, *seeded)
+
+
+def _count_statements(app, method):
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        # Les requêtes d'équipe commencent par ``WITH RECURSIVE``
+        if statement.startswith(('SELECT', 'WITH')):
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = method()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    return response, statements
+
+
+def test_manager_feed_covers_whole_team_in_three_queries(client, team):
+    employee_id, intern_id = team
+    headers = _login_manager(client)
+
+    resp, statements = _count_statements(client.application, lambda: client.get(URL, headers=headers))
+    assert resp.status_code == 200
+    events = resp.get_json()
+    assert {e['id'].split('_')[0] for e in events} == {'pointage', 'mission', 'leave'}
+    assert {e['user_id'] for e in events if e['type'] == 'pointage'} == {employee_id, intern_id}
+    mission = next(e for e in events if e['type'] == 'mission')
+    # Une seule entrée par mission, avec tous les membres de l'équipe affectés
+    assert 'Léa Stage' in mission['user_name'] and mission['user_name'].count(',') == 1
+    assert sum(1 for s in statements if 'FROM pointages' in s or 'FROM missions' in s
+               or 'FROM leave_requests' in s) == 3
+
+    # Même flux : servi depuis le cache, 304 avec l'ETag
+    resp, statements = _count_statements(
+        client.application,
+        lambda: client.get(URL, headers={**headers, 'If-None-Match': resp.headers['ETag']}),
+    )
+    assert resp.status_code == 304
+    assert not any('FROM pointages' in s for s in statements)
+
+
+def test_write_invalidates_cached_feed(client, team):
+    employee_id, _ = team
+    headers = _login_manager(client)
+    first = client.get(URL, headers=headers)
+
+    with client.application.app_context():
+        db.session.add(Pointage(user_id=employee_id, type='office', date_pointage=date(2024, 3, 6),
+                                heure_arrivee=time(8, 0)))
+        db.session.commit()
+
+    second = client.get(URL, headers={'If-None-Match': first.headers['ETag'], **headers})
+    assert second.status_code == 200
+    assert len(second.get_json()) == len(first.get_json()) + 1
+
+    resp = client.get('/api/calendar/events?year=2024&month=3&user_ids=abc', headers=headers)
+    assert resp.status_code == 400
+
+
+class _SharedRedis:
+    """Hash de versions partagé entre « workers »"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = values.get(field, 0) + amount
+        return values[field]
+
+    def pipeline(self):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis, self.calls = redis, []
+
+    def hincrby(self, *args):
+        self.calls.append(args)
+
+    def execute(self):
+        return [self.redis.hincrby(*args) for args in self.calls]
+
+
+def test_write_from_another_worker_invalidates_feed(client, team, monkeypatch):
+    redis = _SharedRedis()
+    monkeypatch.setattr(calendar_feed_service, 'get_redis_connection', lambda: redis)
+    monkeypatch.setitem(calendar_feed_service._state, 'redis_down_until', 0.0)
+    client.application.config['CALENDAR_FEED_VERSION_CHECK_SECONDS'] = 0
+    employee_id, _ = team
+    headers = _login_manager(client)
+    first = client.get(URL, headers=headers)
+
+    with client.application.app_context():
+        company_id = db.session.get(User, employee_id).company_id
+        # Écriture d'un autre worker : aucune invalidation locale, seule la version Redis change
+        db.session.execute(Pointage.__table__.insert(), {
+            'user_id': employee_id, 'type': 'office', 'date_pointage': date(2024, 3, 7),
+            'heure_arrivee': time(8, 0), 'statut': 'present',
+        })
+        db.session.commit()
+        assert client.get(URL, headers={'If-None-Match': first.headers['ETag'], **headers}).status_code == 304
+
+        redis.hincrby(calendar_feed_service.VERSIONS_KEY, str(company_id), 1)
+
+    second = client.get(URL, headers={'If-None-Match': first.headers['ETag'], **headers})
+    assert second.status_code == 200
+    assert len(second.get_json()) == len(first.get_json()) + 1
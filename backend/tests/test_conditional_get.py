@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.leave_type import LeaveType
+from backend.models.office import Office
+from backend.models.user import User
+from backend.tests.test_attendance import login_admin, login_employee
+
+CONTEXT_URL = '/api/attendance/geofencing/context'
+
+
+def _statements(app, method):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = method()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    return response, statements
+
+
+def test_geofencing_context_revalidates_without_reloading(client):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    first = client.get(CONTEXT_URL, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    resp, statements = _statements(
+        client.application, lambda: client.get(CONTEXT_URL, headers={**headers, 'If-None-Match': etag})
+    )
+    assert resp.status_code == 304 and resp.data == b''
+    # Une seule requête de filigranes, sans chargement des bureaux
+    assert len(statements) == 1 and 'FROM offices' in statements[0]
+
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        office = Office(company_id=employee.company_id, name='Annexe', latitude=48.85, longitude=2.35, radius=150)
+        db.session.add(office)
+        db.session.commit()
+
+    resp = client.get(CONTEXT_URL, headers={**headers, 'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.headers['ETag'] != etag
+    assert 'Annexe' in {o['name'] for o in resp.get_json()['context']['offices']}
+
+
+def test_reference_lists_follow_updates_and_deletions(client):
+    headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    with client.application.app_context():
+        admin = User.query.filter_by(email='admin@pointflex.com').first()
+        leave_type = LeaveType(name='RTT', company_id=admin.company_id)
+        db.session.add(leave_type)
+        db.session.commit()
+        leave_type_id = leave_type.id
+
+    etag = client.get('/api/leave/types', headers=headers).headers['ETag']
+    assert client.get('/api/leave/types', headers={**headers, 'If-None-Match': etag}).status_code == 304
+    # Autre filtre : autre version
+    other = client.get('/api/leave/types?include_all_companies_for_superadmin=true',
+                       headers={**headers, 'If-None-Match': etag})
+    assert other.status_code == 200
+
+    with client.application.app_context():
+        db.session.delete(db.session.get(LeaveType, leave_type_id))
+        db.session.commit()
+    resp = client.get('/api/leave/types', headers={**headers, 'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert 'RTT' not in {lt['name'] for lt in resp.get_json()}
+
+    etag = client.get('/api/admin/departments', headers=headers).headers['ETag']
+    client.post('/api/admin/departments', json={'name': 'Finance'}, headers=headers)
+    assert client.get('/api/admin/departments', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+
+def test_company_settings_follow_headcount_and_date(client, monkeypatch):
+    headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    etag = client.get('/api/admin/company/settings', headers=headers).headers['ETag']
+    assert client.get('/api/admin/company/settings', headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+    # L'effectif vient de la table des utilisateurs
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        employee.is_active = not employee.is_active
+        db.session.commit()
+    resp = client.get('/api/admin/company/settings', headers={**headers, 'If-None-Match': etag})
+    assert resp.status_code == 200
+    etag = resp.headers['ETag']
+
+    # Les jours d'abonnement restants changent avec la date
+    from backend.routes import admin_routes
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    monkeypatch.setattr(admin_routes, 'datetime', type('FrozenDatetime', (datetime,), {
+        'utcnow': classmethod(lambda cls: tomorrow)}))
+    assert client.get('/api/admin/company/settings', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        employee.is_active = not employee.is_active
+        db.session.commit()
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from backend.database import db
+from backend.models.email_outbox import EmailOutboxMessage
+from backend.services.email import enqueue_emails, relay_email_outbox
+from backend.tests.test_billing import login_superadmin
+
+
+def _invoice_reminder(client):
+    headers = {'Authorization': f'Bearer {login_superadmin(client)}'}
+    resp = client.put('/api/superadmin/companies/1/extend-subscription', json={'months': 1}, headers=headers)
+    invoice_id = resp.get_json()['invoice']['id']
+    return client.post(f'/api/superadmin/invoices/{invoice_id}/remind', headers=headers), invoice_id
+
+
+def test_invoice_reminder_is_queued_then_sent_over_one_connection(client, smtp_server):
+    resp, invoice_id = _invoice_reminder(client)
+    assert resp.status_code == 200
+    queued = resp.get_json()['emails_queued']
+    assert queued >= 1
+    # La requête n'a pas contacté le serveur SMTP
+    assert smtp_server.connections == 0
+
+    with client.application.app_context():
+        pending = EmailOutboxMessage.query.filter_by(category='invoice_reminder').all()
+        assert len(pending) == queued
+        assert all(message.status == EmailOutboxMessage.STATUS_PENDING for message in pending)
+
+        assert relay_email_outbox() == queued
+        assert relay_email_outbox() == 0
+        messages = EmailOutboxMessage.query.filter_by(category='invoice_reminder').all()
+        assert {message.status for message in messages} == {EmailOutboxMessage.STATUS_SENT}
+
+    assert len(smtp_server.messages) == queued
+    assert f'facture #{invoice_id}' in smtp_server.messages[0][1]
+    assert smtp_server.connections == 1
+
+
+def test_rate_limit_and_retry_backoff(client, smtp_server):
+    app = client.application
+    app.config['EMAIL_RATE_LIMIT_PER_SECOND'] = 1
+    with app.app_context():
+        enqueue_emails([([f'user{index}@test.com'], 'Sujet', '<p>Bonjour</p>') for index in range(3)])
+        db.session.commit()
+
+        # Débit d'un message par seconde : le reste du lot attend, sans tentative consommée
+        assert relay_email_outbox() == 1
+        waiting = EmailOutboxMessage.query.filter_by(status=EmailOutboxMessage.STATUS_PENDING).all()
+        assert len(waiting) == 2 and all(message.attempts == 0 for message in waiting)
+
+        # Serveur injoignable : tentative reculée
+        app.config.update(EMAIL_RATE_LIMIT_PER_SECOND=0, SMTP_PORT=1)
+        assert relay_email_outbox() == 2
+        waiting = EmailOutboxMessage.query.filter_by(status=EmailOutboxMessage.STATUS_PENDING).all()
+        assert len(waiting) == 2
+        assert all(message.attempts == 1 and message.available_at > datetime.utcnow() for message in waiting)
+        assert relay_email_outbox() == 0
+
+    assert len(smtp_server.messages) == 1
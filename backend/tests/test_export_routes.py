@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from backend.models.company import Company
+from backend.models.user import User
+from backend.scripts.query_plan_benchmark import seed_synthetic_tenant
+from backend.services.export_service import EXPORT_COLUMNS, csv_chunks, iter_export_rows
+from backend.tests.test_attendance import login_admin, login_employee
+
+
+def _admin_company_id(client):
+    with client.application.app_context():
+        return User.query.filter_by(email='admin@pointflex.com').first().company_id
+
+
+def _export(client, data_type, format_type):
+    token = login_admin(client)
+    headers = {'Authorization': f'Bearer {token}'}
+    return client.get(f'/api/admin/company/export/{data_type}?format={format_type}', headers=headers)
+
+
+def _seed(client, rows):
+    with client.application.app_context():
+        seed_synthetic_tenant(_admin_company_id(client), rows, users=5)
+
+
+def test_export_attendance_csv_streams(client):
+    _seed(client, 1200)
+    resp = _export(client, 'attendance', 'csv')
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == 'text/csv'
+    assert 'pointages_' in resp.headers['Content-Disposition']
+
+    text = resp.get_data().decode('utf-8-sig')
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(rows) >= 1200
+    assert list(rows[0].keys()) == list(EXPORT_COLUMNS['attendance'])
+    assert rows[0]['employe_nom']
+
+
+def test_export_employees_ndjson_and_json(client):
+    resp = _export(client, 'employees', 'ndjson')
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert any(line['email'] == 'admin@pointflex.com' for line in lines)
+
+    resp = _export(client, 'employees', 'json')
+    assert resp.status_code == 200
+    assert json.loads(resp.get_data(as_text=True)) == lines
+
+
+def test_export_employees_excel(client):
+    openpyxl = pytest.importorskip('openpyxl')
+    resp = _export(client, 'employees', 'excel')
+    assert resp.status_code == 200
+    assert resp.headers['Content-Disposition'].endswith('.xlsx"')
+
+    workbook = openpyxl.load_workbook(io.BytesIO(resp.get_data()), read_only=True)
+    rows = list(workbook.active.iter_rows(values_only=True))
+    assert rows[0] == EXPORT_COLUMNS['employees']
+    assert len(rows) > 1
+
+
+def test_export_rejects_unknown_format_and_empty_data(client):
+    assert _export(client, 'employees', 'pdf').status_code == 400
+    assert _export(client, 'unknown', 'csv').status_code == 400
+    assert _export(client, 'billing', 'csv').status_code == 404
+
+
+def test_export_requires_admin(client):
+    token = login_employee(client)
+    resp = client.get('/api/admin/company/export/employees', headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 403
+
+
+def test_csv_export_memory_does_not_grow_with_rows(client):
+    """La mémoire de pointe reste stable quand le volume exporté est multiplié par 10"""
+    with client.application.app_context():
+        small = Company(name='Export S', email='export-s@pointflex.local')
+        large = Company(name='Export L', email='export-l@pointflex.local')
+        from backend.database import db
+        db.session.add_all([small, large])
+        db.session.commit()
+        seed_synthetic_tenant(small.id, 1000, users=5)
+        seed_synthetic_tenant(large.id, 10000, users=5)
+
+        def peak(company_id):
+            tracemalloc.start()
+            size = 0
+            for chunk in csv_chunks(EXPORT_COLUMNS['attendance'], iter_export_rows('attendance', company_id)):
+                size += len(chunk)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak_bytes, size
+
+        small_peak, small_size = peak(small.id)
+        large_peak, large_size = peak(large.id)
+
+    assert large_size > small_size * 8
+    assert large_peak < small_peak * 3
@@ -0,0 +1,104 @@
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from backend.tests.test_attendance import login_admin, login_employee
+from backend.utils.geo_utils import (
+    OfficeSpatialIndex,
+    calculate_distance,
+    find_nearest_office,
+    haversine_many,
+)
+
+
+def _random_offices(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(id=i, latitude=rng.uniform(-60, 70), longitude=rng.uniform(-180, 180), radius=200)
+        for i in range(count)
+    ]
+
+
+def test_calculate_distance_paris_lyon():
+    distance = calculate_distance(48.8566, 2.3522, 45.7640, 4.8357)
+    assert 391000 < distance < 393000
+    assert calculate_distance(95, 0, 0, 0) == float('inf')
+    assert calculate_distance('48', 2, 45, 4) == float('inf')
+
+
+def test_spatial_index_matches_brute_force():
+    offices = _random_offices(500)
+    index = OfficeSpatialIndex(offices)
+    rng = random.Random(7)
+
+    for _ in range(200):
+        lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        entry, distance = index.nearest(lat, lon)
+        expected = min(calculate_distance(lat, lon, o.latitude, o.longitude) for o in offices)
+        assert abs(distance - expected) < 1e-6
+        assert entry['id'] == next(
+            o.id for o in offices
+            if abs(calculate_distance(lat, lon, o.latitude, o.longitude) - expected) < 1e-6
+        )
+
+
+def test_spatial_index_lookup_is_sub_millisecond():
+    index = OfficeSpatialIndex(_random_offices(500))
+    rng = random.Random(3)
+    queries = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(1000)]
+
+    started = time.perf_counter()
+    for lat, lon in queries:
+        index.nearest(lat, lon)
+    average = (time.perf_counter() - started) / len(queries)
+
+    assert average < 0.001
+
+
+def test_haversine_many_handles_small_index():
+    index = OfficeSpatialIndex(_random_offices(5))
+    entry, distance = index.nearest(0.0, 0.0)
+    assert distance == min(haversine_many(0.0, 0.0, index.points))
+    assert OfficeSpatialIndex([]).nearest(0.0, 0.0) == (None, float('inf'))
+
+
+def test_office_index_invalidated_on_office_creation(client):
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    employee_headers = {'Authorization': f'Bearer {login_employee(client)}'}
+
+    from backend.models.user import User
+    with client.application.app_context():
+        company_id = User.query.filter_by(email='employee@pointflex.com').first().company_id
+        office, _ = find_nearest_office(company_id, 43.2965, 5.3698)
+        assert office is None or office.city != 'Marseille'
+
+    resp = client.post(
+        '/api/admin/offices',
+        json={'name': 'Agence Marseille', 'city': 'Marseille', 'latitude': 43.2965, 'longitude': 5.3698, 'radius': 300},
+        headers=admin_headers,
+    )
+    assert resp.status_code == 201
+    office_id = resp.get_json()['office']['id']
+
+    resp = client.post(
+        '/api/attendance/checkin/office',
+        json={'coordinates': {'latitude': 43.2966, 'longitude': 5.3699, 'accuracy': 5}},
+        headers=employee_headers,
+    )
+    assert resp.status_code == 201
+    assert resp.get_json()['pointage']['office_id'] == office_id
+
+
+def test_offline_checkin_rejects_invalid_coordinates(client):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    timestamp = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+
+    for coordinates in (
+        {'latitude': 95, 'longitude': 2.3522, 'accuracy': 5},
+        {'latitude': '48.8566', 'longitude': 2.3522, 'accuracy': 5},
+        {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': '5'},
+    ):
+        resp = client.post('/api/attendance/checkin/offline',
+                           json={'timestamp': timestamp, 'coordinates': coordinates}, headers=headers)
+        assert resp.status_code == 400, coordinates
@@ -0,0 +1,99 @@
+from datetime import date, datetime, time, timedelta
+
+from backend.database import db
+from backend.models.audit_log import AuditLog
+from backend.models.notification import Notification
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.tests.test_attendance import login_employee
+
+
+def _login_superadmin(client):
+    resp = client.post('/api/auth/login', json={'email': 'superadmin@pointflex.com', 'password': 'superadmin123'})
+    return resp.get_json()['token']
+
+
+def _walk(client, url, headers, key):
+    """Parcourt toutes les pages en suivant ``next_cursor``"""
+    items, cursor, pages = [], None, 0
+    while True:
+        resp = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert resp.status_code == 200
+        data = resp.get_json()
+        items.extend(data[key])
+        pages += 1
+        cursor = data['pagination']['next_cursor']
+        if not cursor:
+            return items, pages, data['pagination']
+
+
+def test_notifications_cursor_walks_ties_without_gaps(client):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    created_at = datetime(2024, 5, 1, 8, 0)
+    with client.application.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        # Horodatages identiques : l'id départage les lignes
+        db.session.add_all([Notification(user_id=user.id, message=f'n{i}', created_at=created_at) for i in range(5)])
+        db.session.add(Notification(user_id=user.id, message='récente', created_at=created_at + timedelta(days=1)))
+        db.session.commit()
+
+    items, pages, pagination = _walk(client, '/api/notifications?per_page=2', headers, 'notifications')
+
+    assert pages == 3
+    assert [n['message'] for n in items] == ['récente', 'n4', 'n3', 'n2', 'n1', 'n0']
+    assert pagination['total'] == 6 and pagination['total_is_exact'] is True
+    assert pagination['has_prev'] is True and pagination['has_next'] is False
+
+    resp = client.get('/api/notifications?cursor=not-a-cursor', headers=headers)
+    assert resp.status_code == 400
+
+
+def test_attendance_history_cursor_and_approximate_total(client):
+    client.application.config['PAGINATION_COUNT_CAP'] = 3
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    with client.application.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        start = date(2024, 4, 1)
+        db.session.add_all([
+            Pointage(user_id=user.id, type='office', date_pointage=start + timedelta(days=day),
+                     heure_arrivee=time(8, minute))
+            for day in range(3) for minute in (0, 30)
+        ])
+        db.session.commit()
+
+    items, pages, pagination = _walk(
+        client, '/api/attendance?per_page=4&start_date=2024-04-01&end_date=2024-04-30', headers, 'records'
+    )
+    assert pages == 2
+    keys = [(r['date_pointage'], r['heure_arrivee']) for r in items]
+    assert keys == sorted(keys, reverse=True) and len(set(keys)) == 6
+    # Au-delà du plafond, le total est une borne basse signalée comme telle
+    assert pagination['total'] >= 4 and pagination['total_is_exact'] is False
+
+    resp = client.get('/api/attendance?per_page=4&start_date=2024-04-01&end_date=2024-04-30&count=exact',
+                      headers=headers)
+    assert resp.get_json()['pagination']['total'] == 6
+    assert resp.get_json()['pagination']['total_is_exact'] is True
+
+    # Mode ``page`` historique conservé
+    resp = client.get('/api/attendance?per_page=4&page=2&start_date=2024-04-01&end_date=2024-04-30',
+                      headers=headers)
+    assert [(r['date_pointage'], r['heure_arrivee']) for r in resp.get_json()['records']] == keys[4:]
+
+
+def test_audit_log_listing_uses_cursor(client):
+    headers = {'Authorization': f'Bearer {_login_superadmin(client)}'}
+    with client.application.app_context():
+        AuditLog.query.delete()
+        created_at = datetime(2024, 5, 1, 8, 0)
+        db.session.add_all([
+            AuditLog(user_email='audit@pointflex.com', action=f'ACTION_{i}', resource_type='Test',
+                     created_at=created_at + timedelta(minutes=i))
+            for i in range(5)
+        ])
+        db.session.commit()
+
+    items, pages, _ = _walk(client, '/api/superadmin/system/audit-logs?per_page=2&action=ACTION_', headers, 'logs')
+
+    assert pages == 3
+    assert [log['action'] for log in items] == [f'ACTION_{i}' for i in reversed(range(5))]
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.leave_accrual import LeaveAccrual
+from backend.models.leave_balance import LeaveBalance
+from backend.models.leave_type import LeaveType
+from backend.models.user import User
+from backend.services.leave_accrual_service import accrue_leave
+
+
+def _seed(app, employees=30):
+    with app.app_context():
+        company_id = User.query.filter_by(email='admin@pointflex.com').first().company_id
+        for index in range(employees):
+            user = User(email=f'accrual{index}@pointflex.com', nom='Accrual', prenom=str(index), role='employee',
+                        company_id=company_id)
+            user.set_password('Accrual123!')
+            db.session.add(user)
+        paid = LeaveType(name='Congés payés', company_id=company_id, annual_accrual_days=25, max_carry_over_days=5)
+        rtt = LeaveType(name='RTT', company_id=None, annual_accrual_days=10)
+        db.session.add_all([paid, rtt])
+        db.session.flush()
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        db.session.add(LeaveBalance(user_id=employee.id, leave_type_id=paid.id, balance_days=12))
+        db.session.commit()
+        return company_id, paid.id, rtt.id, employee.id
+
+
+def _delete_seed(app, leave_type_ids, employees):
+    with app.app_context():
+        LeaveAccrual.query.filter(LeaveAccrual.leave_type_id.in_(leave_type_ids)).delete(synchronize_session=False)
+        LeaveBalance.query.filter(LeaveBalance.leave_type_id.in_(leave_type_ids)).delete(synchronize_session=False)
+        LeaveType.query.filter(LeaveType.id.in_(leave_type_ids)).delete(synchronize_session=False)
+        User.query.filter(User.email.in_([f'accrual{index}@pointflex.com' for index in range(employees)])
+                          ).delete(synchronize_session=False)
+        db.session.commit()
+
+
+@pytest.fixture
+def seed(client):
+    """``_seed`` dont les employés, types de congé et acquisitions sont supprimés après le test"""
+    seeded = []
+
+    def factory(employees=30):
+        company_id, paid_id, rtt_id, employee_id = _seed(client.application, employees)
+        seeded.append(((paid_id, rtt_id), employees))
+        return company_id, paid_id, rtt_id, employee_id
+
+    yield factory
+    for leave_type_ids, employees in seeded:
+        _delete_seed(client.application, leave_type_ids, employees)
+
+
+def test_accrual_is_set_based_capped_and_idempotent(client, seed):
+    company_id, paid_id, rtt_id, employee_id = seed()
+
+    with client.application.app_context():
+        preview = accrue_leave(2024, company_id=company_id, dry_run=True)
+        assert LeaveAccrual.query.count() == 0
+        line = next(l for l in preview['lines'] if (l['user_id'], l['leave_type_id']) == (employee_id, paid_id))
+        assert (line['previous_balance'], line['carried_over'], line['new_balance']) == (12, 5, 30)
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = accrue_leave(2024, company_id=company_id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert len(result['lines']) == len(preview['lines']) > 60
+        # Nombre de requêtes indépendant du nombre d'employés
+        assert len(statements) < 10
+        assert LeaveBalance.query.filter_by(user_id=employee_id, leave_type_id=paid_id).one().balance_days == 30
+        assert LeaveBalance.query.filter_by(leave_type_id=rtt_id).count() == len(result['lines']) // 2
+
+        # Seconde exécution pour la même période : rien à acquérir
+        assert accrue_leave(2024, company_id=company_id)['lines'] == []
+        assert LeaveBalance.query.filter_by(user_id=employee_id, leave_type_id=paid_id).one().balance_days == 30
+
+
+def test_accrue_leave_command_dry_run_prints_diff(client, seed):
+    company_id, paid_id, _, employee_id = seed(employees=2)
+    runner = client.application.test_cli_runner()
+
+    output = runner.invoke(args=['accrue-leave', '--year', '2025', '--company_id', str(company_id),
+                                 '--dry-run']).output
+    assert f'User {employee_id}, Type {paid_id}: Old Balance=12.0, Carried Over=5' in output
+    with client.application.app_context():
+        assert LeaveAccrual.query.count() == 0
+
+    output = runner.invoke(args=['accrue-leave', '--year', '2025', '--company_id', str(company_id)]).output
+    assert 'Successfully committed' in output
+    with client.application.app_context():
+        assert LeaveAccrual.query.filter_by(period='2025', company_id=company_id).count() > 0
@@ -44,8 +44,8 @@ def test_submit_leave_request_dispatch_event(client, monkeypatch):
         lambda event_type, payload_data, company_id: events.append(event_type),
     )
     monkeypatch.setattr(
-        "backend.routes.leave_routes.send_notification",
-        lambda *a, **k: None,
+        "backend.routes.leave_routes.send_notifications_bulk",
+        lambda *a, **k: [],
     )
 
     # Create leave type
@@ -85,11 +85,11 @@ def test_submit_leave_request_triggers_notification(client, monkeypatch):
 
     notified = []
 
-    def fake_notify(user_id, message, **kwargs):
-        notified.append(user_id)
+    def fake_notify(recipients, message, **kwargs):
+        notified.extend(recipients)
 
     monkeypatch.setattr(
-        "backend.routes.leave_routes.send_notification",
+        "backend.routes.leave_routes.send_notifications_bulk",
         fake_notify,
     )
 
@@ -0,0 +1,108 @@
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.company import Company
+from backend.models.notification import Notification
+from backend.models.push_subscription import PushSubscription
+from backend.models.user import User
+from backend.utils import notification_utils
+
+
+class FakePushService:
+    def __init__(self, rejected=()):
+        self.calls = []
+        self.rejected = set(rejected)
+
+    def notify_multiple_devices(self, registration_ids, **kwargs):
+        self.calls.append(list(registration_ids))
+        return {'results': [
+            {'error': 'NotRegistered'} if token in self.rejected else {'message_id': token}
+            for token in registration_ids
+        ]}
+
+
+def _create_users(count):
+    company = Company.query.first()
+    users = [
+        User(email=f'bulk{index}@pointflex.com', prenom='Bulk', nom=str(index),
+             password_hash='x', role='employee', company_id=company.id)
+        for index in range(count)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+@pytest.fixture
+def create_users(client):
+    """``_create_users`` dont les utilisateurs, notifications et abonnements push sont supprimés après le test"""
+    created = []
+
+    def factory(count):
+        user_ids = _create_users(count)
+        created.extend(user_ids)
+        return user_ids
+
+    yield factory
+    with client.application.app_context():
+        for model in (Notification, PushSubscription):
+            model.query.filter(model.user_id.in_(created)).delete(synchronize_session=False)
+        User.query.filter(User.id.in_(created)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_bulk_notifications_use_one_insert_and_one_sse_batch(client, create_users, monkeypatch):
+    published = []
+    monkeypatch.setattr(notification_utils, 'publish_many',
+                        lambda messages, type=None: published.append((list(messages), type)))
+
+    with client.application.app_context():
+        user_ids = create_users(5)
+        inserts = []
+
+        def count_inserts(conn, cursor, statement, *args):
+            if statement.startswith('INSERT INTO notifications'):
+                inserts.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count_inserts)
+        try:
+            notifications = notification_utils.send_notifications_bulk(
+                user_ids + user_ids[:2], "Réunion générale à 10h", send_push=False
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_inserts)
+
+        assert len(notifications) == 5
+        assert len(inserts) == 1
+        rows = Notification.query.filter(Notification.user_id.in_(user_ids)).all()
+        assert sorted(n.user_id for n in rows) == sorted(user_ids)
+        assert all(n.message == "Réunion générale à 10h" and not n.is_read for n in rows)
+
+    assert len(published) == 1
+    messages, message_type = published[0]
+    assert message_type == 'notification'
+    assert [channel for channel, _ in messages] == [f'user_{uid}' for uid in user_ids]
+    assert all(data['id'] for _, data in messages)
+
+
+def test_bulk_push_is_chunked_and_deactivates_rejected_tokens(client, create_users, monkeypatch):
+    push = FakePushService(rejected={'token-3'})
+    monkeypatch.setattr(notification_utils, 'push_service', push)
+    monkeypatch.setattr(notification_utils, 'PUSH_MULTICAST_CHUNK_SIZE', 2)
+
+    with client.application.app_context():
+        user_ids = create_users(3)
+        db.session.add_all(
+            [PushSubscription(user_id=uid, token=f'token-{index}') for index, uid in enumerate(user_ids)]
+            + [PushSubscription(user_id=user_ids[0], token='token-3'),
+               PushSubscription(user_id=user_ids[1], token='token-off', is_active=False)]
+        )
+        db.session.commit()
+
+        notification_utils.send_notifications_bulk(user_ids, "Annonce")
+
+        assert [len(chunk) for chunk in push.calls] == [2, 2]
+        assert sorted(sum(push.calls, [])) == ['token-0', 'token-1', 'token-2', 'token-3']
+        assert PushSubscription.query.filter_by(token='token-3').one().is_active is False
+        assert PushSubscription.query.filter_by(token='token-0').one().is_active is True
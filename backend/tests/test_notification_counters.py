@@ -0,0 +1,104 @@
+import pytest
+
+from backend.database import db
+from backend.models.notification import Notification
+from backend.models.notification_counter import NotificationCounter, NotificationDailyCount
+from backend.models.user import User
+from backend.services import notification_counter_service
+from backend.services.notification_counter_service import (
+    get_company_notification_stats,
+    reconcile_notification_counters,
+)
+from backend.tests.test_attendance import login_admin, login_employee
+from backend.utils.notification_utils import send_notification, send_notifications_bulk
+
+
+def _counter(scope, scope_id):
+    counter = db.session.get(NotificationCounter, (scope, scope_id))
+    return (counter.unread_count, counter.total_count) if counter else None
+
+
+def _delete_company_notifications(app):
+    with app.app_context():
+        company_id = User.query.filter_by(email='employee@pointflex.com').first().company_id
+        user_ids = [user.id for user in User.query.filter_by(company_id=company_id)]
+        Notification.query.filter(Notification.user_id.in_(user_ids)).delete(synchronize_session=False)
+        NotificationCounter.query.filter(
+            db.or_(
+                db.and_(NotificationCounter.scope == NotificationCounter.SCOPE_USER,
+                        NotificationCounter.scope_id.in_(user_ids)),
+                db.and_(NotificationCounter.scope == NotificationCounter.SCOPE_COMPANY,
+                        NotificationCounter.scope_id == company_id),
+            )
+        ).delete(synchronize_session=False)
+        NotificationDailyCount.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+        db.session.commit()
+
+
+@pytest.fixture(autouse=True)
+def clean_notifications(client):
+    """Notifications et compteurs de l'entreprise de démonstration supprimés avant et après chaque test"""
+    _delete_company_notifications(client.application)
+    yield
+    _delete_company_notifications(client.application)
+
+
+def test_counters_follow_sends_and_reads(client, monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        notification_counter_service, 'publish_many',
+        lambda messages, type: published.extend((channel, data, type) for channel, data in messages),
+    )
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        admin = User.query.filter_by(email='admin@pointflex.com').first()
+        employee_id, admin_id, company_id = employee.id, admin.id, employee.company_id
+
+        send_notification(employee_id, 'Bienvenue', send_push=False)
+        send_notifications_bulk([employee_id, admin_id], 'Réunion', send_push=False)
+
+        assert _counter(NotificationCounter.SCOPE_USER, employee_id) == (2, 2)
+        assert _counter(NotificationCounter.SCOPE_USER, admin_id) == (1, 1)
+        assert get_company_notification_stats(company_id) == {'total': 3, 'unread': 3, 'recent': 3}
+        first_id = Notification.query.filter_by(user_id=employee_id).first().id
+
+    assert ('user_%d' % employee_id, {'unread_count': 2}, 'notification_count') in published
+
+    assert client.get('/api/notifications/count', headers=headers).get_json()['unread_count'] == 2
+    client.post(f'/api/notifications/{first_id}/read', headers=headers)
+    # Relecture : pas de seconde décrémentation
+    client.post(f'/api/notifications/{first_id}/read', headers=headers)
+    assert client.get('/api/notifications/count', headers=headers).get_json()['unread_count'] == 1
+
+    resp = client.post('/api/notifications/mark-all-read', headers=headers)
+    assert resp.get_json()['count'] == 1
+    assert client.get('/api/notifications/count', headers=headers).get_json()['unread_count'] == 0
+    assert published[-1] == ('user_%d' % employee_id, {'unread_count': 0}, 'notification_count')
+
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    stats = client.get('/api/admin/stats', headers=admin_headers).get_json()['stats']
+    assert (stats['total_notifications'], stats['unread_notifications'], stats['recent_notifications']) == (3, 1, 3)
+
+
+def test_deleting_through_the_orm_and_reconciliation(client):
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        employee_id, company_id = employee.id, employee.company_id
+        send_notifications_bulk([employee_id], 'Rappel', send_push=False)
+        send_notification(employee_id, 'Second rappel', send_push=False)
+
+        db.session.delete(Notification.query.filter_by(user_id=employee_id, message='Rappel').one())
+        db.session.commit()
+        assert _counter(NotificationCounter.SCOPE_USER, employee_id) == (1, 1)
+
+        # Modification hors application : le compteur dérive
+        Notification.query.filter_by(user_id=employee_id).update({'is_read': True}, synchronize_session=False)
+        db.session.commit()
+        assert _counter(NotificationCounter.SCOPE_USER, employee_id) == (1, 1)
+
+        repaired = reconcile_notification_counters()
+        assert repaired['users'] == 1 and repaired['companies'] == 1
+        assert _counter(NotificationCounter.SCOPE_USER, employee_id) == (0, 1)
+        assert get_company_notification_stats(company_id)['unread'] == 0
+        assert reconcile_notification_counters() == {'users': 0, 'companies': 0}
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.offline_sync_receipt import OfflineSyncReceipt
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.tests.test_attendance import login_employee
+
+PARIS = {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': 10}
+
+
+def _delete_offline_day(app, day):
+    with app.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        OfflineSyncReceipt.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+        pointages = Pointage.query.filter_by(user_id=user.id, date_pointage=day)
+        Pause.query.filter(Pause.pointage_id.in_([p.id for p in pointages])).delete(synchronize_session=False)
+        pointages.delete(synchronize_session=False)
+        db.session.commit()
+
+
+@pytest.fixture
+def offline_day(client):
+    """Veille du jour : pointages et reçus de l'employé supprimés avant et après le test (base persistante)"""
+    client.application.config['OFFLINE_SYNC_MAX_AGE_HOURS'] = 72
+    day = (datetime.utcnow() - timedelta(days=1)).date()
+    _delete_offline_day(client.application, day)
+    yield day
+    _delete_offline_day(client.application, day)
+
+
+def _day_of_events(day):
+    at = lambda hour, minute=0: datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+    return [
+        {'idempotency_key': 'k-in', 'type': 'checkin', 'timestamp': at(8).isoformat(), 'coordinates': PARIS},
+        # Hors ordre : le serveur trie par horodatage
+        {'idempotency_key': 'k-pause-end', 'type': 'pause_end', 'timestamp': at(12, 45).isoformat()},
+        {'idempotency_key': 'k-pause', 'type': 'pause_start', 'timestamp': at(12).isoformat(), 'pause_type': 'lunch'},
+        {'idempotency_key': 'k-out', 'type': 'checkout', 'timestamp': at(17).isoformat()},
+        {'idempotency_key': 'k-far', 'type': 'checkin', 'timestamp': (at(9) - timedelta(days=1)).isoformat(),
+         'coordinates': {'latitude': 43.2965, 'longitude': 5.3698, 'accuracy': 10}},
+        {'type': 'checkout', 'timestamp': at(17).isoformat()},
+    ]
+
+
+def test_offline_day_is_synced_in_one_round_trip(client, offline_day):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    day = offline_day
+    events = _day_of_events(day)
+
+    with client.application.app_context():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            resp = client.post('/api/attendance/sync/offline', json={'events': events}, headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    results = data['results']
+    assert [r['index'] for r in results] == list(range(len(events)))
+    assert [r['status'] for r in results] == ['applied'] * 4 + ['rejected'] * 2
+    assert results[4]['status_code'] == 403 and results[5]['status_code'] == 400
+    assert (data['applied'], data['rejected']) == (4, 2)
+    # Une seule lecture des pointages des jours du lot, quel que soit le nombre d'événements
+    assert sum(1 for s in statements if 'WHERE pointages.user_id =' in s and 'AND pointages.date_pointage' in s) == 1
+
+    with client.application.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        pointage = Pointage.query.filter_by(user_id=user.id, date_pointage=day).one()
+        assert pointage.is_offline and pointage.heure_depart.hour == 17
+        pause = Pause.query.filter_by(pointage_id=pointage.id).one()
+        assert (pause.type, pause.duration_minutes) == ('lunch', 45)
+        assert results[0]['pointage_id'] == pointage.id and results[2]['pause_id'] == pause.id
+
+
+def test_replayed_batch_returns_stored_results_without_duplicates(client, offline_day):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    day = offline_day
+    events = _day_of_events(day)[:4]
+
+    first = client.post('/api/attendance/sync/offline', json={'events': events}, headers=headers).get_json()
+    # Renvoi après une coupure réseau, avec un nouvel événement en fin de file
+    events.append({'idempotency_key': 'k-late', 'type': 'checkin',
+                   'timestamp': datetime.combine(day, datetime.min.time()).replace(hour=18).isoformat(),
+                   'coordinates': PARIS})
+    second = client.post('/api/attendance/sync/offline', json={'events': events}, headers=headers).get_json()
+
+    assert [r['replayed'] for r in second['results']] == [True] * 4 + [False]
+    assert [r['pointage_id'] for r in second['results'][:4]] == [r['pointage_id'] for r in first['results']]
+    assert second['results'][4]['status_code'] == 409 and second['applied'] == 0
+
+    with client.application.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        assert Pointage.query.filter_by(user_id=user.id, date_pointage=day).count() == 1
+        assert OfflineSyncReceipt.query.filter_by(user_id=user.id).count() == 5
+
+    resp = client.post('/api/attendance/sync/offline', json={'events': []}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_invalid_coordinates_only_reject_their_item(client, offline_day):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    at = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+    events = [
+        {'idempotency_key': f'bad-{name}-{uuid4().hex}', 'type': 'checkin', 'timestamp': at,
+         'coordinates': {**PARIS, **override}}
+        for name, override in (('lat', {'latitude': 95}), ('type', {'longitude': '2.35'}),
+                               ('accuracy', {'accuracy': '5'}))
+    ]
+
+    resp = client.post('/api/attendance/sync/offline', json={'events': events}, headers=headers)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert [r['status_code'] for r in body['results']] == [400, 400, 400]
+    assert body['applied'] == 0
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database import db
+from backend.models.notification import Notification
+from backend.models.outbox_event import OutboxEvent
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+from backend.services import outbox_service
+from backend.tests.test_attendance import login_employee
+from backend.utils import webhook_utils
+
+CHECKIN = {'coordinates': {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': 5}}
+
+
+def _delete_checkins(app):
+    with app.app_context():
+        user = User.query.filter_by(email='employee@pointflex.com').first()
+        # Date locale ou UTC selon la route : on couvre les deux
+        today = datetime.utcnow().date()
+        pointages = Pointage.query.filter(
+            Pointage.user_id == user.id,
+            Pointage.date_pointage.between(today - timedelta(days=1), today + timedelta(days=1)),
+        )
+        Pause.query.filter(Pause.pointage_id.in_([p.id for p in pointages])).delete(synchronize_session=False)
+        pointages.delete(synchronize_session=False)
+        Notification.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+        OutboxEvent.query.delete()
+        db.session.commit()
+
+
+@pytest.fixture(autouse=True)
+def clean_checkins(client):
+    """Pointage du jour, notifications de l'employé et événements supprimés avant et après chaque test"""
+    _delete_checkins(client.application)
+    yield
+    _delete_checkins(client.application)
+
+
+def _checkin(client):
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    resp = client.post('/api/attendance/checkin/office', json=CHECKIN, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json()['pointage'], headers
+
+
+def test_checkin_writes_outbox_event_and_relay_fans_out(client, monkeypatch):
+    logged, dispatched = [], []
+    monkeypatch.setattr(outbox_service, 'log_attendance_event',
+                        lambda event_type, user_id, details: logged.append((event_type, details['pointage_id'])))
+    monkeypatch.setattr(webhook_utils, 'dispatch_webhook_event',
+                        lambda **kwargs: dispatched.append(kwargs))
+
+    pointage, _ = _checkin(client)
+
+    with client.application.app_context():
+        # Rien n'est diffusé pendant la requête : seul l'événement est validé
+        event = OutboxEvent.query.filter_by(event_type='pointage.created').one()
+        assert event.status == OutboxEvent.STATUS_PENDING
+        assert (event.aggregate_type, event.aggregate_id) == ('pointages', pointage['id'])
+        assert event.parsed_payload['webhook']['id'] == pointage['id']
+        assert Notification.query.filter_by(user_id=pointage['user_id']).count() == 0
+        assert logged == [] and dispatched == []
+
+        assert outbox_service.relay_outbox_events() == 1
+
+        event = db.session.get(OutboxEvent, event.id)
+        assert event.status == OutboxEvent.STATUS_PROCESSED
+        assert event.attempts == 1
+        messages = [n.message for n in Notification.query.filter_by(user_id=pointage['user_id'])]
+        assert "Pointage bureau enregistré" in messages
+        assert logged == [('office_checkin', pointage['id'])]
+        assert dispatched[0]['event_type'] == 'pointage.created'
+        assert dispatched[0]['event_id'] == f'evt_outbox_{event.id}'
+        assert outbox_service.relay_outbox_events() == 0
+
+
+def test_failed_relay_is_retried_then_marked_failed(client, monkeypatch):
+    def unavailable(**kwargs):
+        raise ConnectionError("redis unavailable")
+
+    monkeypatch.setattr(webhook_utils, 'dispatch_webhook_event', unavailable)
+    client.application.config['OUTBOX_MAX_ATTEMPTS'] = 2
+    pointage, _ = _checkin(client)
+
+    with client.application.app_context():
+        assert outbox_service.relay_outbox_events() == 1
+        event = OutboxEvent.query.filter_by(event_type='pointage.created').one()
+        assert event.status == OutboxEvent.STATUS_PENDING
+        assert event.attempts == 1
+        assert 'redis unavailable' in event.last_error
+        assert event.available_at > datetime.utcnow()
+        # Aucune notification tant que l'événement n'est pas relayé
+        assert Notification.query.filter_by(user_id=pointage['user_id']).count() == 0
+
+        # Reculé : pas relu avant l'échéance
+        assert outbox_service.relay_outbox_events() == 0
+        event.available_at = datetime.utcnow()
+        db.session.commit()
+        assert outbox_service.relay_outbox_events() == 1
+        event = db.session.get(OutboxEvent, event.id)
+        assert event.status == OutboxEvent.STATUS_FAILED
+        assert event.attempts == 2
+
+
+def test_sync_relay_delivers_checkout_side_effects(client):
+    client.application.config['OUTBOX_RELAY_SYNC'] = True
+    pointage, headers = _checkin(client)
+
+    resp = client.post('/api/attendance/checkout', json={'pointage_id': pointage['id']}, headers=headers)
+    assert resp.status_code == 200
+
+    with client.application.app_context():
+        assert OutboxEvent.query.filter_by(status=OutboxEvent.STATUS_PENDING).count() == 0
+        event = OutboxEvent.query.filter_by(event_type='pointage.updated').one()
+        assert event.parsed_payload['attendance_log']['event_type'] == 'checkout'
+        messages = [n.message for n in Notification.query.filter_by(user_id=pointage['user_id'])]
+        assert "Heure de départ enregistrée" in messages
+        assert outbox_service.purge_outbox_events(retention_hours=0) == 2
@@ -0,0 +1,82 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.office import Office
+from backend.models.pause import Pause
+from backend.models.pointage import Pointage
+from backend.models.user import User
+
+
+def _seed_pointages(count):
+    users = User.query.filter(User.company_id.isnot(None)).all()
+    office = Office.query.first()
+    pointages = []
+    for index in range(count):
+        user = users[index % len(users)]
+        pointage = Pointage(
+            user_id=user.id,
+            type='office',
+            date_pointage=date.today() - timedelta(days=index),
+            heure_arrivee=time(8, 30),
+            heure_depart=time(17, 0),
+            statut='present',
+            office_id=office.id if office else None,
+        )
+        db.session.add(pointage)
+        pointages.append(pointage)
+    db.session.flush()
+    for pointage in pointages:
+        db.session.add(Pause(
+            pointage_id=pointage.id,
+            user_id=pointage.user_id,
+            type='repas',
+            start_time=datetime.utcnow(),
+            duration_minutes=30,
+        ))
+    db.session.commit()
+    return [p.id for p in pointages]
+
+
+@pytest.fixture
+def seeded_pointages(client):
+    """100 pointages avec pause, supprimés par l'ORM après le test (les agrégats journaliers suivent)"""
+    with client.application.app_context():
+        ids = _seed_pointages(100)
+    yield ids
+    with client.application.app_context():
+        for pause in Pause.query.filter(Pause.pointage_id.in_(ids)):
+            db.session.delete(pause)
+        for pointage in Pointage.query.filter(Pointage.id.in_(ids)):
+            db.session.delete(pointage)
+        db.session.commit()
+
+
+def test_serialize_many_uses_fixed_number_of_queries(client, seeded_pointages):
+    ids = seeded_pointages
+    with client.application.app_context():
+
+        db.session.expire_all()
+        pointages = Pointage.query.filter(Pointage.id.in_(ids)).order_by(Pointage.id).all()
+        expected = [p.to_dict() for p in pointages]
+
+        db.session.expire_all()
+        pointages = Pointage.query.filter(Pointage.id.in_(ids)).order_by(Pointage.id).all()
+
+        statements = []
+
+        def count_queries(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count_queries)
+        try:
+            records = Pointage.serialize_many(pointages)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_queries)
+
+    assert records == expected
+    assert records[0]['worked_hours'] == 8.0
+    # utilisateurs, entreprises, bureaux, missions, pauses, fuseau horaire
+    assert len(statements) <= 6
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.user import User
+from backend.utils import principal_cache
+
+PIPELINE_URL = '/api/superadmin/system/audit-logs/pipeline'
+
+
+def _login(client, email='superadmin@pointflex.com', password='superadmin123'):
+    resp = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+
+@contextmanager
+def _user_queries(app):
+    """Collecte les requêtes SQL lisant la table ``users``"""
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        if statement.startswith('SELECT') and 'FROM users' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+def _set_user(app, email, **values):
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.session.commit()
+
+
+@pytest.fixture
+def superadmin_restored(client):
+    """Remet le rôle et l'activation du superadmin, modifiés par les tests"""
+    yield
+    _set_user(client.application, 'superadmin@pointflex.com', role='superadmin', is_active=True)
+
+
+def test_role_check_uses_cached_principal_and_sees_changes(client, superadmin_restored):
+    headers = _login(client)
+    assert client.get(PIPELINE_URL, headers=headers).status_code == 200
+
+    with _user_queries(client.application) as statements:
+        assert client.get(PIPELINE_URL, headers=headers).status_code == 200
+    assert statements == []
+
+    # Changement de rôle : effectif dès le commit
+    _set_user(client.application, 'superadmin@pointflex.com', role='admin_rh')
+    assert client.get(PIPELINE_URL, headers=headers).status_code == 403
+
+    _set_user(client.application, 'superadmin@pointflex.com', role='superadmin', is_active=False)
+    assert client.get(PIPELINE_URL, headers=headers).status_code == 401
+
+
+def test_principal_claims_in_token(client, superadmin_restored):
+    client.application.config['JWT_PRINCIPAL_CLAIMS'] = True
+    headers = _login(client)
+    principal_cache.clear()
+
+    with _user_queries(client.application) as statements:
+        assert client.get(PIPELINE_URL, headers=headers).status_code == 200
+    assert statements == []
+
+    # Jeton antérieur à la modification : les claims sont ignorés
+    _set_user(client.application, 'superadmin@pointflex.com', role='admin_rh')
+    assert client.get(PIPELINE_URL, headers=headers).status_code == 403
+
+    _set_user(client.application, 'superadmin@pointflex.com', role='superadmin')
+    resp = client.get('/api/auth/me', headers=headers)
+    assert resp.get_json()['user']['email'] == 'superadmin@pointflex.com'
@@ -0,0 +1,73 @@
+from backend.scripts.qr_token_benchmark import run
+from backend.services.qr_token_store import MemoryQRTokenStore, SQLQRTokenStore
+from backend.tests.test_attendance import login_admin, login_employee
+
+PAYLOAD = {'company_id': '1', 'office_id': 1, 'created_by': 1}
+
+
+def test_memory_store_consumes_once():
+    store = MemoryQRTokenStore()
+    store.put('abc', PAYLOAD, 60)
+
+    assert store.get('abc') == PAYLOAD
+    assert store.consume('abc') == PAYLOAD
+    assert store.consume('abc') is None
+    assert store.get('abc') is None
+
+
+def test_memory_store_purges_expired_tokens():
+    store = MemoryQRTokenStore()
+    for index in range(100):
+        store.put(f'old-{index}', PAYLOAD, 0)
+
+    # Chaque insertion purge les tokens expirés en tête du tas
+    assert len(store) == 1
+    assert store.get('old-99') is None
+    assert store.purge_expired() == 1
+    assert len(store) == 0
+
+    store.put('fresh', PAYLOAD, 60)
+    assert store.purge_expired() == 0
+    assert store.get('fresh') == PAYLOAD
+
+
+def test_memory_store_validation_is_constant_time():
+    (_, small_get, small_consume), (_, large_get, large_consume) = run('memory', [1000, 100_000], 5000)
+
+    assert large_get < small_get * 10
+    assert large_consume < small_consume * 10
+
+
+def test_sql_store_consumes_once(client):
+    with client.application.app_context():
+        store = SQLQRTokenStore()
+        store.put('sql-token', PAYLOAD, 60)
+        store.put('sql-expired', PAYLOAD, -1)
+
+        assert store.get('sql-expired') is None
+        assert store.get('sql-token') == PAYLOAD
+        assert store.consume('sql-token') == PAYLOAD
+        assert store.consume('sql-token') is None
+        assert store.purge_expired() == 1
+
+
+def test_qr_token_is_single_use(client):
+    from backend.models.office import Office
+    from backend.models.user import User
+
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    employee_headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    with client.application.app_context():
+        company_id = User.query.filter_by(email='admin@pointflex.com').first().company_id
+        office_id = Office.query.filter_by(company_id=company_id).first().id
+
+    resp = client.post('/api/attendance/generate-qr-token', json={'office_id': office_id}, headers=admin_headers)
+    assert resp.status_code == 200
+    token = resp.get_json()['token']
+
+    resp = client.post('/api/attendance/qr-checkin', json={'token': token}, headers=employee_headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['success'] is True
+
+    resp = client.post('/api/attendance/qr-checkin', json={'token': token}, headers=employee_headers)
+    assert resp.status_code == 400
@@ -0,0 +1,53 @@
+import os
+from datetime import date
+
+from sqlalchemy import inspect
+
+from backend.database import db
+from backend.models.pointage import Pointage
+from backend.scripts.query_plan_benchmark import (
+    check_hot_paths,
+    explain,
+    hot_path_queries,
+    seed_synthetic_tenant,
+    sequential_scans,
+)
+
+# Le run complet (10M de lignes) passe par ``python -m backend.scripts.query_plan_benchmark`` ;
+# en CI un tenant réduit suffit pour que le planner révèle un index manquant.
+SEED_ROWS = int(os.environ.get('POINTFLEX_PLAN_SEED_ROWS', 5000))
+
+
+def test_hot_paths_use_indexes(client, synthetic_company):
+    company_id = synthetic_company()
+    with client.application.app_context():
+        user_ids = seed_synthetic_tenant(company_id, SEED_ROWS, users=50)
+
+        with db.engine.connect() as connection:
+            failures = check_hot_paths(connection, company_id, user_ids[0], date.today())
+
+    assert failures == {}
+
+
+def test_sequential_scan_is_detected_without_index(client):
+    dropped = {'ix_pointages_user_date_keyset', 'ix_pointages_date_keyset'}
+    with client.application.app_context():
+        with db.engine.connect() as connection:
+            try:
+                with connection.begin():
+                    for name in dropped:
+                        connection.exec_driver_sql(f'DROP INDEX {name}')
+                statement = hot_path_queries(1, 1, date.today())['create_pointage.duplicate_check']
+                with connection.begin():
+                    plan = explain(connection, statement)
+            finally:
+                # Index recréés : les tests suivants partagent la base
+                with connection.begin():
+                    for index in Pointage.__table__.indexes:
+                        if index.name in dropped:
+                            index.create(connection, checkfirst=True)
+
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('pointages')}
+
+    assert sequential_scans(plan)
+    assert dropped <= indexes
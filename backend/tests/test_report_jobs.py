@@ -0,0 +1,114 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database import db
+from backend.models.report_job import ReportJob
+from backend.services import report_job_service
+from backend.tests.test_attendance import login_admin, login_employee
+
+
+@pytest.fixture
+def report_client(client, tmp_path):
+    client.application.config.update(REPORT_JOBS_SYNC=True, REPORT_ARTIFACT_DIR=str(tmp_path))
+    return client
+
+
+def _admin_headers(client):
+    return {'Authorization': f'Bearer {login_admin(client)}'}
+
+
+def test_export_job_is_generated_and_downloadable(report_client, tmp_path):
+    headers = _admin_headers(report_client)
+    resp = report_client.post('/api/reports/jobs', json={
+        'kind': 'company_export', 'params': {'data_type': 'employees', 'format': 'csv'}
+    }, headers=headers)
+    assert resp.status_code == 202
+    job = resp.get_json()['job']
+    assert job['status'] == 'finished'
+    assert job['download_url'] == f"/api/reports/jobs/{job['id']}/download"
+    assert os.listdir(tmp_path) == [f"{job['id']}.csv"]
+
+    resp = report_client.get(job['download_url'], headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/csv'
+    assert 'admin@pointflex.com' in resp.get_data().decode('utf-8-sig')
+
+
+def test_identical_requests_are_deduplicated(report_client):
+    headers = _admin_headers(report_client)
+    payload = {'kind': 'company_export', 'params': {'data_type': 'employees', 'format': 'json'}}
+    first = report_client.post('/api/reports/jobs', json=payload, headers=headers).get_json()
+    resp = report_client.post('/api/reports/jobs', json=payload, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['deduplicated'] is True
+    assert resp.get_json()['job']['id'] == first['job']['id']
+
+
+def test_pdf_route_async_mode(report_client):
+    headers = _admin_headers(report_client)
+    resp = report_client.get('/api/admin/attendance-report/pdf?async=1', headers=headers)
+    assert resp.status_code == 202
+    job = resp.get_json()['job']
+    assert job['kind'] == 'attendance_pdf'
+
+    resp = report_client.get(job['download_url'], headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers['Content-Type'] == 'application/pdf'
+    assert resp.get_data().startswith(b'%PDF')
+
+
+def test_queued_job_is_run_by_worker(report_client, monkeypatch):
+    report_client.application.config['REPORT_JOBS_SYNC'] = False
+    monkeypatch.setattr(report_job_service, '_enqueue', lambda job: None)
+    headers = _admin_headers(report_client)
+
+    resp = report_client.post('/api/reports/jobs', json={
+        'kind': 'company_export', 'params': {'data_type': 'employees', 'format': 'ndjson'}
+    }, headers=headers)
+    job_id = resp.get_json()['job']['id']
+    assert resp.get_json()['job']['status'] == 'queued'
+    assert report_client.get(f'/api/reports/jobs/{job_id}/download', headers=headers).status_code == 409
+
+    with report_client.application.app_context():
+        report_job_service.run_report_job(job_id)
+
+    resp = report_client.get(f'/api/reports/jobs/{job_id}', headers=headers)
+    assert resp.get_json()['job']['status'] == 'finished'
+    assert report_client.get(f'/api/reports/jobs/{job_id}/download', headers=headers).status_code == 200
+
+
+def test_failed_and_expired_jobs(report_client, tmp_path):
+    headers = _admin_headers(report_client)
+    resp = report_client.post('/api/reports/jobs', json={
+        'kind': 'company_export', 'params': {'data_type': 'billing', 'format': 'csv'}
+    }, headers=headers)
+    job = resp.get_json()['job']
+    assert job['status'] == 'failed'
+    assert job['error_message'] == "Aucune donnée à exporter"
+
+    resp = report_client.post('/api/reports/jobs', json={
+        'kind': 'company_export', 'params': {'data_type': 'employees', 'format': 'excel'}
+    }, headers=headers)
+    job_id = resp.get_json()['job']['id']
+    with report_client.application.app_context():
+        ReportJob.query.get(job_id).expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+    assert report_client.get(f'/api/reports/jobs/{job_id}/download', headers=headers).status_code == 410
+
+    with report_client.application.app_context():
+        assert report_job_service.purge_expired_report_jobs() >= 1
+        assert ReportJob.query.get(job_id) is None
+    assert not any(name.startswith(job_id) for name in os.listdir(tmp_path))
+
+
+def test_report_jobs_require_admin_and_valid_kind(report_client):
+    token = login_employee(report_client)
+    resp = report_client.post('/api/reports/jobs', json={'kind': 'company_export'},
+                              headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 403
+
+    headers = _admin_headers(report_client)
+    assert report_client.post('/api/reports/jobs', json={'kind': 'unknown'}, headers=headers).status_code == 400
+    assert report_client.post('/api/reports/jobs', json={'kind': 'audit_log_pdf'}, headers=headers).status_code == 403
@@ -11,3 +11,36 @@ def test_attendance_pdf(client):
     assert resp.status_code == 200
     assert resp.headers['Content-Type'] == 'application/pdf'
 
+
+
+def test_tabular_pdf_chunks_rows_and_wraps_only_long_cells():
+    import re
+
+    from reportlab.platypus import Paragraph
+
+    from backend.utils.pdf_utils import _fit_cell, build_tabular_pdf, new_pdf_spool
+
+    assert _fit_cell("08:15", 40, 7) == "08:15"
+    wrapped = _fit_cell("Retard & réunion d'équipe prolongée au siège", 40, 7)
+    assert isinstance(wrapped, Paragraph)
+    assert '&amp;' in wrapped.text
+
+    rows = ([str(index), f"Employé {index}", "Commentaire très long qui doit passer à la ligne" * (index % 2)]
+            for index in range(500))
+    with new_pdf_spool() as output:
+        build_tabular_pdf(output, ["#", "Employé", "Commentaire"], rows, [40, 120, 120], title="Test")
+        assert output.tell() == 0
+        content = output.read()
+    assert content.startswith(b'%PDF')
+    assert len(re.findall(rb'/Type /Page\b', content)) > 5
+
+
+def test_my_attendance_pdf(client):
+    resp = client.post('/api/auth/login', json={'email': 'employee@pointflex.com', 'password': 'employee123'})
+    headers = {'Authorization': f"Bearer {resp.get_json()['token']}"}
+    client.post('/api/attendance/checkin/office', headers=headers,
+                json={'coordinates': {'latitude': 48.8566, 'longitude': 2.3522, 'accuracy': 5}})
+    resp = client.get('/api/profile/my-attendance-report/pdf', headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers['Content-Type'] == 'application/pdf'
+    assert resp.data.startswith(b'%PDF')
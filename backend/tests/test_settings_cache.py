@@ -0,0 +1,111 @@
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.system_settings import SystemSettings
+from backend.tests.test_billing import login_superadmin
+from backend.utils import settings_cache
+
+
+def _count_settings_queries(func):
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if 'system_settings' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+
+def test_get_setting_is_cached(client):
+    with client.application.app_context():
+        SystemSettings.set_setting('general', 'default_timezone', 'Europe/Paris')
+        db.session.commit()
+
+        def read_many():
+            for _ in range(20):
+                assert SystemSettings.get_setting('general', 'default_timezone', 'UTC') == 'Europe/Paris'
+            assert SystemSettings.get_setting('general', 'unknown_key', 'fallback') == 'fallback'
+            assert SystemSettings.get_setting('general', 'unknown_key', 'other') == 'other'
+
+        assert _count_settings_queries(read_many) == 2
+
+
+def test_set_setting_invalidates_cache(client):
+    with client.application.app_context():
+        SystemSettings.set_setting('general', 'default_timezone', 'UTC')
+        db.session.commit()
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'UTC'
+
+        SystemSettings.set_setting('general', 'default_timezone', 'Africa/Abidjan')
+        db.session.commit()
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'Africa/Abidjan'
+
+        # Modification hors ORM (autre worker) : visible après une nouvelle version
+        SystemSettings.query.filter_by(category='general', key='default_timezone').update({'value': '"Asia/Tokyo"'})
+        db.session.commit()
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'Africa/Abidjan'
+        settings_cache.bump_version()
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'Asia/Tokyo'
+
+
+def test_cached_values_are_not_shared_mutably(client):
+    with client.application.app_context():
+        SystemSettings.set_setting('billing', 'stripe_price_mapping', {'basic': 'price_1'})
+        db.session.commit()
+        mapping = SystemSettings.get_setting('billing', 'stripe_price_mapping', {})
+        mapping['basic'] = 'tampered'
+        assert SystemSettings.get_setting('billing', 'stripe_price_mapping', {}) == {'basic': 'price_1'}
+
+
+def test_system_settings_put_refreshes_cache(client):
+    token = login_superadmin(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with client.application.app_context():
+        assert SystemSettings.get_setting('general', 'default_timezone', 'UTC') is not None
+
+    resp = client.put(
+        '/api/superadmin/system/settings',
+        json={'general': {'default_timezone': 'America/New_York'}},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+    with client.application.app_context():
+        assert SystemSettings.get_setting('general', 'default_timezone', 'UTC') == 'America/New_York'
+
+
+class _SharedRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def test_version_is_published_after_commit_only(client, monkeypatch):
+    redis = _SharedRedis()
+    monkeypatch.setattr(settings_cache, 'get_redis_connection', lambda: redis)
+    monkeypatch.setitem(settings_cache._state, 'redis_down_until', 0.0)
+    with client.application.app_context():
+        SystemSettings.set_setting('general', 'default_timezone', 'Europe/Berlin')
+        db.session.flush()
+        # Avant le commit, un autre worker relirait l'ancienne valeur : rien n'est publié
+        assert redis.get(settings_cache.VERSION_KEY) is None
+        db.session.commit()
+        assert redis.get(settings_cache.VERSION_KEY) == 1
+
+        SystemSettings.set_setting('general', 'default_timezone', 'Europe/Rome')
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'Europe/Rome'
+        db.session.rollback()
+        assert redis.get(settings_cache.VERSION_KEY) == 1
+        assert SystemSettings.get_setting('general', 'default_timezone') == 'Europe/Berlin'
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.company import Company
+from backend.models.notification import Notification
+from backend.models.notification_settings import NotificationSettings
+from backend.models.user import User
+from backend.services.email import relay_email_outbox
+from backend.tasks.subscription_tasks import check_expiring_subscriptions
+
+
+def _company(name, days, admins=1, email_enabled=True):
+    today = datetime.utcnow().date()
+    company = Company(name=name, email=f'{name}@test.com', subscription_plan='premium',
+                      subscription_end=today + timedelta(days=days))
+    db.session.add(company)
+    db.session.flush()
+    for index in range(admins):
+        admin = User(email=f'rh{index}@{name}.com', nom='RH', prenom=str(index), role='admin_rh',
+                     company_id=company.id)
+        admin.set_password('AdminRh123!')
+        db.session.add(admin)
+    if not email_enabled:
+        db.session.add(NotificationSettings(company_id=company.id, email_notifications=False))
+    return company
+
+
+def test_expiry_scan_batches_queries_and_emails(client, smtp_server):
+    app = client.application
+    with app.app_context():
+        # Les entreprises de démonstration sortent de la fenêtre
+        Company.query.update({'subscription_end': datetime.utcnow().date() + timedelta(days=365)})
+        _company('j30', 30, admins=2)
+        _company('j7', 7)
+        _company('j3', 3)  # notification seulement, pas d'email à J-3
+        _company('j5', 5)  # aucun seuil
+        _company('expired', -1, email_enabled=False)
+        db.session.commit()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            success, message = check_expiring_subscriptions()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert success, message
+        assert message.endswith("3 emails en file d'envoi")
+        # Rien n'est envoyé pendant la tâche : les emails attendent le relais
+        assert smtp_server.messages == []
+        # Lectures groupées : entreprises, administrateurs, préférences
+        assert sum(1 for s in statements if s.startswith('SELECT') and 'FROM companies' in s) == 1
+        assert sum(1 for s in statements if s.startswith('SELECT') and 'FROM notification_settings' in s) == 1
+        assert sum(1 for s in statements if s.startswith('SELECT') and 'users.role IN' in s) == 1
+
+        assert relay_email_outbox() == 3
+        recipients = sorted(r for rcpts, _ in smtp_server.messages for r in rcpts)
+        assert recipients == ['rh0@j30.com', 'rh0@j7.com', 'rh1@j30.com']
+        # Une seule connexion SMTP pour tout le lot
+        assert smtp_server.connections == 1
+
+        admin_j5 = User.query.filter_by(email='rh0@j5.com').one()
+        assert Notification.query.filter_by(user_id=admin_j5.id).count() == 0
+        admin_expired = User.query.filter_by(email='rh0@expired.com').one()
+        assert Notification.query.filter_by(user_id=admin_expired.id).count() == 1
+
+
+def test_dry_run_sends_nothing(client, smtp_server):
+    with client.application.app_context():
+        Company.query.update({'subscription_end': datetime.utcnow().date() + timedelta(days=365)})
+        _company('j14', 14)
+        db.session.commit()
+        success, message = check_expiring_subscriptions(dry_run=True)
+
+    assert success and message == '1 entreprises concernées, 1 emails à envoyer'
+    assert smtp_server.messages == [] and smtp_server.connections == 0
@@ -0,0 +1,137 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from backend.database import db
+from backend.models.webhook_delivery_log import WebhookDeliveryLog
+from backend.models.webhook_subscription import WebhookSubscription
+from backend.scripts.webhook_benchmark import StubWebhookServer
+from backend.tasks import webhook_tasks
+from backend.tasks.webhook_tasks import flush_webhook_batch_task
+from backend.tests.test_attendance import login_admin
+from backend.utils import webhook_utils
+from backend.utils.http_pool import close_http_sessions, pooled_hosts
+
+
+@pytest.fixture
+def stub_server():
+    with StubWebhookServer() as server:
+        yield server
+    close_http_sessions()
+
+
+@pytest.fixture
+def sync_client(client):
+    client.application.config['WEBHOOK_DELIVERY_SYNC'] = True
+    return client
+
+
+def _create_subscription(client, url, events, **extra):
+    headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    resp = client.post('/api/webhooks/subscriptions', json={
+        'target_url': url, 'subscribed_events': events, **extra
+    }, headers=headers)
+    assert resp.status_code == 201
+    return resp.get_json(), headers
+
+
+def test_lookup_is_indexed_by_event_and_invalidated_on_update(sync_client):
+    sub, headers = _create_subscription(sync_client, 'https://example.com/hook', ['user.created'])
+    company_id = sub['company_id']
+
+    with sync_client.application.app_context():
+        assert [t.id for t in webhook_utils.get_webhook_targets(company_id, 'user.created')] == [sub['id']]
+        assert webhook_utils.get_webhook_targets(company_id, 'invoice.paid') == []
+
+    resp = sync_client.put(f"/api/webhooks/subscriptions/{sub['id']}", json={
+        'subscribed_events': ['invoice.paid'], 'batch_deliveries': True
+    }, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()['batch_deliveries'] is True
+
+    with sync_client.application.app_context():
+        assert webhook_utils.get_webhook_targets(company_id, 'user.created') == []
+        targets = webhook_utils.get_webhook_targets(company_id, 'invoice.paid')
+        assert [(t.id, t.batch_deliveries) for t in targets] == [(sub['id'], True)]
+
+
+def test_deliveries_reuse_one_connection_per_host(sync_client, stub_server):
+    sub, _ = _create_subscription(sync_client, stub_server.url, ['pointage.created'])
+
+    with sync_client.application.app_context():
+        for index in range(5):
+            webhook_utils.dispatch_webhook_event('pointage.created', {'index': index}, sub['company_id'])
+
+        secret = db.session.get(WebhookSubscription, sub['id']).secret
+        logs = WebhookDeliveryLog.query.filter_by(subscription_id=sub['id']).all()
+        assert len(logs) == 5
+        assert all(log.is_success and log.response_status_code == 200 for log in logs)
+
+    assert len(stub_server.requests) == 5
+    assert stub_server.connection_count == 1
+    assert pooled_hosts() == 1
+    _, request_headers, body = stub_server.requests[0]
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    assert request_headers['X-PointFlex-Signature-256'] == expected
+    assert json.loads(body)['data'] == {'index': 0}
+
+
+def test_batched_subscription_sends_one_post_per_window(sync_client, stub_server, monkeypatch):
+    sub, _ = _create_subscription(sync_client, stub_server.url, ['pointage.created'], batch_deliveries=True)
+    scheduled = []
+    # Le planificateur RQ est remplacé : on déclenche l'envoi à la fin de la fenêtre
+    monkeypatch.setattr(webhook_utils, 'schedule_batch_flush', lambda sub_id, delay=None: scheduled.append(sub_id))
+
+    with sync_client.application.app_context():
+        for index in range(3):
+            webhook_utils.dispatch_webhook_event('pointage.created', {'index': index}, sub['company_id'])
+        assert scheduled == [sub['id']]
+        assert stub_server.requests == []
+
+        stub_server.set_status(503)
+        flush_webhook_batch_task(sub['id'])
+        stub_server.set_status(200)
+        flush_webhook_batch_task(sub['id'])
+
+        logs = WebhookDeliveryLog.query.filter_by(subscription_id=sub['id']).order_by(WebhookDeliveryLog.id).all()
+        assert [log.is_success for log in logs] == [False, True]
+        assert logs[1].event_type == webhook_utils.BATCH_EVENT_TYPE
+
+    # L'échec a remis les événements dans le tampon : le second envoi les contient tous
+    batch = json.loads(stub_server.requests[-1][2])
+    assert batch['batch'] is True
+    assert batch['event_count'] == 3
+    assert [event['data']['index'] for event in batch['events']] == [0, 1, 2]
+
+
+def test_batch_buffer_flags_first_event_only():
+    buffer = webhook_utils.MemoryWebhookBatchBuffer()
+    assert buffer.push(1, '{"a": 1}', 60) is True
+    assert buffer.push(1, '{"a": 2}', 60) is False
+    assert buffer.drain(1, 1) == (['{"a": 1}'], 1)
+    # Après lecture, l'événement suivant replanifie un envoi
+    assert buffer.push(1, '{"a": 3}', 60) is True
+    assert buffer.drain(1, 10) == (['{"a": 2}', '{"a": 3}'], 0)
+
+
+def test_failed_batch_is_rescheduled_with_backoff(client, stub_server, monkeypatch):
+    sub, _ = _create_subscription(client, stub_server.url, ['pointage.created'], batch_deliveries=True)
+    buffer = webhook_utils.MemoryWebhookBatchBuffer()
+    scheduled = []
+    monkeypatch.setattr(webhook_tasks, 'get_webhook_batch_buffer', lambda: buffer)
+    monkeypatch.setattr(webhook_tasks, 'schedule_batch_flush',
+                        lambda sub_id, delay=None, attempt=1: scheduled.append((sub_id, delay, attempt)))
+    stub_server.set_status(503)
+
+    with client.application.app_context():
+        buffer.push(sub['id'], '{"index": 0}', 60)
+        flush_webhook_batch_task(sub['id'])
+        # Dernière tentative prévue par les intervalles : le lot est tout de même replanifié
+        flush_webhook_batch_task(sub['id'], len(webhook_utils.WEBHOOK_RETRY_INTERVALS))
+
+    assert scheduled == [(sub['id'], 10, 2), (sub['id'], 60, 4)]
+    # Les événements attendent l'envoi replanifié, un nouvel événement n'en planifie pas d'autre
+    assert buffer.push(sub['id'], '{"index": 1}', 60) is False
+    assert buffer.drain(sub['id'], 10) == (['{"index": 0}', '{"index": 1}'], 0)
@@ -0,0 +1,72 @@
+import pytest
+
+from backend.database import db
+from backend.models.push_subscription import PushSubscription
+from backend.models.user import User
+from backend.scripts.webhook_benchmark import StubWebhookServer
+from backend.scripts.webpush_benchmark import fake_subscription_info
+from backend.services.push import send_push_to_users
+from backend.services.push import webpush_engine
+from backend.utils.http_pool import close_http_sessions
+
+
+@pytest.fixture
+def push_server():
+    with StubWebhookServer() as server:
+        yield server
+    close_http_sessions()
+
+
+def _subscribe(user_id, info):
+    subscription = PushSubscription(user_id=user_id, device_type='web')
+    subscription.set_web_push_subscription(info)
+    db.session.add(subscription)
+    return subscription
+
+
+def test_batch_deactivates_only_permanent_failures(client, push_server):
+    push_server.set_status(410, path='/push/gone')
+    push_server.set_status(503, path='/push/busy')
+
+    with client.application.app_context():
+        employee = User.query.filter_by(email='employee@pointflex.com').first()
+        admin = User.query.filter_by(email='admin@pointflex.com').first()
+        ok = _subscribe(employee.id, fake_subscription_info(f'{push_server.origin}/push/ok'))
+        second = _subscribe(employee.id, fake_subscription_info(f'{push_server.origin}/push/ok2'))
+        gone = _subscribe(admin.id, fake_subscription_info(f'{push_server.origin}/push/gone'))
+        busy = _subscribe(admin.id, fake_subscription_info(f'{push_server.origin}/push/busy'))
+        invalid_info = fake_subscription_info(f'{push_server.origin}/push/invalid')
+        invalid_info['keys']['p256dh'] = 'AAAA'
+        invalid = _subscribe(admin.id, invalid_info)
+        db.session.commit()
+        ids = {name: sub.id for name, sub in
+               [('ok', ok), ('second', second), ('gone', gone), ('busy', busy), ('invalid', invalid)]}
+
+        results = send_push_to_users([employee.id, admin.id, employee.id], "Rappel", "Début de poste à 9h")
+        assert results == {employee.id: 2, admin.id: 0}
+
+        active = {name: db.session.get(PushSubscription, sub_id).is_active for name, sub_id in ids.items()}
+        # 503 est transitoire : l'abonnement reste actif
+        assert active == {'ok': True, 'second': True, 'gone': False, 'busy': True, 'invalid': False}
+
+    assert sorted(path for path, _, _ in push_server.requests) == [
+        '/push/busy', '/push/gone', '/push/ok', '/push/ok2'
+    ]
+    # Un seul JWT VAPID signé pour l'origine, réutilisé par tous les envois
+    # (pywebpush envoie les en-têtes en minuscules)
+    assert len({headers['authorization'] for _, headers, _ in push_server.requests}) == 1
+    assert all(headers['content-encoding'] == 'aes128gcm' for _, headers, _ in push_server.requests)
+
+
+def test_vapid_headers_are_renewed_before_expiry(client, monkeypatch):
+    with client.application.app_context():
+        cache = webpush_engine.get_vapid_header_cache()
+        now = [1_000_000]
+        monkeypatch.setattr(webpush_engine.time, 'time', lambda: now[0])
+
+        first = cache.headers_for('https://fcm.googleapis.com/fcm/send/a')
+        assert cache.headers_for('https://fcm.googleapis.com/fcm/send/b') is first
+        assert cache.headers_for('https://updates.push.services.mozilla.com/wpush/v2/c') != first
+
+        now[0] += webpush_engine.VAPID_TOKEN_LIFETIME_SECONDS - webpush_engine.VAPID_RENEW_MARGIN_SECONDS
+        assert cache.headers_for('https://fcm.googleapis.com/fcm/send/a') != first
@@ -0,0 +1,127 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.database import db
+from backend.models.company import Company
+from backend.models.company_holiday import CompanyHoliday
+from backend.services import workday_calendar_service
+from backend.tests.test_attendance import login_admin, login_employee
+from backend.utils.holiday_utils import get_national_holidays
+
+
+def _reference_workdays(company, start, end):
+    """Décompte jour par jour, comme l'ancien calcul"""
+    work_days = set(map(int, company.work_days.split(',')))
+    closed = get_national_holidays(company.default_country_code_for_holidays or 'FR', start.year, end.year)
+    closed |= {h.date for h in CompanyHoliday.query.filter_by(company_id=company.id)}
+    return sum(
+        1 for offset in range((end - start).days + 1)
+        if (start + timedelta(days=offset)).weekday() in work_days and start + timedelta(days=offset) not in closed
+    )
+
+
+@pytest.fixture(autouse=True)
+def company_calendar(client):
+    """Restaure les jours ouvrés de l'entreprise de démonstration et supprime les jours fériés ajoutés"""
+    with client.application.app_context():
+        company = Company.query.first()
+        work_days = company.work_days
+        holiday_ids = [h.id for h in CompanyHoliday.query.filter_by(company_id=company.id)]
+    yield
+    with client.application.app_context():
+        company = Company.query.first()
+        company.work_days = work_days
+        CompanyHoliday.query.filter(CompanyHoliday.company_id == company.id,
+                                    CompanyHoliday.id.notin_(holiday_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    workday_calendar_service.clear()
+
+
+def test_prefix_sums_match_day_by_day_count(client):
+    with client.application.app_context():
+        company = Company.query.first()
+        company.work_days = '0,1,2,3,5'
+        db.session.add(CompanyHoliday(company_id=company.id, date=date(2024, 12, 24), name='Veille de Noël'))
+        db.session.commit()
+
+        rng = random.Random(7)
+        for _ in range(200):
+            start = date(2023, 1, 1) + timedelta(days=rng.randrange(900))
+            end = start + timedelta(days=rng.randrange(120))
+            assert workday_calendar_service.count_workdays(company.id, start, end) == \
+                _reference_workdays(company, start, end)
+
+        # Demi-journées : lundi 4 mars (après-midi) -> mardi 5 mars (matin)
+        assert workday_calendar_service.calculate_leave_days(
+            company.id, date(2024, 3, 4), date(2024, 3, 5), 'half_day_afternoon', 'half_day_morning') == 1.0
+        assert workday_calendar_service.calculate_leave_days(
+            company.id, date(2024, 3, 4), date(2024, 3, 4), 'half_day_morning', 'full_day') == 0.5
+        # Dimanche non ouvré : la demi-journée ne compte pas
+        assert workday_calendar_service.calculate_leave_days(
+            company.id, date(2024, 3, 3), date(2024, 3, 5), 'half_day_afternoon', 'full_day') == 2.0
+
+
+def test_calendar_is_cached_and_invalidated_on_holiday_edits(client):
+    admin_headers = {'Authorization': f'Bearer {login_admin(client)}'}
+    headers = {'Authorization': f'Bearer {login_employee(client)}'}
+    week = {'start_date': '2024-06-10', 'end_date': '2024-06-14'}
+    url = '/api/leave/calculate-duration'
+    assert client.post(url, json=week, headers=headers).get_json()['calculated_days'] == 5.0
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    with client.application.app_context():
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            assert client.post(url, json=week, headers=headers).get_json()['calculated_days'] == 5.0
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+    assert not any('company_holidays' in s for s in statements)
+
+    resp = client.post('/api/admin/company/holidays', json={'date': '2024-06-12', 'name': 'Séminaire'},
+                       headers=admin_headers)
+    assert resp.status_code == 201
+    assert client.post(url, json=week, headers=headers).get_json()['calculated_days'] == 4.0
+
+    client.delete(f"/api/admin/company/holidays/{resp.get_json()['id']}", headers=admin_headers)
+    client.put('/api/admin/company/leave-policy', json={'work_days': '0,1,2,3'}, headers=admin_headers)
+    assert client.post(url, json=week, headers=headers).get_json()['calculated_days'] == 4.0
+
+
+class _SharedRedis:
+    """Compteur partagé entre « workers » (get/incr suffisent au cache)"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+def test_other_workers_drop_calendars_after_version_bump(client, monkeypatch):
+    redis = _SharedRedis()
+    monkeypatch.setattr(workday_calendar_service, 'get_redis_connection', lambda: redis)
+    monkeypatch.setitem(workday_calendar_service._state, 'redis_down_until', 0.0)
+    client.application.config['WORKDAY_CALENDAR_VERSION_CHECK_SECONDS'] = 0
+    week = (date(2024, 6, 10), date(2024, 6, 14))
+    with client.application.app_context():
+        company = Company.query.first()
+        assert workday_calendar_service.count_workdays(company.id, *week) == 5
+
+        # Jour férié visible en base mais pas encore commité : le calendrier en cache reste servi
+        db.session.add(CompanyHoliday(company_id=company.id, date=date(2024, 6, 12), name='Séminaire'))
+        db.session.flush()
+        assert workday_calendar_service.count_workdays(company.id, *week) == 5
+
+        # Un autre worker publie une modification : ce worker recalcule
+        redis.incr(workday_calendar_service.VERSION_KEY)
+        assert workday_calendar_service.count_workdays(company.id, *week) == 4
+
+        db.session.rollback()
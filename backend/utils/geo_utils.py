@@ -0,0 +1,232 @@
+"""
+Calculs géographiques partagés : distance haversine et index spatial des bureaux
+
+L'index est construit par entreprise à partir des bureaux actifs et gardé en
+mémoire dans le processus. Il est invalidé explicitement lors des créations,
+modifications et suppressions de bureaux (``admin_routes``) et expire après
+``OFFICE_INDEX_TTL`` secondes pour que les autres workers finissent par voir
+les changements.
+
+Les bureaux sont projetés sur la sphère unité (x, y, z) : la distance
+euclidienne entre deux points (corde) croît avec la distance orthodromique, le
+plus proche voisin dans un k-d tree 3D est donc exactement le bureau le plus
+proche au sens de haversine.
+"""
+import math
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+# Rayon moyen de la Terre en mètres
+EARTH_RADIUS_M = 6371000
+
+DEFAULT_INDEX_TTL_SECONDS = 60
+# En dessous de ce nombre de bureaux, un parcours linéaire est plus rapide que l'arbre
+BRUTE_FORCE_THRESHOLD = 16
+LEAF_SIZE = 8
+
+
+def _log_error(message):
+    if has_app_context():
+        current_app.logger.error(message)
+
+
+def is_finite_number(value):
+    """Vrai pour un int/float fini (les booléens et les chaînes sont refusés)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def valid_coordinates(lat, lon):
+    """Vrai si (lat, lon) sont des nombres dans les bornes GPS"""
+    return is_finite_number(lat) and is_finite_number(lon) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calcule la distance entre deux points GPS en mètres (inf si coordonnées invalides)"""
+    try:
+        if not all(isinstance(coord, (int, float)) for coord in [lat1, lon1, lat2, lon2]):
+            _log_error(f"Invalid coordinate types: {type(lat1)}, {type(lon1)}, {type(lat2)}, {type(lon2)}")
+            return float('inf')
+
+        if not (valid_coordinates(lat1, lon1) and valid_coordinates(lat2, lon2)):
+            _log_error(f"Coordinates out of range: {lat1}, {lon1}, {lat2}, {lon2}")
+            return float('inf')
+
+        return haversine_many(lat1, lon1, [_prepare_point(lat2, lon2)])[0]
+    except Exception as e:
+        _log_error(f"Error calculating distance: {e}")
+        return float('inf')
+
+
+def _prepare_point(lat, lon):
+    """Précalcule (lat_rad, lon_rad, cos(lat)) pour les calculs en série"""
+    lat_rad = math.radians(lat)
+    return lat_rad, math.radians(lon), math.cos(lat_rad)
+
+
+def haversine_many(lat, lon, points):
+    """Distances en mètres entre (lat, lon) et une série de points préparés.
+
+    ``points`` est une séquence de tuples produits par ``_prepare_point`` ; les
+    conversions en radians et les cosinus des cibles ne sont donc calculés
+    qu'une fois, à la construction de l'index.
+    """
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    sin = math.sin
+    asin = math.asin
+    sqrt = math.sqrt
+
+    distances = []
+    for p_lat, p_lon, p_cos in points:
+        a = sin((p_lat - lat_rad) / 2) ** 2 + cos_lat * p_cos * sin((p_lon - lon_rad) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_M * asin(sqrt(min(1.0, a))))
+    return distances
+
+
+def _to_unit_vector(lat, lon):
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lon_rad), cos_lat * math.sin(lon_rad), math.sin(lat_rad))
+
+
+class _KDNode:
+    __slots__ = ('axis', 'split', 'left', 'right', 'items')
+
+    def __init__(self, axis=None, split=None, left=None, right=None, items=None):
+        self.axis = axis
+        self.split = split
+        self.left = left
+        self.right = right
+        self.items = items
+
+
+def _build_kdtree(items, depth=0):
+    """Construit un k-d tree sur des tuples (vecteur, position)"""
+    if len(items) <= LEAF_SIZE:
+        return _KDNode(items=items)
+    axis = depth % 3
+    items = sorted(items, key=lambda item: item[0][axis])
+    middle = len(items) // 2
+    return _KDNode(
+        axis=axis,
+        split=items[middle][0][axis],
+        left=_build_kdtree(items[:middle], depth + 1),
+        right=_build_kdtree(items[middle:], depth + 1),
+    )
+
+
+class OfficeSpatialIndex:
+    """Index des bureaux actifs d'une entreprise pour la recherche du plus proche"""
+
+    def __init__(self, offices):
+        self.entries = [
+            {'id': office.id, 'latitude': office.latitude, 'longitude': office.longitude, 'radius': office.radius}
+            for office in offices
+            if office.latitude is not None and office.longitude is not None
+        ]
+        self.points = [_prepare_point(e['latitude'], e['longitude']) for e in self.entries]
+        self.tree = None
+        if len(self.entries) > BRUTE_FORCE_THRESHOLD:
+            self.tree = _build_kdtree([
+                (_to_unit_vector(e['latitude'], e['longitude']), position)
+                for position, e in enumerate(self.entries)
+            ])
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def nearest(self, lat, lon):
+        """Retourne ``(entrée, distance_m)`` du bureau le plus proche, ou ``(None, inf)``"""
+        if not self.entries or not valid_coordinates(lat, lon):
+            return None, float('inf')
+
+        if self.tree is None:
+            distances = haversine_many(lat, lon, self.points)
+            position = min(range(len(distances)), key=distances.__getitem__)
+            return self.entries[position], distances[position]
+
+        position = self._nearest_in_tree(_to_unit_vector(lat, lon))
+        return self.entries[position], haversine_many(lat, lon, [self.points[position]])[0]
+
+    def _nearest_in_tree(self, target):
+        best = [None, float('inf')]
+
+        def visit(node):
+            if node.items is not None:
+                for vector, position in node.items:
+                    d2 = (
+                        (vector[0] - target[0]) ** 2
+                        + (vector[1] - target[1]) ** 2
+                        + (vector[2] - target[2]) ** 2
+                    )
+                    if d2 < best[1]:
+                        best[0], best[1] = position, d2
+                return
+            delta = target[node.axis] - node.split
+            near, far = (node.left, node.right) if delta < 0 else (node.right, node.left)
+            visit(near)
+            if delta * delta < best[1]:
+                visit(far)
+
+        visit(self.tree)
+        return best[0]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _index_ttl():
+    if has_app_context():
+        return current_app.config.get('OFFICE_INDEX_TTL', DEFAULT_INDEX_TTL_SECONDS)
+    return DEFAULT_INDEX_TTL_SECONDS
+
+
+def get_office_index(company_id):
+    """Retourne l'index spatial des bureaux actifs de l'entreprise (construit si besoin)"""
+    index = _indexes.get(company_id)
+    if index is not None and time.monotonic() - index.built_at < _index_ttl():
+        return index
+
+    from backend.models.office import Office
+
+    offices = Office.query.filter_by(company_id=company_id, is_active=True).all()
+    index = OfficeSpatialIndex(offices)
+    with _lock:
+        _indexes[company_id] = index
+    return index
+
+
+def find_nearest_office(company_id, lat, lon):
+    """Retourne ``(office, distance_m)`` pour le bureau actif le plus proche.
+
+    ``office`` est l'instance ORM (chargée par clé primaire) ou ``None`` si
+    l'entreprise n'a aucun bureau actif.
+    """
+    from backend.models.office import Office
+
+    for _ in range(2):
+        entry, _ = get_office_index(company_id).nearest(lat, lon)
+        if entry is None:
+            return None, float('inf')
+        office = Office.query.get(entry['id'])
+        if office is not None and office.is_active and office.company_id == company_id:
+            # Distance recalculée sur l'instance à jour (coordonnées modifiées ailleurs)
+            return office, calculate_distance(lat, lon, office.latitude, office.longitude)
+        # Index périmé (bureau supprimé ou désactivé par un autre worker) : reconstruction
+        invalidate_office_index(company_id)
+    return None, float('inf')
+
+
+def invalidate_office_index(company_id=None):
+    """Invalide l'index d'une entreprise, ou de toutes si ``company_id`` est None"""
+    with _lock:
+        if company_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(company_id, None)
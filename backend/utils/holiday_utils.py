@@ -1,16 +1,25 @@
 import holidays
 from datetime import date
-from typing import Set
+from functools import lru_cache
+from typing import FrozenSet, Set
 
 
-def get_national_holidays(country_code: str, start_year: int, end_year: int) -> Set[date]:
-    """Return a set of national holiday dates for the given country."""
+@lru_cache(maxsize=256)
+def _national_holidays_for_year(country_code: str, year: int) -> FrozenSet[date]:
+    """National holidays of one year, computed once per process (they never change)."""
     try:
-        holiday_class = getattr(holidays, country_code.upper())
-        holiday_obj = holiday_class(years=range(start_year, end_year + 1))
-        return set(holiday_obj.keys())
+        holiday_class = getattr(holidays, country_code)
+        return frozenset(holiday_class(years=year).keys())
     except Exception:
-        return set()
+        return frozenset()
+
+
+def get_national_holidays(country_code: str, start_year: int, end_year: int) -> Set[date]:
+    """Return a set of national holiday dates for the given country."""
+    result = set()
+    for year in range(start_year, end_year + 1):
+        result.update(_national_holidays_for_year(country_code.upper(), year))
+    return result
 
 
 # Convenience wrapper for Côte d'Ivoire
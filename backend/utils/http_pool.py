@@ -0,0 +1,78 @@
+"""
+Sessions HTTP persistantes par hôte cible
+
+Un ``requests.post`` isolé ouvre une connexion TCP (et une poignée de main TLS)
+par appel. Les workers gardent ici une ``requests.Session`` par
+(schéma, hôte, port) dont l'adaptateur conserve un pool de connexions
+keep-alive réutilisé d'une livraison à l'autre.
+
+Le nombre d'hôtes gardés est borné (``HTTP_POOL_MAX_HOSTS``) : au-delà, la
+session la moins récemment utilisée est fermée.
+"""
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_HOSTS = 256
+DEFAULT_POOL_MAXSIZE = 10
+
+_sessions = OrderedDict()
+_lock = threading.Lock()
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return parts.scheme, (parts.hostname or '').lower(), port
+
+
+def _new_session(user_agent=None):
+    session = requests.Session()
+    pool_maxsize = _config('HTTP_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE)
+    # Pas de nouvelle tentative au niveau HTTP : les reprises passent par la file RQ
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if user_agent:
+        session.headers['User-Agent'] = user_agent
+    return session
+
+
+def get_http_session(url, user_agent=None):
+    """Retourne la session partagée pour l'hôte de ``url`` (créée à la première demande)"""
+    key = _host_key(url)
+    with _lock:
+        session = _sessions.get(key)
+        if session is not None:
+            _sessions.move_to_end(key)
+            return session
+
+        session = _sessions[key] = _new_session(user_agent)
+        max_hosts = _config('HTTP_POOL_MAX_HOSTS', DEFAULT_MAX_HOSTS)
+        while len(_sessions) > max_hosts:
+            _, evicted = _sessions.popitem(last=False)
+            evicted.close()
+        return session
+
+
+def pooled_hosts():
+    """Nombre d'hôtes ayant une session ouverte"""
+    return len(_sessions)
+
+
+def close_http_sessions():
+    """Ferme toutes les sessions (arrêt du worker, tests)"""
+    with _lock:
+        while _sessions:
+            _, session = _sessions.popitem()
+            session.close()
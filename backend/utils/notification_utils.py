@@ -1,13 +1,19 @@
 """Utility functions for sending notifications"""
 
 import os
+from datetime import datetime
 from flask import current_app
 from pyfcm import FCMNotification # type: ignore
+from sqlalchemy import insert
 
 from backend.models.notification import Notification
 from backend.models.push_subscription import PushSubscription
 from backend.database import db
-from backend.sse import sse
+from backend.services.notification_counter_service import record_changes
+from backend.sse import publish_many, sse
+
+# Registration IDs per FCM multicast call
+PUSH_MULTICAST_CHUNK_SIZE = 500
 
 # Initialize FCM
 # The API key should be stored in an environment variable
@@ -43,6 +49,22 @@ def send_notification(
         current_app.logger.error(f"Error saving notification to DB for user {user_id}: {e}")
         raise # Re-raise to indicate failure
 
+    deliver_notification(notification, title, data_payload, send_push)
+    return notification
+
+
+def deliver_notification(
+    notification: Notification,
+    title: str = "Nouvelle Notification",
+    data_payload: dict | None = None,
+    send_push: bool = True
+) -> None:
+    """
+    Send an already persisted notification via SSE and, optionally, as a push notification.
+    """
+    user_id = notification.user_id
+    message = notification.message
+
     # 2. Send real-time notification via SSE (if app is open)
     try:
         sse.publish(notification.to_dict(), type='notification', channel=f'user_{user_id}')
@@ -57,62 +79,141 @@ def send_notification(
         registration_ids = [sub.token for sub in subscriptions]
 
         if registration_ids:
-            # Default payload for click action, can be overridden by data_payload
-            default_click_action = current_app.config.get('FRONTEND_URL', 'http://localhost:5173') + '/notifications'
-
-            message_title = title
-            message_body = message
-            click_action = data_payload.get("click_action", default_click_action) if data_payload else default_click_action
-
-            extra_notification_kwargs = {
-                'sound': 'default',
-                # 'icon': 'myicon' # Name of an icon resource in your Android app's drawable folder
-            }
-            if data_payload and data_payload.get('icon'):
-                 extra_notification_kwargs['icon'] = data_payload['icon']
-
-
             # Send to multiple devices (if user has multiple tokens)
             result = push_service.notify_multiple_devices(
                 registration_ids=registration_ids,
-                message_title=message_title,
-                message_body=message_body,
-                data_message=data_payload, # Custom data for the app to handle
-                click_action=click_action, # URL to open when notification is clicked
-                extra_notification_kwargs=extra_notification_kwargs,
+                **_push_message(title, message, data_payload),
             )
 
             current_app.logger.info(f"📱 Push Notification attempt for user {user_id}. Result: {result}")
-
-            # Handle results: Deactivate bad tokens, etc.
-            if result and 'results' in result:
-                for idx, res in enumerate(result['results']):
-                    if 'error' in res:
-                        error_type = res['error']
-                        failed_token = registration_ids[idx]
-                        current_app.logger.warning(f"Failed to send push to token {failed_token[:20]}...: {error_type}")
-                        if error_type in ['NotRegistered', 'InvalidRegistration']:
-                            # Deactivate or delete the token
-                            failed_subscription = PushSubscription.query.filter_by(token=failed_token).first()
-                            if failed_subscription:
-                                failed_subscription.is_active = False
-                                db.session.add(failed_subscription)
-                                current_app.logger.info(f"Deactivated token: {failed_token[:20]}...")
-                    else:
-                        current_app.logger.info(f"Successfully sent push to token {registration_ids[idx][:20]}...")
-                try:
-                    db.session.commit() # Commit deactivation of tokens
-                except Exception as e:
-                    db.session.rollback()
-                    current_app.logger.error(f"Error deactivating FCM tokens: {e}")
+            _deactivate_tokens(_rejected_tokens(result, registration_ids))
         else:
             current_app.logger.info(f"📱 No active push subscriptions found for user {user_id}.")
-    elif send_push and not push_service:
-        global _push_warning_logged
-        if not _push_warning_logged:
-            current_app.logger.warning(
-                "Push service not initialized (FCM_SERVER_KEY missing). Skipping push notification."
-            )
-            _push_warning_logged = True
+    elif send_push:
+        _warn_push_disabled()
 
-    return notification
+
+def send_notifications_bulk(
+    recipients,
+    message: str,
+    title: str = "Nouvelle Notification",
+    data_payload: dict | None = None,
+    send_push: bool = True
+) -> list[Notification]:
+    """
+    Send the same notification to many users.
+
+    Rows are inserted with one multi-row INSERT and a single commit, SSE
+    messages are published in one pipelined batch, and push tokens of every
+    recipient are fetched in one query then sent in chunked multicast calls.
+    """
+    user_ids = list(dict.fromkeys(uid for uid in recipients if uid))
+    if not user_ids:
+        return []
+
+    now = datetime.utcnow()
+    try:
+        notifications = db.session.scalars(
+            insert(Notification).returning(Notification),
+            [{'user_id': uid, 'message': message, 'is_read': False, 'created_at': now} for uid in user_ids],
+        ).all()
+        # Core INSERT: no flush, so the unread counters are updated explicitly
+        record_changes(db.session, {n.user_id: (1, 1, 1) for n in notifications})
+        # Serialized before the commit expires the instances (no reload per row)
+        sse_messages = [(f'user_{n.user_id}', n.to_dict()) for n in notifications]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error saving {len(user_ids)} notifications to DB: {e}")
+        raise
+
+    try:
+        publish_many(sse_messages, type='notification')
+        current_app.logger.info(f"📣 SSE Notification for {len(sse_messages)} users: {message}")
+    except Exception as e:
+        current_app.logger.error(f"Error sending SSE batch for {len(sse_messages)} users: {e}")
+
+    if send_push and push_service:
+        tokens = [
+            token for (token,) in PushSubscription.query
+            .filter(PushSubscription.user_id.in_(user_ids), PushSubscription.is_active.is_(True))
+            .with_entities(PushSubscription.token)
+        ]
+        push_message = _push_message(title, message, data_payload)
+        rejected = []
+        for start in range(0, len(tokens), PUSH_MULTICAST_CHUNK_SIZE):
+            chunk = tokens[start:start + PUSH_MULTICAST_CHUNK_SIZE]
+            try:
+                result = push_service.notify_multiple_devices(registration_ids=chunk, **push_message)
+            except Exception as e:
+                current_app.logger.error(f"Push multicast failed for {len(chunk)} tokens: {e}")
+                continue
+            rejected.extend(_rejected_tokens(result, chunk))
+        current_app.logger.info(f"📱 Push Notification attempt for {len(tokens)} tokens ({len(user_ids)} users).")
+        _deactivate_tokens(rejected)
+    elif send_push:
+        _warn_push_disabled()
+
+    return notifications
+
+
+def _push_message(title: str, message: str, data_payload: dict | None) -> dict:
+    """Keyword arguments of an FCM multicast call"""
+    # Default payload for click action, can be overridden by data_payload
+    default_click_action = current_app.config.get('FRONTEND_URL', 'http://localhost:5173') + '/notifications'
+    click_action = data_payload.get("click_action", default_click_action) if data_payload else default_click_action
+
+    extra_notification_kwargs = {
+        'sound': 'default',
+        # 'icon': 'myicon' # Name of an icon resource in your Android app's drawable folder
+    }
+    if data_payload and data_payload.get('icon'):
+        extra_notification_kwargs['icon'] = data_payload['icon']
+
+    return {
+        'message_title': title,
+        'message_body': message,
+        'data_message': data_payload, # Custom data for the app to handle
+        'click_action': click_action, # URL to open when notification is clicked
+        'extra_notification_kwargs': extra_notification_kwargs,
+    }
+
+
+def _rejected_tokens(result, registration_ids: list[str]) -> list[str]:
+    """Tokens of a multicast result that FCM no longer accepts"""
+    rejected = []
+    if result and 'results' in result:
+        for idx, res in enumerate(result['results']):
+            if 'error' in res:
+                error_type = res['error']
+                failed_token = registration_ids[idx]
+                current_app.logger.warning(f"Failed to send push to token {failed_token[:20]}...: {error_type}")
+                if error_type in ['NotRegistered', 'InvalidRegistration']:
+                    rejected.append(failed_token)
+            else:
+                current_app.logger.info(f"Successfully sent push to token {registration_ids[idx][:20]}...")
+    return rejected
+
+
+def _deactivate_tokens(tokens: list[str]) -> None:
+    """Deactivate unregistered or invalid tokens in one UPDATE"""
+    if not tokens:
+        return
+    try:
+        PushSubscription.query.filter(PushSubscription.token.in_(tokens)).update(
+            {'is_active': False}, synchronize_session=False
+        )
+        db.session.commit()
+        current_app.logger.info(f"Deactivated {len(tokens)} push tokens.")
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deactivating FCM tokens: {e}")
+
+
+def _warn_push_disabled() -> None:
+    global _push_warning_logged
+    if not _push_warning_logged:
+        current_app.logger.warning(
+            "Push service not initialized (FCM_SERVER_KEY missing). Skipping push notification."
+        )
+        _push_warning_logged = True
@@ -0,0 +1,172 @@
+"""
+Pagination par curseur (keyset)
+
+Les listes triées du plus récent au plus ancien (pointages, notifications,
+journal d'audit) se paginent sur la clé de tri elle-même : la page suivante
+reprend strictement après la dernière ligne renvoyée,
+``WHERE (date_pointage, heure_arrivee, id) < (:d, :h, :id)``, au lieu d'un
+``OFFSET`` qui relit toutes les pages précédentes. Le curseur ``next_cursor``
+est un jeton opaque (JSON en base64url) contenant cette clé ; un index
+composite dans le même ordre rend chaque page aussi rapide que la première.
+
+Le total n'est plus calculé par un ``COUNT(*)`` complet à chaque page :
+
+* par défaut, un comptage borné à ``PAGINATION_COUNT_CAP`` lignes, exact en
+  dessous du plafond, complété au-delà par l'estimation du planificateur
+  PostgreSQL (``total_is_exact`` vaut alors ``False``) ;
+* ``?count=exact`` demande explicitement le ``COUNT(*)``.
+
+Le paramètre ``page`` reste accepté sans curseur (``OFFSET``) pour les
+clients existants.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, literal_column, select, tuple_
+
+from backend.database import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNT_CAP = 1000
+
+
+class InvalidCursorError(ValueError):
+    """Curseur illisible ou incompatible avec la liste demandée"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Jeton opaque pour la clé de tri ``values``"""
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, (date, time)) else value for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b'=').decode()
+
+
+def decode_cursor(token: str, columns: Sequence[Any]) -> Tuple[Any, ...]:
+    """Relit un jeton de ``encode_cursor`` en valeurs typées comme ``columns``"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("nombre de valeurs inattendu")
+        return tuple(_parse_value(column, value) for column, value in zip(columns, values))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursorError("Curseur de pagination invalide") from e
+
+
+def _parse_value(column, value):
+    python_type = column.type.python_type
+    if value is None:
+        raise ValueError(f"valeur manquante pour {column.key}")
+    if python_type in (date, time, datetime):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def wants_exact_count(args) -> bool:
+    """``?count=exact`` demande le total exact"""
+    return (args.get('count') or '').lower() == 'exact'
+
+
+@dataclass
+class KeysetPage:
+    """Page de résultats et curseur de la suivante"""
+
+    items: List[Any]
+    per_page: int
+    page: int = 1
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_exact: bool = True
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def pagination(self, cursor: Optional[str] = None) -> dict:
+        """Bloc ``pagination`` des réponses (champs historiques conservés)"""
+        total = self.total or 0
+        return {
+            'page': self.page,
+            'pages': math.ceil(total / self.per_page) if self.per_page else 0,
+            'per_page': self.per_page,
+            'total': total,
+            'total_is_exact': self.total_is_exact,
+            'has_next': self.has_next,
+            'has_prev': bool(cursor) or self.page > 1,
+            'next_cursor': self.next_cursor,
+        }
+
+
+def paginate_keyset(query, columns: Sequence[Any], cursor: Optional[str] = None, page: int = 1,
+                    per_page: int = 20, key: Optional[Callable[[Any], Sequence[Any]]] = None,
+                    exact_count: bool = False) -> KeysetPage:
+    """Page de ``query`` triée par ``columns`` décroissantes
+
+    ``query`` ne doit pas être triée. ``key`` extrait la clé de tri d'une
+    ligne (par défaut les attributs de même nom que ``columns``).
+    Lève ``InvalidCursorError`` si ``cursor`` est illisible.
+    """
+    page = max(page or 1, 1)
+    total, total_is_exact = count_rows(query, exact=exact_count)
+
+    if cursor:
+        query = query.filter(tuple_(*columns) < tuple(decode_cursor(cursor, columns)))
+        page = 1
+    query = query.order_by(*[column.desc() for column in columns])
+    if not cursor and page > 1:
+        query = query.offset((page - 1) * per_page)
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, column.key) for column in columns]
+        next_cursor = encode_cursor(values)
+    return KeysetPage(rows, per_page, page, next_cursor, total, total_is_exact)
+
+
+def count_rows(query, exact: bool = False, cap: Optional[int] = None) -> Tuple[int, bool]:
+    """Retourne ``(total, exact)`` pour ``query`` sans tri"""
+    base = query.order_by(None)
+    if exact:
+        return base.count(), True
+
+    if cap is None:
+        cap = current_app.config.get('PAGINATION_COUNT_CAP', DEFAULT_COUNT_CAP) \
+            if has_app_context() else DEFAULT_COUNT_CAP
+    bounded = base.with_entities(literal_column('1')).limit(cap + 1).subquery()
+    count = db.session.execute(select(func.count()).select_from(bounded)).scalar()
+    if count <= cap:
+        return count, True
+    return max(estimate_row_count(base) or 0, count), False
+
+
+def estimate_row_count(query) -> Optional[int]:
+    """Nombre de lignes estimé par le planificateur PostgreSQL (``None`` ailleurs)"""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+    try:
+        compiled = query.statement.compile(dialect=connection.dialect)
+        # Point de sauvegarde : un échec ne doit pas invalider la transaction
+        with connection.begin_nested():
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+            ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Estimation du nombre de lignes impossible: {e}")
+        return None
@@ -1,14 +1,39 @@
 """
 PDF Generation Utilities using ReportLab
 """
+import tempfile
+from functools import lru_cache
 from io import BytesIO
+from typing import BinaryIO, Iterable, Sequence
+from xml.sax.saxutils import escape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from datetime import datetime
 
+# Default LEFTPADDING + RIGHTPADDING and TOPPADDING + BOTTOMPADDING of a table cell
+CELL_HORIZONTAL_PADDING = 12
+CELL_VERTICAL_PADDING = 6
+# Widest Helvetica glyph ('@'), in ems: shorter strings always fit without measuring
+HELVETICA_MAX_GLYPH_WIDTH = 1.015
+
+DEFAULT_TABLE_STYLE_COMMANDS = [
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    # Header row style
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkgrey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    # Alternating row colors for data rows
+    # ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
+]
+
 def build_pdf_document(buffer: BytesIO, story: list, title: str = "Rapport", author: str = "PointFlex SaaS") -> BytesIO:
     """
     Builds a PDF document with the given story elements.
@@ -47,22 +72,8 @@ def create_styled_table(data: list, col_widths: list | None = None, style_comman
     """
     table = Table(data, colWidths=col_widths)
 
-    default_styles = [
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        # Header row style
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-        # Alternating row colors for data rows
-        # ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey]),
-    ]
-
     # Apply default styles
-    table_style = TableStyle(default_styles)
+    table_style = TableStyle(DEFAULT_TABLE_STYLE_COMMANDS)
 
     # Apply custom styles if provided
     if style_commands:
@@ -72,6 +83,94 @@ def create_styled_table(data: list, col_widths: list | None = None, style_comman
     table.setStyle(table_style)
     return table
 
+@lru_cache(maxsize=16)
+def get_table_cell_style(font_size: float = 7, header: bool = False) -> ParagraphStyle:
+    """Returns a cached ParagraphStyle for table cells whose text must wrap."""
+    return ParagraphStyle(
+        name=f"TableCell{'Header' if header else ''}{font_size}",
+        fontName='Helvetica-Bold' if header else 'Helvetica',
+        fontSize=font_size,
+        leading=font_size + 2,
+        textColor=colors.whitesmoke if header else colors.black,
+    )
+
+def new_pdf_spool() -> BinaryIO:
+    """Returns an anonymous temporary file to render a large PDF into (instead of a BytesIO)."""
+    return tempfile.TemporaryFile()
+
+def _fit_cell(value, width: float, font_size: float, header: bool = False):
+    """Keeps a cell as a plain string unless its text is wider than the column."""
+    text = '' if value is None else str(value)
+    font_name = 'Helvetica-Bold' if header else 'Helvetica'
+    if '\n' not in text and (len(text) * font_size * HELVETICA_MAX_GLYPH_WIDTH <= width
+                             or stringWidth(text, font_name, font_size) <= width):
+        return text
+    return Paragraph(escape(text).replace('\n', '<br/>'), get_table_cell_style(font_size, header))
+
+def _draw_page_decorations(title: str):
+    """Page header (report title) and footer (page number) drawn directly on the canvas."""
+    def draw(canvas, doc_template):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 10)
+        canvas.drawString(doc_template.leftMargin,
+                          doc_template.height + doc_template.topMargin - 0.1*inch - 10, title)
+        canvas.drawString(doc_template.leftMargin, 0.1*inch, f"Page {doc_template.page}")
+        canvas.restoreState()
+    return draw
+
+def build_tabular_pdf(output, header: Sequence[str], rows: Iterable[Sequence], col_widths: list,
+                      title: str = "Rapport", author: str = "PointFlex SaaS", intro: list | None = None,
+                      style_commands: list | None = None, font_size: float = 7,
+                      empty_message: str | None = None):
+    """
+    Fast rendering mode for large tabular reports.
+
+    Instead of one giant Table of Paragraphs (whose layout cost grows
+    superlinearly with the row count), rows are chunked into page-sized
+    tables that repeat the header row. Cells stay plain strings unless their
+    text is wider than the column, in which case they wrap with a cached
+    ParagraphStyle. One TableStyle is shared by every chunk.
+
+    ``rows`` may be any iterable of cell values (a generator works).
+    ``output`` is a path or a binary file object; large reports should be
+    rendered into a file (see ``new_pdf_spool``) rather than a BytesIO.
+    """
+    doc = SimpleDocTemplate(output, pagesize=A4,
+                            rightMargin=0.75*inch, leftMargin=0.75*inch,
+                            topMargin=1*inch, bottomMargin=1*inch,
+                            title=title, author=author, pageCompression=1)
+
+    story = list(intro or [])
+    table_style = TableStyle(DEFAULT_TABLE_STYLE_COMMANDS + list(style_commands or [])
+                             + [('FONTSIZE', (0, 0), (-1, -1), font_size)])
+    text_widths = [width - CELL_HORIZONTAL_PADDING for width in col_widths]
+    header_row = [_fit_cell(text, width, font_size, header=True) for text, width in zip(header, text_widths)]
+    # Rows of single-line cells filling one frame; wrapped rows just split onto the next page
+    rows_per_table = max(1, int(doc.height // (font_size * 1.2 + CELL_VERTICAL_PADDING)) - 1)
+
+    def flush(chunk):
+        table = Table([header_row] + chunk, colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        story.append(table)
+
+    chunk, row_count = [], 0
+    for row in rows:
+        chunk.append([_fit_cell(value, width, font_size) for value, width in zip(row, text_widths)])
+        row_count += 1
+        if len(chunk) == rows_per_table:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    if not row_count and empty_message:
+        story.append(Paragraph(empty_message, get_report_styles()['Normal']))
+
+    decorate = _draw_page_decorations(title)
+    doc.build(story, onFirstPage=decorate, onLaterPages=decorate)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
 def get_report_styles() -> dict:
     """Returns a dictionary of commonly used ParagraphStyles."""
     styles = getSampleStyleSheet()
@@ -83,7 +182,7 @@ def get_report_styles() -> dict:
         'SmallText': ParagraphStyle(name='SmallText', parent=styles['Normal'], fontSize=7, leading=9),
     }
     # Combine standard styles with custom ones for easy access
-    final_styles = {k: v for k, v in styles.items()}
+    final_styles = dict(styles.byName)
     final_styles.update(custom_styles)
     return final_styles
 
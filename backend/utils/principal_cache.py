@@ -0,0 +1,212 @@
+"""
+Cache des principaux (identité et rôle des utilisateurs authentifiés)
+
+L'autorisation n'a besoin que de ``(rôle, entreprise, actif, manager)`` :
+ces valeurs sont gardées par processus, ``id -> Principal``, pendant
+``PRINCIPAL_CACHE_TTL`` secondes, au lieu de recharger l'utilisateur à chaque
+décorateur.
+
+Une modification du rôle, de l'entreprise, du manager ou de l'activation d'un
+utilisateur (ou sa suppression) est repérée par un écouteur de session ;
+après le commit, l'entrée est invalidée localement, la date de modification
+est publiée dans Redis et la version partagée incrémentée. Les autres workers
+relisent la version au plus toutes les
+``PRINCIPAL_CACHE_VERSION_CHECK_SECONDS`` secondes. Sans Redis, le TTL borne
+la durée pendant laquelle un autre worker peut voir l'ancien rôle.
+
+Avec ``JWT_PRINCIPAL_CLAIMS``, le rôle, l'entreprise et le manager sont aussi
+inscrits dans le jeton (``additional_claims``) : un jeton émis après la
+dernière modification de l'utilisateur suffit, sans cache ni base. Les
+modifications n'étant connues des autres workers que par Redis, cette option
+suppose Redis.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.utils.redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'pointflex:principals:version'
+CHANGED_KEY = 'pointflex:principals:changed_at'
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_VERSION_CHECK_SECONDS = 2
+# Après un échec de connexion, Redis n'est pas réinterrogé pendant ce délai
+REDIS_RETRY_SECONDS = 30
+# Colonnes dont la modification invalide le principal
+WATCHED_COLUMNS = ('role', 'company_id', 'is_active', 'manager_id')
+# Clé de ``Session.info`` : ids des utilisateurs modifiés dans la transaction
+PENDING_KEY = 'principal_changes'
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identité et rôle d'un utilisateur, suffisants pour l'autorisation"""
+
+    id: int
+    role: str
+    company_id: Optional[int]
+    is_active: bool
+    manager_id: Optional[int]
+
+
+_entries = {}
+# Dernière modification connue par utilisateur (timestamp Unix), pour les claims
+_changed_at = {}
+_state = {'version': None, 'checked_at': 0.0, 'redis_down_until': 0.0}
+_lock = threading.Lock()
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _redis_call(operation):
+    """Exécute ``operation(redis)`` ; retourne None si Redis est indisponible"""
+    now = time.monotonic()
+    if now < _state['redis_down_until']:
+        return None
+    try:
+        return operation(get_redis_connection())
+    except Exception as exc:
+        _state['redis_down_until'] = now + REDIS_RETRY_SECONDS
+        logger.debug(f"Redis indisponible pour le cache des principaux: {exc}")
+        return None
+
+
+def _sync_version():
+    """Relit la version partagée ; si elle a changé, vide le cache et relit les dates de modification"""
+    now = time.monotonic()
+    if now - _state['checked_at'] < _config('PRINCIPAL_CACHE_VERSION_CHECK_SECONDS',
+                                            DEFAULT_VERSION_CHECK_SECONDS):
+        return
+    _state['checked_at'] = now
+
+    remote = _redis_call(lambda redis: redis.get(VERSION_KEY))
+    if remote is None or int(remote) == _state['version']:
+        return
+    changed = _redis_call(lambda redis: redis.hgetall(CHANGED_KEY)) or {}
+    with _lock:
+        _entries.clear()
+        for user_id, changed_at in changed.items():
+            _changed_at[int(user_id)] = max(float(changed_at), _changed_at.get(int(user_id), 0.0))
+        _state['version'] = int(remote)
+
+
+def _load(user_id):
+    from backend.database import db
+    from backend.models.user import User
+
+    row = db.session.execute(
+        select(User.id, User.role, User.company_id, User.is_active, User.manager_id).where(User.id == user_id)
+    ).first()
+    return Principal(*row) if row else None
+
+
+def get_principal(user_id):
+    """Principal de ``user_id`` (None si l'utilisateur n'existe pas)"""
+    _sync_version()
+    now = time.monotonic()
+    entry = _entries.get(user_id)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+
+    principal = _load(user_id)
+    ttl = _config('PRINCIPAL_CACHE_TTL', DEFAULT_TTL_SECONDS)
+    if ttl > 0:
+        _entries[user_id] = (principal, now + ttl)
+    return principal
+
+
+def principal_from_claims(user_id, claims):
+    """Principal tiré des claims d'un jeton, ou None s'ils sont absents ou antérieurs à une modification"""
+    if 'role' not in claims:
+        return None
+    _sync_version()
+    if claims.get('iat', 0) <= _changed_at.get(user_id, 0.0):
+        return None
+    return Principal(user_id, claims['role'], claims.get('company_id'), True, claims.get('manager_id'))
+
+
+def additional_claims(user):
+    """Claims ajoutés aux jetons d'accès si ``JWT_PRINCIPAL_CLAIMS`` est activé"""
+    return {'role': user.role, 'company_id': user.company_id, 'manager_id': user.manager_id}
+
+
+def invalidate(user_ids=None):
+    """Invalide localement les principaux de ``user_ids`` (tous si None)"""
+    with _lock:
+        if user_ids is None:
+            _entries.clear()
+            return
+        changed_at = time.time()
+        for user_id in user_ids:
+            _entries.pop(user_id, None)
+            _changed_at[user_id] = changed_at
+
+
+def bump_version(user_ids):
+    """Invalide localement et signale la modification aux autres workers"""
+    user_ids = list(user_ids)
+    invalidate(user_ids)
+    if not user_ids:
+        return
+
+    def publish(redis):
+        pipe = redis.pipeline()
+        pipe.hset(CHANGED_KEY, mapping={user_id: _changed_at[user_id] for user_id in user_ids})
+        pipe.incr(VERSION_KEY)
+        return pipe.execute()[-1]
+
+    remote = _redis_call(publish)
+    if remote is not None:
+        _state['version'] = int(remote)
+
+
+def clear():
+    """Vide entièrement le cache du processus (nouvelle application, tests)"""
+    with _lock:
+        _entries.clear()
+        _changed_at.clear()
+        _state['version'] = None
+        _state['checked_at'] = 0.0
+
+
+# Écouteurs de session ------------------------------------------------------------
+def _after_flush(session, flush_context):
+    from backend.models.user import User
+
+    changed = {
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and any(inspect(obj).attrs[name].history.has_changes() for name in WATCHED_COLUMNS)
+    }
+    changed.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    if changed:
+        session.info.setdefault(PENDING_KEY, set()).update(changed)
+
+
+def _after_commit(session):
+    changed = session.info.pop(PENDING_KEY, None)
+    if changed:
+        bump_version(changed)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def register_principal_hooks():
+    """Active l'invalidation des principaux pour toutes les sessions (idempotent)"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
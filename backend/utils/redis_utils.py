@@ -0,0 +1,36 @@
+"""
+Connexion Redis partagée par processus
+
+``Redis.from_url`` crée un pool de connexions à chaque appel ; on garde donc un
+client par URL pour réutiliser le pool au lieu d'ouvrir une socket par requête.
+"""
+import os
+import threading
+
+from flask import current_app, has_app_context
+from redis import Redis
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_redis_url():
+    """Retourne l'URL Redis configurée pour l'application"""
+    default_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    if has_app_context():
+        return current_app.config.get('REDIS_URL', default_url)
+    return default_url
+
+
+def get_redis_connection(url=None):
+    """Retourne le client Redis partagé pour ``url`` (créé à la première demande)"""
+    url = url or get_redis_url()
+    client = _clients.get(url)
+    if client is None:
+        with _lock:
+            client = _clients.get(url)
+            if client is None:
+                timeout = current_app.config.get('REDIS_SOCKET_TIMEOUT', 2) if has_app_context() else 2
+                client = Redis.from_url(url, socket_connect_timeout=timeout, health_check_interval=30)
+                _clients[url] = client
+    return client
@@ -0,0 +1,198 @@
+"""
+Cache des paramètres système (SystemSettings)
+
+Deux niveaux :
+
+* un mémo par requête (``flask.g``) pour qu'une même requête voie une valeur
+  stable et n'interroge jamais deux fois le même paramètre ;
+* un cache par processus avec TTL, invalidé par un numéro de version.
+
+La version est incrémentée après le commit de toute écriture sur
+``SystemSettings`` (écouteurs de session) et publiée dans Redis ; les autres
+workers la relisent au plus toutes les ``SETTINGS_CACHE_VERSION_CHECK_SECONDS``
+secondes. Publier avant le commit laisserait un autre worker relire l'ancienne
+valeur et la garder pour tout le TTL. Sans Redis, le TTL borne la durée
+pendant laquelle un autre worker peut voir l'ancienne valeur.
+"""
+import copy
+import logging
+import threading
+import time
+from itertools import chain
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.utils.redis_utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'pointflex:system_settings:version'
+DEFAULT_TTL_SECONDS = 60
+DEFAULT_VERSION_CHECK_SECONDS = 2
+# Après un échec de connexion, Redis n'est pas réinterrogé pendant ce délai
+REDIS_RETRY_SECONDS = 30
+# Clé de ``Session.info`` : paramètres ``(catégorie, clé)`` modifiés, ``(None, None)`` pour tous
+PENDING_KEY = 'system_settings_changed'
+
+MISSING = object()
+
+_entries = {}
+_state = {'version': None, 'checked_at': 0.0, 'redis_down_until': 0.0}
+_lock = threading.Lock()
+
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _request_memo():
+    if not has_request_context():
+        return None
+    memo = getattr(g, '_system_settings_memo', None)
+    if memo is None:
+        memo = g._system_settings_memo = {}
+    return memo
+
+
+def _redis_call(operation):
+    """Exécute ``operation(redis)`` ; retourne None si Redis est indisponible"""
+    now = time.monotonic()
+    if now < _state['redis_down_until']:
+        return None
+    try:
+        return operation(get_redis_connection())
+    except Exception as exc:
+        _state['redis_down_until'] = now + REDIS_RETRY_SECONDS
+        logger.debug(f"Redis indisponible pour le cache des paramètres: {exc}")
+        return None
+
+
+def _sync_version():
+    """Relit la version partagée et vide le cache local si elle a changé"""
+    now = time.monotonic()
+    if now - _state['checked_at'] < _config('SETTINGS_CACHE_VERSION_CHECK_SECONDS', DEFAULT_VERSION_CHECK_SECONDS):
+        return
+    _state['checked_at'] = now
+
+    remote = _redis_call(lambda redis: redis.get(VERSION_KEY))
+    if remote is None:
+        return
+    remote = int(remote)
+    if remote != _state['version']:
+        with _lock:
+            _entries.clear()
+            _state['version'] = remote
+
+
+def _copy(value):
+    # Les valeurs JSON mutables sont copiées pour qu'un appelant ne modifie pas le cache
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def get(category, key, loader):
+    """Retourne la valeur en cache ou appelle ``loader()`` (qui peut renvoyer ``MISSING``)"""
+    cache_key = (category, key)
+
+    memo = _request_memo()
+    if memo is not None and cache_key in memo:
+        return _copy(memo[cache_key])
+
+    _sync_version()
+
+    now = time.monotonic()
+    entry = _entries.get(cache_key)
+    if entry is not None and entry[1] > now:
+        value = entry[0]
+    else:
+        value = loader()
+        ttl = _config('SETTINGS_CACHE_TTL', DEFAULT_TTL_SECONDS)
+        if ttl > 0:
+            _entries[cache_key] = (value, now + ttl)
+
+    if memo is not None:
+        memo[cache_key] = value
+    return _copy(value)
+
+
+def invalidate(category=None, key=None):
+    """Invalide une entrée (ou tout le cache) localement et pour la requête courante"""
+    with _lock:
+        if category is None:
+            _entries.clear()
+        else:
+            _entries.pop((category, key), None)
+
+    memo = _request_memo()
+    if memo is not None:
+        if category is None:
+            memo.clear()
+        else:
+            memo.pop((category, key), None)
+
+
+def _publish_version():
+    remote = _redis_call(lambda redis: redis.incr(VERSION_KEY))
+    if remote is not None:
+        _state['version'] = int(remote)
+
+
+def bump_version(category=None, key=None):
+    """Invalide le cache local et incrémente la version partagée entre workers"""
+    invalidate(category, key)
+    _publish_version()
+
+
+def bump_version_on_commit(session, category=None, key=None):
+    """Programme ``bump_version`` au commit de ``session`` (écritures hors unité de travail)"""
+    invalidate(category, key)
+    session.info.setdefault(PENDING_KEY, set()).add((category, key))
+
+
+def clear():
+    """Vide entièrement le cache du processus (nouvelle application, tests)"""
+    with _lock:
+        _entries.clear()
+        _state['version'] = None
+        _state['checked_at'] = 0.0
+
+
+# Écouteurs de session ------------------------------------------------------------
+def _after_flush(session, flush_context):
+    from backend.models.system_settings import SystemSettings
+
+    changed = {
+        (obj.category, obj.key) for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, SystemSettings)
+    }
+    if changed:
+        session.info.setdefault(PENDING_KEY, set()).update(changed)
+        for category, key in changed:
+            invalidate(category, key)
+
+
+def _after_commit(session):
+    changed = session.info.pop(PENDING_KEY, None)
+    if changed:
+        for category, key in changed:
+            invalidate(category, key)
+        _publish_version()
+
+
+def _after_rollback(session):
+    # La valeur non validée a pu être relue et mise en cache par ce processus
+    for category, key in session.info.pop(PENDING_KEY, None) or ():
+        invalidate(category, key)
+
+
+def register_settings_hooks():
+    """Active l'invalidation des paramètres pour toutes les sessions (idempotent)"""
+    for name, listener in (('after_flush', _after_flush), ('after_commit', _after_commit),
+                           ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
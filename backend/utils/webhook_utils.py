@@ -1,109 +1,366 @@
 """
 Utilities for dispatching webhooks
+
+Chemin d'un événement :
+
+* les abonnements concernés sont résolus par (entreprise, type d'événement)
+  via la table indexée ``webhook_subscription_events``, avec un cache par
+  processus (``WEBHOOK_SUBSCRIPTION_CACHE_TTL``) invalidé à chaque
+  modification d'abonnement ;
+* le payload est sérialisé une seule fois puis les jobs RQ sont mis en file
+  en un seul aller-retour Redis (``enqueue_many``) sur la connexion partagée ;
+* les abonnements ``batch_deliveries`` accumulent les événements dans un
+  tampon (liste Redis) vidé par ``flush_webhook_batch_task`` après
+  ``WEBHOOK_BATCH_WINDOW_SECONDS`` : un seul POST pour tout le lot.
+
+Avec ``WEBHOOK_DELIVERY_SYNC`` les livraisons sont faites immédiatement dans le
+processus courant (développement sans Redis).
 """
 import json
-import os
-import requests
+import secrets
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta
+
 from flask import current_app
 
-from backend.database import db # Corrected import
-from backend.models.webhook_subscription import WebhookSubscription # This import is fine as it's a sibling package
-from backend.models.webhook_delivery_log import WebhookDeliveryLog # This import is fine
+from backend.database import db
+from backend.models.webhook_subscription import WebhookSubscription, WebhookSubscriptionEvent
 
 # Queue name used for webhook dispatch jobs
 WEBHOOK_QUEUE_NAME = "pointflex_webhooks"
 
 # Configuration for webhook delivery
 WEBHOOK_TIMEOUT_SECONDS = 10
-WEBHOOK_MAX_RETRIES = 3 # For a more advanced system; initial implementation might not auto-retry
-WEBHOOK_RETRY_DELAY_SECONDS = 60 # Initial delay for retries
+WEBHOOK_MAX_RETRIES = 3
+WEBHOOK_RETRY_INTERVALS = [10, 30, 60]
 
-def dispatch_webhook_event(event_type: str, payload_data: dict, company_id: int | None = None):
-    """
-    Finds relevant webhook subscriptions and attempts to dispatch the event.
+DEFAULT_SUBSCRIPTION_CACHE_TTL = 30
+DEFAULT_BATCH_WINDOW_SECONDS = 5
+DEFAULT_BATCH_MAX_EVENTS = 100
+# Durée de vie du marqueur « lot planifié » au-delà de la fenêtre (job perdu)
+BATCH_FLAG_GRACE_SECONDS = 300
 
-    :param event_type: The type of event (e.g., "user.created").
-    :param payload_data: A dictionary representing the event payload.
-    :param company_id: The ID of the company this event pertains to (if applicable).
-                       If None, only global webhooks (if any) might be triggered, or it's an error.
+BATCH_EVENT_TYPE = "batch"
+BATCH_REDIS_PREFIX = 'pointflex:webhooks:batch:'
+
+WebhookTarget = namedtuple('WebhookTarget', 'id target_url batch_deliveries')
+
+_targets = {}  # { (company_id, event_type): (expires_at, [WebhookTarget]) }
+_targets_lock = threading.Lock()
+
+
+# --- Résolution des abonnements ------------------------------------------------
+
+def _load_targets(company_id, event_type):
+    rows = db.session.query(
+        WebhookSubscription.id,
+        WebhookSubscription.target_url,
+        WebhookSubscription.batch_deliveries,
+    ).join(
+        WebhookSubscriptionEvent, WebhookSubscriptionEvent.subscription_id == WebhookSubscription.id
+    ).filter(
+        WebhookSubscriptionEvent.event_type == event_type,
+        WebhookSubscription.company_id == company_id,
+        WebhookSubscription.is_active == True,  # noqa: E712 - comparaison SQL
+    ).order_by(WebhookSubscription.id).all()
+    return [WebhookTarget(row.id, row.target_url, bool(row.batch_deliveries)) for row in rows]
+
+
+def get_webhook_targets(company_id, event_type):
+    """Abonnements actifs de ``company_id`` souscrits à ``event_type`` (cache par processus)"""
+    key = (company_id, event_type)
+    now = time.monotonic()
+    entry = _targets.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    targets = _load_targets(company_id, event_type)
+    ttl = current_app.config.get('WEBHOOK_SUBSCRIPTION_CACHE_TTL', DEFAULT_SUBSCRIPTION_CACHE_TTL)
+    if ttl > 0:
+        with _targets_lock:
+            _targets[key] = (now + ttl, targets)
+    return targets
+
+
+def invalidate_webhook_subscriptions(company_id=None):
+    """Invalide le cache des abonnements d'une entreprise (ou de toutes)"""
+    with _targets_lock:
+        if company_id is None:
+            _targets.clear()
+        else:
+            for key in [key for key in _targets if key[0] == company_id]:
+                del _targets[key]
+
+
+# --- Tampon des livraisons groupées ----------------------------------------------
+
+class WebhookBatchBuffer:
+    """Interface des tampons d'événements en attente de livraison groupée"""
+
+    def push(self, subscription_id, payload_json, ttl_seconds):
+        """Ajoute un événement ; retourne True si aucun envoi n'était planifié pour l'abonnement"""
+        raise NotImplementedError
+
+    def drain(self, subscription_id, limit):
+        """Retire (dans l'ordre) jusqu'à ``limit`` événements ; retourne ``(événements, restants)``"""
+        raise NotImplementedError
+
+    def restore(self, subscription_id, payloads):
+        """Remet des événements en tête du tampon (échec de livraison)"""
+        raise NotImplementedError
+
+    def mark_scheduled(self, subscription_id, ttl_seconds):
+        """Note qu'un envoi est déjà planifié : les événements ajoutés n'en planifient pas d'autre"""
+        raise NotImplementedError
+
+
+class MemoryWebhookBatchBuffer(WebhookBatchBuffer):
+    """Tampon en mémoire du processus (développement, tests)"""
+
+    def __init__(self):
+        self._events = {}
+        self._scheduled = set()
+        self._lock = threading.Lock()
+
+    def push(self, subscription_id, payload_json, ttl_seconds):
+        with self._lock:
+            self._events.setdefault(subscription_id, []).append(payload_json)
+            if subscription_id in self._scheduled:
+                return False
+            self._scheduled.add(subscription_id)
+            return True
+
+    def drain(self, subscription_id, limit):
+        with self._lock:
+            self._scheduled.discard(subscription_id)
+            events = self._events.get(subscription_id, [])
+            drained, remaining = events[:limit], events[limit:]
+            self._events[subscription_id] = remaining
+            return drained, len(remaining)
+
+    def restore(self, subscription_id, payloads):
+        with self._lock:
+            self._events[subscription_id] = list(payloads) + self._events.get(subscription_id, [])
+
+    def mark_scheduled(self, subscription_id, ttl_seconds):
+        with self._lock:
+            self._scheduled.add(subscription_id)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._scheduled.clear()
+
+
+class RedisWebhookBatchBuffer(WebhookBatchBuffer):
+    """Liste Redis par abonnement et marqueur ``SET NX`` du prochain envoi planifié
+
+    Le marqueur est supprimé avant la lecture du lot : un événement ajouté
+    pendant l'envoi planifie toujours un nouvel envoi, aucun n'est oublié.
     """
-    if not company_id:
-        current_app.logger.warning(f"dispatch_webhook_event called for event '{event_type}' without a company_id. No company-specific webhooks will be sent.")
-        # Depending on policy, you might want to fetch global webhooks if company_id is None
-        # For now, assuming events are typically company-scoped.
-        # query = WebhookSubscription.query.filter(
-        #     WebhookSubscription.is_active == True,
-        #     WebhookSubscription.company_id == None # Global webhooks
-        # )
-        return
 
-    query = WebhookSubscription.query.filter(
-        WebhookSubscription.is_active == True,
-        WebhookSubscription.company_id == company_id
+    def __init__(self, redis):
+        self.redis = redis
+
+    @staticmethod
+    def _keys(subscription_id):
+        key = f'{BATCH_REDIS_PREFIX}{subscription_id}'
+        return key, f'{key}:scheduled'
+
+    def push(self, subscription_id, payload_json, ttl_seconds):
+        events_key, flag_key = self._keys(subscription_id)
+        pipe = self.redis.pipeline()
+        pipe.rpush(events_key, payload_json)
+        pipe.set(flag_key, 1, nx=True, ex=ttl_seconds)
+        return bool(pipe.execute()[1])
+
+    def drain(self, subscription_id, limit):
+        events_key, flag_key = self._keys(subscription_id)
+        self.redis.delete(flag_key)
+        pipe = self.redis.pipeline()
+        pipe.lrange(events_key, 0, limit - 1)
+        pipe.ltrim(events_key, limit, -1)
+        pipe.llen(events_key)
+        events, _, remaining = pipe.execute()
+        return [event.decode('utf-8') if isinstance(event, bytes) else event for event in events], remaining
+
+    def restore(self, subscription_id, payloads):
+        if payloads:
+            events_key, _ = self._keys(subscription_id)
+            self.redis.lpush(events_key, *reversed(payloads))
+
+    def mark_scheduled(self, subscription_id, ttl_seconds):
+        _, flag_key = self._keys(subscription_id)
+        self.redis.set(flag_key, 1, ex=ttl_seconds)
+
+
+_memory_batch_buffer = MemoryWebhookBatchBuffer()
+
+
+def get_webhook_batch_buffer():
+    """Tampon en mémoire en mode synchrone, Redis sinon"""
+    if current_app.config.get('WEBHOOK_DELIVERY_SYNC'):
+        return _memory_batch_buffer
+    from backend.utils.redis_utils import get_redis_connection
+    return RedisWebhookBatchBuffer(get_redis_connection())
+
+
+def clear_webhook_caches():
+    """Vide le cache des abonnements et le tampon en mémoire (nouvelle application, tests)"""
+    invalidate_webhook_subscriptions()
+    _memory_batch_buffer.clear()
+
+
+def build_batch_body(subscription_id, payloads_json):
+    """Corps JSON d'un lot, construit sans re-sérialiser les événements"""
+    header = json.dumps({
+        "batch": True,
+        "subscription_id": subscription_id,
+        "event_count": len(payloads_json),
+        "created_at": datetime.utcnow().isoformat(),
+    }, sort_keys=True)
+    return f'{header[:-1]}, "events": [{", ".join(payloads_json)}]}}'
+
+
+# --- Mise en file ------------------------------------------------------------------
+
+def get_webhook_queue():
+    """File RQ des webhooks sur la connexion Redis partagée du processus"""
+    from rq import Queue
+    from backend.utils.redis_utils import get_redis_connection
+    return Queue(WEBHOOK_QUEUE_NAME, connection=get_redis_connection())
+
+
+def _job_options(config):
+    from rq import Retry
+    max_retries = config.get('WEBHOOK_MAX_RETRIES', WEBHOOK_MAX_RETRIES)
+    return {
+        # Plus de temps que le délai d'une requête HTTP
+        'timeout': config.get('WEBHOOK_TIMEOUT_SECONDS', WEBHOOK_TIMEOUT_SECONDS) * 2,
+        'retry': Retry(max=max_retries, interval=WEBHOOK_RETRY_INTERVALS) if max_retries > 0 else None,
+    }
+
+
+def _enqueue_deliveries(targets, event_type, full_payload, payload_json):
+    from rq import Queue
+
+    queue = get_webhook_queue()
+    options = _job_options(current_app.config)
+    jobs = queue.enqueue_many([
+        Queue.prepare_data(
+            'backend.tasks.webhook_tasks.send_webhook_attempt_task',
+            args=(target.id, event_type, full_payload, payload_json),
+            job_id=f"webhook_{target.id}_{full_payload['event_id']}",
+            **options,
+        )
+        for target in targets
+    ])
+    current_app.logger.info(
+        f"Enqueued {len(jobs)} webhook job(s) for event '{event_type}' (event {full_payload['event_id']})"
     )
 
-    subscriptions_to_notify = []
-    for sub in query.all():
-        if event_type in sub.subscribed_events:
-            subscriptions_to_notify.append(sub)
 
-    if not subscriptions_to_notify:
-        current_app.logger.info(f"No active subscriptions for event '{event_type}' in company {company_id}.")
+def batch_retry_delay(attempt_number):
+    """Attente avant de renvoyer un lot après l'échec de la tentative ``attempt_number``"""
+    return WEBHOOK_RETRY_INTERVALS[min(attempt_number, len(WEBHOOK_RETRY_INTERVALS)) - 1]
+
+
+def schedule_batch_flush(subscription_id, delay_seconds=None, attempt_number=1):
+    """Planifie l'envoi du lot d'un abonnement (immédiat en mode synchrone)
+
+    Le job d'envoi n'a pas de ``Retry`` RQ : après un échec, il remet les
+    événements dans le tampon et se replanifie lui-même (``attempt_number``).
+    """
+    config = current_app.config
+    if config.get('WEBHOOK_DELIVERY_SYNC'):
+        from backend.tasks.webhook_tasks import flush_webhook_batch_task
+        flush_webhook_batch_task(subscription_id)
         return
 
-    # Prepare the base payload structure
+    if delay_seconds is None:
+        delay_seconds = config.get('WEBHOOK_BATCH_WINDOW_SECONDS', DEFAULT_BATCH_WINDOW_SECONDS)
+    queue = get_webhook_queue()
+    timeout = _job_options(config)['timeout']
+    task = 'backend.tasks.webhook_tasks.flush_webhook_batch_task'
+    if delay_seconds > 0:
+        # Exécuté par le planificateur du worker (``run_worker.py`` le démarre)
+        queue.enqueue_in(timedelta(seconds=delay_seconds), task, subscription_id, attempt_number,
+                         job_timeout=timeout)
+    else:
+        queue.enqueue(task, subscription_id, attempt_number, job_timeout=timeout)
+
+
+def _buffer_batched(targets, payload_json):
+    buffer = get_webhook_batch_buffer()
+    window = current_app.config.get('WEBHOOK_BATCH_WINDOW_SECONDS', DEFAULT_BATCH_WINDOW_SECONDS)
+    for target in targets:
+        if buffer.push(target.id, payload_json, window + BATCH_FLAG_GRACE_SECONDS):
+            schedule_batch_flush(target.id, window)
+
+
+def build_event_payload(event_type, payload_data, company_id, event_id=None):
+    """Retourne le payload complet d'un événement et sa sérialisation JSON (signée telle quelle)"""
     full_payload = {
-        "event_id": f"evt_{datetime.utcnow().timestamp()}_{secrets.token_hex(8)}", # Unique event ID
+        "event_id": event_id or f"evt_{datetime.utcnow().timestamp()}_{secrets.token_hex(8)}", # Unique event ID
         "event_type": event_type,
         "created_at": datetime.utcnow().isoformat(),
         "data": payload_data,
         "company_id": company_id
     }
+    return full_payload, json.dumps(full_payload, sort_keys=True, default=str)
+
 
-    payload_json_bytes_str = json.dumps(full_payload, sort_keys=True, default=str)
-    # No longer encode to bytes here, task will do it. Pass string to RQ.
+def dispatch_webhook_event(
+    event_type: str,
+    payload_data: dict,
+    company_id: int | None = None,
+    event_id: str | None = None,
+    raise_errors: bool = False,
+):
+    """
+    Finds relevant webhook subscriptions and attempts to dispatch the event.
+
+    :param event_type: The type of event (e.g., "user.created").
+    :param payload_data: A dictionary representing the event payload.
+    :param company_id: The ID of the company this event pertains to (if applicable).
+                       If None, no company-specific webhooks are sent.
+    :param event_id: Stable event ID (an event relayed twice keeps the same ID).
+    :param raise_errors: Re-raise lookup/enqueue failures instead of logging them
+                         (the outbox relay retries the event).
+    """
+    if not company_id:
+        current_app.logger.warning(f"dispatch_webhook_event called for event '{event_type}' without a company_id. No company-specific webhooks will be sent.")
+        return
 
-    # Get RQ queue
-    # This assumes Redis is configured for the Flask app.
-    # RQ connection and queue should ideally be managed globally or via Flask extension.
     try:
-        redis_url = current_app.config.get('REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
-        redis_conn = Redis.from_url(redis_url)
-        # Using a dedicated queue for webhooks
-        webhook_queue = Queue(WEBHOOK_QUEUE_NAME, connection=redis_conn)
+        targets = get_webhook_targets(company_id, event_type)
     except Exception as e:
-        current_app.logger.error(f"Failed to connect to Redis for RQ: {e}. Webhooks will not be queued.")
+        current_app.logger.error(f"Failed to load webhook subscriptions for company {company_id}: {e}", exc_info=True)
+        if raise_errors:
+            raise
         return
 
-    for sub in subscriptions_to_notify:
-        try:
-            # Enqueue the task
-            # The task path is 'backend.tasks.webhook_tasks.send_webhook_attempt_task'
-            job = webhook_queue.enqueue(
-                'backend.tasks.webhook_tasks.send_webhook_attempt_task',
-                args=(sub.id, event_type, full_payload, payload_json_bytes_str),
-                job_timeout=current_app.config.get('WEBHOOK_TIMEOUT_SECONDS', 10) * 2, # Give task more time than single HTTP timeout
-                retry=Retry(max=current_app.config.get('WEBHOOK_MAX_RETRIES', 3), interval=[10, 30, 60]), # Example retry strategy
-                # result_ttl=3600, # How long to keep job result
-                # failure_ttl=... # How long to keep failed job info
-                job_id=f"webhook_{sub.id}_{full_payload.get('event_id', secrets.token_hex(4))}" # Optional: custom job ID
-            )
-            current_app.logger.info(f"Enqueued webhook job {job.id} for event '{event_type}' to sub ID {sub.id}, URL {sub.target_url}")
-
-            # Optionally, create an initial WebhookDeliveryLog here with 'queued' status
-            # This ensures a log exists even if the worker never picks up the task.
-            # However, the task itself also creates a log upon actual attempt.
-            # For simplicity, we'll let the task create its own log.
-
-        except Exception as e:
-            current_app.logger.error(f"Failed to enqueue webhook task for sub ID {sub.id}, event '{event_type}': {e}", exc_info=True)
-
-# The send_single_webhook function is now effectively replaced by the RQ task in webhook_tasks.py
-# We can remove it or keep it for non-RQ/testing purposes if clearly marked.
-# For this refactor, it's assumed to be replaced.
-
-# Need to import secrets for event_id generation in dispatch_webhook_event
-import secrets
-from redis import Redis # For RQ connection
-from rq import Queue, Retry # For RQ
+    if not targets:
+        current_app.logger.info(f"No active subscriptions for event '{event_type}' in company {company_id}.")
+        return
+
+    full_payload, payload_json = build_event_payload(event_type, payload_data, company_id, event_id)
+    direct = [target for target in targets if not target.batch_deliveries]
+    batched = [target for target in targets if target.batch_deliveries]
+
+    try:
+        if direct:
+            if current_app.config.get('WEBHOOK_DELIVERY_SYNC'):
+                from backend.tasks.webhook_tasks import send_webhook_attempt_task
+                for target in direct:
+                    send_webhook_attempt_task(target.id, event_type, full_payload, payload_json)
+            else:
+                _enqueue_deliveries(direct, event_type, full_payload, payload_json)
+        if batched:
+            _buffer_batched(batched, payload_json)
+    except Exception as e:
+        current_app.logger.error(f"Failed to dispatch webhook event '{event_type}' for company {company_id}: {e}", exc_info=True)
+        if raise_errors:
+            raise
@@ -1,4 +1,9 @@
 import apiClient from '../api/client';
+import AdaptiveStorage from '../platform/storage';
+
+const OFFLINE_QUEUE_KEY = 'offlineAttendanceQueue';
+// Doit rester inférieur ou égal à OFFLINE_SYNC_MAX_EVENTS côté serveur
+const OFFLINE_SYNC_BATCH_SIZE = 500;
 
 /**
  * Type pour les coordonnées GPS
@@ -9,6 +14,40 @@ interface LocationData {
   accuracy: number;
 }
 
+/**
+ * Événement de pointage enregistré hors connexion
+ */
+export type OfflineEventType = 'checkin' | 'checkout' | 'pause_start' | 'pause_end';
+
+export interface OfflineEvent {
+  idempotency_key: string;
+  type: OfflineEventType;
+  timestamp: string;
+  coordinates?: LocationData;
+  device_id?: string;
+  pause_type?: string;
+}
+
+/**
+ * Résultat de la synchronisation d'un événement
+ */
+export interface OfflineSyncResult {
+  index: number;
+  idempotency_key?: string;
+  status: 'applied' | 'rejected';
+  status_code: number;
+  message: string | null;
+  replayed?: boolean;
+}
+
+const generateIdempotencyKey = () =>
+  `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+
+const readOfflineQueue = async (): Promise<OfflineEvent[]> => {
+  const raw = await AdaptiveStorage.getItem(OFFLINE_QUEUE_KEY);
+  return raw ? JSON.parse(raw) : [];
+};
+
 /**
  * Service pour gérer les fonctionnalités de pointage
  */
@@ -93,6 +132,50 @@ export const attendanceService = {
       console.error('Get today attendance error:', error);
       throw error;
     }
+  },
+
+  /**
+   * Met en file un événement de pointage fait sans connexion
+   * @param event - Type, coordonnées éventuelles et type de pause
+   * @returns L'événement enregistré avec sa clé d'idempotence
+   */
+  async queueOfflineEvent(event: Omit<OfflineEvent, 'idempotency_key' | 'timestamp'>) {
+    const queued: OfflineEvent = {
+      ...event,
+      idempotency_key: generateIdempotencyKey(),
+      timestamp: new Date().toISOString()
+    };
+    const queue = await readOfflineQueue();
+    queue.push(queued);
+    await AdaptiveStorage.setItem(OFFLINE_QUEUE_KEY, JSON.stringify(queue));
+    return queued;
+  },
+
+  /**
+   * Rejoue la file hors ligne en un appel par lot de OFFLINE_SYNC_BATCH_SIZE événements.
+   * Les clés d'idempotence rendent un renvoi sans effet : en cas d'échec réseau,
+   * la file est conservée et pourra être renvoyée telle quelle.
+   * @returns Résultats par événement
+   */
+  async syncOfflineQueue(): Promise<OfflineSyncResult[]> {
+    const queue = await readOfflineQueue();
+    const results: OfflineSyncResult[] = [];
+    try {
+      for (let start = 0; start < queue.length; start += OFFLINE_SYNC_BATCH_SIZE) {
+        const events = queue.slice(start, start + OFFLINE_SYNC_BATCH_SIZE);
+        const response = await apiClient.post('/attendance/sync/offline', { events });
+        results.push(...response.data.results);
+        // Chaque événement a reçu un résultat définitif (appliqué ou rejeté)
+        await AdaptiveStorage.setItem(
+          OFFLINE_QUEUE_KEY,
+          JSON.stringify(queue.slice(start + events.length))
+        );
+      }
+      return results;
+    } catch (error) {
+      console.error('Offline sync error:', error);
+      throw error;
+    }
   }
 };
 
@@ -1,22 +1,31 @@
 #!/usr/bin/env python
 """Start an RQ worker with Flask app context."""
-import os
-from redis import Redis
-from rq import Worker, Connection
+import sys
+from rq import SimpleWorker
 
 from backend.app import create_app
+from backend.services.report_job_service import REPORTS_QUEUE_NAME
+from backend.utils.http_pool import close_http_sessions
+from backend.utils.redis_utils import get_redis_connection
 from backend.utils.webhook_utils import WEBHOOK_QUEUE_NAME
 
 
 def main():
     app = create_app()
-    redis_url = app.config.get("REDIS_URL", os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
-    conn = Redis.from_url(redis_url)
+
+    # Files écoutées : toutes par défaut, ou celles passées en argument
+    # (ex. ``python run_worker.py pointflex_reports`` pour un worker dédié aux rapports)
+    queues = sys.argv[1:] or [WEBHOOK_QUEUE_NAME, REPORTS_QUEUE_NAME]
 
     with app.app_context():
-        with Connection(conn):
-            worker = Worker([WEBHOOK_QUEUE_NAME])
-            worker.work()
+        # Jobs exécutés dans le processus du worker (pas de fork par job) : les
+        # pools HTTP keep-alive des webhooks survivent d'un job à l'autre.
+        # Le planificateur exécute les envois groupés différés (``enqueue_in``).
+        worker = SimpleWorker(queues, connection=get_redis_connection())
+        try:
+            worker.work(with_scheduler=True)
+        finally:
+            close_http_sessions()
 
 
 if __name__ == "__main__":
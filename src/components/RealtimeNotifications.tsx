@@ -53,8 +53,7 @@ export default function RealtimeNotifications() {
         read: false,
       },
     ])
-    setUnreadCount(prev => prev + 1)
-  })
+  }, setUnreadCount)
 
   const markAsRead = (id: string) => {
     setNotifications(prev => 
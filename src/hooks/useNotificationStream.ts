@@ -7,14 +7,20 @@ interface NotificationData {
   [key: string]: any
 }
 
-export function useNotificationStream(userId?: number, onMessage?: (data: NotificationData) => void) {
+export function useNotificationStream(
+  userId?: number,
+  onMessage?: (data: NotificationData) => void,
+  onUnreadCount?: (count: number) => void
+) {
   const onMessageRef = useRef<typeof onMessage>()
+  const onUnreadCountRef = useRef<typeof onUnreadCount>()
 
-  // Keep the latest callback in a ref so that the EventSource doesn't need to
+  // Keep the latest callbacks in refs so that the EventSource doesn't need to
   // be re-created on each render
   useEffect(() => {
     onMessageRef.current = onMessage
-  }, [onMessage])
+    onUnreadCountRef.current = onUnreadCount
+  }, [onMessage, onUnreadCount])
 
   useEffect(() => {
     if (!userId) return
@@ -30,7 +36,18 @@ export function useNotificationStream(userId?: number, onMessage?: (data: Notifi
       }
     }
 
+    // Unread counter pushed by the server, no need to poll /notifications/count
+    const countHandler = (event: MessageEvent) => {
+      try {
+        const data: { unread_count: number } = JSON.parse(event.data)
+        onUnreadCountRef.current && onUnreadCountRef.current(data.unread_count)
+      } catch (e) {
+        console.error('Failed to parse notification count', e)
+      }
+    }
+
     source.addEventListener('notification', handler)
+    source.addEventListener('notification_count', countHandler)
 
     return () => {
       source.close()